@@ -0,0 +1,180 @@
+"""
+ベンチマーク用の共通ユーティリティ
+
+- 計測（経過時間・発行クエリ数・ピークメモリ）
+- ロールバック前提の一時データ作成
+"""
+import calendar
+import random
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import date
+from decimal import Decimal
+
+from django.db import connection, reset_queries, transaction
+from django.test.utils import CaptureQueriesContext
+
+
+class _Rollback(Exception):
+    """ベンチマーク終了時にトランザクションを破棄するための例外"""
+
+
+@contextmanager
+def rollback_after():
+    """ブロック内で作成したデータを最後にロールバックする"""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def measure(func, *args, **kwargs):
+    """関数を1回実行し、(戻り値, 経過ミリ秒, クエリ数) を返す"""
+    with CaptureQueriesContext(connection) as captured:
+        started = time.perf_counter()
+        result = func(*args, **kwargs)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    return result, elapsed_ms, len(captured.captured_queries)
+
+
+def measure_memory(func, *args, **kwargs):
+    """関数を1回実行し、(戻り値, 経過ミリ秒, クエリ数, ピークメモリMB) を返す（tracemalloc）"""
+    # クエリログの上限（9000件）に達しているとクエリ数を数えられないため空にする
+    reset_queries()
+    tracemalloc.start()
+    try:
+        result, elapsed_ms, queries = measure(func, *args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, elapsed_ms, queries, peak / 1024 / 1024
+
+
+def build_workload_dataset(users=20, tickets=100, months=6, seed=0, start=None):
+    """
+    工数・工数集計・外注費の計測用データを bulk_create で作成する。
+    同じ seed なら同じデータになる。
+    """
+    from apps.users.models import CustomUser, Department, Section
+    from apps.projects.models import Project, ProjectTicket
+    from apps.workloads.models import Workload
+    from apps.reports.models import WorkloadAggregation
+    from apps.cost_master.models import BusinessPartner, OutsourcingCost
+
+    rng = random.Random(seed)
+    start = start or date(2024, 1, 1)
+    year_months = []
+    year, month = start.year, start.month
+    for _ in range(months):
+        year_months.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+
+    department = Department.objects.create(name=f'bench-dept-{seed}')
+    section = Section.objects.create(name=f'bench-section-{seed}', department=department)
+
+    levels = [code for code, _ in CustomUser.EMPLOYEE_LEVEL_CHOICES]
+    CustomUser.objects.bulk_create([
+        CustomUser(
+            username=f'bench-{seed}-user-{i:05d}',
+            department=department,
+            section=section,
+            employee_level=rng.choice(levels),
+        )
+        for i in range(users)
+    ])
+    user_list = list(CustomUser.objects.filter(username__startswith=f'bench-{seed}-user-').order_by('id'))
+
+    project = Project.objects.create(name=f'bench-project-{seed}', assigned_section=section)
+    ProjectTicket.objects.bulk_create([
+        ProjectTicket(project=project, title=f'bench-ticket-{i:05d}')
+        for i in range(tickets)
+    ])
+    ticket_list = list(ProjectTicket.objects.filter(project=project).order_by('id'))
+
+    workloads = []
+    for ticket in ticket_list:
+        for user in rng.sample(user_list, min(len(user_list), 3)):
+            for year_month in year_months:
+                workload = Workload(user=user, project=project, ticket=ticket, year_month=year_month)
+                days_in_month = calendar.monthrange(int(year_month[:4]), int(year_month[5:]))[1]
+                for day in range(1, days_in_month + 1):
+                    if rng.random() < 0.4:
+                        workload.set_day_value(day, rng.choice([0.5, 1, 2, 3.5, 4, 8]))
+                workloads.append(workload)
+    Workload.objects.bulk_create(workloads, batch_size=500)
+
+    classifications = [code for code, _ in WorkloadAggregation.CaseClassificationChoices.choices]
+    creator = user_list[0]
+    aggregations = []
+    for ticket in ticket_list:
+        order_month = rng.randrange(months)
+        order_date = date(
+            int(year_months[order_month][:4]), int(year_months[order_month][5:]), rng.randint(1, 28)
+        )
+        end_month = rng.randrange(order_month, months)
+        actual_end_date = date(
+            int(year_months[end_month][:4]), int(year_months[end_month][5:]), rng.randint(1, 28)
+        ) if rng.random() < 0.7 else None
+        aggregations.append(WorkloadAggregation(
+            project_name=project,
+            case_name=ticket,
+            section=section,
+            case_classification=rng.choice(classifications),
+            order_date=order_date,
+            actual_end_date=actual_end_date if actual_end_date and actual_end_date >= order_date else None,
+            billing_amount_excluding_tax=Decimal(rng.randrange(100, 5000) * 1000),
+            created_by=creator,
+        ))
+    WorkloadAggregation.objects.bulk_create(aggregations, batch_size=500)
+
+    partner = BusinessPartner.objects.create(name=f'bench-bp-{seed}', hourly_rate=Decimal('5000'))
+    costs = []
+    for ticket in ticket_list:
+        for year_month in rng.sample(year_months, min(len(year_months), 2)):
+            hours = Decimal(rng.randrange(1, 160))
+            costs.append(OutsourcingCost(
+                year_month=year_month,
+                business_partner=partner,
+                project=project,
+                ticket=ticket,
+                status='in_progress',
+                work_hours=hours,
+                hourly_rate=partner.hourly_rate,
+                total_cost=hours * partner.hourly_rate,
+            ))
+    OutsourcingCost.objects.bulk_create(costs, batch_size=500)
+
+    return {
+        'department': department,
+        'section': section,
+        'users': user_list,
+        'project': project,
+        'tickets': ticket_list,
+        'year_months': year_months,
+    }
+
+
+def fill_aggregations(project, rows, batch_size=1000):
+    """
+    プロジェクトの工数集計を複製して rows 件にそろえる（エクスポート計測用）。
+    複製した行の備考には連番を入れる。
+    """
+    from apps.reports.models import WorkloadAggregation
+
+    template = list(WorkloadAggregation.objects.filter(project_name=project).order_by('id')[:100])
+    existing = WorkloadAggregation.objects.filter(project_name=project).count()
+    fields = [field.attname for field in WorkloadAggregation._meta.concrete_fields if not field.primary_key]
+
+    clones = []
+    for index in range(existing, rows):
+        source = template[index % len(template)]
+        values = {field: getattr(source, field) for field in fields}
+        values['remarks'] = f'bench-row-{index}'
+        clones.append(WorkloadAggregation(**values))
+        if len(clones) >= batch_size:
+            WorkloadAggregation.objects.bulk_create(clones)
+            clones = []
+    WorkloadAggregation.objects.bulk_create(clones)
@@ -0,0 +1,138 @@
+"""
+営業日カレンダーサービス
+
+年月ごとの祝日・曜日・営業日をビットマップ（NumPy のブール配列）として事前計算し、
+プロセス内の LRU キャッシュと Django のキャッシュで使い回す。
+jpholiday による祝日判定は年月ごとに1回だけ行う。
+"""
+import calendar
+from datetime import date, timedelta
+from functools import lru_cache
+
+import jpholiday
+import numpy as np
+from django.core.cache import cache
+
+WEEKDAY_NAMES = ['月', '火', '水', '木', '金', '土', '日']
+
+# 日種別（day_types の値）
+DAY_TYPE_WEEKDAY = 0
+DAY_TYPE_SATURDAY = 1
+DAY_TYPE_HOLIDAY = 2  # 日曜・祝日
+
+# プロセス内に保持する年月数
+LRU_SIZE = 120
+
+# Django キャッシュの保持期間（祝日データは年月ごとに不変）
+CACHE_TIMEOUT = 60 * 60 * 24 * 30
+CACHE_KEY_PREFIX = 'business_calendar'
+
+
+class MonthCalendar:
+    """1か月分のカレンダー（各配列の添字0が1日）"""
+
+    def __init__(self, year, month, holiday_mask):
+        self.year = year
+        self.month = month
+        self.days_in_month = calendar.monthrange(year, month)[1]
+
+        first_weekday = date(year, month, 1).weekday()
+        self.weekdays = (np.arange(self.days_in_month) + first_weekday) % 7
+        self.holidays = np.array(
+            [bool(holiday_mask >> i & 1) for i in range(self.days_in_month)], dtype=bool
+        )
+        self.saturdays = self.weekdays == 5
+        self.sundays = self.weekdays == 6
+        self.business_days = (self.weekdays < 5) & ~self.holidays
+
+        self.day_types = np.full(self.days_in_month, DAY_TYPE_WEEKDAY, dtype=np.int8)
+        self.day_types[self.saturdays] = DAY_TYPE_SATURDAY
+        self.day_types[self.sundays | self.holidays] = DAY_TYPE_HOLIDAY
+
+        # キャッシュ共有のため読み取り専用にする
+        for array in (self.weekdays, self.holidays, self.saturdays, self.sundays,
+                      self.business_days, self.day_types):
+            array.flags.writeable = False
+
+    @property
+    def holiday_days(self):
+        """祝日の日付（日）のリスト"""
+        return [int(day) + 1 for day in np.flatnonzero(self.holidays)]
+
+    def business_day_count(self, first_day=1, last_day=None):
+        """指定日範囲（両端含む）の営業日数"""
+        last_day = self.days_in_month if last_day is None else min(last_day, self.days_in_month)
+        if last_day < first_day:
+            return 0
+        return int(self.business_days[first_day - 1:last_day].sum())
+
+    def weekday_info(self):
+        """日ごとの曜日・土日祝情報（テンプレート用の辞書）"""
+        info = {}
+        for index in range(self.days_in_month):
+            weekday = int(self.weekdays[index])
+            is_saturday = bool(self.saturdays[index])
+            is_sunday = bool(self.sundays[index])
+            is_holiday = bool(self.holidays[index])
+            if is_holiday or is_sunday:
+                css_class = 'holiday-cell'
+            elif is_saturday:
+                css_class = 'saturday-cell'
+            else:
+                css_class = 'weekday-cell'
+            info[index + 1] = {
+                'weekday': weekday,
+                'weekday_name': WEEKDAY_NAMES[weekday],
+                'is_saturday': is_saturday,
+                'is_sunday': is_sunday,
+                'is_holiday': is_holiday,
+                'css_class': css_class,
+                'display_text': f"{index + 1}{WEEKDAY_NAMES[weekday]}",
+            }
+        return info
+
+
+def _holiday_mask(year, month):
+    """祝日のビットマスク（ビット0が1日）を Django キャッシュ経由で取得"""
+    key = f'{CACHE_KEY_PREFIX}:{year:04d}-{month:02d}'
+    mask = cache.get(key)
+    if mask is None:
+        mask = 0
+        for day in range(1, calendar.monthrange(year, month)[1] + 1):
+            if jpholiday.is_holiday(date(year, month, day)):
+                mask |= 1 << (day - 1)
+        cache.set(key, mask, CACHE_TIMEOUT)
+    return mask
+
+
+@lru_cache(maxsize=LRU_SIZE)
+def get_month_calendar(year, month):
+    """年月のカレンダーを取得"""
+    return MonthCalendar(year, month, _holiday_mask(year, month))
+
+
+def day_types(year, month):
+    """日種別の配列（DAY_TYPE_WEEKDAY / DAY_TYPE_SATURDAY / DAY_TYPE_HOLIDAY）"""
+    return get_month_calendar(year, month).day_types
+
+
+def count_business_days(start_date, end_date):
+    """開始日〜終了日（両端含む）の営業日数（土日祝を除く）"""
+    if end_date < start_date:
+        return 0
+    total = 0
+    current = start_date
+    while current <= end_date:
+        month_calendar = get_month_calendar(current.year, current.month)
+        if current.year == end_date.year and current.month == end_date.month:
+            last_day = end_date.day
+        else:
+            last_day = month_calendar.days_in_month
+        total += month_calendar.business_day_count(current.day, last_day)
+        current = date(current.year, current.month, month_calendar.days_in_month) + timedelta(days=1)
+    return total
+
+
+def clear_calendar_cache():
+    """プロセス内キャッシュを破棄（祝日データ更新時など）"""
+    get_month_calendar.cache_clear()
@@ -0,0 +1,142 @@
+"""
+Excel（.xlsx）の書き出しエンジン
+
+openpyxl の write-only モードで1行ずつ書き出し、シート全体をメモリに持たない。
+write-only モードでは列幅（<cols>）を最初の行より前に書く必要があるため、
+行は一時ファイルに退避しながら列幅だけを逐次計算し、保存時に列幅を設定してから書き戻す。
+"""
+import pickle
+import tempfile
+
+from django.http import FileResponse
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+# 列幅の上限と余白（文字数）
+MAX_COLUMN_WIDTH = 50
+COLUMN_PADDING = 2
+
+# ヘッダー行のスタイル
+HEADER_STYLE_DEFAULT = {
+    'font': Font(bold=True),
+    'alignment': Alignment(horizontal='center', vertical='center'),
+    'border': Border(*(Side(style='thin'),) * 4),
+}
+HEADER_STYLE_BLUE = {
+    'font': Font(bold=True, color='FFFFFF'),
+    'fill': PatternFill(start_color='366092', end_color='366092', fill_type='solid'),
+    'alignment': Alignment(horizontal='center', vertical='center'),
+}
+
+
+class ExcelStreamWriter:
+    """
+    1シートのExcelを少しずつ書き出す。
+
+        writer = ExcelStreamWriter('シート名', headers)
+        for row in rows:
+            writer.append(row)
+        writer.save(path_or_file)
+    """
+
+    def __init__(self, sheet_title, headers, header_style=None):
+        self.sheet_title = sheet_title
+        self.headers = list(headers)
+        self.header_style = HEADER_STYLE_DEFAULT if header_style is None else header_style
+        self.widths = [len(str(header)) for header in self.headers]
+        self.row_count = 0
+        self._spool = tempfile.TemporaryFile()
+        self._pickler = pickle.Pickler(self._spool, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def append(self, values):
+        """データ行を追加（列幅を更新し、行は一時ファイルに退避）"""
+        values = list(values)
+        widths = self.widths
+        for index, value in enumerate(values):
+            if value is None:
+                continue
+            length = len(str(value))
+            if index >= len(widths):
+                widths.extend([0] * (index + 1 - len(widths)))
+            if length > widths[index]:
+                widths[index] = length
+        self._pickler.dump(values)
+        # 退避済みの行を参照し続けないようにする
+        self._pickler.clear_memo()
+        self.row_count += 1
+
+    def extend(self, rows, progress=None, progress_interval=None):
+        """複数行を追加。progress には追加済み件数が通知される"""
+        for values in rows:
+            self.append(values)
+            if progress and progress_interval and self.row_count % progress_interval == 0:
+                progress(self.row_count)
+
+    def column_widths(self):
+        """列ごとの幅（既存の自動調整と同じく 最大文字数+2、上限50）"""
+        return [min(width + COLUMN_PADDING, MAX_COLUMN_WIDTH) for width in self.widths]
+
+    def _iter_spooled_rows(self):
+        self._spool.flush()
+        self._spool.seek(0)
+        unpickler = pickle.Unpickler(self._spool)
+        for _ in range(self.row_count):
+            yield unpickler.load()
+
+    def save(self, destination):
+        """ファイルパスまたはファイルオブジェクトに保存"""
+        workbook = Workbook(write_only=True)
+        worksheet = workbook.create_sheet(self.sheet_title)
+
+        for index, width in enumerate(self.column_widths(), 1):
+            worksheet.column_dimensions[get_column_letter(index)].width = width
+
+        header_cells = []
+        for header in self.headers:
+            cell = WriteOnlyCell(worksheet, value=header)
+            for attribute, style in self.header_style.items():
+                setattr(cell, attribute, style)
+            header_cells.append(cell)
+        worksheet.append(header_cells)
+
+        for values in self._iter_spooled_rows():
+            worksheet.append(values)
+
+        workbook.save(destination)
+        self.close()
+        return destination
+
+    def close(self):
+        """退避用の一時ファイルを削除"""
+        if not self._spool.closed:
+            self._spool.close()
+
+
+def write_excel(destination, sheet_title, headers, rows, header_style=None,
+                progress=None, progress_interval=None):
+    """行をExcelに書き出し、データ行数を返す"""
+    writer = ExcelStreamWriter(sheet_title, headers, header_style)
+    try:
+        writer.extend(rows, progress, progress_interval)
+        writer.save(destination)
+    finally:
+        writer.close()
+    return writer.row_count
+
+
+def excel_response(filename, sheet_title, headers, rows, header_style=None):
+    """行をExcelに書き出し、一時ファイルから送出するレスポンスを返す"""
+    output = tempfile.TemporaryFile()
+    try:
+        write_excel(output, sheet_title, headers, rows, header_style)
+    except Exception:
+        output.close()
+        raise
+    output.seek(0)
+    # FileResponse が送出後に一時ファイルを閉じる（閉じると削除される）
+    return FileResponse(output, as_attachment=True, filename=filename, content_type=XLSX_CONTENT_TYPE)
+
@@ -0,0 +1,177 @@
+"""
+ダッシュボードのKPIスナップショット
+
+管理者ダッシュボードの指標を条件付き集計（Count/Sum の filter）でまとめて計算し、
+短時間だけ Django のキャッシュに保持する。
+工数集計・工数が書き込まれたらシグナル（apps.reports.signals）で破棄する。
+"""
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+from django.utils import timezone
+
+from apps.core.calendar_service import count_business_days
+
+# キャッシュの保持秒数
+CACHE_TIMEOUT = 60
+CACHE_KEY_PREFIX = 'dashboard:kpi_snapshot'
+
+# スナップショットの対象範囲（'all': 全件、'active': 削除フラグなし）
+SCOPES = ('all', 'active')
+
+# 進行中として扱うステータス
+ACTIVE_STATUSES = ['planning', 'in_progress']
+
+
+def _cache_key(scope):
+    return f'{CACHE_KEY_PREFIX}:{scope}'
+
+
+def _decimal(value):
+    """集計結果を Decimal にそろえる（SQLite では浮動小数で返ることがある）"""
+    if value is None:
+        return Decimal('0')
+    if isinstance(value, Decimal):
+        return value
+    return Decimal(str(value))
+
+
+def _aggregation_queryset(scope):
+    from apps.reports.models import WorkloadAggregation
+
+    queryset = WorkloadAggregation.objects.all()
+    if scope == 'active':
+        queryset = queryset.filter(del_flag=False)
+    return queryset
+
+
+def _ticket_summary(aggregation, today):
+    """注意チケット一覧用の値（キャッシュに載せるため文字列・数値のみ）"""
+    return {
+        'ticket_title': aggregation.case_name.title if aggregation.case_name else '未設定',
+        'project_name': str(aggregation.project_name),
+        'status': aggregation.status,
+        'status_display': aggregation.get_status_display(),
+        'planned_end_date': aggregation.planned_end_date,
+        'days_from_today': (aggregation.planned_end_date - today).days,
+    }
+
+
+def compute_kpi_snapshot(scope='all', now=None):
+    """KPIスナップショットを計算する（キャッシュを使わない）"""
+    from apps.projects.models import Project
+    from apps.users.models import CustomUser
+    from apps.workloads.models import Workload, WorkloadEntry
+
+    if scope not in SCOPES:
+        raise ValueError(f'不正な範囲です: {scope}')
+
+    now = now or timezone.now()
+    today = now.date()
+    first_day_of_month = now.replace(day=1)
+    last_month_first_day = (first_day_of_month - timedelta(days=1)).replace(day=1)
+    last_month_last_day = first_day_of_month - timedelta(days=1)
+
+    user_stats = CustomUser.objects.aggregate(
+        total_users=Count('id'),
+        active_users=Count('id', filter=Q(is_active=True)),
+        leader_users=Count('id', filter=Q(is_leader=True)),
+    )
+    project_stats = Project.objects.aggregate(
+        total_projects=Count('id'),
+        active_projects=Count('id', filter=Q(is_active=True)),
+    )
+
+    # 工数集計の指標（1クエリ）
+    aggregations = _aggregation_queryset(scope)
+    in_progress_tickets = Q(status__in=ACTIVE_STATUSES, case_name__isnull=False)
+    aggregation_stats = aggregations.aggregate(
+        aggregation_count=Count('id'),
+        active_tickets_count=Count('id', filter=in_progress_tickets & Q(del_flag=False)),
+        overdue_tickets_count=Count('id', filter=in_progress_tickets & Q(planned_end_date__lt=today)),
+        total_billing=Sum('billing_amount_excluding_tax'),
+        total_outsourcing=Sum('outsourcing_cost_excluding_tax'),
+        this_month_used_workdays=Sum('used_workdays', filter=Q(created_at__gte=first_day_of_month)),
+        last_month_used_workdays=Sum(
+            'used_workdays',
+            filter=Q(created_at__gte=last_month_first_day, created_at__lte=last_month_last_day)
+        ),
+    )
+
+    # チケットステータス別（1クエリ）
+    status_stats = [
+        {
+            'status': row['status'],
+            'count': row['count'],
+            'total_amount': _decimal(row['total_amount']),
+        }
+        for row in aggregations.filter(case_name__isnull=False).values('status').annotate(
+            count=Count('id'),
+            total_amount=Sum('billing_amount_excluding_tax')
+        ).order_by('-total_amount')
+    ]
+
+    # 今月（今日まで）・前月の工数（日付別工数の date 索引で範囲集計、1クエリ）
+    month_hours = WorkloadEntry.objects.in_range(last_month_first_day.date(), today).aggregate(
+        this_month=Sum('hours', filter=Q(date__gte=first_day_of_month.date())),
+        last_month=Sum('hours', filter=Q(date__lte=last_month_last_day.date())),
+    )
+
+    recent_aggregations = aggregations.select_related('case_name', 'project_name').order_by('-created_at')[:5]
+    overdue_tickets = aggregations.filter(
+        in_progress_tickets, planned_end_date__lt=today
+    ).select_related('case_name', 'project_name')[:3]
+    upcoming_tickets = aggregations.filter(
+        in_progress_tickets,
+        planned_end_date__gte=today,
+        planned_end_date__lte=today + timedelta(days=3)
+    ).select_related('case_name', 'project_name')[:2]
+
+    return {
+        'computed_at': now,
+        'scope': scope,
+        **user_stats,
+        **project_stats,
+        'workload_count': Workload.objects.count(),
+        'aggregation_count': aggregation_stats['aggregation_count'],
+        'active_tickets_count': aggregation_stats['active_tickets_count'],
+        'overdue_tickets_count': aggregation_stats['overdue_tickets_count'],
+        'total_billing': _decimal(aggregation_stats['total_billing']),
+        'total_outsourcing': _decimal(aggregation_stats['total_outsourcing']),
+        'this_month_used_workdays': _decimal(aggregation_stats['this_month_used_workdays']),
+        'last_month_used_workdays': _decimal(aggregation_stats['last_month_used_workdays']),
+        'this_month_workload_hours': float(month_hours['this_month'] or 0),
+        'last_month_workload_hours': float(month_hours['last_month'] or 0),
+        'working_days_this_month': count_business_days(first_day_of_month.date(), today),
+        'status_stats': status_stats,
+        'recent_entries': [
+            {
+                'project_name': str(aggregation.project_name),
+                'case_name': {
+                    'title': aggregation.case_name.title if aggregation.case_name else '未設定'
+                },
+                'used_workdays': aggregation.used_workdays or 0,
+                'created_at': aggregation.created_at,
+            }
+            for aggregation in recent_aggregations
+        ],
+        'overdue_tickets': [_ticket_summary(aggregation, today) for aggregation in overdue_tickets],
+        'upcoming_tickets': [_ticket_summary(aggregation, today) for aggregation in upcoming_tickets],
+    }
+
+
+def get_kpi_snapshot(scope='all'):
+    """KPIスナップショットを取得（キャッシュがなければ計算して保存）"""
+    key = _cache_key(scope)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = compute_kpi_snapshot(scope)
+        cache.set(key, snapshot, CACHE_TIMEOUT)
+    return snapshot
+
+
+def invalidate_kpi_snapshot():
+    """KPIスナップショットのキャッシュを破棄"""
+    cache.delete_many([_cache_key(scope) for scope in SCOPES])
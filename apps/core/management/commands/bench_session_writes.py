@@ -0,0 +1,97 @@
+"""
+セッションの書き込み回数のベンチマーク
+使用方法: python manage.py bench_session_writes --requests 1000
+
+ログイン済みのユーザーで工数セルの更新（update_workload_ajax）を連続して送り、
+セッションテーブルへの書き込み（INSERT / UPDATE）を数える。
+従来の設定（毎リクエスト保存・アクティビティ時間を丸めない）と現在の設定を比較する。
+signed_cookies の場合はDBに書き込まないため、Set-Cookie の回数を数える。
+計測用データはトランザクション内で作成し、終了時にロールバックする。
+"""
+import json
+import random
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client, override_settings
+
+from apps.core.benchmark import build_workload_dataset, rollback_after
+from apps.workloads import ledger
+from apps.workloads.models import Workload
+
+
+def run_requests(user, workloads, count, rng):
+    """
+    工数セルの更新リクエストを count 回送る。
+    戻り値: (セッションの書き込み回数, セッションCookieの送信回数, 経過ミリ秒)
+    """
+    # 既定のホスト名（testserver）は ALLOWED_HOSTS にないため 400 になる
+    client = Client(SERVER_NAME='127.0.0.1')
+    client.force_login(user)
+    session_table = connection.ops.quote_name(Session._meta.db_table)
+    cookie_name = settings.SESSION_COOKIE_NAME
+    writes = 0
+    cookie_sets = 0
+
+    def count_session_writes(execute, sql, params, many, context):
+        nonlocal writes
+        if session_table in sql and sql.lstrip().upper().startswith(('INSERT', 'UPDATE')):
+            writes += 1
+        return execute(sql, params, many, context)
+
+    with connection.execute_wrapper(count_session_writes):
+        started = time.perf_counter()
+        for _ in range(count):
+            workload = rng.choice(workloads)
+            response = client.post(
+                '/workloads/ajax/update/',
+                data=json.dumps({
+                    'workload_id': workload.id,
+                    'day': rng.randint(1, 28),
+                    'value': rng.choice([0, 1, 2.5, 4, 7.5, 8]),
+                }),
+                content_type='application/json',
+            )
+            # 失敗したリクエストはセッションの扱いが異なるため、計測を中止する
+            if response.status_code != 200 or not response.json().get('success'):
+                raise CommandError(f'工数セルの更新に失敗しました: {response.status_code} {response.content[:200]!r}')
+            if cookie_name in response.cookies:
+                cookie_sets += 1
+        elapsed_ms = (time.perf_counter() - started) * 1000
+    return writes, cookie_sets, elapsed_ms
+
+
+class Command(BaseCommand):
+    help = '工数セル更新のリクエストあたりのセッション書き込み回数を従来の設定と比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=1000, help='送信するリクエスト数')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+
+    def handle(self, *args, **options):
+        count = options['requests']
+
+        with rollback_after():
+            dataset = build_workload_dataset(users=1, tickets=20, months=1, seed=options['seed'])
+            user = dataset['users'][0]
+            workloads = list(Workload.objects.filter(user=user))
+            ledger.rebuild_ledger()
+
+            with override_settings(SESSION_SAVE_EVERY_REQUEST=True, SESSION_ACTIVITY_GRANULARITY_SECONDS=0):
+                legacy = run_requests(user, workloads, count, random.Random(options['seed']))
+            current = run_requests(user, workloads, count, random.Random(options['seed']))
+
+        granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY_SECONDS', 60)
+        self.stdout.write(f"セッション: {settings.SESSION_ENGINE} / リクエスト数: {count}件")
+        for label, (writes, cookie_sets, elapsed_ms) in [
+            ('従来の設定（毎リクエスト保存）', legacy),
+            (f'現在の設定（{granularity}秒単位）', current),
+        ]:
+            self.stdout.write(
+                f"{label}: セッション書き込み {writes * 1000 / count:,.1f} 回 / "
+                f"Set-Cookie {cookie_sets * 1000 / count:,.1f} 回（1,000リクエストあたり） / "
+                f"{elapsed_ms / count:,.2f} ms/リクエスト"
+            )
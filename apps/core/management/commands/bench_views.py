@@ -0,0 +1,232 @@
+"""
+主要画面・APIのベンチマーク
+使用方法:
+    python manage.py seed_perf_data                     # 計測用データを作成（初回のみ）
+    python manage.py bench_views --iterations 20 --output bench.json
+    python manage.py bench_views --baseline bench.json  # 前回の結果と比較
+
+seed_perf_data で作成したデータに対して、工数カレンダー・工数集計一覧・ダッシュボード・
+エクスポート・一括再計算をテストクライアント（エクスポートのファイル生成はワーカー処理）で
+繰り返し実行し、処理時間の p50 / p95 とクエリ数を JSON で出力する。
+コミット間で比較できるよう、出力にはコミットIDを含める。
+更新を伴う処理もあるため、全体をトランザクション内で実行し、終了時にロールバックする。
+"""
+import json
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Max
+from django.test import Client
+from django.urls import reverse
+
+from apps.core.benchmark import rollback_after
+from apps.core.kpi_snapshot import invalidate_kpi_snapshot
+from apps.core.perf_data import admin_username, seed_prefix
+from apps.core.profiling import QueryRecorder
+from apps.projects.lookup import invalidate_lookup
+from apps.reports.export_jobs import build_export_queryset, enqueue_export, run_export_job
+from apps.reports.list_totals import invalidate_totals
+from apps.reports.utils import LocalExportStorage
+from apps.users.models import CustomUser
+from apps.workloads.models import Workload
+
+EXPORT_FORMATS = ['csv', 'excel']
+
+
+def percentile(values, percent):
+    """最近順位法のパーセンタイル"""
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * percent // 100) - 1)
+    return ordered[int(index)]
+
+
+def build_scenarios(year_month):
+    """
+    計測する処理の一覧
+    (名前, ユーザー（'admin' / 'leader' / 'member'）, メソッド, URL, パラメータ)
+    メソッドが 'export_job' の場合は、テストクライアントではなくエクスポートのワーカー処理を計測する。
+    """
+    scenarios = [
+        ('workload_calendar', 'admin', 'get', reverse('workloads:workload_calendar'), {'year_month': year_month}),
+        ('workload_calendar[member]', 'member', 'get', reverse('workloads:workload_calendar'), {'year_month': year_month}),
+        ('workload_grid_api', 'admin', 'get', reverse('workloads:workload_grid_api'), {'year_month': year_month}),
+        ('timesheet_completeness', 'admin', 'get', reverse('workloads:timesheet_completeness'), {'year_month': year_month}),
+        ('workload_aggregation', 'admin', 'get', reverse('reports:workload_aggregation'), {}),
+        ('workload_aggregation[page2]', 'admin', 'get', reverse('reports:workload_aggregation'), {'page': 2}),
+        ('admin_dashboard', 'admin', 'get', reverse('core:admin_dashboard'), {}),
+        ('staff_dashboard[leader]', 'leader', 'get', reverse('core:staff_dashboard'), {}),
+        ('user_dashboard[member]', 'member', 'get', reverse('core:user_dashboard'), {}),
+        ('outsourcing_dashboard', 'admin', 'get', reverse('cost_master:dashboard'), {}),
+        ('bulk_update_work_hours', 'admin', 'json', reverse('reports:bulk_update_work_hours'), {'filter_params': {}}),
+        ('sync_outsourcing_costs', 'admin', 'json', reverse('reports:sync_outsourcing_costs'), {'filter_params': {}}),
+    ]
+    for export_format in EXPORT_FORMATS:
+        scenarios.append((
+            f'workload_export_current[{export_format}]', 'admin', 'post',
+            reverse('reports:workload_export_current'), {'format': export_format},
+        ))
+        scenarios.append((f'export_job[{export_format}]', 'admin', 'export_job', '', {'format': export_format}))
+    return scenarios
+
+
+def git_commit():
+    """計測したコミットのID（git が使えない場合は空文字）"""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            cwd=settings.BASE_DIR, capture_output=True, text=True, timeout=10,
+        )
+    except (OSError, subprocess.SubprocessError):
+        return ''
+    return result.stdout.strip() if result.returncode == 0 else ''
+
+
+class Command(BaseCommand):
+    help = '主要画面・APIの処理時間（p50 / p95）とクエリ数を計測し、JSON で出力します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=0, help='計測に使う seed_perf_data のシード')
+        parser.add_argument('--iterations', type=int, default=10, help='処理ごとの計測回数')
+        parser.add_argument('--warmup', type=int, default=1, help='計測前に実行する回数（キャッシュ作成など）')
+        parser.add_argument('--only', nargs='+', default=[], help='名前にいずれかを含む処理だけを計測します')
+        parser.add_argument('--output', help='結果の JSON を書き込むファイル（省略時は標準出力）')
+        parser.add_argument('--baseline', help='比較する前回の結果（JSON ファイル）')
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        if options['iterations'] < 1:
+            raise CommandError('計測回数は1以上を指定してください')
+        try:
+            admin = CustomUser.objects.get(username=admin_username(seed))
+        except CustomUser.DoesNotExist:
+            raise CommandError(f'計測用データがありません（先に manage.py seed_perf_data --seed {seed} を実行してください）')
+        seeded_users = CustomUser.objects.filter(username__startswith=seed_prefix(seed), is_superuser=False).order_by('id')
+        leader = seeded_users.filter(is_leader=True).first() or admin
+        member = seeded_users.filter(is_leader=False).exclude(employee_level='junior').first() or admin
+        year_month = Workload.objects.filter(user__username__startswith=seed_prefix(seed)).aggregate(
+            latest=Max('year_month')
+        )['latest']
+
+        scenarios = [
+            scenario for scenario in build_scenarios(year_month)
+            if not options['only'] or any(keyword in scenario[0] for keyword in options['only'])
+        ]
+        clients = {}
+        for key, user in [('admin', admin), ('leader', leader), ('member', member)]:
+            clients[key] = Client(SERVER_NAME='127.0.0.1')
+            clients[key].force_login(user)
+
+        storage_root = tempfile.mkdtemp(prefix='bench_views_')
+        results = {}
+        try:
+            with rollback_after():
+                for name, user_key, method, url, params in scenarios:
+                    self.stderr.write(f'計測中: {name}')
+                    results[name] = self._run_scenario(
+                        clients[user_key], admin, method, url, params,
+                        LocalExportStorage(storage_root), options['iterations'], options['warmup'],
+                    )
+        finally:
+            shutil.rmtree(storage_root, ignore_errors=True)
+            # ロールバックしたデータから作ったキャッシュを残さない
+            invalidate_lookup()
+            invalidate_totals()
+            invalidate_kpi_snapshot()
+
+        report = {
+            'commit': git_commit(),
+            'database': connection.vendor,
+            'seed': seed,
+            'year_month': year_month,
+            'iterations': options['iterations'],
+            'results': results,
+        }
+        if options['baseline']:
+            self._compare(report, options['baseline'])
+
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as f:
+                f.write(output + '\n')
+            self.stderr.write(self.style.SUCCESS(f"結果を書き込みました: {options['output']}"))
+        else:
+            self.stdout.write(output)
+
+    def _run_scenario(self, client, admin, method, url, params, storage, iterations, warmup):
+        """1つの処理を warmup + iterations 回実行し、計測結果を返す"""
+        samples = []
+        statuses = set()
+        for index in range(warmup + iterations):
+            with QueryRecorder() as recorder:
+                started = time.perf_counter()
+                status = self._execute(client, admin, method, url, params, storage)
+                elapsed_ms = (time.perf_counter() - started) * 1000
+            if index >= warmup:
+                samples.append((elapsed_ms, recorder.count, recorder.sql_seconds * 1000, recorder.duplicate_count()))
+                statuses.add(status)
+
+        wall_ms = [sample[0] for sample in samples]
+        queries = [sample[1] for sample in samples]
+        return {
+            'p50_ms': round(percentile(wall_ms, 50), 1),
+            'p95_ms': round(percentile(wall_ms, 95), 1),
+            'max_ms': round(max(wall_ms), 1),
+            'sql_p50_ms': round(percentile([sample[2] for sample in samples], 50), 1),
+            'queries': int(statistics.median(queries)),
+            'queries_max': max(queries),
+            'duplicate_queries': max(sample[3] for sample in samples),
+            'status': sorted(statuses, key=str),
+        }
+
+    @staticmethod
+    def _execute(client, admin, method, url, params, storage):
+        """処理を1回実行し、ステータス（HTTP ステータスまたはエクスポートの状態）を返す"""
+        if method == 'export_job':
+            export_format = params['format']
+            # 受付（enqueue）は計測対象外。ファイル生成〜保存のみを計測する
+            job = enqueue_export(admin, export_format, {}, total_records=build_export_queryset({}).count())
+            return run_export_job(job, storage=storage).status
+        if method == 'json':
+            response = client.post(url, data=json.dumps(params), content_type='application/json')
+        elif method == 'post':
+            response = client.post(url, data=params, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        else:
+            response = client.get(url, data=params)
+        return response.status_code
+
+    def _compare(self, report, baseline_path):
+        """前回の結果との比較（p50 の比・クエリ数の差）を結果に追加し、概要を表示する"""
+        try:
+            with open(baseline_path, encoding='utf-8') as f:
+                baseline = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f'比較する結果を読み込めません: {e}')
+
+        report['baseline_commit'] = baseline.get('commit', '')
+        for name, result in report['results'].items():
+            previous = baseline.get('results', {}).get(name)
+            if not previous:
+                continue
+            ratio = result['p50_ms'] / previous['p50_ms'] if previous['p50_ms'] else None
+            result['baseline'] = {
+                'p50_ms': previous['p50_ms'],
+                'p95_ms': previous['p95_ms'],
+                'queries': previous['queries'],
+                'p50_ratio': round(ratio, 2) if ratio is not None else None,
+                'queries_diff': result['queries'] - previous['queries'],
+            }
+            line = (
+                f"{name}: p50 {previous['p50_ms']:,.1f} → {result['p50_ms']:,.1f} ms"
+                f"{f' (x{ratio:.2f})' if ratio is not None else ''} / "
+                f"クエリ {previous['queries']} → {result['queries']}"
+            )
+            if result['queries'] > previous['queries'] or (ratio is not None and ratio >= 1.2):
+                self.stderr.write(self.style.WARNING(line))
+            else:
+                self.stderr.write(line)
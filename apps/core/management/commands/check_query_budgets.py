@@ -0,0 +1,45 @@
+"""
+URL名ごとのクエリ予算の確認コマンド
+使用方法:
+    python manage.py check_query_budgets                 # 全URL名を確認
+    python manage.py check_query_budgets --only reports  # 名前に reports を含むURLのみ
+    python manage.py test apps.core.tests                # 同じ確認をテストとして実行
+
+件数の少ないデータと多いデータで各URLのクエリ数を数え（apps.core.query_budget）、
+予算の超過・件数に応じたクエリ数の増加・予算の未定義があればエラー終了する。
+計測用データはトランザクション内で作成し、終了時にロールバックする。
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.query_budget import check_query_budgets
+
+
+class Command(BaseCommand):
+    help = '全URLのクエリ数が予算内で、件数に応じて増えないことを確認します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--only', nargs='+', default=[], help='名前にいずれかを含むURLだけを確認します')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+
+    def handle(self, *args, **options):
+        results = check_query_budgets(names=options['only'], seed=options['seed'])
+
+        failures = 0
+        for result in results:
+            counts = (
+                f"{result['small']} → {result['large']} / 予算 {result['budget']}"
+                if result['budget'] is not None else '-'
+            )
+            line = f"{result['name']}: {counts}"
+            if result['violations']:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"{line}  {'、'.join(result['violations'])}"))
+                # N+1 の調査用に、繰り返し発行されたクエリを表示する
+                for duplicate in result['duplicates'][:3]:
+                    self.stdout.write(f"    {duplicate['count']}回: {duplicate['sql'][:200]}")
+            else:
+                self.stdout.write(line)
+
+        if failures:
+            raise CommandError(f'クエリ予算の違反: {failures}件 / {len(results)}件')
+        self.stdout.write(self.style.SUCCESS(f'全{len(results)}件のURLがクエリ予算内です'))
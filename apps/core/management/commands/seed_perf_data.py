@@ -0,0 +1,63 @@
+"""
+性能計測用の大量データ作成コマンド
+使用方法:
+    python manage.py seed_perf_data --projects 200 --tickets 50 --months 24
+    python manage.py seed_perf_data --seed 1 --clear   # seed=1 のデータを削除して作り直す
+
+作成したデータは名前・ユーザー名の先頭が perf-<seed>- になる（apps.core.perf_data）。
+管理者 perf-<seed>-admin を作成するため、bench_views の計測にそのまま使える。
+"""
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.core.perf_data import admin_username, clear_perf_data, perf_data_exists, seed_perf_data
+
+
+class Command(BaseCommand):
+    help = '本番相当の件数の部署・ユーザー・プロジェクト・工数・工数集計・外注費を作成します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--departments', type=int, default=5, help='部署数')
+        parser.add_argument('--sections', type=int, default=3, help='部署あたりの課数')
+        parser.add_argument('--users-per-level', type=int, default=10, help='社員レベルごとのユーザー数')
+        parser.add_argument('--projects', type=int, default=20, help='プロジェクト数')
+        parser.add_argument('--tickets', type=int, default=25, help='プロジェクトあたりのチケット数')
+        parser.add_argument('--months', type=int, default=12, help='工数データの月数')
+        parser.add_argument('--users-per-ticket', type=int, default=3, help='チケットあたりの担当者数')
+        parser.add_argument('--partners', type=int, default=30, help='BP数')
+        parser.add_argument('--start', default='2024-01', help='工数データの開始年月（YYYY-MM）')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード（同じ値なら同じデータになる）')
+        parser.add_argument('--password', default=None, help='ユーザーのパスワード（省略時はログイン不可）')
+        parser.add_argument('--clear', action='store_true', help='同じ seed で作成済みのデータを削除してから作成します')
+
+    def handle(self, *args, **options):
+        seed = options['seed']
+        try:
+            start = datetime.strptime(options['start'], '%Y-%m').date()
+        except ValueError:
+            raise CommandError(f"開始年月の形式が正しくありません: {options['start']}")
+        if min(options['departments'], options['sections'], options['users_per_level'], options['months']) < 1:
+            raise CommandError('部署数・課数・ユーザー数・月数は1以上を指定してください')
+
+        if perf_data_exists(seed):
+            if not options['clear']:
+                raise CommandError(f'seed={seed} のデータは作成済みです（作り直す場合は --clear を指定してください）')
+            deleted = clear_perf_data(seed)
+            self.stdout.write('削除しました: ' + ', '.join(f'{label} {count:,}件' for label, count in deleted.items()))
+
+        counts = seed_perf_data(
+            departments=options['departments'],
+            sections=options['sections'],
+            users_per_level=options['users_per_level'],
+            projects=options['projects'],
+            tickets=options['tickets'],
+            months=options['months'],
+            users_per_ticket=options['users_per_ticket'],
+            partners=options['partners'],
+            seed=seed,
+            start=start,
+            password=options['password'],
+        )
+        self.stdout.write('作成しました: ' + ', '.join(f'{label} {count:,}件' for label, count in counts.items()))
+        self.stdout.write(self.style.SUCCESS(f'管理者: {admin_username(seed)}'))
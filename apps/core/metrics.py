@@ -0,0 +1,247 @@
+"""
+アプリケーションのメトリクス（Prometheus のテキスト形式）
+
+カウンターとヒストグラムをプロセス内のメモリで集計し、/metrics で出力する。
+gunicorn の複数ワーカーやエクスポートワーカーの値をまとめるため、
+METRICS_DIR を設定した場合は各プロセスが一定間隔（METRICS_FLUSH_SECONDS）で
+自分の値を METRICS_DIR/<pid>.json に書き出し、/metrics は全ファイルを合算する。
+終了したプロセスのファイルも合算を続けるため、サービスの起動時に METRICS_DIR を空にすること。
+
+記録（inc / observe）はラベル値のタプルをキーにした辞書の更新だけで、
+リクエストあたりの負荷はマイクロ秒程度。
+"""
+import atexit
+import glob
+import json
+import math
+import os
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+# 処理時間のバケット（秒）
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# バッチ処理（エクスポート・再計算）の処理時間のバケット（秒）
+JOB_DURATION_BUCKETS = (0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+# ファイルサイズのバケット（バイト）
+SIZE_BUCKETS = (10_000, 100_000, 1_000_000, 5_000_000, 10_000_000, 50_000_000, 100_000_000)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    pairs.extend(f'{name}="{_escape(value)}"' for name, value in extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_number(value):
+    if value == math.inf:
+        return '+Inf'
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """増加のみのカウンター"""
+    kind = 'counter'
+
+    def __init__(self, registry, name, documentation, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+
+    def inc(self, amount=1, *labelvalues):
+        with self.registry.lock:
+            self.values[labelvalues] = self.values.get(labelvalues, 0) + amount
+        self.registry.maybe_flush()
+
+    def dump(self):
+        return [[list(key), value] for key, value in self.values.items()]
+
+    @staticmethod
+    def merge(target, dumped):
+        for key, value in dumped:
+            key = tuple(key)
+            target[key] = target.get(key, 0) + value
+
+    def render(self, values):
+        lines = []
+        for key, value in sorted(values.items()):
+            lines.append(f'{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}')
+        return lines
+
+
+class Histogram:
+    """バケットごとの件数・合計・件数を持つヒストグラム"""
+    kind = 'histogram'
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # ラベル値 → [バケットごとの件数（累積ではない、最後は +Inf）..., 合計]
+        self.values = {}
+
+    def observe(self, value, *labelvalues):
+        index = bisect_left(self.buckets, value)
+        with self.registry.lock:
+            state = self.values.get(labelvalues)
+            if state is None:
+                state = self.values[labelvalues] = [0] * (len(self.buckets) + 2)
+            state[index] += 1
+            state[-1] += value
+        self.registry.maybe_flush()
+
+    def dump(self):
+        return [[list(key), list(state)] for key, state in self.values.items()]
+
+    @staticmethod
+    def merge(target, dumped):
+        for key, state in dumped:
+            key = tuple(key)
+            current = target.get(key)
+            if current is None:
+                target[key] = list(state)
+            else:
+                target[key] = [a + b for a, b in zip(current, state)]
+
+    def render(self, values):
+        lines = []
+        bounds = self.buckets + (math.inf,)
+        for key, state in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, state):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [('le', _format_number(bound))])
+                lines.append(f'{self.name}_bucket{labels} {cumulative}')
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f'{self.name}_sum{labels} {_format_number(state[-1])}')
+            lines.append(f'{self.name}_count{labels} {cumulative}')
+        return lines
+
+
+class Registry:
+    """メトリクスの登録・ファイルへの書き出し・合算"""
+
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+        self._next_flush = 0.0
+        self._atexit_registered = False
+
+    def counter(self, name, documentation, labelnames=()):
+        return self._register(Counter(self, name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, name, documentation, labelnames, buckets))
+
+    def _register(self, metric):
+        self.metrics[metric.name] = metric
+        return metric
+
+    @staticmethod
+    def directory():
+        return getattr(settings, 'METRICS_DIR', '')
+
+    def maybe_flush(self):
+        """前回の書き出しから METRICS_FLUSH_SECONDS 経っていれば書き出す"""
+        now = time.monotonic()
+        if now < self._next_flush:
+            return
+        self._next_flush = now + getattr(settings, 'METRICS_FLUSH_SECONDS', 5)
+        self.flush()
+
+    def flush(self):
+        """このプロセスの値を METRICS_DIR/<pid>.json に書き出す（未設定なら何もしない）"""
+        directory = self.directory()
+        if not directory:
+            return
+        if not self._atexit_registered:
+            atexit.register(self.flush)
+            self._atexit_registered = True
+        with self.lock:
+            payload = {name: metric.dump() for name, metric in self.metrics.items() if metric.values}
+        os.makedirs(directory, exist_ok=True)
+        path = os.path.join(directory, f'{os.getpid()}.json')
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(temporary, path)
+
+    def collect(self):
+        """全プロセスの値を合算する（メトリクス名 → ラベル値 → 値）"""
+        directory = self.directory()
+        if not directory:
+            with self.lock:
+                return {name: dict(metric.values) for name, metric in self.metrics.items()}
+
+        self.flush()
+        merged = {name: {} for name in self.metrics}
+        for path in glob.glob(os.path.join(directory, '*.json')):
+            try:
+                with open(path, encoding='utf-8') as f:
+                    payload = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for name, dumped in payload.items():
+                metric = self.metrics.get(name)
+                if metric is not None:
+                    metric.merge(merged[name], dumped)
+        return merged
+
+    def render(self):
+        """Prometheus のテキスト形式"""
+        collected = self.collect()
+        lines = []
+        for name, metric in self.metrics.items():
+            lines.append(f'# HELP {name} {metric.documentation}')
+            lines.append(f'# TYPE {name} {metric.kind}')
+            lines.extend(metric.render(collected.get(name, {})))
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+
+REQUEST_LATENCY = REGISTRY.histogram(
+    'kousu_http_request_duration_seconds',
+    'リクエストの処理時間（URL名・メソッド・ステータス別）',
+    ('view', 'method', 'status'),
+)
+CELL_WRITES = REGISTRY.counter(
+    'kousu_workload_cell_writes_total',
+    '工数カレンダーのAJAXで書き込んだセル数',
+    ('endpoint',),
+)
+EXPORT_DURATION = REGISTRY.histogram(
+    'kousu_report_export_duration_seconds',
+    'エクスポートの処理時間（形式別）',
+    ('format', 'result'),
+    buckets=JOB_DURATION_BUCKETS,
+)
+EXPORT_SIZE = REGISTRY.histogram(
+    'kousu_report_export_size_bytes',
+    'エクスポートしたファイルのサイズ（形式別）',
+    ('format',),
+    buckets=SIZE_BUCKETS,
+)
+RECALCULATION_DURATION = REGISTRY.histogram(
+    'kousu_recalculation_duration_seconds',
+    '工数集計の再計算・外注費同期の処理時間',
+    ('operation',),
+    buckets=JOB_DURATION_BUCKETS,
+)
+RECALCULATION_RECORDS = REGISTRY.counter(
+    'kousu_recalculation_records_total',
+    '工数集計の再計算・外注費同期で処理したレコード数',
+    ('operation', 'result'),
+)
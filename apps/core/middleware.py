@@ -1,16 +1,27 @@
+import random
 import time
 from django.conf import settings
 from django.contrib.auth import logout
+from django.core.exceptions import MiddlewareNotUsed
 from django.shortcuts import redirect
 from django.contrib import messages
 from django.utils import timezone
 from datetime import timedelta
 import logging
 
+from . import metrics, profiling
+
 logger = logging.getLogger(__name__)
 
 class SessionTimeoutMiddleware:
-    """セッションタイムアウトとセキュリティ管理のためのミドルウェア"""
+    """
+    セッションタイムアウトとセキュリティ管理のためのミドルウェア
+
+    最後のアクティビティ時間は SESSION_ACTIVITY_GRANULARITY_SECONDS 単位に丸めて記録し、
+    区切りが変わったときだけセッションを書き換える。
+    SESSION_SAVE_EVERY_REQUEST = False と組み合わせると、セッションの保存（有効期限の延長）は
+    区切りごとに1回になり、工数セルの編集などの連続したリクエストで毎回セッションを書き込まない。
+    """
     
     def __init__(self, get_response):
         self.get_response = get_response
@@ -94,12 +105,24 @@ class SessionTimeoutMiddleware:
         return redirect('login')
 
     def update_last_activity(self, request):
-        """最後のアクティビティ時間を更新"""
-        request.session['last_activity'] = time.time()
+        """
+        最後のアクティビティ時間を更新（区切りが変わったときだけ書き込む）
+        非アクティブタイムアウトの判定はこの区切りの精度になる。
+        """
+        last_activity = self.activity_bucket(time.time())
+        if request.session.get('last_activity') != last_activity:
+            request.session['last_activity'] = last_activity
         
         # セッションデータのクリーンアップ（古いデータを削除）
         self.cleanup_session_data(request)
 
+    def activity_bucket(self, current_time):
+        """アクティビティ時間を区切りの開始時刻に丸める（0以下なら丸めない）"""
+        granularity = getattr(settings, 'SESSION_ACTIVITY_GRANULARITY_SECONDS', 60)
+        if granularity <= 0:
+            return current_time
+        return int(current_time // granularity * granularity)
+
     def cleanup_session_data(self, request):
         """セッションデータのクリーンアップ"""
         # 古いセッションキーがあれば削除
@@ -115,4 +138,64 @@ class SessionTimeoutMiddleware:
             ip = x_forwarded_for.split(',')[0].strip()
         else:
             ip = request.META.get('REMOTE_ADDR')
-        return ip
\ No newline at end of file
+        return ip
+
+
+class RequestProfilingMiddleware:
+    """
+    リクエストごとのクエリ数・SQL時間・処理時間を計測するミドルウェア（既定は無効）
+
+    REQUEST_PROFILING_ENABLED = True のときだけ有効になり、
+    REQUEST_PROFILING_SAMPLE_RATE の割合のリクエストを計測する。
+    しきい値（REQUEST_PROFILING_SLOW_MS / REQUEST_PROFILING_SLOW_QUERIES）以上のリクエストを
+    ログファイルと RequestProfile テーブルに記録する（apps.core.profiling）。
+    """
+
+    def __init__(self, get_response):
+        self.options = profiling.profiling_settings()
+        if not self.options['enabled']:
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        self.skip_prefixes = tuple(
+            prefix for prefix in (settings.STATIC_URL, getattr(settings, 'MEDIA_URL', '')) if prefix
+        )
+        profiling.configure_slow_request_log(self.options['log_file'])
+
+    def __call__(self, request):
+        if request.path.startswith(self.skip_prefixes) or random.random() >= self.options['sample_rate']:
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        with profiling.QueryRecorder() as recorder:
+            response = self.get_response(request)
+        wall_seconds = time.perf_counter() - started
+
+        profile = profiling.build_profile(request, response, recorder, wall_seconds)
+        if profiling.is_slow(profile, self.options):
+            profiling.record_slow_request(profile, self.options['buffer_size'])
+        return response
+
+
+class MetricsMiddleware:
+    """
+    リクエストの処理時間を URL名・メソッド・ステータス別のヒストグラムに記録するミドルウェア
+    （apps.core.metrics、/metrics で出力）。METRICS_ENABLED = False なら無効。
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', True):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+
+    def __call__(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        resolver_match = request.resolver_match
+        metrics.REQUEST_LATENCY.observe(
+            time.perf_counter() - started,
+            resolver_match.view_name if resolver_match else 'unresolved',
+            request.method,
+            f'{response.status_code // 100}xx',
+        )
+        return response
+
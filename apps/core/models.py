@@ -11,4 +11,30 @@ class CostMaster(models.Model):
     remarks = models.TextField(blank=True)
 
     def __str__(self):
-        return self.name
\ No newline at end of file
+        return self.name
+
+class RequestProfile(models.Model):
+    """
+    遅いリクエストの記録（RequestProfilingMiddleware）
+    直近の REQUEST_PROFILING_BUFFER_SIZE 件だけを残すリングバッファとして使う。
+    """
+    created_at = models.DateTimeField('記録日時', auto_now_add=True, db_index=True)
+    method = models.CharField('メソッド', max_length=10)
+    path = models.CharField('パス', max_length=500)
+    view_name = models.CharField('ビュー', max_length=200, blank=True)
+    status_code = models.PositiveSmallIntegerField('ステータス', default=0)
+    username = models.CharField('ユーザー', max_length=150, blank=True)
+    wall_ms = models.FloatField('処理時間（ms）')
+    sql_ms = models.FloatField('SQL時間（ms）')
+    query_count = models.PositiveIntegerField('クエリ数')
+    duplicate_count = models.PositiveIntegerField('重複クエリ数', default=0)
+    duplicates = models.JSONField('重複クエリ', default=list, blank=True)
+
+    class Meta:
+        db_table = 'request_profiles'
+        verbose_name = 'リクエストの計測'
+        verbose_name_plural = 'リクエストの計測'
+        ordering = ['-id']
+
+    def __str__(self):
+        return f'{self.method} {self.path} ({self.wall_ms:.0f}ms)'
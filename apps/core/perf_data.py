@@ -0,0 +1,336 @@
+"""
+性能計測用の大量データ生成（manage.py seed_perf_data）
+
+本番相当の件数の部署・課・ユーザー・プロジェクト・チケット・工数・工数集計・
+BP・外注費を bulk_create で作成する。同じ seed と件数なら同じ内容になる。
+作成したデータは名前・ユーザー名の先頭が perf-<seed>- になり、clear_perf_data で削除できる。
+
+bulk_create はシグナルが送られないため、作成後に工数台帳・日付別工数・
+工数集計の再計算・外注費の月次集計を作り直し、各キャッシュを破棄する。
+"""
+import calendar
+import logging
+import random
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 1000
+# 1日あたりの工数の候補（時間）
+DAY_HOURS = [0.5, 1, 1.5, 2, 3, 4, 6, 8]
+
+
+def seed_prefix(seed):
+    """作成するデータの名前・ユーザー名の先頭"""
+    return f'perf-{seed}-'
+
+
+def admin_username(seed):
+    """作成する管理者（スーパーユーザー）のユーザー名"""
+    return f'{seed_prefix(seed)}admin'
+
+
+def month_range(start, months):
+    """start の月から months か月分の年月（YYYY-MM）"""
+    year_months = []
+    year, month = start.year, start.month
+    for _ in range(months):
+        year_months.append(f'{year:04d}-{month:02d}')
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return year_months
+
+
+def perf_data_exists(seed):
+    """seed のデータが作成済みか"""
+    from apps.users.models import Department
+
+    return Department.objects.filter(name__startswith=seed_prefix(seed)).exists()
+
+
+def clear_perf_data(seed):
+    """seed で作成したデータを削除する。戻り値は {モデル名: 削除件数}"""
+    from apps.cost_master.models import BusinessPartner, OutsourcingCost
+    from apps.projects.models import Project
+    from apps.reports.models import WorkloadAggregation
+    from apps.users.models import CustomUser, Department
+
+    prefix = seed_prefix(seed)
+    deleted = {}
+    with transaction.atomic():
+        for label, queryset in [
+            ('外注費', OutsourcingCost.objects.filter(project__name__startswith=prefix)),
+            ('工数集計', WorkloadAggregation.objects.filter(project_name__name__startswith=prefix)),
+            ('プロジェクト', Project.objects.filter(name__startswith=prefix)),
+            ('BP', BusinessPartner.objects.filter(name__startswith=prefix)),
+            ('ユーザー', CustomUser.objects.filter(username__startswith=prefix)),
+            ('部署', Department.objects.filter(name__startswith=prefix)),
+        ]:
+            # 連鎖して削除した件数（チケット・工数など）は含めない
+            deleted[label] = queryset.delete()[1].get(queryset.model._meta.label, 0)
+    _rebuild_derived_data(aggregations=None, year_months=[])
+    return deleted
+
+
+def _working_days(year_month):
+    """年月の平日（日）"""
+    year, month = int(year_month[:4]), int(year_month[5:])
+    days_in_month = calendar.monthrange(year, month)[1]
+    return [day for day in range(1, days_in_month + 1) if date(year, month, day).weekday() < 5]
+
+
+def _month_date(rng, year_month):
+    return date(int(year_month[:4]), int(year_month[5:]), rng.randint(1, 28))
+
+
+def seed_perf_data(
+    departments=5, sections=3, users_per_level=10, projects=20, tickets=25,
+    months=12, users_per_ticket=3, partners=30, seed=0, start=None, password=None,
+):
+    """
+    性能計測用のデータを作成する。戻り値は {モデル名: 作成件数}
+
+    departments: 部署数 / sections: 部署あたりの課数
+    users_per_level: 社員レベルごとのユーザー数（課に順に割り当てる）
+    projects: プロジェクト数 / tickets: プロジェクトあたりのチケット数
+    months: 工数データの月数（start の月から）/ users_per_ticket: チケットあたりの担当者数
+    partners: BP数 / password: ユーザーのパスワード（省略時はログイン不可）
+    """
+    from apps.cost_master.models import BusinessPartner, OutsourcingCost
+    from apps.projects.models import Project, ProjectTicket
+    from apps.reports.models import WorkloadAggregation
+    from apps.users.models import CustomUser, Department, Section
+    from apps.workloads.models import Workload
+
+    rng = random.Random(seed)
+    prefix = seed_prefix(seed)
+    start = start or date(2024, 1, 1)
+    year_months = month_range(start, months)
+    working_days = {year_month: _working_days(year_month) for year_month in year_months}
+    counts = {}
+
+    with transaction.atomic():
+        # 部署・課
+        Department.objects.bulk_create([
+            Department(name=f'{prefix}dept-{i:03d}') for i in range(departments)
+        ])
+        department_list = list(Department.objects.filter(name__startswith=prefix).order_by('id'))
+        Section.objects.bulk_create([
+            Section(name=f'{prefix}section-{i:03d}-{j:02d}', department=department)
+            for i, department in enumerate(department_list)
+            for j in range(sections)
+        ])
+        section_list = list(Section.objects.filter(name__startswith=prefix).order_by('id'))
+        counts['部署'] = len(department_list)
+        counts['課'] = len(section_list)
+
+        # ユーザー（社員レベルごと + 管理者）。パスワードのハッシュ化は1回だけ行う
+        password_hash = make_password(password)
+        users = []
+        for level, _ in CustomUser.EMPLOYEE_LEVEL_CHOICES:
+            for i in range(users_per_level):
+                section = section_list[len(users) % len(section_list)]
+                users.append(CustomUser(
+                    username=f'{prefix}{level}-{i:04d}',
+                    password=password_hash,
+                    last_name=f'{level}',
+                    first_name=f'{i:04d}',
+                    email=f'{prefix}{level}-{i:04d}@example.com',
+                    department_id=section.department_id,
+                    section=section,
+                    employee_level=level,
+                    is_leader=level in ('lead', 'manager', 'director'),
+                ))
+        users.append(CustomUser(
+            username=admin_username(seed),
+            password=password_hash,
+            department_id=section_list[0].department_id,
+            section=section_list[0],
+            employee_level='manager',
+            is_staff=True,
+            is_superuser=True,
+        ))
+        CustomUser.objects.bulk_create(users, batch_size=BATCH_SIZE)
+        user_list = list(CustomUser.objects.filter(username__startswith=prefix).order_by('id'))
+        admin = next(user for user in user_list if user.username == admin_username(seed))
+        members = [user for user in user_list if user is not admin]
+        members_by_section = {}
+        for user in members:
+            members_by_section.setdefault(user.section_id, []).append(user)
+        counts['ユーザー'] = len(user_list)
+
+        # プロジェクト・担当者
+        project_statuses = [code for code, _ in Project.STATUS_CHOICES]
+        Project.objects.bulk_create([
+            Project(
+                project_no=f'PF{seed}-{i:05d}',
+                name=f'{prefix}project-{i:05d}',
+                client=f'顧客{rng.randint(1, 50):02d}',
+                status=rng.choice(project_statuses),
+                start_date=_month_date(rng, year_months[0]),
+                budget=Decimal(rng.randrange(100, 10000) * 10000),
+                assigned_section=rng.choice(section_list),
+            )
+            for i in range(projects)
+        ], batch_size=BATCH_SIZE)
+        project_list = list(Project.objects.filter(name__startswith=prefix).order_by('id'))
+        Project.assigned_users.through.objects.bulk_create([
+            Project.assigned_users.through(project_id=project.id, customuser_id=user.id)
+            for project in project_list
+            for user in rng.sample(members, min(len(members), 2))
+        ], batch_size=BATCH_SIZE)
+        counts['プロジェクト'] = len(project_list)
+
+        # チケット（担当者はプロジェクトの担当課から選ぶ）
+        def project_members(project):
+            return members_by_section.get(project.assigned_section_id) or members
+
+        ProjectTicket.objects.bulk_create([
+            ProjectTicket(
+                ticket_no=f'PF{seed}-{i:05d}-{j:04d}',
+                project=project,
+                title=f'{prefix}ticket-{i:05d}-{j:04d}',
+                priority=rng.choice(ProjectTicket.PriorityChoices.values),
+                status=rng.choice(ProjectTicket.StatusChoices.values),
+                case_classification=rng.choice(ProjectTicket.CaseClassificationChoices.values),
+                billing_status=rng.choice(ProjectTicket.BillingStatusChoices.values),
+                assigned_user=rng.choice(project_members(project)),
+                created_by=admin,
+            )
+            for i, project in enumerate(project_list)
+            for j in range(tickets)
+        ], batch_size=BATCH_SIZE)
+        ticket_list = list(
+            ProjectTicket.objects.filter(project__name__startswith=prefix)
+            .select_related('project').order_by('id')
+        )
+        counts['チケット'] = len(ticket_list)
+
+        # 工数（チケットごとに担当者 × 月。平日の半分程度に入力がある）
+        workload_count = 0
+        batch = []
+        for ticket in ticket_list:
+            candidates = project_members(ticket.project)
+            for user in rng.sample(candidates, min(len(candidates), users_per_ticket)):
+                for year_month in year_months:
+                    workload = Workload(user=user, project_id=ticket.project_id, ticket=ticket, year_month=year_month)
+                    for day in working_days[year_month]:
+                        if rng.random() < 0.5:
+                            workload.set_day_value(day, rng.choice(DAY_HOURS))
+                    batch.append(workload)
+                    if len(batch) >= BATCH_SIZE:
+                        Workload.objects.bulk_create(batch)
+                        workload_count += len(batch)
+                        batch = []
+        Workload.objects.bulk_create(batch)
+        counts['工数'] = workload_count + len(batch)
+
+        # 工数集計（チケットごとに1件）
+        aggregation_statuses = WorkloadAggregation.StatusChoices.values
+        aggregation_classifications = WorkloadAggregation.CaseClassificationChoices.values
+        aggregations = []
+        for ticket in ticket_list:
+            order_month = rng.randrange(months)
+            order_date = _month_date(rng, year_months[order_month])
+            end_month = rng.randrange(order_month, months)
+            actual_end_date = _month_date(rng, year_months[end_month]) if rng.random() < 0.6 else None
+            if actual_end_date and actual_end_date < order_date:
+                actual_end_date = None
+            aggregations.append(WorkloadAggregation(
+                project_name_id=ticket.project_id,
+                case_name=ticket,
+                section_id=ticket.project.assigned_section_id,
+                status=rng.choice(aggregation_statuses),
+                case_classification=rng.choice(aggregation_classifications),
+                estimate_date=order_date - timedelta(days=rng.randint(7, 60)),
+                order_date=order_date,
+                planned_end_date=order_date + timedelta(days=rng.randint(30, 240)),
+                actual_end_date=actual_end_date,
+                billing_amount_excluding_tax=Decimal(rng.randrange(50, 5000) * 1000),
+                estimated_workdays=Decimal(rng.randrange(5, 200)),
+                billing_destination=ticket.project.client,
+                mub_manager=rng.choice(project_members(ticket.project)),
+                created_by=admin,
+            ))
+        WorkloadAggregation.objects.bulk_create(aggregations, batch_size=BATCH_SIZE)
+        counts['工数集計'] = len(aggregations)
+
+        # BP・外注費（3割程度のチケットに、月ごとに半分程度の確率で計上）
+        BusinessPartner.objects.bulk_create([
+            BusinessPartner(
+                name=f'{prefix}bp-{i:04d}',
+                company=f'協力会社{rng.randint(1, 10):02d}',
+                hourly_rate=Decimal(rng.randrange(30, 120) * 100),
+                created_by=admin,
+            )
+            for i in range(partners)
+        ], batch_size=BATCH_SIZE)
+        partner_list = list(BusinessPartner.objects.filter(name__startswith=prefix).order_by('id'))
+        cost_statuses = [code for code, _ in OutsourcingCost.STATUS_CHOICES]
+        cost_classifications = [code for code, _ in OutsourcingCost.CASE_CLASSIFICATION_CHOICES]
+        costs = []
+        if partner_list:
+            for ticket in ticket_list:
+                if rng.random() >= 0.3:
+                    continue
+                partner = rng.choice(partner_list)
+                for year_month in year_months:
+                    if rng.random() >= 0.5:
+                        continue
+                    status = rng.choice(cost_statuses)
+                    hours = Decimal(rng.randrange(4, 160))
+                    costs.append(OutsourcingCost(
+                        year_month=year_month,
+                        business_partner=partner,
+                        project_id=ticket.project_id,
+                        ticket=ticket,
+                        status=status,
+                        case_classification=rng.choice(cost_classifications),
+                        work_hours=hours,
+                        hourly_rate=partner.hourly_rate,
+                        # OutsourcingCost.save と同じく着手のみ金額を計上する
+                        total_cost=hours * partner.hourly_rate if status == 'in_progress' else Decimal('0'),
+                        created_by=admin,
+                    ))
+        OutsourcingCost.objects.bulk_create(costs, batch_size=BATCH_SIZE)
+        # BPの参加プロジェクト（外注費を計上したプロジェクト）
+        partner_projects = sorted({(cost.business_partner.id, cost.project_id) for cost in costs})
+        BusinessPartner.projects.through.objects.bulk_create([
+            BusinessPartner.projects.through(businesspartner_id=partner_id, project_id=project_id)
+            for partner_id, project_id in partner_projects
+        ], batch_size=BATCH_SIZE)
+        counts['BP'] = len(partner_list)
+        counts['外注費'] = len(costs)
+
+        _rebuild_derived_data(
+            aggregations=WorkloadAggregation.objects.filter(project_name__name__startswith=prefix),
+            year_months=year_months,
+        )
+
+    logger.info(f"性能計測用データを作成しました: seed={seed}, {counts}")
+    return counts
+
+
+def _rebuild_derived_data(aggregations, year_months):
+    """bulk_create / 一括削除で更新されない集計テーブルを作り直し、キャッシュを破棄する"""
+    from apps.core.kpi_snapshot import invalidate_kpi_snapshot
+    from apps.cost_master.models import OutsourcingCostSummary
+    from apps.projects.lookup import invalidate_lookup
+    from apps.reports.list_totals import invalidate_totals
+    from apps.reports.recalculation import recalculate_aggregations
+    from apps.workloads.entries import backfill_entries
+    from apps.workloads.ledger import rebuild_ledger
+
+    rebuild_ledger()
+    backfill_entries()
+    if aggregations is not None:
+        recalculate_aggregations(aggregations)
+    for year_month in year_months:
+        OutsourcingCostSummary.calculate_summary(year_month)
+
+    transaction.on_commit(invalidate_lookup)
+    transaction.on_commit(invalidate_totals)
+    transaction.on_commit(invalidate_kpi_snapshot)
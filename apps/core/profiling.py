@@ -0,0 +1,144 @@
+"""
+リクエストごとのSQL・処理時間の計測
+
+RequestProfilingMiddleware（apps.core.middleware）から使う。
+抽出したリクエストについて、クエリ数・SQLの合計時間・処理時間と、
+同じ形のクエリが繰り返し発行されたもの（N+1 の候補）を記録する。
+しきい値を超えたリクエストは、ローテーションするログファイル（JSON 1行）と
+RequestProfile テーブル（直近の一定件数だけ残す）に書き込む。
+"""
+import json
+import logging
+import os
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from logging.handlers import RotatingFileHandler
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+slow_request_logger = logging.getLogger('apps.core.profiling.slow_requests')
+
+# 記録する重複クエリの件数（多い順）
+MAX_DUPLICATES = 10
+# 重複クエリとして記録するSQLの長さ
+MAX_SQL_LENGTH = 500
+
+_IN_LIST = re.compile(r'\bIN\s*\((?:\s*%s\s*,?)+\)', re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def profiling_settings():
+    """計測の設定（settings.REQUEST_PROFILING_*）"""
+    return {
+        'enabled': getattr(settings, 'REQUEST_PROFILING_ENABLED', False),
+        'sample_rate': getattr(settings, 'REQUEST_PROFILING_SAMPLE_RATE', 0.1),
+        'slow_ms': getattr(settings, 'REQUEST_PROFILING_SLOW_MS', 500),
+        'slow_queries': getattr(settings, 'REQUEST_PROFILING_SLOW_QUERIES', 100),
+        'buffer_size': getattr(settings, 'REQUEST_PROFILING_BUFFER_SIZE', 500),
+        'log_file': getattr(settings, 'REQUEST_PROFILING_LOG_FILE', ''),
+    }
+
+
+def sql_fingerprint(sql):
+    """パラメータ・リテラル・IN の要素数の違いを無視したSQLの形"""
+    sql = _IN_LIST.sub('IN (...)', sql)
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def configure_slow_request_log(log_file):
+    """遅いリクエストのログファイル（10MB × 5世代でローテーション）を設定する"""
+    if not log_file or slow_request_logger.handlers:
+        return
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
+    handler = RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(message)s'))
+    slow_request_logger.addHandler(handler)
+    slow_request_logger.setLevel(logging.INFO)
+    slow_request_logger.propagate = False
+
+
+class QueryRecorder:
+    """
+    ブロック内で発行されたクエリの件数・合計時間・形ごとの件数を記録する
+    （全DB接続の execute_wrapper）。
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.sql_seconds = 0.0
+        self.fingerprints = Counter()
+        self._stack = None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_seconds += time.perf_counter() - started
+            self.count += 1
+            self.fingerprints[sql_fingerprint(sql)] += 1
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for connection in connections.all():
+            self._stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+
+    def duplicates(self):
+        """2回以上発行された形（多い順）"""
+        return [
+            {'sql': sql[:MAX_SQL_LENGTH], 'count': count}
+            for sql, count in self.fingerprints.most_common(MAX_DUPLICATES)
+            if count > 1
+        ]
+
+    def duplicate_count(self):
+        """重複して発行されたクエリ数（形ごとの2回目以降の合計）"""
+        return sum(count - 1 for count in self.fingerprints.values() if count > 1)
+
+
+def build_profile(request, response, recorder, wall_seconds):
+    """計測結果の辞書"""
+    resolver_match = getattr(request, 'resolver_match', None)
+    user = getattr(request, 'user', None)
+    return {
+        'method': request.method,
+        'path': request.path[:500],
+        'view_name': (resolver_match.view_name if resolver_match else '')[:200],
+        'status_code': getattr(response, 'status_code', 0),
+        'username': user.get_username() if user is not None and user.is_authenticated else '',
+        'wall_ms': round(wall_seconds * 1000, 1),
+        'sql_ms': round(recorder.sql_seconds * 1000, 1),
+        'query_count': recorder.count,
+        'duplicate_count': recorder.duplicate_count(),
+        'duplicates': recorder.duplicates(),
+    }
+
+
+def is_slow(profile, options):
+    """処理時間またはクエリ数がしきい値以上か"""
+    return profile['wall_ms'] >= options['slow_ms'] or profile['query_count'] >= options['slow_queries']
+
+
+def record_slow_request(profile, buffer_size):
+    """遅いリクエストをログと RequestProfile テーブルに書き込み、古い記録を削除する"""
+    from .models import RequestProfile
+
+    slow_request_logger.info(json.dumps(profile, ensure_ascii=False))
+    try:
+        record = RequestProfile.objects.create(**profile)
+        RequestProfile.objects.filter(id__lte=record.id - buffer_size).delete()
+    except Exception:
+        # 計測の失敗でリクエストを失敗させない
+        logger.exception('リクエストの計測結果を保存できませんでした')
@@ -0,0 +1,345 @@
+"""
+URL名ごとのクエリ数の上限（クエリ予算）
+
+manage.py check_query_budgets と apps/core/tests.py（manage.py test apps.core.tests）から使う。
+seed_perf_data で件数の少ないデータと多いデータをそれぞれ作成し（終了時にロールバック）、
+apps/*/urls.py の全URL名について次を確認する。
+
+- 件数の多いデータでのクエリ数が BUDGETS の上限以下か
+- 件数を増やしたときにクエリ数が増えていないか（N+1 の検出）
+- URL名に予算が定義されているか（URLを追加したら BUDGETS にも追加する）
+
+各リクエストはセーブポイント内で実行してロールバックするため、
+削除・更新のリクエストも他のリクエストの結果に影響しない。
+キャッシュは毎回空にし、キャッシュがない状態のクエリ数を数える。
+"""
+import json
+import shutil
+import tempfile
+from datetime import date
+
+from django.core.cache import cache
+from django.db.models import Max
+from django.test import Client, override_settings
+from django.urls import URLResolver, get_resolver, reverse
+
+from apps.core.benchmark import rollback_after
+from apps.core.perf_data import (
+    admin_username, clear_perf_data, month_range, perf_data_exists, seed_perf_data, seed_prefix,
+)
+from apps.core.profiling import QueryRecorder
+
+# 件数の少ないデータ・多いデータ（seed_perf_data の引数）。
+# 多いデータは運用規模に近い件数（ユーザー約120人・チケット750件・工数行約1万3千行）にし、
+# 件数に応じたクエリ数の増加が少ないデータとの比較で表れるようにする
+SMALL_VOLUME = {
+    'departments': 1, 'sections': 2, 'users_per_level': 2, 'projects': 2,
+    'tickets': 3, 'months': 2, 'users_per_ticket': 2, 'partners': 2,
+}
+LARGE_VOLUME = {
+    'departments': 5, 'sections': 3, 'users_per_level': 20, 'projects': 30,
+    'tickets': 25, 'months': 6, 'users_per_ticket': 3, 'partners': 30,
+}
+
+
+class Budget:
+    """
+    URL名ごとのクエリ予算とリクエスト内容
+
+    kwargs / params は Targets を受け取って URL の引数・リクエストのパラメータを返す関数。
+    method: 'get' / 'post'（フォーム）/ 'json'（JSON の POST）
+    user: リクエストするユーザー（'admin' / 'leader' / 'member'）
+    batched: 件数に比例して分割されるクエリ（bulk_update・連鎖削除の IN 句。SQLite では
+        パラメーター数の上限で分割される）を含むため、件数による増加は確認しない（予算のみ確認）
+    """
+
+    def __init__(self, name, max_queries, method='get', kwargs=None, params=None, user='admin', batched=False):
+        self.name = name
+        self.max_queries = max_queries
+        self.method = method
+        self.kwargs = kwargs
+        self.params = params
+        self.user = user
+        self.batched = batched
+
+
+class Targets:
+    """リクエストの対象にする作成済みデータ（件数を増やすと関連データが増えるものを選ぶ）"""
+
+    def __init__(self, seed, export_storage):
+        from apps.cost_master.models import BusinessPartner, OutsourcingCost
+        from apps.projects.models import Project, ProjectTicket
+        from apps.reports.export_jobs import enqueue_export, run_export_job
+        from apps.reports.models import WorkloadAggregation
+        from apps.users.models import CustomUser, Department, Section
+        from apps.workloads.models import Workload
+
+        prefix = seed_prefix(seed)
+        users = CustomUser.objects.filter(username__startswith=prefix, is_superuser=False).order_by('id')
+        self.admin = CustomUser.objects.get(username=admin_username(seed))
+        self.leader = users.filter(is_leader=True).first()
+        self.member = users.filter(is_leader=False).exclude(employee_level='junior').first()
+        self.department = Department.objects.filter(name__startswith=prefix).order_by('id').first()
+        self.section = Section.objects.filter(name__startswith=prefix).order_by('id').first()
+        self.project = Project.objects.filter(name__startswith=prefix).order_by('id').first()
+        self.ticket = self.project.tickets.order_by('id').first()
+        self.workload = Workload.objects.filter(ticket=self.ticket).order_by('id').first()
+        # 工数の入力済みの日（未入力の日だと日付別工数の更新が挿入になり、データによってクエリ数が変わる）
+        self.workload_day = next(
+            (day for day in range(1, 32) if self.workload.get_day_value(day)), 1
+        )
+        self.aggregation = WorkloadAggregation.objects.filter(project_name=self.project).order_by('id').first()
+        # ユーザー削除時の関連（担当チケット・工数集計の担当者）の有無が件数によってずれないよう、
+        # 対象のユーザーに1件ずつ割り当てる
+        ProjectTicket.objects.filter(pk=self.ticket.pk).update(assigned_user=self.member)
+        WorkloadAggregation.objects.filter(pk=self.aggregation.pk).update(mub_manager=self.member)
+        self.cost = OutsourcingCost.objects.filter(project__name__startswith=prefix).order_by('id').first()
+        self.partner = (
+            BusinessPartner.objects.get(pk=self.cost.business_partner_id) if self.cost
+            else BusinessPartner.objects.filter(name__startswith=prefix).order_by('id').first()
+        )
+        self.year_month = Workload.objects.filter(ticket=self.ticket).aggregate(latest=Max('year_month'))['latest']
+        self.next_month = month_range(date(int(self.year_month[:4]), int(self.year_month[5:]), 1), 2)[-1]
+        self.export = run_export_job(
+            enqueue_export(self.admin, 'csv', {}, total_records=WorkloadAggregation.objects.count()),
+            storage=export_storage,
+        )
+
+
+def _pk(attribute):
+    return lambda targets: {'pk': getattr(targets, attribute).pk}
+
+
+def _calendar_block_params(targets):
+    """工数カレンダーの先頭ブロック（全ての並びキーより前のカーソル）"""
+    from apps.workloads.grid import encode_cursor
+    return {'year_month': targets.year_month, 'cursor': encode_cursor(['', '', ''])}
+
+
+# 予算は件数の多いデータでの計測値に 2 程度の余裕を加えた値。
+# 確認画面のテンプレートがない削除画面は、削除（POST）のリクエストで数える。
+BUDGETS = [
+    # 社員
+    Budget('users:user_register', 9),
+    Budget('users:user_password_display', 7),
+    Budget('users:user_export', 9),
+    Budget('users:user_list', 14),
+    Budget('users:user_detail', 11, kwargs=_pk('member')),
+    Budget('users:user_edit', 13, kwargs=_pk('member')),
+    Budget('users:user_delete', 8, kwargs=_pk('member')),
+    Budget('users:user_permanent_delete', 10, kwargs=_pk('member')),
+    Budget('users:profile', 9),
+    Budget('users:profile_edit', 8),
+    Budget('users:department_list', 11),
+    Budget('users:department_detail', 10, kwargs=_pk('department')),
+    Budget('users:department_create', 8),
+    Budget('users:department_edit', 9, kwargs=_pk('department')),
+    Budget('users:department_delete', 24, method='post', kwargs=_pk('department'), batched=True),
+    Budget('users:section_list', 8),
+    Budget('users:section_detail', 9, kwargs=_pk('section')),
+    Budget('users:section_create', 9),
+    Budget('users:section_edit', 10, kwargs=_pk('section')),
+    Budget('users:section_delete', 16, method='post', kwargs=_pk('section')),
+    Budget('users:user_delete_ajax', 9, method='json', params=lambda t: {'user_id': t.member.pk}),
+    Budget('users:user_restore_ajax', 9, method='json', params=lambda t: {'user_id': t.member.pk}),
+    Budget('users:user_permanent_delete_ajax', 32, method='json',
+           params=lambda t: {'user_id': t.member.pk, 'confirm_text': 'DELETE'}),
+    Budget('users:cleanup_inactive_users', 10, method='json',
+           params=lambda t: {'days_threshold': 365, 'confirm_text': 'CLEANUP'}),
+    Budget('users:ajax_load_sections', 8, params=lambda t: {'department_id': t.department.pk}),
+
+    # プロジェクト・チケット
+    Budget('projects:project_list', 9),
+    Budget('projects:project_create', 8),
+    Budget('projects:project_detail', 14, kwargs=_pk('project')),
+    Budget('projects:project_edit', 10, kwargs=_pk('project')),
+    Budget('projects:project_delete', 10, kwargs=_pk('project')),
+    Budget('projects:ticket_detail', 12, kwargs=_pk('ticket')),
+    Budget('projects:ticket_edit', 11, kwargs=_pk('ticket')),
+    Budget('projects:ticket_delete', 8, kwargs=_pk('ticket')),
+    Budget('projects:project_ticket_list', 11, kwargs=lambda t: {'project_pk': t.project.pk}),
+    Budget('projects:project_ticket_create', 9, kwargs=lambda t: {'project_pk': t.project.pk}),
+    Budget('projects:get_project_tickets_api', 9, kwargs=lambda t: {'project_id': t.project.pk}),
+    Budget('projects:get_tickets_api', 9, params=lambda t: {'project_id': t.project.pk}),
+    Budget('projects:lookup_api', 8, kwargs=lambda t: {'kind': 'tickets'}),
+
+    # 工数
+    Budget('workloads:workload_calendar', 13, params=lambda t: {'year_month': t.year_month}),
+    Budget('workloads:workload_create', 8),
+    Budget('workloads:workload_edit', 9, kwargs=_pk('workload')),
+    Budget('workloads:workload_delete', 8, kwargs=_pk('workload')),
+    Budget('workloads:create_workload_ajax', 19, method='json', params=lambda t: {
+        'user_id': t.member.pk, 'project_id': t.project.pk, 'ticket_id': t.ticket.pk, 'year_month': t.next_month,
+    }),
+    Budget('workloads:update_workload_ajax', 15, method='json',
+           params=lambda t: {'workload_id': t.workload.pk, 'day': t.workload_day, 'value': 7.5}),
+    Budget('workloads:bulk_update_workload_ajax', 18, method='json', params=lambda t: {'changes': [
+        {'workload_id': t.workload.pk, 'day': day, 'value': 4} for day in range(1, 6)
+    ]}),
+    Budget('workloads:delete_workload_ajax', 8, method='json', params=lambda t: {'workload_id': t.workload.pk}),
+    Budget('workloads:workload_grid_api', 9, params=lambda t: {'year_month': t.year_month}),
+    Budget('workloads:workload_calendar_block', 10, params=_calendar_block_params),
+    Budget('workloads:workload_change_feed', 8, params=lambda t: {'year_month': t.year_month}),
+    Budget('workloads:rollover_workload_ajax', 10, method='json',
+           params=lambda t: {'target_month': t.next_month, 'source_month': t.year_month}),
+    Budget('workloads:timesheet_import', 7),
+    Budget('workloads:timesheet_completeness', 11, params=lambda t: {'year_month': t.year_month}),
+    Budget('workloads:timesheet_completeness_csv', 9, params=lambda t: {'year_month': t.year_month}),
+    Budget('workloads:timesheet_completeness_api', 9, params=lambda t: {'year_month': t.year_month}),
+
+    # レポート
+    Budget('reports:report_list', 7),
+    Budget('reports:workload_aggregation', 9),
+    Budget('reports:workload_aggregation_create', 8),
+    Budget('reports:workload_aggregation_detail', 8, kwargs=_pk('aggregation')),
+    Budget('reports:workload_aggregation_edit', 11, kwargs=_pk('aggregation')),
+    Budget('reports:workload_aggregation_delete', 8, kwargs=_pk('aggregation')),
+    Budget('reports:workload_export_current', 10, method='post', params=lambda t: {'format': 'csv'}),
+    Budget('reports:report_export_list', 9),
+    Budget('reports:export_status', 8, kwargs=_pk('export')),
+    Budget('reports:export_download', 9, kwargs=_pk('export')),
+    Budget('reports:calculate_workdays_ajax', 12, method='post', params=lambda t: {
+        'ticket_id': t.ticket.pk, 'classification': 'development',
+        'order_date': t.aggregation.order_date.isoformat(),
+        'actual_end_date': t.aggregation.actual_end_date.isoformat() if t.aggregation.actual_end_date else '',
+    }),
+    Budget('reports:bulk_update_work_hours', 18, method='json', params=lambda t: {'filter_params': {}},
+           batched=True),
+    Budget('reports:sync_outsourcing_costs', 13, method='json', params=lambda t: {'filter_params': {}}),
+
+    # 外注費
+    Budget('cost_master:dashboard', 16),
+    Budget('cost_master:business_partner_list', 10),
+    Budget('cost_master:business_partner_create', 8),
+    Budget('cost_master:business_partner_update', 10, kwargs=_pk('partner')),
+    Budget('cost_master:business_partner_delete', 9, method='post', kwargs=_pk('partner')),
+    Budget('cost_master:outsourcing_cost_list', 11),
+    Budget('cost_master:outsourcing_cost_create', 8),
+    Budget('cost_master:outsourcing_cost_update', 11, kwargs=_pk('cost')),
+    Budget('cost_master:outsourcing_cost_delete', 9, kwargs=_pk('cost')),
+    Budget('cost_master:get_project_tickets_api', 8, params=lambda t: {'project_id': t.project.pk}),
+    Budget('cost_master:get_bp_hourly_rate_api', 8, params=lambda t: {'bp_id': t.partner.pk}),
+    Budget('cost_master:get_bp_projects_api', 9, params=lambda t: {'bp_id': t.partner.pk}),
+    Budget('cost_master:get_ticket_outsourcing_cost_api', 8,
+           params=lambda t: {'ticket_id': t.ticket.pk, 'year_month': t.year_month}),
+
+    # ダッシュボードなど
+    Budget('core:home', 7),
+    Budget('core:admin_dashboard', 16),
+    Budget('core:staff_dashboard', 8, user='leader'),
+    Budget('core:user_dashboard', 12, user='member'),
+    Budget('core:request_profiles', 9),
+    Budget('core:metrics', 7),
+]
+
+
+def app_url_names():
+    """apps/*/urls.py で定義されたURL名（名前空間付き）"""
+    names = set()
+
+    def walk(patterns, namespace, in_app):
+        for pattern in patterns:
+            if isinstance(pattern, URLResolver):
+                module = getattr(pattern.urlconf_module, '__name__', str(pattern.urlconf_name))
+                child = f'{namespace}{pattern.namespace}:' if pattern.namespace else namespace
+                walk(pattern.url_patterns, child, in_app or module.startswith('apps.'))
+            elif in_app and pattern.name:
+                names.add(f'{namespace}{pattern.name}')
+
+    walk(get_resolver().url_patterns, '', False)
+    return names
+
+
+def _request(client, budget, targets):
+    """予算の定義どおりにリクエストを送り、(ステータス, クエリ数, 重複クエリ) を返す"""
+    url = reverse(budget.name, kwargs=budget.kwargs(targets) if budget.kwargs else None)
+    params = budget.params(targets) if budget.params else {}
+    cache.clear()
+    with rollback_after():
+        with QueryRecorder() as recorder:
+            if budget.method == 'json':
+                response = client.post(url, data=json.dumps(params), content_type='application/json')
+            elif budget.method == 'post':
+                response = client.post(url, data=params, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+            else:
+                response = client.get(url, data=params)
+            if getattr(response, 'streaming', False):
+                # ストリーミングのレスポンスは読み出すときにクエリを発行する
+                b''.join(response.streaming_content)
+    return response.status_code, recorder.count, recorder.duplicates()
+
+
+def measure_budgets(volume, budgets, seed=0):
+    """volume の件数のデータを作成し、各予算のリクエストのクエリ数を数える。戻り値は {URL名: _request の戻り値}"""
+    from apps.reports.utils import LocalExportStorage
+
+    measured = {}
+    storage_root = tempfile.mkdtemp(prefix='query_budget_')
+    try:
+        with rollback_after():
+            # 同じ seed のデータが作成済みなら、このトランザクション内でだけ削除して作り直す
+            if perf_data_exists(seed):
+                clear_perf_data(seed)
+            seed_perf_data(seed=seed, **volume)
+            targets = Targets(seed, LocalExportStorage(storage_root))
+            clients = {}
+            for key in ('admin', 'leader', 'member'):
+                # 500 エラーも例外にせずステータスとして記録する
+                clients[key] = Client(SERVER_NAME='127.0.0.1', raise_request_exception=False)
+                clients[key].force_login(getattr(targets, key))
+            # 既定で無効の機能（変更通知）も有効にして数える。
+            # 変更通知の接続は経過時間で DB の確認回数が変わるため、確認前に終わる短い接続にする。
+            # エクスポートの登録はワーカーで実行する構成で数える（ファイル生成は Targets で1回実行している）
+            with override_settings(
+                REPORT_EXPORT_WORKER_ENABLED=True,
+                WORKLOAD_CHANGE_FEED_ENABLED=True,
+                WORKLOAD_FEED_STREAM_SECONDS=1,
+                WORKLOAD_FEED_POLL_SECONDS=10,
+            ):
+                for budget in budgets:
+                    measured[budget.name] = _request(clients[budget.user], budget, targets)
+    finally:
+        shutil.rmtree(storage_root, ignore_errors=True)
+        cache.clear()
+    return measured
+
+
+def check_query_budgets(names=None, small=SMALL_VOLUME, large=LARGE_VOLUME, seed=0):
+    """
+    クエリ予算を確認する。
+    戻り値: [{'name', 'budget', 'small', 'large', 'status', 'duplicates', 'violations'}, ...]（URL名順）
+    duplicates は件数の多いデータで繰り返し発行されたクエリ（QueryRecorder.duplicates）
+    """
+    budgets = [budget for budget in BUDGETS if not names or any(name in budget.name for name in names)]
+    small_counts = measure_budgets(small, budgets, seed)
+    large_counts = measure_budgets(large, budgets, seed)
+
+    results = []
+    for budget in budgets:
+        small_status, small_queries, _ = small_counts[budget.name]
+        large_status, large_queries, duplicates = large_counts[budget.name]
+        violations = []
+        if large_status >= 500:
+            violations.append(f'ステータス {large_status}')
+        if large_queries > budget.max_queries:
+            violations.append(f'予算超過（{large_queries} > {budget.max_queries}）')
+        if large_queries > small_queries and not budget.batched:
+            violations.append(f'件数に応じて増加（{small_queries} → {large_queries}）')
+        results.append({
+            'name': budget.name,
+            'budget': budget.max_queries,
+            'small': small_queries,
+            'large': large_queries,
+            'status': large_status,
+            'duplicates': duplicates,
+            'violations': violations,
+        })
+
+    if not names:
+        declared = {budget.name for budget in BUDGETS}
+        for name in sorted(app_url_names() - declared):
+            results.append({
+                'name': name, 'budget': None, 'small': None, 'large': None, 'status': None, 'duplicates': [],
+                'violations': ['予算が定義されていません'],
+            })
+    return sorted(results, key=lambda result: result['name'])
@@ -0,0 +1,22 @@
+"""
+テストランナー
+
+マイグレーションファイルはデプロイ時に makemigrations で生成し、リポジトリには含めないため、
+テスト用データベースはローカルアプリのマイグレーションを使わずモデルから直接作成する。
+"""
+from django.apps import apps
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+
+class AppTestRunner(DiscoverRunner):
+    """ローカルアプリ（apps.*）のマイグレーションを無効にしてテスト用データベースを作成する"""
+
+    def setup_databases(self, **kwargs):
+        migration_modules = {
+            app_config.label: None
+            for app_config in apps.get_app_configs()
+            if app_config.name.startswith('apps.')
+        }
+        with override_settings(MIGRATION_MODULES=migration_modules):
+            return super().setup_databases(**kwargs)
@@ -0,0 +1,48 @@
+"""
+apps.core のテスト
+
+クエリ予算は manage.py check_query_budgets と同じ確認（apps.core.query_budget）をテストとして実行する。
+"""
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from apps.core.query_budget import check_query_budgets
+
+
+class QueryBudgetTests(TestCase):
+    """全URLのクエリ数が予算内で、件数に応じて増えないこと"""
+
+    def test_query_budgets(self):
+        results = check_query_budgets()
+        violations = {result['name']: result['violations'] for result in results if result['violations']}
+        self.assertEqual(violations, {})
+
+
+@override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+class MetricsAccessTests(TestCase):
+    """/metrics の接続元IPアドレスによる制限（X-Forwarded-For の偽装で通らないこと）"""
+
+    def get(self, remote_addr, forwarded_for=None):
+        headers = {'REMOTE_ADDR': remote_addr}
+        if forwarded_for:
+            headers['HTTP_X_FORWARDED_FOR'] = forwarded_for
+        return self.client.get(reverse('core:metrics'), **headers)
+
+    def test_allowed_remote_addr(self):
+        self.assertEqual(self.get('127.0.0.1').status_code, 200)
+
+    @override_settings(METRICS_TRUSTED_PROXY_COUNT=0)
+    def test_spoofed_forwarded_for_without_proxy(self):
+        self.assertEqual(self.get('203.0.113.9', '127.0.0.1').status_code, 403)
+
+    @override_settings(METRICS_TRUSTED_PROXY_COUNT=1)
+    def test_spoofed_forwarded_for_behind_proxy(self):
+        # クライアントが付けた値（左）ではなく、プロキシが付けた値（右）で判定する
+        self.assertEqual(self.get('10.0.0.2', '127.0.0.1, 203.0.113.9').status_code, 403)
+        self.assertEqual(self.get('10.0.0.2', '203.0.113.9, 127.0.0.1').status_code, 200)
+
+    def test_superuser(self):
+        superuser = get_user_model().objects.create_superuser('metrics-admin', 'metrics@example.com', 'password')
+        self.client.force_login(superuser)
+        self.assertEqual(self.get('203.0.113.9', '127.0.0.1').status_code, 200)
@@ -10,4 +10,10 @@ urlpatterns = [
     path('dashboard/admin/', views.AdminDashboardView.as_view(), name='admin_dashboard'),
     path('dashboard/staff/', views.StaffDashboardView.as_view(), name='staff_dashboard'),
     path('dashboard/user/', views.UserDashboardView.as_view(), name='user_dashboard'),
+
+    # リクエストの計測（遅いリクエストの記録）
+    path('profiling/', views.RequestProfileListView.as_view(), name='request_profiles'),
+
+    # メトリクス（Prometheus のテキスト形式）
+    path('metrics', views.metrics_view, name='metrics'),
 ]
\ No newline at end of file
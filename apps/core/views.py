@@ -1,16 +1,24 @@
 from django.shortcuts import render, redirect
+from django.http import HttpResponse, HttpResponseForbidden
+from django.conf import settings
 from django.contrib.auth.views import LoginView
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.views.generic import TemplateView
+from django.views.generic import ListView, TemplateView
 from django.urls import reverse
 from django.contrib import messages
-from django.db.models import Sum, Q, Count
+from django.db.models import Avg, Max, Sum, Q, Count
 from django.utils import timezone
 from datetime import date, datetime, timedelta
 from apps.users.models import CustomUser
 from apps.projects.models import Project,ProjectTicket
 from apps.workloads.models import Workload
 from apps.reports.models import WorkloadAggregation
+from apps.core.calendar_service import get_month_calendar
+from apps.core.kpi_snapshot import get_kpi_snapshot
+from apps.core.decorators import SuperuserRequiredMixin
+from apps.core.models import RequestProfile
+from apps.core.profiling import profiling_settings
+from apps.core import metrics
 
 class CustomLoginView(LoginView):
     """ユーザー権限別リダイレクト機能付きログインビュー"""
@@ -43,60 +51,30 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         
-        # システム統計情報
-        total_users = CustomUser.objects.count()
-        active_users = CustomUser.objects.filter(is_active=True).count()
-        leader_users = CustomUser.objects.filter(is_leader=True).count()
-        
-        try:
-            total_projects = Project.objects.count()
-            active_projects = Project.objects.filter(is_active=True).count()
-        except:
-            total_projects = 0
-            active_projects = 0
-        
-        # === 追加統計情報の計算 ===
+        # 指標はKPIスナップショット（短時間キャッシュ）から取得
+        snapshot = get_kpi_snapshot()
         now = timezone.now()
-        first_day_of_month = now.replace(day=1)
         
-        # 総工数登録数
-        workload_count = Workload.objects.count()
+        total_users = snapshot['total_users']
+        active_users = snapshot['active_users']
+        leader_users = snapshot['leader_users']
+        total_projects = snapshot['total_projects']
+        active_projects = snapshot['active_projects']
         
-        # 進行中チケット数
-        active_tickets_count = WorkloadAggregation.objects.filter(
-            status__in=['planning', 'in_progress'],
-            case_name__isnull=False,
-            del_flag=False
-        ).count()
+        # 総工数登録数
+        workload_count = snapshot['workload_count']
         
-        # 期限超過チケット数
-        overdue_tickets_count = WorkloadAggregation.objects.filter(
-            planned_end_date__lt=now.date(),
-            status__in=['planning', 'in_progress'],
-            case_name__isnull=False
-        ).count()
+        # 進行中チケット数・期限超過チケット数
+        active_tickets_count = snapshot['active_tickets_count']
+        overdue_tickets_count = snapshot['overdue_tickets_count']
         
         # 収益統計
-        revenue_stats = WorkloadAggregation.objects.aggregate(
-            total_billing=Sum('billing_amount_excluding_tax'),
-            total_outsourcing=Sum('outsourcing_cost_excluding_tax')
-        )
-        
-        total_billing = revenue_stats['total_billing'] or 0
-        total_outsourcing = revenue_stats['total_outsourcing'] or 0
-        
-        total_revenue = total_billing
-        total_outsourcing_cost = total_outsourcing
+        total_revenue = snapshot['total_billing']
+        total_outsourcing_cost = snapshot['total_outsourcing']
         gross_profit = total_revenue - total_outsourcing_cost
         profit_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
         
         # チケットステータス別統計
-        ticket_records = WorkloadAggregation.objects.filter(case_name__isnull=False)
-        status_data = ticket_records.values('status').annotate(
-            count=Count('id'),
-            total_amount=Sum('billing_amount_excluding_tax')*10000  
-        ).order_by('-total_amount')
-        
         ticket_status_stats = []
         status_colors = {
             'planning': 'secondary',
@@ -116,91 +94,44 @@ class AdminDashboardView(LoginRequiredMixin, UserPassesTestMixin, TemplateView):
             'cancelled': 'キャンセル'
         }
         
-        for item in status_data:
+        for item in snapshot['status_stats']:
             status_value = item['status']
-            count = item['count']
-            amount = item['total_amount'] or 0
-            
-            display_name = status_display_names.get(status_value, status_value)
-            
             ticket_status_stats.append({
-                'name': display_name,
-                'count': count,
-                'total_amount': amount / 10000,  # 万円単位
+                'name': status_display_names.get(status_value, status_value),
+                'count': item['count'],
+                'total_amount': item['total_amount'],
                 'color': status_colors.get(status_value, 'secondary')
             })
         
         # 今月の工数統計
-        this_month_stats = WorkloadAggregation.objects.filter(
-            created_at__gte=first_day_of_month
-        ).aggregate(
-            total_workdays=Sum('used_workdays')
-        )
-        
-        this_month_workdays = this_month_stats['total_workdays'] or 0
+        this_month_workdays = snapshot['this_month_used_workdays']
         
-        # 営業日数計算
-        working_days_this_month = 0
-        current_date = first_day_of_month.date()
-        while current_date <= now.date():
-            if current_date.weekday() < 5:  # 平日のみ
-                working_days_this_month += 1
-            current_date += timedelta(days=1)
+        # 営業日数（土日祝を除く）
+        working_days_this_month = snapshot['working_days_this_month']
         
         avg_daily_workdays = this_month_workdays / working_days_this_month if working_days_this_month > 0 else 0
         
         # 前月比較
-        last_month_first_day = (first_day_of_month - timedelta(days=1)).replace(day=1)
-        last_month_last_day = first_day_of_month - timedelta(days=1)
-
-        last_month_stats = WorkloadAggregation.objects.filter(
-            created_at__gte=last_month_first_day,
-            created_at__lte=last_month_last_day
-        ).aggregate(
-            total_workdays=Sum('used_workdays')
-        )
-        
-        last_month_workdays = last_month_stats['total_workdays'] or 0
+        last_month_workdays = snapshot['last_month_used_workdays']
         workdays_growth = ((this_month_workdays - last_month_workdays) / last_month_workdays * 100) if last_month_workdays > 0 else 0
         
         # 目標達成率
         monthly_target = working_days_this_month * 0.8
         target_achievement = (float(this_month_workdays) / monthly_target * 100) if monthly_target > 0 else 0
         
-        # 最近の登録データ取得
-        recent_workload_entries = []
-        recent_aggregations = WorkloadAggregation.objects.select_related(
-            'case_name'
-        ).order_by('-created_at')[:5]
-        
-        for aggregation in recent_aggregations:
-            recent_workload_entries.append({
-                'project_name': aggregation.project_name or '未設定',
-                'case_name': {
-                    'title': aggregation.case_name.title if aggregation.case_name else '未設定'
-                },
-                'used_workdays': aggregation.used_workdays or 0,
-                'created_at': aggregation.created_at
-            })
+        # 最近の登録データ
+        recent_workload_entries = snapshot['recent_entries']
         
-        # 注意チケット取得
+        # 注意チケット（期限超過）
         attention_tickets = []
-        
-        # 期限超過チケット
-        overdue_tickets = WorkloadAggregation.objects.filter(
-            planned_end_date__lt=now.date(),
-            status__in=['planning', 'in_progress'],
-            case_name__isnull=False
-        ).select_related('case_name')[:3]
-        
-        for ticket in overdue_tickets:
-            days_overdue = (now.date() - ticket.planned_end_date).days
+        for ticket in snapshot['overdue_tickets']:
+            days_overdue = -ticket['days_from_today']
             attention_tickets.append({
-                'ticket_title': ticket.case_name.title if ticket.case_name else '未設定',
-                'project_name': ticket.project_name,
+                'ticket_title': ticket['ticket_title'],
+                'project_name': ticket['project_name'],
                 'reason': f'予定終了日を{days_overdue}日超過',
                 'alert_level': 'danger',
-                'status_display': status_display_names.get(ticket.status, ticket.status),
+                'status_display': status_display_names.get(ticket['status'], ticket['status']),
                 'days_overdue': days_overdue
             })
         
@@ -276,26 +207,19 @@ class UserDashboardView(LoginRequiredMixin, TemplateView):
         today_weekday = today.weekday()  # 0=月曜日, 6=日曜日
         this_week_start = today - timedelta(days=today_weekday)
         
-        # 今月の工数を取得
-        this_month_workloads = Workload.objects.filter(
+        # 今月の工数を日別の月ベクトルとして取得（1クエリ）
+        this_month_matrix = Workload.objects.filter(
             user=user,
             year_month=current_year_month
-        )
+        ).month_matrix(key_fields=('id',))
+        day_totals = this_month_matrix.day_totals()
         
         # 今月の合計工数を計算
-        this_month_hours = 0
-        for workload in this_month_workloads:
-            this_month_hours += workload.total_hours
+        this_month_hours = this_month_matrix.total()
         
-        # 今週の合計工数を計算
-        this_week_hours = 0
-        for workload in this_month_workloads:
-            # 今週の日付範囲内の工数のみ合計
-            for day_num in range((today - this_week_start).days + 1):
-                target_date = this_week_start + timedelta(days=day_num)
-                if target_date.month == today.month and target_date.year == today.year:
-                    day_hours = workload.get_day_value(target_date.day)
-                    this_week_hours += day_hours
+        # 今週の合計工数を計算（今月分のみ）
+        week_first_day = this_week_start.day if this_week_start.month == today.month else 1
+        this_week_hours = float(day_totals[week_first_day - 1:today.day].sum())
         
         # 参加中のプロジェクト（正しいフィールド名を使用）
         my_projects = Project.objects.filter(
@@ -306,39 +230,15 @@ class UserDashboardView(LoginRequiredMixin, TemplateView):
         # 最近の工数履歴（直近5件）
         recent_workloads = Workload.objects.filter(
             user=user
-        ).select_related('project').order_by('-year_month', '-updated_at')[:5]
+        ).select_related('project').with_month_total().order_by('-year_month', '-updated_at')[:5]
         
         # 今日の工数入力状況をチェック
-        today_workload_exists = False
-        today_workloads = Workload.objects.filter(
-            user=user,
-            year_month=current_year_month
-        )
-        
-        for workload in today_workloads:
-            day_hours = workload.get_day_value(today.day)
-            if day_hours > 0:
-                today_workload_exists = True
-                break
-        
-        # 未入力日数の計算（今月の平日で工数が0の日をカウント）
-        pending_tasks_count = 0
-        import calendar
+        today_workload_exists = bool(day_totals[today.day - 1] > 0)
         
-        # 今月の日数を取得
-        _, last_day = calendar.monthrange(today.year, today.month)
-        
-        for day in range(1, min(today.day + 1, last_day + 1)):  # 今日まで
-            # 平日かどうかチェック
-            check_date = date(today.year, today.month, day)
-            if check_date.weekday() < 5:  # 月曜日(0)〜金曜日(4)
-                # その日の工数合計をチェック
-                day_total = 0
-                for workload in today_workloads:
-                    day_total += workload.get_day_value(day)
-                
-                if day_total == 0:
-                    pending_tasks_count += 1
+        # 未入力日数の計算（今月の営業日で工数が0の日をカウント）
+        month_calendar = get_month_calendar(today.year, today.month)
+        pending_days = month_calendar.business_days[:today.day] & (day_totals[:today.day] == 0)
+        pending_tasks_count = int(pending_days.sum())
         
         context.update({
             'title': 'ダッシュボード',
@@ -372,4 +272,77 @@ class HomeView(LoginRequiredMixin, TemplateView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['title'] = 'ホーム'
-        return context
\ No newline at end of file
+        return context
+
+
+class RequestProfileListView(SuperuserRequiredMixin, ListView):
+    """遅いリクエストの記録一覧（RequestProfilingMiddleware、スーパーユーザー専用）"""
+    model = RequestProfile
+    template_name = 'core/request_profiles.html'
+    context_object_name = 'profiles'
+    paginate_by = 50
+
+    # 並び順の指定 → order_by
+    ORDERINGS = {
+        'recent': '-id',
+        'wall': '-wall_ms',
+        'queries': '-query_count',
+        'duplicates': '-duplicate_count',
+    }
+
+    def get_queryset(self):
+        queryset = RequestProfile.objects.all()
+        view_name = self.request.GET.get('view', '')
+        if view_name:
+            queryset = queryset.filter(view_name=view_name)
+        return queryset.order_by(self.ORDERINGS.get(self.request.GET.get('sort'), '-id'))
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        # ビューごとの件数・平均/最大の処理時間・最大クエリ数（多い順）
+        context['view_summary'] = (
+            RequestProfile.objects.order_by()
+            .values('view_name')
+            .annotate(
+                count=Count('id'),
+                avg_wall_ms=Avg('wall_ms'),
+                max_wall_ms=Max('wall_ms'),
+                avg_sql_ms=Avg('sql_ms'),
+                max_queries=Max('query_count'),
+                max_duplicates=Max('duplicate_count'),
+            )
+            .order_by('-count', '-max_wall_ms')[:20]
+        )
+        context['profiling'] = profiling_settings()
+        context['selected_view'] = self.request.GET.get('view', '')
+        context['selected_sort'] = self.request.GET.get('sort', 'recent')
+        return context
+
+
+def _metrics_client_ip(request):
+    """
+    /metrics の接続元IPアドレス。
+    X-Forwarded-For の左側はクライアントが自由に書けるため使わず、
+    信頼するプロキシの段数（METRICS_TRUSTED_PROXY_COUNT）だけ右から数えた値を使う。
+    段数が0、またはヘッダーの値が段数より少ない場合は REMOTE_ADDR を使う。
+    """
+    proxy_count = getattr(settings, 'METRICS_TRUSTED_PROXY_COUNT', 0)
+    forwarded_for = request.META.get('HTTP_X_FORWARDED_FOR')
+    if proxy_count and forwarded_for:
+        addresses = [address.strip() for address in forwarded_for.split(',')]
+        if len(addresses) >= proxy_count:
+            return addresses[-proxy_count]
+    return request.META.get('REMOTE_ADDR')
+
+
+def metrics_view(request):
+    """
+    メトリクス（Prometheus のテキスト形式）
+    METRICS_ALLOWED_IPS からのアクセスと、スーパーユーザーのみ参照できる。
+    リバースプロキシ経由のアクセスは、信頼するプロキシが付けた X-Forwarded-For の値で判定する。
+    """
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1'])
+    if _metrics_client_ip(request) not in allowed_ips and not request.user.is_superuser:
+        return HttpResponseForbidden('このページにアクセスする権限がありません。')
+    return HttpResponse(metrics.REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
@@ -3,6 +3,7 @@ from django.contrib.auth import get_user_model
 from datetime import date
 from .models import BusinessPartner, OutsourcingCost
 from apps.projects.models import Project, ProjectTicket
+from apps.projects.widgets import LookupSelect
 
 User = get_user_model()
 
@@ -86,7 +87,7 @@ class OutsourcingCostForm(forms.ModelForm):
                 'class': 'form-select',
                 'id': 'id_business_partner'
             }),
-            'project': forms.Select(attrs={
+            'project': LookupSelect('projects', attrs={
                 'class': 'form-select',
                 'id': 'id_project'
             }),
@@ -137,7 +138,7 @@ class OutsourcingCostForm(forms.ModelForm):
         # チケットの選択肢（初期は空）
         if self.instance.pk and self.instance.project:
             # 編集時：選択されたプロジェクトのチケットのみ表示
-            self.fields['ticket'].queryset = ProjectTicket.objects.filter(
+            self.fields['ticket'].queryset = ProjectTicket.objects.select_related('project').filter(
                 project=self.instance.project,
                 is_active=True
             ).order_by('title')
@@ -145,7 +146,7 @@ class OutsourcingCostForm(forms.ModelForm):
             # フォーム送信時：選択されたプロジェクトのチケットのみ表示
             try:
                 project_id = int(self.data.get('project'))
-                self.fields['ticket'].queryset = ProjectTicket.objects.filter(
+                self.fields['ticket'].queryset = ProjectTicket.objects.select_related('project').filter(
                     project_id=project_id,
                     is_active=True
                 ).order_by('title')
@@ -232,7 +233,7 @@ class OutsourcingCostFilterForm(forms.Form):
         queryset=Project.objects.filter(is_active=True).order_by('name'),
         required=False,
         empty_label="全てのプロジェクト",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=LookupSelect('projects', attrs={'class': 'form-select'})
     )
     status = forms.ChoiceField(
         label='ステータス',
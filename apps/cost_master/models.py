@@ -264,15 +264,20 @@ class OutsourcingCostSummary(models.Model):
             }
         )
         
-        # 集計計算
-        summary.total_records = outsourcing_costs.count()
-        summary.in_progress_records = outsourcing_costs.filter(status='in_progress').count()
-        summary.not_started_records = outsourcing_costs.filter(status='not_started').count()
-        
-        # 着手案件のみ集計
-        in_progress_costs = outsourcing_costs.filter(status='in_progress')
-        summary.total_hours = sum(cost.work_hours for cost in in_progress_costs)
-        summary.total_cost = sum(cost.total_cost for cost in in_progress_costs)
+        # 集計計算（件数・着手案件のみの時間と金額を1クエリで集計）
+        in_progress = models.Q(status='in_progress')
+        totals = outsourcing_costs.aggregate(
+            total_records=models.Count('id'),
+            in_progress_records=models.Count('id', filter=in_progress),
+            not_started_records=models.Count('id', filter=models.Q(status='not_started')),
+            total_hours=models.Sum('work_hours', filter=in_progress),
+            total_cost=models.Sum('total_cost', filter=in_progress),
+        )
+        summary.total_records = totals['total_records']
+        summary.in_progress_records = totals['in_progress_records']
+        summary.not_started_records = totals['not_started_records']
+        summary.total_hours = totals['total_hours'] or Decimal('0')
+        summary.total_cost = totals['total_cost'] or Decimal('0')
         
         summary.save()
         return summary
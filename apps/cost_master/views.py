@@ -208,7 +208,9 @@ def outsourcing_cost_create(request):
 @leader_or_superuser_required_403
 def outsourcing_cost_update(request, pk):
     """外注費編集"""
-    cost = get_object_or_404(OutsourcingCost, pk=pk)
+    cost = get_object_or_404(
+        OutsourcingCost.objects.select_related('business_partner', 'project', 'ticket'), pk=pk
+    )
     
     if request.method == 'POST':
         form = OutsourcingCostForm(request.POST, instance=cost)
@@ -240,7 +242,9 @@ def outsourcing_cost_update(request, pk):
 @leader_or_superuser_required_403
 def outsourcing_cost_delete(request, pk):
     """外注費削除"""
-    cost = get_object_or_404(OutsourcingCost, pk=pk)
+    cost = get_object_or_404(
+        OutsourcingCost.objects.select_related('business_partner', 'project', 'ticket'), pk=pk
+    )
     
     if request.method == 'POST':
         year_month = cost.year_month
@@ -1,8 +1,8 @@
 from django.shortcuts import render
 from django.contrib.auth.decorators import login_required, user_passes_test
-from django.db.models import Sum, Count, Avg, Q
+from django.db.models import Avg, Q
 from django.utils import timezone
-from datetime import datetime, timedelta
+from datetime import datetime
 from calendar import monthrange
 
 from apps.core.decorators import (
@@ -10,9 +10,9 @@ from apps.core.decorators import (
     LeaderOrSuperuserRequiredMixin
 )
 from apps.reports.models import WorkloadAggregation
-from apps.workloads.models import Workload 
-from apps.projects.models import Project, Case
+from apps.projects.models import Project
 from apps.cost_master.models import OutsourcingCost
+from apps.core.kpi_snapshot import get_kpi_snapshot
 
 @login_required
 @leader_or_superuser_required_403
@@ -22,121 +22,43 @@ def admin_dashboard(request):
     # 現在の日付情報
     now = timezone.now()
     current_month = now.strftime('%Y年%m月')
-    first_day_of_month = now.replace(day=1)
-    last_month_first_day = (first_day_of_month - timedelta(days=1)).replace(day=1)
-    last_month_last_day = first_day_of_month - timedelta(days=1)
     
     try:
+        # 指標はKPIスナップショット（削除フラグなしの工数集計、短時間キャッシュ）から取得
+        snapshot = get_kpi_snapshot('active')
+        
         # === 基本統計 ===
         # 総工数登録数（実際の工数入力データ + 工数集計データ）
-        workload_count = Workload.objects.count() if hasattr(Workload, 'objects') else 0
-        aggregation_count = WorkloadAggregation.objects.count()
-        total_workload_entries = workload_count + aggregation_count
-        
-        # 進行中チケット数
-        active_tickets_count = WorkloadAggregation.active_objects.filter(
-            status__in=['planning', 'in_progress'],
-            case_name__isnull=False,
-            del_flag=False
-        ).count()
-        
-        # 期限超過チケット数
-        overdue_tickets_count = WorkloadAggregation.active_objects.filter(
-            planned_end_date__lt=now.date(),
-            status__in=['planning', 'in_progress'],
-            case_name__isnull=False
-        ).count()
-        
-        # === 収益統計（正確なデータ取得） ===
-        print("=== 収益統計計算開始 ===")
-        
-        # WorkloadAggregationから収益データを取得
-        revenue_query = WorkloadAggregation.active_objects.all()
-        print(f"総レコード数: {revenue_query.count()}")
-        
-        # 各項目の合計を個別に計算
-        total_billing = revenue_query.aggregate(
-            total=Sum('billing_amount_excluding_tax')
-        )['total'] or 0
-        
-        total_outsourcing = revenue_query.aggregate(
-            total=Sum('outsourcing_cost_excluding_tax')
-        )['total'] or 0
+        total_workload_entries = snapshot['workload_count'] + snapshot['aggregation_count']
         
-        print(f"総請求金額（税抜）: ¥{total_billing:,}")
-        print(f"総外注費（税抜）: ¥{total_outsourcing:,}")
+        # 進行中チケット数・期限超過チケット数
+        active_tickets_count = snapshot['active_tickets_count']
+        overdue_tickets_count = snapshot['overdue_tickets_count']
         
+        # === 収益統計 ===
         # 万円単位に変換
-        total_revenue = total_billing / 10000  # 万円単位
-        total_outsourcing_cost = total_outsourcing / 10000  # 万円単位
+        total_revenue = snapshot['total_billing'] / 10000
+        total_outsourcing_cost = snapshot['total_outsourcing'] / 10000
         gross_profit = total_revenue - total_outsourcing_cost
         profit_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
         
-        print(f"総請求金額（万円）: ¥{total_revenue:,.1f}")
-        print(f"総外注費（万円）: ¥{total_outsourcing_cost:,.1f}")
-        print(f"粗利益（万円）: ¥{gross_profit:,.1f}")
-        print(f"利益率: {profit_margin:.1f}%")
-        
         # === 今月の工数統計 ===
-        # 今月の工数集計データ
-        this_month_aggregation = WorkloadAggregation.active_objects.filter(
-            created_at__gte=first_day_of_month
-        ).aggregate(
-            total_workdays=Sum('used_workdays'),
-            count=Count('id')
+        # 工数集計データ + 実際の工数入力データ（8時間=1日）
+        this_month_workdays = (
+            float(snapshot['this_month_used_workdays']) + snapshot['this_month_workload_hours'] / 8.0
         )
         
-        # 実際の工数入力データ（もしWorkloadモデルが存在する場合）
-        try:
-            this_month_workload = Workload.objects.filter(
-                work_date__gte=first_day_of_month.date(),
-                work_date__lte=now.date()
-            ).aggregate(
-                total_hours=Sum('hours')
-            )
-            this_month_hours = this_month_workload['total_hours'] or 0
-            this_month_workdays_from_workload = this_month_hours / 8.0  # 8時間=1日
-        except:
-            this_month_workdays_from_workload = 0
-        
-        # 合計工数
-        this_month_workdays = (this_month_aggregation['total_workdays'] or 0) + this_month_workdays_from_workload
-        
-        # 今月の営業日数計算
-        working_days_this_month = 0
-        current_date = first_day_of_month.date()
-        while current_date <= now.date():
-            if current_date.weekday() < 5:  # 平日のみ
-                working_days_this_month += 1
-            current_date += timedelta(days=1)
+        # 今月の営業日数（土日祝を除く）
+        working_days_this_month = snapshot['working_days_this_month']
         
         # 1日平均工数
         avg_daily_workdays = this_month_workdays / working_days_this_month if working_days_this_month > 0 else 0
         
         # === 前月比較 ===
-        # 前月の工数集計データ
-        last_month_aggregation = WorkloadAggregation.active_objects.filter(
-            created_at__gte=last_month_first_day,
-            created_at__lte=last_month_last_day
-        ).aggregate(
-            total_workdays=Sum('used_workdays')
+        last_month_workdays = (
+            float(snapshot['last_month_used_workdays']) + snapshot['last_month_workload_hours'] / 8.0
         )
         
-        # 前月の工数入力データ
-        try:
-            last_month_workload = Workload.objects.filter(
-                work_date__gte=last_month_first_day.date(),
-                work_date__lte=last_month_last_day.date()
-            ).aggregate(
-                total_hours=Sum('hours')
-            )
-            last_month_hours = last_month_workload['total_hours'] or 0
-            last_month_workdays_from_workload = last_month_hours / 8.0
-        except:
-            last_month_workdays_from_workload = 0
-        
-        last_month_workdays = (last_month_aggregation['total_workdays'] or 0) + last_month_workdays_from_workload
-        
         # 前月比成長率
         workdays_growth = ((this_month_workdays - last_month_workdays) / last_month_workdays * 100) if last_month_workdays > 0 else 0
         
@@ -144,23 +66,7 @@ def admin_dashboard(request):
         monthly_target_workdays = working_days_this_month * 0.8  # 1日0.8人日を目標
         target_achievement = (this_month_workdays / monthly_target_workdays * 100) if monthly_target_workdays > 0 else 0
         
-        # === チケットステータス別統計（正確なデータ取得） ===
-        print("=== チケットステータス別統計計算開始 ===")
-        
-        ticket_status_stats = []
-        
-        # case_nameがあるもので、ステータス別に集計
-        status_query = WorkloadAggregation.active_objects.filter(
-            case_name__isnull=False
-        )
-        
-        print(f"チケット対象レコード数: {status_query.count()}")
-        
-        status_data = status_query.values('status').annotate(
-            count=Count('id'),
-            total_amount=Sum('billing_amount_excluding_tax')
-        ).order_by('-total_amount')
-        
+        # === チケットステータス別統計 ===
         # ステータス別の色設定
         status_colors = {
             'planning': 'secondary',
@@ -175,8 +81,9 @@ def admin_dashboard(request):
             'rejected': 'danger'
         }
         
-        # ステータス別表示名の設定
+        # ステータス別表示名の設定（未定義のものはモデルの選択肢の表示名）
         status_display_names = {
+            **dict(WorkloadAggregation.StatusChoices.choices),
             'planning': '企画中',
             'in_progress': '進行中',
             'testing': 'テスト中',
@@ -189,121 +96,44 @@ def admin_dashboard(request):
             'rejected': '却下'
         }
         
-        for item in status_data:
+        ticket_status_stats = []
+        for item in snapshot['status_stats']:
             status_value = item['status']
-            count = item['count']
-            amount = item['total_amount'] or 0
-            
-            print(f"ステータス: {status_value}, 件数: {count}, 金額: ¥{amount:,}")
-            
-            # 表示名を取得
-            try:
-                # まず定義済みの表示名を確認
-                if status_value in status_display_names:
-                    display_name = status_display_names[status_value]
-                else:
-                    # サンプルインスタンスから取得を試行
-                    sample_instance = WorkloadAggregation.active_objects.filter(
-                        status=status_value
-                    ).first()
-                    
-                    if sample_instance and hasattr(sample_instance, 'get_status_display'):
-                        display_name = sample_instance.get_status_display()
-                    else:
-                        display_name = str(status_value).replace('_', ' ').title()
-            except Exception as e:
-                print(f"ステータス表示名取得エラー ({status_value}): {e}")
-                display_name = str(status_value).replace('_', ' ').title()
-            
+            display_name = status_display_names.get(status_value, str(status_value).replace('_', ' ').title())
             ticket_status_stats.append({
                 'name': display_name,
-                'count': count,
-                'total_amount': amount / 10000,  # 万円単位
+                'count': item['count'],
+                'total_amount': item['total_amount'] / 10000,  # 万円単位
                 'color': status_colors.get(status_value, 'secondary')
             })
         
-        print(f"チケットステータス統計: {len(ticket_status_stats)}件")
-        
         # === 最近の工数登録 ===
-        recent_workload_entries = []
-        
-        # 工数集計データから最近の登録を取得
-        recent_aggregations = WorkloadAggregation.active_objects.select_related(
-            'case_name'
-        ).order_by('-created_at')[:5]
-        
-        for aggregation in recent_aggregations:
-            recent_workload_entries.append({
-                'project_name': aggregation.project_name or '未設定',
-                'case_name': {
-                    'title': aggregation.case_name.title if aggregation.case_name else '未設定'
-                },
-                'used_workdays': aggregation.used_workdays or 0,
-                'created_at': aggregation.created_at
-            })
+        recent_workload_entries = snapshot['recent_entries']
         
         # === 注意が必要なチケット ===
         attention_tickets = []
         
         # 期限超過チケット
-        try:
-            overdue_tickets = WorkloadAggregation.active_objects.filter(
-                planned_end_date__lt=now.date(),
-                status__in=['planning', 'in_progress'],
-                case_name__isnull=False
-            ).select_related('case_name')[:3]
-            
-            for ticket in overdue_tickets:
-                days_overdue = (now.date() - ticket.planned_end_date).days
-                
-                try:
-                    if hasattr(ticket, 'get_status_display'):
-                        status_display = ticket.get_status_display()
-                    else:
-                        status_display = status_display_names.get(ticket.status, ticket.status)
-                except:
-                    status_display = str(ticket.status)
-                
-                attention_tickets.append({
-                    'ticket_title': ticket.case_name.title if ticket.case_name else '未設定',
-                    'project_name': ticket.project_name,
-                    'reason': f'予定終了日を{days_overdue}日超過',
-                    'alert_level': 'danger',
-                    'status_display': status_display,
-                    'days_overdue': days_overdue
-                })
-        except Exception as e:
-            print(f"期限超過チケット取得エラー: {e}")
+        for ticket in snapshot['overdue_tickets']:
+            days_overdue = -ticket['days_from_today']
+            attention_tickets.append({
+                'ticket_title': ticket['ticket_title'],
+                'project_name': ticket['project_name'],
+                'reason': f'予定終了日を{days_overdue}日超過',
+                'alert_level': 'danger',
+                'status_display': ticket['status_display'],
+                'days_overdue': days_overdue
+            })
         
         # 締切間近のチケット（3日以内）
-        try:
-            upcoming_deadline_tickets = WorkloadAggregation.active_objects.filter(
-                planned_end_date__gte=now.date(),
-                planned_end_date__lte=now.date() + timedelta(days=3),
-                status__in=['planning', 'in_progress'],
-                case_name__isnull=False
-            ).select_related('case_name')[:2]
-            
-            for ticket in upcoming_deadline_tickets:
-                days_until = (ticket.planned_end_date - now.date()).days
-                
-                try:
-                    if hasattr(ticket, 'get_status_display'):
-                        status_display = ticket.get_status_display()
-                    else:
-                        status_display = status_display_names.get(ticket.status, ticket.status)
-                except:
-                    status_display = str(ticket.status)
-                
-                attention_tickets.append({
-                    'ticket_title': ticket.case_name.title if ticket.case_name else '未設定',
-                    'project_name': ticket.project_name,
-                    'reason': f'あと{days_until}日で予定終了',
-                    'alert_level': 'warning',
-                    'status_display': status_display
-                })
-        except Exception as e:
-            print(f"締切間近チケット取得エラー: {e}")
+        for ticket in snapshot['upcoming_tickets']:
+            attention_tickets.append({
+                'ticket_title': ticket['ticket_title'],
+                'project_name': ticket['project_name'],
+                'reason': f"あと{ticket['days_from_today']}日で予定終了",
+                'alert_level': 'warning',
+                'status_display': ticket['status_display']
+            })
     
     except Exception as e:
         print(f"ダッシュボードデータ取得エラー: {e}")
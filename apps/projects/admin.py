@@ -5,6 +5,7 @@ from .models import Project, ProjectDetail
 class ProjectAdmin(admin.ModelAdmin):
     """プロジェクト管理画面"""
     list_display = ['name', 'status', 'start_date', 'end_date', 'assigned_section', 'is_active']
+    list_select_related = ['assigned_section__department']
     list_filter = ['status', 'assigned_section', 'is_active', 'created_at']
     search_fields = ['name', 'description', 'client']
     filter_horizontal = ['assigned_users']
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class ProjectsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.projects'
-    verbose_name = 'Projects Management'
\ No newline at end of file
+    verbose_name = 'Projects Management'
+
+    def ready(self):
+        """シグナルの登録"""
+        from . import signals  # noqa: F401
@@ -1,6 +1,7 @@
 from django import forms
 from django.contrib.auth import get_user_model
 from .models import Project, ProjectTicket
+from .widgets import LookupSelect
 from apps.users.models import Department, Section
 
 User = get_user_model()
@@ -98,7 +99,7 @@ class ProjectTicketForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': '例: TICKET-001, TASK-2024-001'
             }),
-            'project': forms.Select(attrs={'class': 'form-select'}),
+            'project': LookupSelect('projects', attrs={'class': 'form-select'}),
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={
                 'class': 'form-control', 
@@ -108,7 +109,7 @@ class ProjectTicketForm(forms.ModelForm):
             'status': forms.Select(attrs={'class': 'form-select'}),
             'case_classification': forms.Select(attrs={'class': 'form-select'}),
             'billing_status': forms.Select(attrs={'class': 'form-select'}),
-            'assigned_user': forms.Select(attrs={'class': 'form-select'}),
+            'assigned_user': LookupSelect('users', attrs={'class': 'form-select'}),
             'due_date': forms.DateInput(attrs={
                 'class': 'form-control', 
                 'type': 'date'
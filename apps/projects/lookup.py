@@ -0,0 +1,248 @@
+"""
+チケット・プロジェクト・ユーザーの検索（入力補完）
+
+選択肢をページに全件描画する代わりに、検索APIから候補をページ単位で返す。
+候補はプロセス内のメモリ上の索引から検索する。
+索引は種類ごとの版（世代番号と DB の状態）と組で保持し、版が変わったら次の検索時に作り直す。
+
+- 世代番号（Django のキャッシュ）: モデルが書き込まれたら進める（signals.py）。
+  キャッシュがプロセスごと（LocMemCache）の場合は同じプロセスの書き込みにしか効かない
+- DB の状態（件数・有効件数・最終更新日時などの集計、1クエリ）: 別のワーカーや
+  管理コマンドでの追加・削除・更新も検出する
+- 作成からの経過時間（LOOKUP_INDEX_MAX_AGE_SECONDS）: 集計に表れない変更
+  （ユーザーの氏名の変更など）も一定時間で反映する
+
+並び順は、検索語で始まる候補（前方一致）を先に、途中に含む候補（部分一致）を後にする。
+"""
+import threading
+import time
+import unicodedata
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db.models import Count, Max, Q
+
+from .models import Project, ProjectTicket
+
+User = get_user_model()
+
+# 1ページの件数
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+VERSION_KEY_PREFIX = 'projects:lookup:version'
+
+# 索引を作り直すまでの最大秒数（0 なら経過時間では作り直さない）
+DEFAULT_MAX_AGE_SECONDS = 300
+
+# 種類 → 索引の作成関数（下で登録）
+BUILDERS = {}
+# 種類 → 索引の元データの状態を返す関数（下で登録）
+STATES = {}
+
+_indexes = {}
+_lock = threading.Lock()
+
+
+def normalize(text):
+    """検索用の正規化（全角英数・半角カナの統一、大文字小文字の無視）"""
+    return unicodedata.normalize('NFKC', text or '').casefold()
+
+
+class LookupIndex:
+    """
+    検索用の索引。
+
+    entries: 候補の辞書のリスト。
+        id, label（表示名）, keys（前方一致の対象とする正規化済みの語）,
+        text（部分一致の対象とする正規化済みの文字列）と、絞り込み用の属性を持つ。
+    """
+
+    def __init__(self, entries):
+        self.entries = entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def search(self, query='', page=1, page_size=PAGE_SIZE, ids=None, **filters):
+        """
+        候補を検索する。
+        空白で区切った検索語はすべて含むものを対象とし、
+        先頭の語で始まる候補を先に返す。
+        ids: 対象とする候補IDの集合（None なら全件）
+        filters: 属性の一致条件（例: project_id=3）
+        戻り値: {'results': [{'id', 'label'}], 'page', 'has_more'}
+        """
+        terms = normalize(query).split()
+        prefix_matches = []
+        substring_matches = []
+        for entry in self.entries:
+            if ids is not None and entry['id'] not in ids:
+                continue
+            if filters and any(entry.get(key) != value for key, value in filters.items()):
+                continue
+            if not terms:
+                prefix_matches.append(entry)
+                continue
+            text = entry['text']
+            if not all(term in text for term in terms):
+                continue
+            if any(key.startswith(terms[0]) for key in entry['keys']):
+                prefix_matches.append(entry)
+            else:
+                substring_matches.append(entry)
+
+        page = max(page, 1)
+        page_size = min(max(page_size, 1), MAX_PAGE_SIZE)
+        start = (page - 1) * page_size
+        matches = prefix_matches + substring_matches
+        return {
+            'results': [
+                {'id': entry['id'], 'label': entry['label']} for entry in matches[start:start + page_size]
+            ],
+            'page': page,
+            'has_more': len(matches) > start + page_size,
+        }
+
+
+def _entry(entry_id, label, keys, **attrs):
+    keys = [normalize(key) for key in keys if key]
+    return {
+        'id': entry_id,
+        'label': label,
+        'keys': keys,
+        'text': ' '.join(keys),
+        **attrs,
+    }
+
+
+def build_ticket_index():
+    """有効なプロジェクトの有効なチケット（チケット番号・タイトル・プロジェクト名で検索）"""
+    rows = ProjectTicket.objects.filter(
+        is_active=True,
+        project__is_active=True,
+    ).order_by('project__name', 'title').values_list(
+        'id', 'ticket_no', 'title', 'project_id', 'project__name', 'project__project_no'
+    )
+    return LookupIndex([
+        _entry(
+            ticket_id,
+            f'[{project_name}] {title}',
+            [ticket_no, title, project_name, project_no],
+            project_id=project_id,
+        )
+        for ticket_id, ticket_no, title, project_id, project_name, project_no in rows
+    ])
+
+
+def build_project_index():
+    """有効なプロジェクト（プロジェクト番号・プロジェクト名で検索）"""
+    rows = Project.objects.filter(is_active=True).order_by('name').values_list('id', 'project_no', 'name')
+    return LookupIndex([
+        _entry(project_id, name, [project_no, name])
+        for project_id, project_no, name in rows
+    ])
+
+
+def build_user_index():
+    """有効なユーザー（ユーザー名・氏名で検索）"""
+    rows = User.objects.filter(is_active=True).order_by('last_name', 'first_name', 'username').values_list(
+        'id', 'username', 'first_name', 'last_name'
+    )
+    entries = []
+    for user_id, username, first_name, last_name in rows:
+        full_name = f'{first_name} {last_name}'.strip()
+        entries.append(_entry(user_id, full_name or username, [username, first_name, last_name, full_name]))
+    return LookupIndex(entries)
+
+
+BUILDERS.update({
+    'tickets': build_ticket_index,
+    'projects': build_project_index,
+    'users': build_user_index,
+})
+
+
+def ticket_state():
+    """チケットの件数・有効件数・最終更新日時と、プロジェクト（名前・有効）の最終更新日時"""
+    return tuple(ProjectTicket.objects.aggregate(
+        count=Count('id'),
+        active=Count('id', filter=Q(is_active=True, project__is_active=True)),
+        updated=Max('updated_at'),
+        project_updated=Max('project__updated_at'),
+    ).values())
+
+
+def project_state():
+    """プロジェクトの件数・有効件数・最終更新日時"""
+    return tuple(Project.objects.aggregate(
+        count=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        updated=Max('updated_at'),
+    ).values())
+
+
+def user_state():
+    """ユーザーの件数・有効件数・最大ID（氏名の変更は経過時間で反映する）"""
+    return tuple(User.objects.aggregate(
+        count=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+        last_id=Max('id'),
+    ).values())
+
+
+STATES.update({
+    'tickets': ticket_state,
+    'projects': project_state,
+    'users': user_state,
+})
+
+
+def _version(kind):
+    key = f'{VERSION_KEY_PREFIX}:{kind}'
+    version = cache.get(key)
+    if version is None:
+        # 世代番号が消えた場合に古い索引と重ならないよう、時刻から始める
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def _is_current(cached, version):
+    if cached is None or cached[0] != version:
+        return False
+    max_age = getattr(settings, 'LOOKUP_INDEX_MAX_AGE_SECONDS', DEFAULT_MAX_AGE_SECONDS)
+    return not max_age or time.monotonic() - cached[2] < max_age
+
+
+def get_index(kind):
+    """索引を取得（世代番号・DB の状態が変わったか、一定時間が過ぎていれば作り直す）"""
+    if kind not in BUILDERS:
+        raise KeyError(kind)
+    version = (_version(kind), STATES[kind]())
+    cached = _indexes.get(kind)
+    if _is_current(cached, version):
+        return cached[1]
+    with _lock:
+        cached = _indexes.get(kind)
+        if _is_current(cached, version):
+            return cached[1]
+        index = BUILDERS[kind]()
+        _indexes[kind] = (version, index, time.monotonic())
+        return index
+
+
+def search(kind, query='', page=1, page_size=PAGE_SIZE, ids=None, **filters):
+    """kind の索引から候補を検索する（LookupIndex.search を参照）"""
+    return get_index(kind).search(query, page=page, page_size=page_size, ids=ids, **filters)
+
+
+def invalidate_lookup(*kinds):
+    """索引を無効にする（省略時はすべて）"""
+    for kind in kinds or BUILDERS:
+        key = f'{VERSION_KEY_PREFIX}:{kind}'
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), None)
@@ -131,8 +131,8 @@ class Project(models.Model):
     
     @property
     def assigned_users_display(self):
-        """担当者の表示用プロパティ"""
-        users = self.assigned_users.all()
+        """担当者の表示用プロパティ（prefetch_related('assigned_users') 済みならクエリを発行しない）"""
+        users = list(self.assigned_users.all())
         if users:
             return ", ".join([user.get_full_name() or user.username for user in users[:3]])
         return "未設定"
@@ -473,9 +473,11 @@ class ProjectDetail(models.Model):
         return self.billing_amount * 1.1  # 10%税込
     
     def get_cost_master(self):
-        """コストマスターを取得"""
-        from apps.cost_master.models import CostMaster
-        return CostMaster.objects.filter(department=self.department).first()
+        """コストマスターを取得（利益率・仕掛中金額などで繰り返し参照するため、インスタンスごとに1回だけ問い合わせる）"""
+        if not hasattr(self, '_cost_master'):
+            from apps.cost_master.models import CostMaster
+            self._cost_master = CostMaster.objects.filter(department_id=self.department_id).first()
+        return self._cost_master
     
     def get_total_cost(self):
         """総コスト計算"""
@@ -488,17 +490,10 @@ class ProjectDetail(models.Model):
     
     def update_used_workdays_from_workloads(self, year_month=None):
         """工数入力データから使用工数を更新"""
-        from apps.workloads.models import Workload
+        from apps.workloads.ledger import get_project_hours
         
-        if year_month:
-            workloads = Workload.objects.filter(
-                project=self.project,
-                year_month=year_month
-            )
-        else:
-            workloads = Workload.objects.filter(project=self.project)
-        
-        total_days = sum(w.total_days for w in workloads)
+        # 工数台帳の合計から算出（工数行は走査しない）
+        total_days = float(get_project_hours(self.project_id, year_month)) / 8
         self.used_workdays = total_days
         self.save()
         
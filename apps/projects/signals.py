@@ -0,0 +1,41 @@
+"""
+プロジェクト・チケット・ユーザーの書き込み時の処理
+
+検索（入力補完）の索引（lookup）を無効にする。
+チケットの候補にはプロジェクト名も含むため、プロジェクトの変更ではチケットの索引も無効にする。
+bulk_update / update() はシグナルが送られないため、呼び出し側で破棄処理を呼ぶ。
+"""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .lookup import invalidate_lookup
+from .models import Project, ProjectTicket
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Project)
+@receiver(post_delete, sender=Project)
+def invalidate_project_lookup(sender, **kwargs):
+    """コミット後にプロジェクト・チケットの索引を無効にする"""
+    transaction.on_commit(partial(invalidate_lookup, 'projects', 'tickets'))
+
+
+@receiver(post_save, sender=ProjectTicket)
+@receiver(post_delete, sender=ProjectTicket)
+def invalidate_ticket_lookup(sender, **kwargs):
+    """コミット後にチケットの索引を無効にする"""
+    transaction.on_commit(partial(invalidate_lookup, 'tickets'))
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def invalidate_user_lookup(sender, update_fields=None, **kwargs):
+    """コミット後にユーザーの索引を無効にする（ログイン時の last_login の更新は除く）"""
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(partial(invalidate_lookup, 'users'))
@@ -23,4 +23,5 @@ urlpatterns = [
     # API関連のURL
     path('api/<int:project_id>/tickets/', views.get_project_tickets_api, name='get_project_tickets_api'),
     path('api/tickets/', views.get_tickets_api, name='get_tickets_api'),
+    path('api/lookup/<str:kind>/', views.lookup_api, name='lookup_api'),
 ]
\ No newline at end of file
@@ -1,10 +1,12 @@
+import logging
+
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.mixins import UserPassesTestMixin
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy, reverse
 from django.contrib import messages
 from datetime import date
-from django.db.models import Q
+from django.db.models import Count, Q
 from django.contrib.auth import get_user_model
 from django.http import JsonResponse, HttpResponseRedirect
 from django.contrib.auth.decorators import login_required
@@ -14,10 +16,12 @@ from apps.core.decorators import (
     leader_or_superuser_required_403,
     LeaderOrSuperuserRequiredMixin
 )
+from . import lookup
 from .models import Project, ProjectTicket
 from .forms import ProjectForm, ProjectTicketForm
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
 
 class ProjectListView(LeaderOrSuperuserRequiredMixin, ListView):
     """プロジェクト一覧"""
@@ -72,7 +76,6 @@ class ProjectDetailView(LeaderOrSuperuserRequiredMixin, DetailView):
         context = super().get_context_data(**kwargs)
         
         # プロジェクトに関連するチケット一覧を取得
-        tickets = self.object.tickets.select_related('assigned_user').order_by('-created_at')
         tickets = self.object.tickets.filter(
             is_active=True
         ).select_related('assigned_user').order_by('-created_at')
@@ -82,9 +85,15 @@ class ProjectDetailView(LeaderOrSuperuserRequiredMixin, DetailView):
         # 今日の日付を追加（期限の色分け用）
         context['today'] = date.today()
         
-        # チケット統計を計算
-        total_tickets = tickets.count()
-        closed_tickets = tickets.filter(status='closed').count()
+        # チケット統計を計算（ステータス別の件数を1クエリで集計）
+        stats = tickets.order_by().aggregate(
+            total=Count('id'),
+            closed=Count('id', filter=Q(status='closed')),
+            in_progress=Count('id', filter=Q(status='in_progress')),
+            open=Count('id', filter=Q(status='open')),
+        )
+        total_tickets = stats['total']
+        closed_tickets = stats['closed']
         
         # 進捗率を計算
         progress_percent = 0
@@ -94,8 +103,8 @@ class ProjectDetailView(LeaderOrSuperuserRequiredMixin, DetailView):
         context.update({
             'total_tickets': total_tickets,
             'closed_tickets': closed_tickets,
-            'in_progress_tickets': tickets.filter(status='in_progress').count(),
-            'open_tickets': tickets.filter(status='open').count(),
+            'in_progress_tickets': stats['in_progress'],
+            'open_tickets': stats['open'],
             'progress_percent': progress_percent,
         })
         
@@ -169,29 +178,14 @@ class TicketListView(LeaderOrSuperuserRequiredMixin, ListView):
     paginate_by = 20
     
     def get_queryset(self):
-        all_tickets = ProjectTicket.objects.all()
-        print(f"全チケット数: {all_tickets.count()}")
-        for ticket in all_tickets:
-            print(f"チケット: {ticket.pk} - {ticket.title} - プロジェクト: {ticket.project.pk if ticket.project else 'なし'}")
-            # print(f"チケット: {ticket.pk} - {ticket.title} - プロジェクト: {ticket.project.pk if ticket.project else 'なし'} - アクティブ: {ticket.is_active}")
-        
-        queryset = ProjectTicket.objects.select_related(
-            'project', 'assigned_user', 'project__assigned_section'
-        )
         queryset = ProjectTicket.objects.select_related(
             'project', 'assigned_user', 'project__assigned_section'
         ).filter(is_active=True)
         
-        print(f"全チケット数: {queryset.count()}")
-        # print(f"アクティブチケット数: {queryset.count()}")
-        
         # プロジェクト別フィルター（URLパラメータから）
         project_pk = self.kwargs.get('project_pk')
-        print(f"project_pk: {project_pk}")
-        
         if project_pk:
             queryset = queryset.filter(project_id=project_pk)
-            print(f"プロジェクト{project_pk}のチケット数: {queryset.count()}")
         
         # 検索フィルター
         search = self.request.GET.get('search', '').strip()
@@ -201,19 +195,16 @@ class TicketListView(LeaderOrSuperuserRequiredMixin, ListView):
                 Q(description__icontains=search) |
                 Q(ticket_no__icontains=search)
             )
-            print(f"検索後のチケット数: {queryset.count()}")
         
         # ステータスフィルター
         status = self.request.GET.get('status', '').strip()
         if status:
             queryset = queryset.filter(status=status)
-            print(f"ステータス「{status}」フィルター後: {queryset.count()}")
         
         # 優先度フィルター
         priority = self.request.GET.get('priority', '').strip()
         if priority:
             queryset = queryset.filter(priority=priority)
-            print(f"優先度「{priority}」フィルター後: {queryset.count()}")
         
         # プロジェクトフィルター（全チケット一覧でのフィルター）
         project_filter = self.request.GET.get('project', '').strip()
@@ -221,15 +212,10 @@ class TicketListView(LeaderOrSuperuserRequiredMixin, ListView):
             try:
                 project_id = int(project_filter)
                 queryset = queryset.filter(project_id=project_id)
-                print(f"プロジェクトフィルター「{project_id}」後: {queryset.count()}")
             except (ValueError, TypeError):
-                print(f"無効なプロジェクトID: {project_filter}")
-                pass
-        
-        final_queryset = queryset.order_by('-created_at')
-        print(f"最終チケット数: {final_queryset.count()}")
+                logger.debug(f"無効なプロジェクトID: {project_filter}")
         
-        return final_queryset
+        return queryset.order_by('-created_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -239,16 +225,15 @@ class TicketListView(LeaderOrSuperuserRequiredMixin, ListView):
         if project_pk:
             try:
                 context['project'] = get_object_or_404(Project, pk=project_pk)
-                print(f"プロジェクト情報取得: {context['project'].name}")
             except Project.DoesNotExist:
-                print(f"プロジェクトが見つかりません: {project_pk}")
+                logger.debug(f"プロジェクトが見つかりません: {project_pk}")
         
         # 全プロジェクト（フィルター用）
         context['all_projects'] = Project.objects.filter(is_active=True).order_by('name')
         
-        # 統計情報
-        tickets = self.get_queryset().filter(is_active=True)
-        context['total_tickets'] = tickets.count()
+        # 統計情報（一覧のページネーションで数えた件数を使う）
+        paginator = context.get('paginator')
+        context['total_tickets'] = paginator.count if paginator else self.object_list.count()
         
         # 今日の日付（期限判定用）
         from datetime import date
@@ -262,8 +247,6 @@ class TicketListView(LeaderOrSuperuserRequiredMixin, ListView):
             'search': self.request.GET.get('search', ''),
         }
         
-        print(f"コンテキスト - 総チケット数: {context['total_tickets']}")
-        
         return context
 
 class TicketDetailView(LeaderOrSuperuserRequiredMixin, DetailView):
@@ -588,4 +571,44 @@ def get_tickets_api(request):
         return JsonResponse({
             'success': False,
             'error': str(e)
-        })
\ No newline at end of file
+        })
+
+
+@login_required
+@require_http_methods(["GET"])
+def lookup_api(request, kind):
+    """
+    入力補完の検索API（チケット・プロジェクト・ユーザー）
+
+    GET パラメータ:
+        q: 検索語（前方一致を優先、部分一致も対象）
+        page: ページ番号（1から）
+        project: プロジェクトID（チケットの絞り込み）
+        scope: 'calendar' なら工数カレンダーの表示範囲のユーザーのみ
+    """
+    if kind not in lookup.BUILDERS:
+        return JsonResponse({'success': False, 'error': '不明な検索の種類です'}, status=404)
+
+    try:
+        page = int(request.GET.get('page') or 1)
+    except ValueError:
+        page = 1
+
+    filters = {}
+    ids = None
+    project_id = request.GET.get('project', '')
+    if kind == 'tickets' and project_id:
+        if not project_id.isdigit():
+            return JsonResponse({'success': True, 'results': [], 'page': page, 'has_more': False})
+        filters['project_id'] = int(project_id)
+    if kind == 'users' and request.GET.get('scope') == 'calendar':
+        from apps.workloads.grid import calendar_scope
+
+        user = request.user
+        if not (user.is_leader or user.is_superuser):
+            _, scoped_users = calendar_scope(user)
+            ids = set(scoped_users.values_list('id', flat=True))
+
+    result = lookup.search(kind, request.GET.get('q', ''), page=page, ids=ids, **filters)
+    return JsonResponse({'success': True, **result})
+
@@ -0,0 +1,49 @@
+"""
+入力補完のセレクト
+
+ModelChoiceField の選択肢を全件描画せず、空欄と選択中の値だけを描画する。
+候補は static/js/lookup_select.js が検索API（lookup_api）から読み込む。
+"""
+from django import forms
+from django.urls import reverse
+
+
+class LookupSelect(forms.Select):
+    """
+    検索APIから候補を読み込むセレクト。
+
+    kind: 検索の種類（'tickets' / 'projects' / 'users'）
+    depends_on: 候補の絞り込みに使う別のセレクトのID（チケットのプロジェクトなど）
+    """
+
+    def __init__(self, kind, depends_on=None, attrs=None):
+        super().__init__(attrs)
+        self.kind = kind
+        self.depends_on = depends_on
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        widget_attrs = context['widget']['attrs']
+        widget_attrs['data-lookup-url'] = reverse('projects:lookup_api', args=[self.kind])
+        if self.depends_on:
+            widget_attrs['data-lookup-depends-on'] = self.depends_on
+        return context
+
+    def optgroups(self, name, value, attrs=None):
+        choices = self.choices
+        queryset = getattr(choices, 'queryset', None)
+        if queryset is None:
+            return super().optgroups(name, value, attrs)
+
+        # 空欄と選択中の値だけを選択肢にする
+        selected = [v for v in value if str(v).isdigit()]
+        limited = []
+        if choices.field.empty_label is not None:
+            limited.append(('', choices.field.empty_label))
+        if selected:
+            limited.extend(choices.choice(obj) for obj in queryset.filter(pk__in=selected))
+        self.choices = limited
+        try:
+            return super().optgroups(name, value, attrs)
+        finally:
+            self.choices = choices
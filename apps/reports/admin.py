@@ -20,6 +20,8 @@ class WorkloadAggregationAdmin(admin.ModelAdmin):
         'used_workdays', 'newbie_workdays', 'total_used_workdays_display',
         'remaining_amount_display', 'profit_rate_display', 'created_at'
     ]
+    # 一覧の各列（プロジェクト・チケット・課の __str__）で行ごとに問い合わせないよう結合して取得
+    list_select_related = ['project_name', 'case_name__project', 'section__department']
     list_filter = [
         'status', 'case_classification', 'section', 'order_date', 'actual_end_date',
         'created_at', 'updated_at'
@@ -3,4 +3,8 @@ from django.apps import AppConfig
 class ReportsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'apps.reports'
-    verbose_name = 'レポート管理'
\ No newline at end of file
+    verbose_name = 'レポート管理'
+
+    def ready(self):
+        """シグナルの登録"""
+        from . import signals  # noqa: F401
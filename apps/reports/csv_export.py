@@ -0,0 +1,198 @@
+"""
+工数集計のCSVストリーミング出力
+
+モデルを生成せずに values_list().iterator() で行を読み込み、
+1行ずつCSVに変換して送出（またはファイルへ書き込み）する。
+行数に関係なくメモリ使用量は一定になる。
+"""
+import csv
+from datetime import datetime
+
+from django.http import StreamingHttpResponse
+
+from .models import WorkloadAggregation
+
+# iterator() で一度に取得する行数
+DEFAULT_CHUNK_SIZE = 2000
+
+BOM = '\ufeff'
+
+# export_workload_csv の列
+CSV_HEADERS = [
+    'プロジェクト名', 'チケット名', '部名', 'ステータス', 'チケット分類',
+    '見積日', '受注日', '終了日（予定）', '終了日実績', '検収日',
+    '使用可能金額（税別）', '請求金額（税別）', '外注費（税別）',
+    '見積工数（人日）', '使用工数（人日）', '新入社員使用工数（人日）',
+    '単価（万円/月）', '請求単価（万円/月）',
+    '請求先', 'MUB担当者', '備考', '作成日時'
+]
+
+# workload_export（集計値付き）の列
+SUMMARY_CSV_HEADERS = [
+    'プロジェクト名', 'チケット名', '部名', 'ステータス', 'チケット分類', '見積日', '受注日',
+    '終了日（予定）', '終了日実績', '検収日', '使用可能金額（税別）', '請求金額（税別）',
+    '外注費（税別）', '見積工数（人日）', '使用工数（人日）', '新入社員使用工数（人日）',
+    '使用工数合計', '残工数', '残金額', '利益率', '仕掛中金額', '請求先', 'MUB担当者', '作成日時'
+]
+
+# values_list で取得する列（iter_value_rows の辞書のキー）
+VALUE_FIELDS = [
+    'project_name__project_no', 'project_name__name', 'case_name__title', 'section__name',
+    'status', 'case_classification',
+    'estimate_date', 'order_date', 'planned_end_date', 'actual_end_date', 'inspection_date',
+    'available_amount', 'billing_amount_excluding_tax', 'outsourcing_cost_excluding_tax',
+    'estimated_workdays', 'used_workdays', 'newbie_workdays',
+    'unit_cost_per_month', 'billing_unit_cost_per_month',
+    'billing_destination', 'mub_manager_id', 'mub_manager__first_name', 'mub_manager__last_name',
+    'remarks', 'created_at',
+]
+
+STATUS_LABELS = dict(WorkloadAggregation.StatusChoices.choices)
+CASE_CLASSIFICATION_LABELS = dict(WorkloadAggregation.CaseClassificationChoices.choices)
+
+
+class _Echo:
+    """csv.writer の書き込み先（書き込んだ文字列をそのまま返す）"""
+
+    def write(self, value):
+        return value
+
+
+def _date(value):
+    return value.strftime('%Y-%m-%d') if value else ''
+
+
+def project_display(project_no, name):
+    """Project.__str__ と同じ表示"""
+    if project_no:
+        return f"[{project_no}] {name}"
+    return name
+
+
+def full_name(first_name, last_name):
+    """CustomUser.get_full_name と同じ表示"""
+    return f'{first_name} {last_name}'.strip()
+
+
+def iter_value_rows(queryset, chunk_size=DEFAULT_CHUNK_SIZE):
+    """出力に必要な列だけを辞書で順に返す（モデルを生成しない）"""
+    for values in queryset.values_list(*VALUE_FIELDS).iterator(chunk_size=chunk_size):
+        yield dict(zip(VALUE_FIELDS, values))
+
+
+def format_row(row):
+    """export_workload_csv と同じ形式の1行"""
+    return [
+        project_display(row['project_name__project_no'], row['project_name__name']),
+        str(row['case_name__title']),
+        str(row['section__name']),
+        str(STATUS_LABELS.get(row['status'], row['status'])),
+        str(CASE_CLASSIFICATION_LABELS.get(row['case_classification'], row['case_classification'])),
+        _date(row['estimate_date']),
+        _date(row['order_date']),
+        _date(row['planned_end_date']),
+        _date(row['actual_end_date']),
+        _date(row['inspection_date']),
+        str(row['available_amount'] or 0),
+        str(row['billing_amount_excluding_tax'] or 0),
+        str(row['outsourcing_cost_excluding_tax'] or 0),
+        str(row['estimated_workdays'] or 0),
+        str(row['used_workdays'] or 0),
+        str(row['newbie_workdays'] or 0),
+        str(row['unit_cost_per_month'] or 0),
+        str(row['billing_unit_cost_per_month'] or 0),
+        str(row['billing_destination']) if row['billing_destination'] else '',
+        full_name(row['mub_manager__first_name'], row['mub_manager__last_name']) if row['mub_manager_id'] else '',
+        str(row['remarks']) if row['remarks'] else '',
+        row['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
+    ]
+
+
+def format_summary_row(row):
+    """workload_export と同じ形式の1行（使用工数合計・残工数などの計算値を含む）"""
+    # 計算値はモデルのプロパティをそのまま使う（DBアクセスなしの一時インスタンス）
+    aggregation = WorkloadAggregation(
+        case_classification=row['case_classification'],
+        billing_amount_excluding_tax=row['billing_amount_excluding_tax'],
+        outsourcing_cost_excluding_tax=row['outsourcing_cost_excluding_tax'],
+        estimated_workdays=row['estimated_workdays'],
+        used_workdays=row['used_workdays'],
+        newbie_workdays=row['newbie_workdays'],
+        billing_unit_cost_per_month=row['billing_unit_cost_per_month'],
+    )
+    return [
+        project_display(row['project_name__project_no'], row['project_name__name']),
+        row['case_name__title'],
+        row['section__name'],
+        STATUS_LABELS.get(row['status'], row['status']),
+        CASE_CLASSIFICATION_LABELS.get(row['case_classification'], row['case_classification']),
+        _date(row['estimate_date']),
+        _date(row['order_date']),
+        _date(row['planned_end_date']),
+        _date(row['actual_end_date']),
+        _date(row['inspection_date']),
+        str(row['available_amount']),
+        str(row['billing_amount_excluding_tax']),
+        str(row['outsourcing_cost_excluding_tax']),
+        str(row['estimated_workdays']),
+        str(row['used_workdays']),
+        str(row['newbie_workdays']),
+        str(aggregation.total_used_workdays),
+        str(aggregation.remaining_workdays),
+        str(aggregation.remaining_amount),
+        str(aggregation.profit_rate),
+        str(aggregation.wip_amount),
+        row['billing_destination'],
+        full_name(row['mub_manager__first_name'], row['mub_manager__last_name']) if row['mub_manager_id'] else '',
+        row['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
+    ]
+
+
+def iter_csv_lines(queryset, headers=CSV_HEADERS, formatter=format_row,
+                   chunk_size=DEFAULT_CHUNK_SIZE, progress=None, progress_interval=None):
+    """BOM・ヘッダー行・データ行の順にCSVの行（文字列）を返す"""
+    writer = csv.writer(_Echo())
+    yield BOM + writer.writerow(headers)
+    for count, row in enumerate(iter_value_rows(queryset, chunk_size), 1):
+        yield writer.writerow(formatter(row))
+        if progress and progress_interval and count % progress_interval == 0:
+            progress(count)
+
+
+def _iter_bytes(lines, buffer_size=64 * 1024):
+    """行をまとめて UTF-8 のバイト列として返す（送出回数を減らす）"""
+    buffer = []
+    size = 0
+    for line in lines:
+        buffer.append(line)
+        size += len(line)
+        if size >= buffer_size:
+            yield ''.join(buffer).encode('utf-8')
+            buffer = []
+            size = 0
+    if buffer:
+        yield ''.join(buffer).encode('utf-8')
+
+
+def streaming_csv_response(queryset, filename=None, headers=CSV_HEADERS, formatter=format_row,
+                           chunk_size=DEFAULT_CHUNK_SIZE):
+    """CSVを少しずつ送出するレスポンス"""
+    if filename is None:
+        filename = f"workload_csv_{datetime.now().strftime('%Y%m%d_%H%M%S')}.csv"
+    response = StreamingHttpResponse(
+        _iter_bytes(iter_csv_lines(queryset, headers, formatter, chunk_size)),
+        content_type='text/csv; charset=utf-8'
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+def write_csv_file(queryset, path, headers=CSV_HEADERS, formatter=format_row,
+                   chunk_size=DEFAULT_CHUNK_SIZE, progress=None, progress_interval=None):
+    """CSVをファイルへ書き込み、データ行数を返す"""
+    count = 0
+    with open(path, 'w', encoding='utf-8', newline='') as f:
+        for line in iter_csv_lines(queryset, headers, formatter, chunk_size, progress, progress_interval):
+            f.write(line)
+            count += 1
+    return count - 1
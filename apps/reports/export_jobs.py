@@ -0,0 +1,260 @@
+"""
+工数集計エクスポートのジョブキュー
+
+ReportExport をジョブテーブルとして使い、リクエストでは登録のみを行う。
+ファイル生成と保存（S3 またはローカル）は manage.py run_export_worker が行う。
+ワーカーを動かさない構成（REPORT_EXPORT_WORKER_ENABLED が無効）では、登録したリクエストの中で実行する。
+処理中のワーカーは進捗のたびに heartbeat_at を更新し、
+一定時間更新のないジョブ（ワーカーが停止したもの）は別のワーカーが取得して再実行する。
+"""
+import logging
+import os
+import tempfile
+import time
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import HttpResponse
+from django.utils import timezone
+
+from apps.core.metrics import EXPORT_DURATION, EXPORT_SIZE
+
+from .models import ReportExport, WorkloadAggregation
+from .utils import get_export_storage
+
+logger = logging.getLogger(__name__)
+
+# 画面から受け付けるフィルター条件
+FILTER_KEYS = ['project_name', 'case_name', 'status', 'case_classification', 'section', 'mub_manager']
+
+EXTENSION_MAP = {
+    'excel': 'xlsx',
+    'csv': 'csv',
+    'pdf': 'pdf',
+    'professional': 'pdf',
+}
+
+# 進捗（exported_records）を書き込む間隔（行数）
+PROGRESS_INTERVAL = 500
+
+# 処理中のジョブの進捗（heartbeat_at）が途絶えてから、停止したワーカーのものとみなすまでの秒数
+DEFAULT_STALE_SECONDS = 3600
+
+
+def extract_filters(request):
+    """リクエストからフィルター条件を取得"""
+    filters = {}
+    for key in FILTER_KEYS:
+        value = request.POST.get(key) or request.GET.get(key)
+        if value:
+            filters[key] = value
+    return filters
+
+
+def build_export_queryset(filters):
+    """フィルター条件からエクスポート対象のクエリセットを作成"""
+    queryset = WorkloadAggregation.objects.select_related(
+        'case_name', 'section', 'mub_manager'
+    )
+    if filters.get('project_name'):
+        # 画面の絞り込みはプロジェクトID、それ以外はプロジェクト名の部分一致
+        project_name = str(filters['project_name'])
+        if project_name.isdigit():
+            queryset = queryset.filter(project_name_id=project_name)
+        else:
+            queryset = queryset.filter(project_name__name__icontains=project_name)
+    if filters.get('case_name'):
+        queryset = queryset.filter(case_name_id=filters['case_name'])
+    if filters.get('status'):
+        queryset = queryset.filter(status=filters['status'])
+    if filters.get('case_classification'):
+        queryset = queryset.filter(case_classification=filters['case_classification'])
+    if filters.get('section'):
+        queryset = queryset.filter(section_id=filters['section'])
+    if filters.get('mub_manager'):
+        queryset = queryset.filter(mub_manager_id=filters['mub_manager'])
+    return queryset.order_by('-created_at')
+
+
+def enqueue_export(user, export_format, filters, options=None, total_records=None):
+    """エクスポートジョブを登録（ファイル生成はワーカーで行う）"""
+    if export_format not in EXTENSION_MAP:
+        raise ValueError(f'サポートされていない形式です: {export_format}')
+
+    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
+    if total_records is None:
+        total_records = build_export_queryset(filters).count()
+
+    job = ReportExport.objects.create(
+        requested_by=user,
+        export_type=ReportExport.ExportTypeChoices.WORKLOAD_AGGREGATION,
+        export_format=export_format,
+        status=ReportExport.StatusChoices.PENDING,
+        file_name=f"workload_{timestamp}.{EXTENSION_MAP[export_format]}",
+        filter_conditions=filters,
+        options=options or {},
+        total_records=total_records,
+        exported_records=0,
+    )
+    # 同一秒の重複を避けるためIDをファイル名に付与
+    job.file_name = f"workload_{timestamp}_{job.pk}.{EXTENSION_MAP[export_format]}"
+    job.save(update_fields=['file_name'])
+    logger.info(f"[エクスポート] ジョブ登録: id={job.pk}, 形式={export_format}, 件数={total_records}")
+    return job
+
+
+def _claimable():
+    """
+    取得できるジョブの条件。
+    処理待ちのジョブと、最後の進捗から REPORT_EXPORT_STALE_SECONDS を過ぎても処理中のジョブ
+    （ワーカーが途中で停止したもの）を対象にする
+    """
+    stale_seconds = getattr(settings, 'REPORT_EXPORT_STALE_SECONDS', DEFAULT_STALE_SECONDS)
+    stale_before = timezone.now() - timedelta(seconds=stale_seconds)
+    return Q(status=ReportExport.StatusChoices.PENDING) | (
+        Q(status=ReportExport.StatusChoices.PROCESSING)
+        & (Q(heartbeat_at__lt=stale_before) | Q(heartbeat_at__isnull=True))
+    )
+
+
+def _claim(pk):
+    """ジョブを処理中にする（取得できる状態のときのみ）。取得できたら True"""
+    now = timezone.now()
+    return bool(ReportExport.objects.filter(_claimable(), pk=pk).update(
+        status=ReportExport.StatusChoices.PROCESSING,
+        started_at=now,
+        heartbeat_at=now
+    ))
+
+
+def claim_next_job():
+    """処理待ち（または停止したワーカーが残した）ジョブを1件取得して処理中にする（他のワーカーと競合しない）"""
+    candidates = ReportExport.objects.filter(
+        _claimable()
+    ).order_by('requested_at', 'pk').values_list('pk', 'status')
+
+    for pk, status in candidates[:10]:
+        if _claim(pk):
+            if status == ReportExport.StatusChoices.PROCESSING:
+                logger.warning(f"[エクスポート] 処理中のまま停止したジョブを再実行: id={pk}")
+            return ReportExport.objects.get(pk=pk)
+    return None
+
+
+def run_without_worker(job, storage=None):
+    """
+    ワーカーを動かさない構成（REPORT_EXPORT_WORKER_ENABLED が無効）では、登録したジョブをその場で実行する。
+    ワーカーを動かす構成では何もしない
+    """
+    if getattr(settings, 'REPORT_EXPORT_WORKER_ENABLED', False):
+        return job
+    if not _claim(job.pk):
+        return job
+    job.refresh_from_db()
+    return run_export_job(job, storage=storage)
+
+
+def _heartbeat(job):
+    """処理中であることを記録（停止したワーカーのジョブと区別する）"""
+    ReportExport.objects.filter(pk=job.pk).update(heartbeat_at=timezone.now())
+
+
+def _progress_callback(job):
+    """exported_records と heartbeat_at を更新するコールバック"""
+    def update(count):
+        ReportExport.objects.filter(pk=job.pk).update(exported_records=count, heartbeat_at=timezone.now())
+    return update
+
+
+def render_export(job, local_path):
+    """ジョブのファイルを1回だけ生成して local_path に保存"""
+    # views のエクスポート関数を利用（views からも本モジュールを読み込むため遅延インポート）
+    from . import views
+
+    queryset = build_export_queryset(job.filter_conditions or {})
+    progress = _progress_callback(job)
+
+    if job.export_format == 'excel':
+        result = views.export_workload_excel(queryset, export_type='excel', save_to_file=local_path, progress=progress)
+    elif job.export_format == 'csv':
+        result = views.export_workload_csv(queryset, save_to_file=local_path, progress=progress)
+    elif job.export_format == 'pdf':
+        result = views.export_workload_pdf(queryset, job.filter_conditions, save_to_file=local_path)
+    elif job.export_format == 'professional':
+        professional_type = (job.options or {}).get('professional_type', 'executive_summary')
+        result = views.export_workload_professional(
+            queryset, job.filter_conditions, professional_type, save_to_file=local_path
+        )
+    else:
+        raise ValueError(f'サポートされていない形式です: {job.export_format}')
+
+    # PDF系はエラー時に HttpResponse を返す
+    if isinstance(result, HttpResponse) or not os.path.exists(local_path):
+        raise Exception(f"ファイル生成に失敗しました: {local_path}")
+
+
+def run_export_job(job, storage=None):
+    """ジョブを実行（生成 → 保存 → 完了）。失敗時は FAILED にして例外を送出しない"""
+    storage = storage or get_export_storage()
+    local_path = os.path.join(tempfile.gettempdir(), job.file_name)
+    started = time.perf_counter()
+
+    try:
+        render_export(job, local_path)
+        file_size = os.path.getsize(local_path)
+        _heartbeat(job)
+        file_path, file_s3_url = storage.save(local_path, f"exports/{job.file_name}")
+
+        job.refresh_from_db(fields=['exported_records'])
+        job.file_path = file_path or ''
+        job.file_s3_url = file_s3_url
+        job.file_size = file_size
+        job.exported_records = job.total_records if job.total_records is not None else job.exported_records
+        job.status = ReportExport.StatusChoices.COMPLETED
+        job.completed_at = timezone.now()
+        job.error_message = ''
+        job.save(update_fields=[
+            'file_path', 'file_s3_url', 'file_size', 'exported_records',
+            'status', 'completed_at', 'error_message'
+        ])
+        logger.info(f"[エクスポート] 完了: id={job.pk}, ファイル={job.file_name} ({file_size} bytes)")
+        EXPORT_DURATION.observe(time.perf_counter() - started, job.export_format, 'completed')
+        EXPORT_SIZE.observe(file_size, job.export_format)
+
+    except Exception as e:
+        logger.exception(f"[エクスポート] 失敗: id={job.pk}")
+        job.status = ReportExport.StatusChoices.FAILED
+        job.error_message = str(e)
+        job.completed_at = timezone.now()
+        job.save(update_fields=['status', 'error_message', 'completed_at'])
+        EXPORT_DURATION.observe(time.perf_counter() - started, job.export_format, 'failed')
+
+    finally:
+        if os.path.exists(local_path):
+            try:
+                os.remove(local_path)
+            except OSError as cleanup_error:
+                logger.warning(f"[エクスポート] 一時ファイル削除に失敗: {cleanup_error}")
+
+    return job
+
+
+def run_pending_jobs(max_jobs=None, storage=None):
+    """処理待ちのジョブを順に実行し、実行件数を返す"""
+    processed = 0
+    while max_jobs is None or processed < max_jobs:
+        job = claim_next_job()
+        if job is None:
+            break
+        run_export_job(job, storage=storage)
+        processed += 1
+    return processed
+
+
+def visible_exports(user):
+    """ユーザーが参照できるエクスポート"""
+    queryset = ReportExport.objects.all()
+    if user.is_superuser or getattr(user, 'is_leader', False):
+        return queryset
+    return queryset.filter(Q(requested_by=user) | Q(is_public=True))
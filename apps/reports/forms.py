@@ -4,6 +4,7 @@ from datetime import date, datetime
 from .models import WorkloadAggregation
 from apps.users.models import Department, Section
 from apps.projects.models import Project, ProjectTicket
+from apps.projects.widgets import LookupSelect
 
 User = get_user_model()
 
@@ -38,7 +39,7 @@ class WorkloadAggregationForm(forms.ModelForm):
         ]
         widgets = {
             # 基本情報
-            'project_name': forms.Select(attrs={
+            'project_name': LookupSelect('projects', attrs={
                 'class': 'form-select',
                 'id': 'id_project_name'
             }),
@@ -124,7 +125,7 @@ class WorkloadAggregationForm(forms.ModelForm):
                 'class': 'form-control',
                 'placeholder': '請求先担当者を入力してください'
             }),
-            'mub_manager': forms.Select(attrs={'class': 'form-select'}),
+            'mub_manager': LookupSelect('users', attrs={'class': 'form-select'}),
             
             # 備考
             'remarks': forms.Textarea(attrs={
@@ -147,7 +148,7 @@ class WorkloadAggregationForm(forms.ModelForm):
         # チケット名の選択肢を初期設定
         if self.instance.pk and self.instance.project_name:
             # 編集時：選択されたプロジェクトのチケットのみ表示
-            self.fields['case_name'].queryset = ProjectTicket.objects.filter(
+            self.fields['case_name'].queryset = ProjectTicket.objects.select_related('project').filter(
                 project=self.instance.project_name,
                 is_active=True
             ).order_by('title')
@@ -155,7 +156,7 @@ class WorkloadAggregationForm(forms.ModelForm):
             # フォーム送信時：選択されたプロジェクトのチケットのみ表示
             try:
                 project_id = int(self.data.get('project_name'))
-                self.fields['case_name'].queryset = ProjectTicket.objects.filter(
+                self.fields['case_name'].queryset = ProjectTicket.objects.select_related('project').filter(
                     project_id=project_id,
                     is_active=True
                 ).order_by('title')
@@ -167,11 +168,6 @@ class WorkloadAggregationForm(forms.ModelForm):
         
         self.fields['case_name'].empty_label = "チケットを選択してください"
         
-        # チケット選択肢のwidgetにproject情報を追加
-        case_name_choices = []
-        for ticket in self.fields['case_name'].queryset:
-            case_name_choices.append((ticket.id, str(ticket)))
-        
         # 課名の選択肢を設定
         self.fields['section'].queryset = Section.objects.filter(
             is_active=True
@@ -308,14 +304,14 @@ class WorkloadAggregationFilterForm(forms.Form):
         queryset=Project.objects.filter(is_active=True).order_by('name'),
         required=False,
         empty_label="全てのプロジェクト",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=LookupSelect('projects', attrs={'class': 'form-select'})
     )
     case_name = forms.ModelChoiceField(
         label='チケット名',
         queryset=ProjectTicket.objects.select_related('project').filter(is_active=True).order_by('project__name', 'title'),
         required=False,
         empty_label="全てのチケット",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=LookupSelect('tickets', depends_on='id_project_name', attrs={'class': 'form-select'})
     )
     section = forms.ModelChoiceField(
         label='課名',
@@ -341,7 +337,7 @@ class WorkloadAggregationFilterForm(forms.Form):
         queryset=User.objects.filter(is_active=True).order_by('last_name', 'first_name'),
         required=False,
         empty_label="全ての担当者",
-        widget=forms.Select(attrs={'class': 'form-select'})
+        widget=LookupSelect('users', attrs={'class': 'form-select'})
     )
     search = forms.CharField(
         label='検索',
@@ -0,0 +1,78 @@
+"""
+工数集計一覧の合計値
+
+件数と各列の合計を1回の aggregate で取得し、フィルター条件ごとに短時間キャッシュする。
+工数集計が書き込まれたら世代番号を進めて、全フィルター条件のキャッシュをまとめて無効にする。
+キャッシュがプロセスごと（LocMemCache）の場合、世代番号は別のワーカーでの書き込みでは進まないため、
+呼び出し側が数えた件数（ページ分割の件数）がキャッシュと異なれば集計し直す。
+一覧の件数・ページ数にはキャッシュの値を使わない。
+"""
+import hashlib
+import json
+import time
+
+from django.core.cache import cache
+from django.db.models import Count, Sum
+
+# キャッシュの保持秒数
+CACHE_TIMEOUT = 300
+CACHE_KEY_PREFIX = 'reports:list_totals'
+VERSION_KEY = f'{CACHE_KEY_PREFIX}:version'
+
+# total_stats のキー → 合計する列
+TOTAL_FIELDS = {
+    'total_available_amount': 'available_amount',
+    'total_billing_amount': 'billing_amount_excluding_tax',
+    'total_outsourcing': 'outsourcing_cost_excluding_tax',
+    'total_estimated_workdays': 'estimated_workdays',
+    'total_used_workdays': 'used_workdays',
+    'total_newbie_workdays': 'newbie_workdays',
+}
+
+
+def filter_fingerprint(cleaned_data):
+    """フィルター条件（フォームの cleaned_data）からキャッシュ用の識別子を作成"""
+    normalized = {}
+    for key, value in (cleaned_data or {}).items():
+        if value in (None, ''):
+            continue
+        normalized[key] = getattr(value, 'pk', value)
+    payload = json.dumps(normalized, sort_keys=True, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _version():
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # 世代番号が消えた場合に古いキャッシュと重ならないよう、時刻から始める
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def compute_totals(queryset):
+    """件数と各列の合計（1クエリ）"""
+    aggregates = {key: Sum(field) for key, field in TOTAL_FIELDS.items()}
+    result = queryset.order_by().aggregate(count=Count('id'), **aggregates)
+    return {key: (value or 0) for key, value in result.items()}
+
+
+def get_totals(queryset, fingerprint, count=None):
+    """
+    件数と各列の合計を取得（フィルター条件ごとにキャッシュ）
+    count: 呼び出し側で数えた現在の件数。キャッシュの件数と異なれば集計し直す
+    """
+    key = f'{CACHE_KEY_PREFIX}:{_version()}:{fingerprint}'
+    totals = cache.get(key)
+    if totals is None or (count is not None and totals['count'] != count):
+        totals = compute_totals(queryset)
+        cache.set(key, totals, CACHE_TIMEOUT)
+    return totals
+
+
+def invalidate_totals():
+    """全フィルター条件の合計キャッシュを無効にする"""
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.set(VERSION_KEY, int(time.time() * 1000), None)
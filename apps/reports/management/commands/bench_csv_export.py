@@ -0,0 +1,97 @@
+"""
+工数集計CSVエクスポートのメモリ・スループットベンチマーク
+使用方法: python manage.py bench_csv_export --rows 1000 10000 100000
+
+行数ごとに、従来の一括生成（StringIO + モデル）とストリーミング出力の
+ピークメモリ（tracemalloc）・経過時間・クエリ数を計測する。
+計測用データはトランザクション内で作成し、終了時にロールバックする。
+"""
+import csv
+import io
+
+from django.core.management.base import BaseCommand
+
+from apps.core.benchmark import build_workload_dataset, fill_aggregations, measure_memory, rollback_after
+from apps.reports.csv_export import CSV_HEADERS, streaming_csv_response
+from apps.reports.models import WorkloadAggregation
+
+
+def legacy_csv(queryset):
+    """従来の一括生成（比較用）。全行を StringIO に書き込んでから返す"""
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(CSV_HEADERS)
+    for workload in queryset.select_related('case_name', 'section', 'mub_manager'):
+        writer.writerow([
+            str(workload.project_name) if workload.project_name else '',
+            str(workload.case_name.title) if workload.case_name else '',
+            str(workload.section.name) if workload.section else '',
+            str(workload.get_status_display()),
+            str(workload.get_case_classification_display()),
+            workload.estimate_date.strftime('%Y-%m-%d') if workload.estimate_date else '',
+            workload.order_date.strftime('%Y-%m-%d') if workload.order_date else '',
+            workload.planned_end_date.strftime('%Y-%m-%d') if workload.planned_end_date else '',
+            workload.actual_end_date.strftime('%Y-%m-%d') if workload.actual_end_date else '',
+            workload.inspection_date.strftime('%Y-%m-%d') if workload.inspection_date else '',
+            str(workload.available_amount or 0),
+            str(workload.billing_amount_excluding_tax or 0),
+            str(workload.outsourcing_cost_excluding_tax or 0),
+            str(workload.estimated_workdays or 0),
+            str(workload.used_workdays or 0),
+            str(workload.newbie_workdays or 0),
+            str(workload.unit_cost_per_month or 0),
+            str(workload.billing_unit_cost_per_month or 0),
+            str(workload.billing_destination) if workload.billing_destination else '',
+            str(workload.mub_manager.get_full_name()) if workload.mub_manager else '',
+            str(workload.remarks) if workload.remarks else '',
+            workload.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        ])
+    return ('\ufeff' + output.getvalue()).encode('utf-8')
+
+
+def streaming_csv(queryset, keep=False):
+    """ストリーミング出力を最後まで読み出す（keep=False ならサイズのみ数える）"""
+    response = streaming_csv_response(queryset)
+    if keep:
+        return b''.join(response.streaming_content)
+    return sum(len(chunk) for chunk in response.streaming_content)
+
+
+class Command(BaseCommand):
+    help = '工数集計CSVの一括生成とストリーミング出力のピークメモリ・スループットを比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000], help='工数集計の行数（複数指定可）')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+
+    def handle(self, *args, **options):
+        with rollback_after():
+            dataset = build_workload_dataset(users=5, tickets=50, months=1, seed=options['seed'])
+
+            for rows in sorted(options['rows']):
+                fill_aggregations(dataset['project'], rows)
+
+                queryset = WorkloadAggregation.objects.filter(
+                    project_name=dataset['project']
+                ).order_by('-created_at', 'id')
+
+                legacy_bytes, legacy_ms, legacy_queries, legacy_mb = measure_memory(legacy_csv, queryset)
+                stream_size, stream_ms, stream_queries, stream_mb = measure_memory(streaming_csv, queryset)
+
+                self.stdout.write(f"--- {rows:,}行 ({len(legacy_bytes) / 1024 / 1024:,.1f} MB) ---")
+                self.stdout.write(
+                    f"一括生成:       {legacy_ms:,.1f} ms / {legacy_queries} クエリ / ピーク {legacy_mb:,.1f} MB"
+                    f" / {rows / legacy_ms * 1000:,.0f} 行/秒"
+                )
+                self.stdout.write(
+                    f"ストリーミング: {stream_ms:,.1f} ms / {stream_queries} クエリ / ピーク {stream_mb:,.1f} MB"
+                    f" / {rows / stream_ms * 1000:,.0f} 行/秒"
+                )
+
+                if rows == min(options['rows']):
+                    if streaming_csv(queryset, keep=True) == legacy_bytes:
+                        self.stdout.write(self.style.SUCCESS('出力内容は一致しました'))
+                    else:
+                        self.stdout.write(self.style.ERROR('出力内容が一致しません'))
+                elif stream_size != len(legacy_bytes):
+                    self.stdout.write(self.style.ERROR('出力サイズが一致しません'))
@@ -0,0 +1,128 @@
+"""
+工数集計Excelエクスポートのメモリ・時間ベンチマーク
+使用方法: python manage.py bench_excel_export --rows 1000 100000
+
+行数ごとに、従来の通常モード（Workbook + 全セル走査による列幅調整）と
+write-only モードの書き出しエンジンのピークメモリ（tracemalloc）・経過時間を計測する。
+計測用データはトランザクション内で作成し、終了時にロールバックする。
+"""
+import os
+import tempfile
+
+import openpyxl
+from django.core.management.base import BaseCommand
+from openpyxl.styles import Alignment, Font, PatternFill
+from openpyxl.utils import get_column_letter
+
+from apps.core.benchmark import build_workload_dataset, fill_aggregations, measure_memory, rollback_after
+from apps.reports.csv_export import CSV_HEADERS
+from apps.reports.models import WorkloadAggregation
+from apps.reports.views import export_workload_excel
+
+
+def legacy_excel(queryset, path):
+    """従来の通常モードでの書き出し（比較用）"""
+    wb = openpyxl.Workbook()
+    ws = wb.active
+    ws.title = "工数集計レポート"
+    for col_num, header in enumerate(CSV_HEADERS, 1):
+        cell = ws.cell(row=1, column=col_num, value=header)
+        cell.font = Font(bold=True, color="FFFFFF")
+        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
+        cell.alignment = Alignment(horizontal="center", vertical="center")
+
+    for row_num, workload in enumerate(queryset.select_related('case_name', 'section', 'mub_manager'), 2):
+        data_row = [
+            str(workload.project_name) if workload.project_name else '',
+            str(workload.case_name.title) if workload.case_name else '',
+            str(workload.section.name) if workload.section else '',
+            str(workload.get_status_display()),
+            str(workload.get_case_classification_display()),
+            workload.estimate_date.strftime('%Y-%m-%d') if workload.estimate_date else '',
+            workload.order_date.strftime('%Y-%m-%d') if workload.order_date else '',
+            workload.planned_end_date.strftime('%Y-%m-%d') if workload.planned_end_date else '',
+            workload.actual_end_date.strftime('%Y-%m-%d') if workload.actual_end_date else '',
+            workload.inspection_date.strftime('%Y-%m-%d') if workload.inspection_date else '',
+            float(workload.available_amount or 0),
+            float(workload.billing_amount_excluding_tax or 0),
+            float(workload.outsourcing_cost_excluding_tax or 0),
+            float(workload.estimated_workdays or 0),
+            float(workload.used_workdays or 0),
+            float(workload.newbie_workdays or 0),
+            float(workload.unit_cost_per_month or 0),
+            float(workload.billing_unit_cost_per_month or 0),
+            workload.billing_destination or '',
+            workload.mub_manager.get_full_name() if workload.mub_manager else '',
+            workload.remarks or '',
+            workload.created_at.strftime('%Y-%m-%d %H:%M:%S'),
+        ]
+        for col_num, value in enumerate(data_row, 1):
+            ws.cell(row=row_num, column=col_num, value=value)
+
+    for column in ws.columns:
+        max_length = 0
+        column_letter = get_column_letter(column[0].column)
+        for cell in column:
+            if len(str(cell.value)) > max_length:
+                max_length = len(str(cell.value))
+        ws.column_dimensions[column_letter].width = min(max_length + 2, 50)
+    wb.save(path)
+    return path
+
+
+def read_sheet(path):
+    """比較用にセルの値と列幅を読み込む"""
+    wb = openpyxl.load_workbook(path)
+    ws = wb.active
+    values = [tuple(cell if cell is not None else '' for cell in row) for row in ws.iter_rows(values_only=True)]
+    widths = {letter: dimension.width for letter, dimension in ws.column_dimensions.items()}
+    return ws.title, values, widths
+
+
+class Command(BaseCommand):
+    help = '工数集計Excelの通常モードとwrite-onlyモードのピークメモリ・経過時間を比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000], help='工数集計の行数（複数指定可）')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+        parser.add_argument('--skip-legacy', action='store_true', help='通常モードの計測を省略します')
+
+    def handle(self, *args, **options):
+        temp_dir = tempfile.mkdtemp()
+        legacy_path = os.path.join(temp_dir, 'legacy.xlsx')
+        stream_path = os.path.join(temp_dir, 'stream.xlsx')
+
+        with rollback_after():
+            dataset = build_workload_dataset(users=5, tickets=50, months=1, seed=options['seed'])
+
+            for rows in sorted(options['rows']):
+                fill_aggregations(dataset['project'], rows)
+                queryset = WorkloadAggregation.objects.filter(
+                    project_name=dataset['project']
+                ).order_by('-created_at', 'id')
+
+                self.stdout.write(f"--- {rows:,}行 ---")
+                _, stream_ms, stream_queries, stream_mb = measure_memory(
+                    export_workload_excel, queryset, save_to_file=stream_path
+                )
+                if not options['skip_legacy']:
+                    _, legacy_ms, legacy_queries, legacy_mb = measure_memory(legacy_excel, queryset, legacy_path)
+                    self.stdout.write(
+                        f"通常モード:     {legacy_ms:,.1f} ms / {legacy_queries} クエリ / ピーク {legacy_mb:,.1f} MB"
+                        f" / {os.path.getsize(legacy_path) / 1024:,.0f} KB"
+                    )
+                self.stdout.write(
+                    f"write-only:     {stream_ms:,.1f} ms / {stream_queries} クエリ / ピーク {stream_mb:,.1f} MB"
+                    f" / {os.path.getsize(stream_path) / 1024:,.0f} KB"
+                )
+
+                if rows == min(options['rows']) and not options['skip_legacy']:
+                    if read_sheet(legacy_path) == read_sheet(stream_path):
+                        self.stdout.write(self.style.SUCCESS('セルの値・列幅は一致しました'))
+                    else:
+                        self.stdout.write(self.style.ERROR('セルの値・列幅が一致しません'))
+
+        for path in (legacy_path, stream_path):
+            if os.path.exists(path):
+                os.remove(path)
+        os.rmdir(temp_dir)
@@ -0,0 +1,131 @@
+"""
+工数一括更新（bulk_update_work_hours）の再計算ベンチマーク
+使用方法: python manage.py bench_recalculation --tickets 500 --users 30 --months 12
+
+計測用データはトランザクション内で作成し、終了時にロールバックする。
+"""
+import calendar
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from apps.core.benchmark import build_workload_dataset, measure, rollback_after
+from apps.cost_master.models import OutsourcingCost
+from apps.reports.models import WorkloadAggregation
+from apps.reports.recalculation import recalculate_aggregations
+from apps.workloads.models import Workload
+
+
+def legacy_recalculate(queryset):
+    """従来の1レコードずつの再計算（比較用。新入社員判定は一括エンジンと同じく社員レベルで行う）"""
+    updated_count = 0
+    for aggregation in queryset:
+        if not aggregation.case_name:
+            continue
+        if aggregation.order_date:
+            target_year_month = aggregation.order_date.strftime('%Y-%m')
+        else:
+            target_year_month = datetime.now().strftime('%Y-%m')
+
+        outsourcing = Decimal('0.0')
+        for cost in OutsourcingCost.objects.filter(
+            ticket=aggregation.case_name, year_month=target_year_month, is_active=True
+        ):
+            outsourcing += Decimal(str(cost.total_cost or 0))
+
+        workload_qs = Workload.objects.filter(ticket=aggregation.case_name)
+        has_period = aggregation.order_date and aggregation.actual_end_date
+        if has_period:
+            target_year_months = []
+            current = aggregation.order_date.replace(day=1)
+            while current <= aggregation.actual_end_date:
+                target_year_months.append(current.strftime('%Y-%m'))
+                if current.month == 12:
+                    current = current.replace(year=current.year + 1, month=1)
+                else:
+                    current = current.replace(month=current.month + 1)
+            workload_qs = workload_qs.filter(year_month__in=target_year_months)
+
+        used = Decimal('0.0')
+        newbie = Decimal('0.0')
+        for workload in workload_qs:
+            if has_period:
+                year, month = map(int, workload.year_month.split('-'))
+                last_day = calendar.monthrange(year, month)[1]
+                period_start = max(aggregation.order_date, datetime(year, month, 1).date())
+                period_end = min(aggregation.actual_end_date, datetime(year, month, last_day).date())
+                month_hours = sum(
+                    workload.get_day_value(day) for day in range(period_start.day, period_end.day + 1)
+                )
+            else:
+                month_hours = workload.total_hours
+            workdays = Decimal(str(month_hours)) / Decimal('8.0')
+            if workload.user.employee_level == 'junior':
+                newbie += workdays
+            else:
+                used += workdays
+
+        aggregation.used_workdays = used
+        aggregation.newbie_workdays = newbie
+        aggregation.outsourcing_cost_excluding_tax = outsourcing
+        aggregation.updated_at = timezone.now()
+        aggregation.available_amount = aggregation.calculated_available_amount
+        aggregation.save()
+        updated_count += 1
+    return {'updated_count': updated_count}
+
+
+class Command(BaseCommand):
+    help = '工数一括更新の再計算処理（従来ループ / 一括エンジン）のクエリ数と処理時間を比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=30, help='ユーザー数')
+        parser.add_argument('--tickets', type=int, default=300, help='チケット数（= 工数集計レコード数）')
+        parser.add_argument('--months', type=int, default=12, help='工数データの月数')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+
+    def handle(self, *args, **options):
+        with rollback_after():
+            dataset = build_workload_dataset(
+                users=options['users'],
+                tickets=options['tickets'],
+                months=options['months'],
+                seed=options['seed'],
+            )
+            queryset = WorkloadAggregation.objects.filter(project_name=dataset['project'])
+
+            _, legacy_ms, legacy_queries = measure(legacy_recalculate, queryset.select_related('case_name'))
+            expected = self._snapshot(queryset)
+
+            _, engine_ms, engine_queries = measure(recalculate_aggregations, queryset)
+            actual = self._snapshot(queryset)
+
+        mismatches = [pk for pk in expected if expected[pk] != actual.get(pk)]
+
+        self.stdout.write(f"集計レコード数: {len(expected)}件")
+        self.stdout.write(f"従来ループ: {legacy_ms:,.1f} ms / {legacy_queries} クエリ")
+        self.stdout.write(f"一括エンジン: {engine_ms:,.1f} ms / {engine_queries} クエリ")
+        if engine_ms > 0:
+            self.stdout.write(f"速度比: {legacy_ms / engine_ms:,.1f} 倍")
+        if mismatches:
+            self.stdout.write(self.style.ERROR(f"結果不一致: {len(mismatches)}件 (ID: {mismatches[:10]})"))
+        else:
+            self.stdout.write(self.style.SUCCESS('結果は従来ループと一致しました'))
+
+    @staticmethod
+    def _snapshot(queryset):
+        """比較用に再計算結果を取得（人日は小数第3位で比較）"""
+        return {
+            row['id']: (
+                round(row['used_workdays'], 2),
+                round(row['newbie_workdays'], 2),
+                row['outsourcing_cost_excluding_tax'],
+                row['available_amount'],
+            )
+            for row in queryset.values(
+                'id', 'used_workdays', 'newbie_workdays',
+                'outsourcing_cost_excluding_tax', 'available_amount'
+            )
+        }
@@ -0,0 +1,52 @@
+"""
+エクスポートジョブのワーカー
+使用方法:
+    python manage.py run_export_worker                 # 常駐して処理待ちジョブを順に実行
+    python manage.py run_export_worker --once          # 処理待ちジョブを実行して終了
+    python manage.py run_export_worker --max-jobs 10   # 10件実行したら終了
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from apps.reports.export_jobs import run_pending_jobs
+
+
+class Command(BaseCommand):
+    help = '処理待ちのエクスポートジョブ（ReportExport）を実行し、ファイルを保存します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='処理待ちのジョブがなくなったら終了します'
+        )
+        parser.add_argument(
+            '--sleep',
+            type=float,
+            default=2.0,
+            help='処理待ちジョブがないときの待機秒数（デフォルト: 2.0）'
+        )
+        parser.add_argument(
+            '--max-jobs',
+            type=int,
+            default=None,
+            help='実行するジョブの最大件数'
+        )
+
+    def handle(self, *args, **options):
+        max_jobs = options['max_jobs']
+        processed = 0
+
+        while max_jobs is None or processed < max_jobs:
+            remaining = None if max_jobs is None else max_jobs - processed
+            count = run_pending_jobs(max_jobs=remaining)
+            processed += count
+            if count:
+                self.stdout.write(f'エクスポートジョブを実行しました: {count}件')
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+
+        self.stdout.write(self.style.SUCCESS(f'ワーカーを終了します（実行件数: {processed}件）'))
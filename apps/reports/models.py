@@ -176,130 +176,6 @@ class WorkloadAggregation(models.Model):
     def __str__(self):
         return f"{self.project_name.name} - {self.case_name.title}"
     
-    def calculate_workdays_from_workload(self):
-        """工数登録機能から工数を自動計算（開発タイプは全期間対応版）"""
-        from apps.workloads.models import Workload
-        from decimal import Decimal
-        from datetime import datetime, date
-        import calendar
-        
-        # チケットに関連する工数を取得
-        workloads = Workload.objects.filter(ticket=self.case_name)
-        
-        # チケットの分類を確認（開発タイプかどうか）
-        is_development = self.case_classification == self.CaseClassificationChoices.DEVELOPMENT
-        
-        # 開発タイプでない場合のみ期間フィルターを適用
-        if not is_development:
-            # 保守・その他のタイプの場合は従来通り期間フィルター適用
-            target_year_months = set()
-            
-            if self.order_date:
-                start_date = self.order_date
-            else:
-                # デフォルトは現在年月から6ヶ月前
-                start_date = date.today().replace(day=1)
-            
-            if self.actual_end_date:
-                end_date = self.actual_end_date
-            else:
-                # デフォルトは現在年月
-                end_date = date.today()
-            
-            # 対象年月のリストを作成
-            current_date = start_date.replace(day=1)
-            while current_date <= end_date:
-                target_year_months.add(current_date.strftime('%Y-%m'))
-                # 次の月へ
-                if current_date.month == 12:
-                    current_date = current_date.replace(year=current_date.year + 1, month=1)
-                else:
-                    current_date = current_date.replace(month=current_date.month + 1)
-            
-            # 対象年月でフィルター（保守・その他のみ）
-            if target_year_months:
-                workloads = workloads.filter(year_month__in=target_year_months)
-        
-        # 開発タイプの場合はworkloadsをそのまま使用（全期間対象）
-        
-        # 一般使用工数と新入社員工数を分離
-        regular_workdays = Decimal('0.0')
-        newbie_workdays = Decimal('0.0')
-        
-        for workload in workloads:
-            # ユーザーのemployee_levelを確認
-            is_junior = False
-            if hasattr(workload.user, 'employee_level') and workload.user.employee_level == 'junior':
-                is_junior = True
-            
-            # 各日の工数を合計
-            workload_year_month = workload.year_month
-            year, month = map(int, workload_year_month.split('-'))
-            
-            # その月の日数を取得
-            days_in_month = calendar.monthrange(year, month)[1]
-            
-            for day in range(1, days_in_month + 1):
-                # 開発タイプの場合は日付範囲チェックを完全にスキップ
-                if not is_development:
-                    # 保守・その他のタイプの場合のみ日付範囲チェック
-                    current_day = date(year, month, day)
-                    if self.order_date and current_day < self.order_date:
-                        continue
-                    if self.actual_end_date and current_day > self.actual_end_date:
-                        continue
-                
-                # その日の工数を取得
-                day_hours = workload.get_day_value(day)
-                
-                # 工数の分類
-                if is_junior:
-                    newbie_workdays += Decimal(str(day_hours))
-                else:
-                    regular_workdays += Decimal(str(day_hours))
-        
-        # 時間を人日に変換（8時間=1人日として計算）
-        self.used_workdays = regular_workdays / 8
-        self.newbie_workdays = newbie_workdays / 8
-        
-        # デバッグ情報を返す
-        all_workloads_count = Workload.objects.filter(ticket=self.case_name).count()
-        filtered_workloads_count = workloads.count()
-        
-        debug_info = {
-            'チケット分類': self.get_case_classification_display(),
-            '開発タイプ判定': is_development,
-            '期間フィルター適用': not is_development,
-            '全工数レコード数': all_workloads_count,
-            '対象工数レコード数': filtered_workloads_count,
-            '一般工数（時間）': float(regular_workdays),
-            '新入社員工数（時間）': float(newbie_workdays),
-            '一般工数（人日）': float(self.used_workdays),
-            '新入社員工数（人日）': float(self.newbie_workdays),
-        }
-        
-        if is_development:
-            debug_info['適用期間'] = "開発タイプのため全期間対象"
-            debug_info['年月フィルター'] = "なし（全期間）"
-        else:
-            if self.order_date and self.actual_end_date:
-                debug_info['適用期間'] = f"{self.order_date} ～ {self.actual_end_date}"
-            else:
-                debug_info['適用期間'] = "受注日・終了日未設定のため制限なし"
-            
-            # 対象年月をデバッグ情報に追加
-            if 'target_year_months' in locals():
-                debug_info['対象年月リスト'] = sorted(list(target_year_months))
-            else:
-                debug_info['対象年月リスト'] = "フィルターなし"
-        
-        return {
-            'used_workdays': self.used_workdays,
-            'newbie_workdays': self.newbie_workdays,
-            'total_workdays': self.used_workdays + self.newbie_workdays,
-            'debug_info': debug_info
-        }
-    
     # 既存のpropertyメソッドはそのまま維持
     @property
     def total_used_workdays(self):
@@ -354,14 +230,11 @@ class WorkloadAggregation(models.Model):
     
     def calculate_workdays_from_workload(self):
         """工数登録機能から工数を自動計算（開発タイプは全期間対応版）"""
-        from apps.workloads.models import Workload
+        from apps.workloads.ledger import get_ticket_hours
         from decimal import Decimal
         from datetime import datetime, date
         import calendar
         
-        # チケットに関連する工数を取得
-        workloads = Workload.objects.filter(ticket=self.case_name)
-        
         # チケットの分類を確認（開発タイプかどうか）
         is_development = self.case_classification == self.CaseClassificationChoices.DEVELOPMENT
         
@@ -391,63 +264,26 @@ class WorkloadAggregation(models.Model):
                     current_date = current_date.replace(year=current_date.year + 1, month=1)
                 else:
                     current_date = current_date.replace(month=current_date.month + 1)
-            
-            # 対象年月でフィルター（保守・その他のみ）
-            if target_year_months:
-                workloads = workloads.filter(year_month__in=target_year_months)
-        
-        # 開発タイプの場合はworkloadsをそのまま使用（全期間対象）
-        
-        # 一般使用工数と新入社員工数を分離
-        regular_workdays = Decimal('0.0')
-        newbie_workdays = Decimal('0.0')
         
-        for workload in workloads:
-            # ユーザーのemployee_levelを確認
-            is_junior = False
-            if hasattr(workload.user, 'employee_level') and workload.user.employee_level == 'junior':
-                is_junior = True
-            
-            # 各日の工数を合計
-            workload_year_month = workload.year_month
-            year, month = map(int, workload_year_month.split('-'))
-            
-            # その月の日数を取得
-            days_in_month = calendar.monthrange(year, month)[1]
-            
-            for day in range(1, days_in_month + 1):
-                # 開発タイプの場合は日付範囲チェックを完全にスキップ
-                if not is_development:
-                    # 保守・その他のタイプの場合のみ日付範囲チェック
-                    current_day = date(year, month, day)
-                    if self.order_date and current_day < self.order_date:
-                        continue
-                    if self.actual_end_date and current_day > self.actual_end_date:
-                        continue
-                
-                # その日の工数を取得
-                day_hours = workload.get_day_value(day)
-                
-                # 工数の分類
-                if is_junior:
-                    newbie_workdays += Decimal(str(day_hours))
-                else:
-                    regular_workdays += Decimal(str(day_hours))
+        # 一般使用工数と新入社員工数を工数台帳から取得（開発タイプは全期間）
+        if is_development:
+            regular_workdays, newbie_workdays = get_ticket_hours(self.case_name_id)
+        else:
+            # 終了日実績が未設定の場合は終了月の月末までを対象とする
+            period_end = end_date
+            if not self.actual_end_date:
+                period_end = end_date.replace(day=calendar.monthrange(end_date.year, end_date.month)[1])
+            regular_workdays, newbie_workdays = get_ticket_hours(self.case_name_id, start_date, period_end)
         
         # 時間を人日に変換（8時間=1人日として計算）
         self.used_workdays = regular_workdays / 8
         self.newbie_workdays = newbie_workdays / 8
         
-        # デバッグ情報を返す
-        all_workloads_count = Workload.objects.filter(ticket=self.case_name).count()
-        filtered_workloads_count = workloads.count()
-        
+        # デバッグ情報を返す（工数行は走査しない）
         debug_info = {
             'チケット分類': self.get_case_classification_display(),
             '開発タイプ判定': is_development,
             '期間フィルター適用': not is_development,
-            '全工数レコード数': all_workloads_count,
-            '対象工数レコード数': filtered_workloads_count,
             '一般工数（時間）': float(regular_workdays),
             '新入社員工数（時間）': float(newbie_workdays),
             '一般工数（人日）': float(self.used_workdays),
@@ -561,6 +397,7 @@ class ReportExport(models.Model):
         EXCEL = 'excel', 'Excel (.xlsx)'
         CSV = 'csv', 'CSV (.csv)'
         PDF = 'pdf', 'PDF (.pdf)'
+        PROFESSIONAL = 'professional', 'プロフェッショナルレポート (.pdf)'
     
     class StatusChoices(models.TextChoices):
         PENDING = 'pending', '処理待ち'
@@ -596,6 +433,9 @@ class ReportExport(models.Model):
         help_text='エクスポート時のフィルター条件をJSON形式で保存'
     )
     
+    # 出力オプション（プロフェッショナルレポートの種類など）
+    options = models.JSONField('出力オプション', default=dict, blank=True)
+    
     # ステータス
     status = models.CharField(
         'ステータス',
@@ -612,6 +452,10 @@ class ReportExport(models.Model):
     # 日時情報
     requested_at = models.DateTimeField('リクエスト日時', auto_now_add=True)
     started_at = models.DateTimeField('開始日時', null=True, blank=True)
+    heartbeat_at = models.DateTimeField(
+        '最終進捗日時', null=True, blank=True,
+        help_text='処理中のワーカーが進捗を書き込んだ日時（停止したワーカーの判定に使う）'
+    )
     completed_at = models.DateTimeField('完了日時', null=True, blank=True)
     expires_at = models.DateTimeField('有効期限', null=True, blank=True)
     
@@ -645,7 +489,16 @@ class ReportExport(models.Model):
     @property
     def is_downloadable(self):
         """ダウンロード可能かどうか"""
-        return self.status == self.StatusChoices.COMPLETED and self.file_path
+        return self.status == self.StatusChoices.COMPLETED and bool(self.file_path or self.file_s3_url)
+    
+    @property
+    def progress_percent(self):
+        """進捗率（%）"""
+        if self.status == self.StatusChoices.COMPLETED:
+            return 100
+        if not self.total_records:
+            return 0
+        return min(int((self.exported_records or 0) * 100 / self.total_records), 100)
     
     @property
     def processing_time(self):
@@ -0,0 +1,302 @@
+"""
+工数集計の一括再計算エンジン
+
+WorkloadAggregation ごとに外注費・工数を個別に問い合わせる代わりに、
+対象レコード全体をまとめて集計する。
+クエリ数は対象件数に依存しない（集計レコード取得・外注費集計・工数集計の3本 + bulk_update）。
+"""
+import calendar
+import logging
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+from django.db import transaction
+from django.db.models import BooleanField, Case, Sum, Value, When
+from django.utils import timezone
+
+from apps.core.kpi_snapshot import invalidate_kpi_snapshot
+from apps.cost_master.models import OutsourcingCost
+from apps.workloads.models import Workload
+from .list_totals import invalidate_totals
+from .models import WorkloadAggregation
+
+logger = logging.getLogger(__name__)
+
+DAY_FIELDS = [f'day_{day:02d}' for day in range(1, 32)]
+DAY_NUMBERS = np.arange(1, 32)
+
+# 新入社員として扱う社員レベル
+NEWBIE_EMPLOYEE_LEVEL = 'junior'
+
+# bulk_update のバッチサイズ
+UPDATE_BATCH_SIZE = 500
+
+UPDATE_FIELDS = [
+    'used_workdays',
+    'newbie_workdays',
+    'outsourcing_cost_excluding_tax',
+    'available_amount',
+    'updated_at',
+]
+
+
+def _month_index(year_month):
+    """'YYYY-MM' を月の通し番号に変換（不正値は None）"""
+    try:
+        year, month = map(int, year_month.split('-'))
+        if not 1 <= month <= 12:
+            return None
+        return year * 12 + (month - 1)
+    except (AttributeError, ValueError):
+        return None
+
+
+def _target_year_month(aggregation):
+    """外注費の集計対象年月（受注日の年月、未設定なら現在年月）"""
+    if aggregation.order_date:
+        return aggregation.order_date.strftime('%Y-%m')
+    return datetime.now().strftime('%Y-%m')
+
+
+def _fetch_outsourcing_totals(ticket_ids, year_months):
+    """(チケットID, 年月) ごとの外注費合計を1クエリで取得"""
+    if not ticket_ids:
+        return {}
+    rows = OutsourcingCost.objects.filter(
+        ticket_id__in=ticket_ids,
+        year_month__in=year_months,
+        is_active=True
+    ).values('ticket_id', 'year_month').annotate(
+        total=Sum('total_cost')
+    ).order_by()
+    return {
+        (row['ticket_id'], row['year_month']): row['total'] or Decimal('0')
+        for row in rows
+    }
+
+
+def _fetch_workload_matrix(ticket_ids):
+    """
+    (チケットID, 年月, 新入社員フラグ) ごとの日別工数合計を1クエリで取得。
+    戻り値は各グループの属性配列と、0.1時間単位の整数行列（グループ数 × 31）。
+    """
+    empty = (
+        np.zeros(0, dtype=np.int64),
+        np.zeros(0, dtype=np.int64),
+        np.zeros(0, dtype=bool),
+        np.zeros((0, 31), dtype=np.int64),
+    )
+    if not ticket_ids:
+        return empty
+
+    rows = Workload.objects.filter(
+        ticket_id__in=ticket_ids
+    ).annotate(
+        is_newbie=Case(
+            When(user__employee_level=NEWBIE_EMPLOYEE_LEVEL, then=Value(True)),
+            default=Value(False),
+            output_field=BooleanField()
+        )
+    ).values('ticket_id', 'year_month', 'is_newbie').annotate(
+        **{field: Sum(field) for field in DAY_FIELDS}
+    ).order_by()
+
+    ticket_col, month_col, newbie_col, hours = [], [], [], []
+    for row in rows:
+        month_index = _month_index(row['year_month'])
+        if month_index is None:
+            logger.warning(f"不正な年月のためスキップ: チケットID={row['ticket_id']}, 年月={row['year_month']}")
+            continue
+        ticket_col.append(row['ticket_id'])
+        month_col.append(month_index)
+        newbie_col.append(bool(row['is_newbie']))
+        # 小数第1位までの工数を整数（0.1時間単位）に変換して誤差なく合計する
+        hours.append([int(round((row[field] or 0) * 10)) for field in DAY_FIELDS])
+
+    if not ticket_col:
+        return empty
+
+    return (
+        np.array(ticket_col, dtype=np.int64),
+        np.array(month_col, dtype=np.int64),
+        np.array(newbie_col, dtype=bool),
+        np.array(hours, dtype=np.int64).reshape(-1, 31),
+    )
+
+
+def _clip_and_sum(aggregations, group_ticket, group_month, group_newbie, group_hours):
+    """
+    集計レコードごとに期間（受注日〜終了日実績）で日別工数を切り出して合計する。
+    戻り値は (一般工数, 新入社員工数) の0.1時間単位の配列。
+    """
+    count = len(aggregations)
+    regular = np.zeros(count, dtype=np.int64)
+    newbie = np.zeros(count, dtype=np.int64)
+    if count == 0 or len(group_ticket) == 0:
+        return regular, newbie
+
+    # チケットごとのグループ行インデックス
+    order = np.argsort(group_ticket, kind='stable')
+    sorted_tickets = group_ticket[order]
+
+    # 集計レコードごとの期間（受注日・終了日実績の両方がある場合のみ切り出す。従来ロジックと同じ）
+    has_period = np.zeros(count, dtype=bool)
+    start_month = np.zeros(count, dtype=np.int64)
+    start_day = np.ones(count, dtype=np.int64)
+    end_month = np.zeros(count, dtype=np.int64)
+    end_day = np.full(count, 31, dtype=np.int64)
+
+    agg_index, group_index = [], []
+    for i, aggregation in enumerate(aggregations):
+        if aggregation.order_date and aggregation.actual_end_date:
+            has_period[i] = True
+            start_month[i] = aggregation.order_date.year * 12 + aggregation.order_date.month - 1
+            start_day[i] = aggregation.order_date.day
+            end_month[i] = aggregation.actual_end_date.year * 12 + aggregation.actual_end_date.month - 1
+            end_day[i] = aggregation.actual_end_date.day
+
+        lo = np.searchsorted(sorted_tickets, aggregation.case_name_id, side='left')
+        hi = np.searchsorted(sorted_tickets, aggregation.case_name_id, side='right')
+        if lo < hi:
+            agg_index.append(np.full(hi - lo, i, dtype=np.int64))
+            group_index.append(order[lo:hi])
+
+    if not agg_index:
+        return regular, newbie
+
+    agg_index = np.concatenate(agg_index)
+    group_index = np.concatenate(group_index)
+    has_period = has_period[agg_index]
+    start_month = start_month[agg_index]
+    start_day = start_day[agg_index]
+    end_month = end_month[agg_index]
+    end_day = end_day[agg_index]
+
+    month = group_month[group_index]
+    last_day = np.array(
+        [calendar.monthrange(m // 12, m % 12 + 1)[1] for m in month],
+        dtype=np.int64
+    )
+
+    # 期間あり: 対象月外は除外し、開始月・終了月は日付で切り出す（月末日を上限とする）
+    in_range = ~has_period | ((month >= start_month) & (month <= end_month))
+    first = np.where(has_period & (month == start_month), start_day, 1)
+    last = np.where(has_period, np.where(month == end_month, np.minimum(end_day, last_day), last_day), 31)
+
+    mask = (
+        (DAY_NUMBERS[None, :] >= first[:, None])
+        & (DAY_NUMBERS[None, :] <= last[:, None])
+        & in_range[:, None]
+    )
+    pair_hours = (group_hours[group_index] * mask).sum(axis=1)
+
+    is_newbie = group_newbie[group_index]
+    regular += np.bincount(agg_index, weights=np.where(is_newbie, 0, pair_hours), minlength=count).astype(np.int64)
+    newbie += np.bincount(agg_index, weights=np.where(is_newbie, pair_hours, 0), minlength=count).astype(np.int64)
+    return regular, newbie
+
+
+def _tenths_to_workdays(tenths):
+    """0.1時間単位の整数を人日（8時間=1人日）に変換"""
+    return Decimal(int(tenths)) / Decimal('10') / Decimal('8')
+
+
+def recalculate_aggregations(queryset):
+    """
+    工数集計レコードの使用工数・新入社員工数・外注費・使用可能金額を一括再計算する。
+
+    戻り値: {'updated_count': 更新件数, 'error_count': チケット未設定件数}
+    """
+    aggregations = list(queryset.only(
+        'id', 'case_name_id', 'order_date', 'actual_end_date',
+        'billing_amount_excluding_tax', 'outsourcing_cost_excluding_tax',
+        'used_workdays', 'newbie_workdays', 'available_amount', 'updated_at'
+    ).order_by())
+
+    targets = [aggregation for aggregation in aggregations if aggregation.case_name_id]
+    error_count = len(aggregations) - len(targets)
+    if error_count:
+        logger.warning(f"チケットが設定されていない集計レコード: {error_count}件")
+
+    ticket_ids = sorted({aggregation.case_name_id for aggregation in targets})
+    year_months = sorted({_target_year_month(aggregation) for aggregation in targets})
+
+    outsourcing_totals = _fetch_outsourcing_totals(ticket_ids, year_months)
+    regular, newbie = _clip_and_sum(targets, *_fetch_workload_matrix(ticket_ids))
+
+    now = timezone.now()
+    for i, aggregation in enumerate(targets):
+        outsourcing = outsourcing_totals.get(
+            (aggregation.case_name_id, _target_year_month(aggregation)), Decimal('0')
+        )
+        billing = aggregation.billing_amount_excluding_tax or Decimal('0')
+
+        aggregation.used_workdays = _tenths_to_workdays(regular[i])
+        aggregation.newbie_workdays = _tenths_to_workdays(newbie[i])
+        aggregation.outsourcing_cost_excluding_tax = outsourcing
+        aggregation.available_amount = max(billing - outsourcing, Decimal('0'))
+        aggregation.updated_at = now
+
+    with transaction.atomic():
+        WorkloadAggregation.objects.bulk_update(targets, UPDATE_FIELDS, batch_size=UPDATE_BATCH_SIZE)
+        # bulk_update はシグナルを送らないため、ダッシュボードのKPI・一覧の合計値を明示的に破棄
+        transaction.on_commit(invalidate_kpi_snapshot)
+        transaction.on_commit(invalidate_totals)
+
+    return {
+        'updated_count': len(targets),
+        'error_count': error_count,
+    }
+
+
+def recalculate_outsourcing_costs(queryset):
+    """
+    工数集計レコードの外注費・使用可能金額を最新の外注費データと同期する。
+    外注費は (チケット, 年月) ごとに1クエリでまとめて集計し、変更のあったレコードだけを更新する。
+
+    戻り値: {'processed_count': 対象件数, 'updated_count': 更新件数, 'error_count': チケット未設定件数}
+    """
+    aggregations = list(queryset.only(
+        'id', 'case_name_id', 'order_date', 'billing_amount_excluding_tax',
+        'outsourcing_cost_excluding_tax', 'available_amount', 'updated_at'
+    ).order_by())
+
+    targets = [aggregation for aggregation in aggregations if aggregation.case_name_id]
+    error_count = len(aggregations) - len(targets)
+    if error_count:
+        logger.warning(f"チケットが設定されていない集計レコード: {error_count}件")
+
+    ticket_ids = sorted({aggregation.case_name_id for aggregation in targets})
+    year_months = sorted({_target_year_month(aggregation) for aggregation in targets})
+    outsourcing_totals = _fetch_outsourcing_totals(ticket_ids, year_months)
+
+    now = timezone.now()
+    changed = []
+    for aggregation in targets:
+        outsourcing = outsourcing_totals.get(
+            (aggregation.case_name_id, _target_year_month(aggregation)), Decimal('0')
+        )
+        # 外注費が変更されている場合のみ更新
+        if outsourcing == (aggregation.outsourcing_cost_excluding_tax or Decimal('0')):
+            continue
+        billing = aggregation.billing_amount_excluding_tax or Decimal('0')
+        aggregation.outsourcing_cost_excluding_tax = outsourcing
+        aggregation.available_amount = max(billing - outsourcing, Decimal('0'))
+        aggregation.updated_at = now
+        changed.append(aggregation)
+
+    if changed:
+        with transaction.atomic():
+            WorkloadAggregation.objects.bulk_update(
+                changed, ['outsourcing_cost_excluding_tax', 'available_amount', 'updated_at'],
+                batch_size=UPDATE_BATCH_SIZE
+            )
+            transaction.on_commit(invalidate_kpi_snapshot)
+            transaction.on_commit(invalidate_totals)
+
+    return {
+        'processed_count': len(aggregations),
+        'updated_count': len(changed),
+        'error_count': error_count,
+    }
@@ -0,0 +1,32 @@
+"""
+工数集計・工数の書き込み時の処理
+
+ダッシュボードのKPIスナップショット（apps.core.kpi_snapshot）と
+工数集計一覧の合計値（list_totals）のキャッシュを破棄する。
+bulk_update / update() はシグナルが送られないため、呼び出し側で破棄処理を呼ぶ。
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from apps.core.kpi_snapshot import invalidate_kpi_snapshot
+from apps.workloads.models import Workload
+
+from .list_totals import invalidate_totals
+from .models import WorkloadAggregation
+
+
+@receiver(post_save, sender=WorkloadAggregation)
+@receiver(post_delete, sender=WorkloadAggregation)
+@receiver(post_save, sender=Workload)
+@receiver(post_delete, sender=Workload)
+def invalidate_dashboard_snapshot(sender, **kwargs):
+    """コミット後にKPIスナップショットを破棄（トランザクション外なら即時）"""
+    transaction.on_commit(invalidate_kpi_snapshot)
+
+
+@receiver(post_save, sender=WorkloadAggregation)
+@receiver(post_delete, sender=WorkloadAggregation)
+def invalidate_list_totals(sender, **kwargs):
+    """コミット後に工数集計一覧の合計値を無効にする"""
+    transaction.on_commit(invalidate_totals)
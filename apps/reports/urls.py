@@ -18,6 +18,8 @@ urlpatterns = [
 
     # エクスポート機能
     path('exports/', views.ReportExportListView.as_view(), name='report_export_list'), #未完了
+    path('exports/<int:pk>/status/', views.export_status, name='export_status'),
+    path('exports/<int:pk>/download/', views.export_download, name='export_download'),
     
     # 工数自動計算API(AJAX)
     path('calculate-workdays/', views.calculate_workdays_ajax, name='calculate_workdays_ajax'),
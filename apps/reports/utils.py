@@ -1,3 +1,6 @@
+import os
+import shutil
+
 import boto3
 from django.conf import settings
 
@@ -11,4 +14,35 @@ def upload_file_to_s3(local_path, s3_key):
     bucket = settings.AWS_STORAGE_BUCKET_NAME
     s3.upload_file(local_path, bucket, s3_key)
     url = f"https://{bucket}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{s3_key}"
-    return url
\ No newline at end of file
+    return url
+
+
+class S3ExportStorage:
+    """エクスポートファイルの保存先（S3）"""
+
+    def save(self, local_path, key):
+        """ファイルを保存し、(file_path, file_s3_url) を返す"""
+        return '', upload_file_to_s3(local_path, key)
+
+
+class LocalExportStorage:
+    """エクスポートファイルの保存先（ローカルファイルシステム、開発・テスト用のS3代替）"""
+
+    def __init__(self, root=None):
+        self.root = root or getattr(
+            settings, 'REPORT_EXPORT_LOCAL_ROOT', os.path.join(settings.MEDIA_ROOT, 'exports')
+        )
+
+    def save(self, local_path, key):
+        """ファイルを保存し、(file_path, file_s3_url) を返す"""
+        destination = os.path.join(self.root, key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        shutil.copyfile(local_path, destination)
+        return destination, None
+
+
+def get_export_storage():
+    """設定 REPORT_EXPORT_STORAGE（'s3' / 'local'）に応じた保存先を返す"""
+    if getattr(settings, 'REPORT_EXPORT_STORAGE', 's3') == 'local':
+        return LocalExportStorage()
+    return S3ExportStorage()
@@ -4,12 +4,10 @@ import json
 import logging
 import io
 import calendar
+import time
 from datetime import date, datetime, timedelta
 from decimal import Decimal
 # サードパーティライブラリ(レポートエクスポート用)
-import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill
-from openpyxl.utils import get_column_letter
 from reportlab.lib import colors
 from reportlab.pdfbase.pdfmetrics import stringWidth
 from reportlab.lib.pagesizes import A4, landscape
@@ -30,22 +28,35 @@ from django.views.generic import (
 )
 from django.contrib.auth.decorators import login_required
 from django.contrib import messages
-from django.urls import reverse_lazy
-from django.http import JsonResponse, HttpResponse, HttpResponseRedirect
-from django.db.models import Q, Sum, Avg, Count
+from django.urls import reverse, reverse_lazy
+from django.http import JsonResponse, HttpResponse, HttpResponseRedirect, FileResponse
+from django.db.models import Q, Sum, Avg, Count, F
 from django.utils import timezone
 from django.conf import settings
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods, require_POST
 from django.contrib.auth import get_user_model
 from apps.workloads.models import Workload
+from apps.workloads.ledger import get_ticket_hours
+from apps.core.metrics import RECALCULATION_DURATION, RECALCULATION_RECORDS
 from kousu_management_app.settings import FONT_PATH
 # ローカルアプリ
 from .models import ReportExport, WorkloadAggregation
 from .forms import WorkloadAggregationForm, WorkloadAggregationFilterForm
 from apps.users.models import Department, Section
 from apps.projects.models import ProjectTicket
-from .utils import upload_file_to_s3
+from .recalculation import recalculate_aggregations, recalculate_outsourcing_costs
+from .csv_export import (
+    CASE_CLASSIFICATION_LABELS, CSV_HEADERS, STATUS_LABELS, SUMMARY_CSV_HEADERS,
+    full_name, project_display, format_summary_row, iter_value_rows,
+    streaming_csv_response, write_csv_file,
+)
+from .list_totals import TOTAL_FIELDS, filter_fingerprint, get_totals
+from .export_jobs import (
+    EXTENSION_MAP, PROGRESS_INTERVAL, build_export_queryset, enqueue_export,
+    extract_filters, run_without_worker, visible_exports,
+)
+from apps.core.excel_export import HEADER_STYLE_BLUE, excel_response, write_excel
 from apps.core.decorators import (
     leader_or_superuser_required_403,
     LeaderOrSuperuserRequiredMixin
@@ -66,13 +77,15 @@ class WorkloadAggregationListView(LeaderOrSuperuserRequiredMixin, ListView):
         del_flag=False のレコードを対象
         """
         queryset = WorkloadAggregation.objects.filter(del_flag=False).select_related(
-            'case_name', 'section', 'mub_manager', 'created_by'
+            'project_name', 'case_name', 'section', 'mub_manager', 'created_by'
         ).order_by('section', '-order_date', '-created_at')
-        # フィルター処理
+        # フィルター処理（フォームと条件の識別子は合計値の取得でも使う）
         form = WorkloadAggregationFilterForm(self.request.GET)
+        self.filter_form = form
+        self.filter_fingerprint = filter_fingerprint(form.cleaned_data if form.is_valid() else None)
         if form.is_valid():
             if form.cleaned_data.get('project_name'):
-                queryset = queryset.filter(project_name__icontains=form.cleaned_data['project_name'])
+                queryset = queryset.filter(project_name=form.cleaned_data['project_name'])
             if form.cleaned_data.get('case_name'):
                 queryset = queryset.filter(case_name=form.cleaned_data['case_name'])
             if form.cleaned_data.get('section'):
@@ -86,13 +99,22 @@ class WorkloadAggregationListView(LeaderOrSuperuserRequiredMixin, ListView):
             if form.cleaned_data.get('search'):
                 search_term = form.cleaned_data['search']
                 queryset = queryset.filter(
-                    Q(project_name__icontains=search_term) |
-                    Q(case_name__name__icontains=search_term) |
+                    Q(project_name__name__icontains=search_term) |
+                    Q(case_name__title__icontains=search_term) |
                     Q(remarks__icontains=search_term)
                 )
         
         return queryset
     
+    def get_total_stats(self, count=None):
+        """
+        件数と合計値（絞り込み済みのクエリセットから1クエリ、フィルター条件ごとにキャッシュ）
+        count: ページ分割で数えた件数。キャッシュの件数と異なれば集計し直す
+        """
+        if not hasattr(self, '_total_stats'):
+            self._total_stats = get_totals(self.object_list, self.filter_fingerprint, count=count)
+        return self._total_stats
+    
     def get_context_data(self, **kwargs):
         """
         テンプレートに渡すコンテキストデータを構築。
@@ -101,19 +123,12 @@ class WorkloadAggregationListView(LeaderOrSuperuserRequiredMixin, ListView):
         context = super().get_context_data(**kwargs)
         
         # 現在のフィルター入力値を保持したフォームをコンテキストに追加
-        context['filter_form'] = WorkloadAggregationFilterForm(self.request.GET)
+        context['filter_form'] = self.filter_form
         
-        # 表示対象クエリセットを取得
-        queryset = self.get_queryset()
         # 集計情報をコンテキストに追加（合計値を表示）
-        context['total_stats'] = {
-            'total_available_amount': queryset.aggregate(total=Sum('available_amount'))['total'] or 0,
-            'total_billing_amount': queryset.aggregate(total=Sum('billing_amount_excluding_tax'))['total'] or 0,
-            'total_outsourcing': queryset.aggregate(total=Sum('outsourcing_cost_excluding_tax'))['total'] or 0,
-            'total_estimated_workdays': queryset.aggregate(total=Sum('estimated_workdays'))['total'] or 0,
-            'total_used_workdays': queryset.aggregate(total=Sum('used_workdays'))['total'] or 0,
-            'total_newbie_workdays': queryset.aggregate(total=Sum('newbie_workdays'))['total'] or 0,
-        }
+        paginator = context.get('paginator')
+        total_stats = self.get_total_stats(count=paginator.count if paginator else None)
+        context['total_stats'] = {key: total_stats[key] for key in TOTAL_FIELDS}
         
 
         # 現在のフィルター条件を辞書として渡す（テンプレート側でフォームの再表示等に利用）
@@ -176,12 +191,19 @@ class WorkloadAggregationCreateView(LeaderOrSuperuserRequiredMixin, CreateView):
         context['title'] = '工数集計登録'  # テンプレートで使う画面タイトル
         return context
 
+# 詳細・編集・削除画面で表示する関連（プロジェクト・チケット・課・担当者）
+AGGREGATION_RELATED_FIELDS = ('project_name', 'case_name', 'section', 'mub_manager', 'created_by')
+
+
 class WorkloadAggregationDetailView(LeaderOrSuperuserRequiredMixin, DetailView):
     """工数集計詳細画面"""
     model = WorkloadAggregation
     template_name = 'reports/workload_aggregation_detail.html'
     context_object_name = 'workload_aggregation'
 
+    def get_queryset(self):
+        return WorkloadAggregation.objects.select_related(*AGGREGATION_RELATED_FIELDS)
+
 class WorkloadAggregationUpdateView(LeaderOrSuperuserRequiredMixin, UpdateView):
     """工数集計編集画面"""
     model = WorkloadAggregation
@@ -189,6 +211,9 @@ class WorkloadAggregationUpdateView(LeaderOrSuperuserRequiredMixin, UpdateView):
     template_name = 'reports/workload_aggregation_form.html'
     success_url = reverse_lazy('reports:workload_aggregation')
 
+    def get_queryset(self):
+        return WorkloadAggregation.objects.select_related(*AGGREGATION_RELATED_FIELDS)
+
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         kwargs['user'] = self.request.user
@@ -214,7 +239,7 @@ class WorkloadAggregationDeleteView(LeaderOrSuperuserRequiredMixin, DeleteView):
     
     def get_queryset(self):
         """削除されていないデータのみを対象"""
-        return WorkloadAggregation.objects.filter(del_flag=False)
+        return WorkloadAggregation.objects.filter(del_flag=False).select_related(*AGGREGATION_RELATED_FIELDS)
 
     def post(self, request, *args, **kwargs):
         """POSTリクエストでの削除処理"""     
@@ -246,30 +271,9 @@ class WorkloadAggregationDeleteView(LeaderOrSuperuserRequiredMixin, DeleteView):
 @login_required
 @leader_or_superuser_required_403
 def workload_export(request):
-    """工数データのエクスポート"""
-    import csv
-    from django.http import HttpResponse
-    
-    
-    # CSV レスポンスの作成
-    response = HttpResponse(content_type='text/csv; charset=utf-8')
-    response['Content-Disposition'] = f'attachment; filename="workload_aggregation_{datetime.now().strftime("%Y%m%d")}.csv"'
-    
-    # BOM付きでUTF-8エンコーディング
-    response.write('\ufeff')
-    
-    writer = csv.writer(response)
-    writer.writerow([
-        'プロジェクト名', 'チケット名', '部名', 'ステータス', 'チケット分類', '見積日', '受注日',
-        '終了日（予定）', '終了日実績', '検収日', '使用可能金額（税別）', '請求金額（税別）',
-        '外注費（税別）', '見積工数（人日）', '使用工数（人日）', '新入社員使用工数（人日）',
-        '使用工数合計', '残工数', '残金額', '利益率', '仕掛中金額', '請求先', 'MUB担当者', '作成日時'
-    ])
-    
+    """工数データのエクスポート（CSVを少しずつ送出）"""
     # フィルター適用
-    queryset = WorkloadAggregation.objects.select_related(
-        'case_name', 'section', 'mub_manager'
-    ).order_by('-order_date')
+    queryset = WorkloadAggregation.objects.order_by('-order_date')
     
     # URLパラメータでフィルター
     if request.GET.get('project_name'):
@@ -279,35 +283,12 @@ def workload_export(request):
     if request.GET.get('status'):
         queryset = queryset.filter(status=request.GET['status'])
     
-    for workload in queryset:
-        writer.writerow([
-            workload.project_name,
-            workload.case_name.name,
-            workload.section.name,
-            workload.get_status_display(),
-            workload.get_case_classification_display(),
-            workload.estimate_date.strftime('%Y-%m-%d') if workload.estimate_date else '',
-            workload.order_date.strftime('%Y-%m-%d') if workload.order_date else '',
-            workload.planned_end_date.strftime('%Y-%m-%d') if workload.planned_end_date else '',
-            workload.actual_end_date.strftime('%Y-%m-%d') if workload.actual_end_date else '',
-            workload.inspection_date.strftime('%Y-%m-%d') if workload.inspection_date else '',
-            str(workload.available_amount),
-            str(workload.billing_amount_excluding_tax),
-            str(workload.outsourcing_cost_excluding_tax),
-            str(workload.estimated_workdays),
-            str(workload.used_workdays),
-            str(workload.newbie_workdays),
-            str(workload.total_used_workdays),
-            str(workload.remaining_workdays),
-            str(workload.remaining_amount),
-            str(workload.profit_rate),
-            str(workload.wip_amount),
-            workload.billing_destination,
-            workload.mub_manager.get_full_name() if workload.mub_manager else '',
-            workload.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-        ])
-    
-    return response
+    return streaming_csv_response(
+        queryset,
+        filename=f'workload_aggregation_{datetime.now().strftime("%Y%m%d")}.csv',
+        headers=SUMMARY_CSV_HEADERS,
+        formatter=format_summary_row,
+    )
 
 class ReportListView(LeaderOrSuperuserRequiredMixin, TemplateView):
     """レポート一覧画面"""
@@ -433,50 +414,8 @@ def calculate_workdays_ajax(request):
         if target_year_months:
             workloads_query = workloads_query.filter(year_month__in=target_year_months)
         
-        # 一般使用工数と新入社員工数を分離
-        regular_workdays = Decimal('0.0')
-        newbie_workdays = Decimal('0.0')
-        
-        for workload in workloads_query:
-            # ユーザーのemployee_levelを確認
-            is_junior = False
-            if hasattr(workload.user, 'employee_level') and workload.user.employee_level == 'junior':
-                is_junior = True
-            
-            # 各日の工数を合計（日付範囲内のみ）
-            workload_year_month = workload.year_month
-            try:
-                year, month = map(int, workload_year_month.split('-'))
-            except ValueError:
-                continue  # 無効な年月形式はスキップ
-            
-            # その月の日数を取得
-            days_in_month = calendar.monthrange(year, month)[1]
-            
-            for day in range(1, days_in_month + 1):
-                # 日付範囲チェック
-                try:
-                    current_day = date(year, month, day)
-                except ValueError:
-                    continue  # 無効な日付はスキップ
-                
-                # 指定された日付範囲外の工数は除外
-                if current_day < start_date or current_day > end_date:
-                    continue
-                
-                # その日の工数を取得
-                try:
-                    day_hours = workload.get_day_value(day)
-                    if day_hours < 0:  # 負の値はスキップ
-                        continue
-                except (AttributeError, TypeError, ValueError):
-                    continue  # エラーの場合はスキップ
-                
-                # 工数の分類
-                if is_junior:
-                    newbie_workdays += Decimal(str(day_hours))
-                else:
-                    regular_workdays += Decimal(str(day_hours))
+        # 一般使用工数と新入社員工数を工数台帳から取得（期間の端の月のみ日単位で集計）
+        regular_workdays, newbie_workdays = get_ticket_hours(ticket.id, start_date, end_date)
         
         # 時間を人日に変換（8時間=1人日として計算）
         used_workdays = regular_workdays / 8
@@ -516,155 +455,82 @@ def calculate_workdays_ajax(request):
 @login_required
 @leader_or_superuser_required_403
 def workload_export_current(request):
-    """現在表示中の工数集計データをエクスポート（即時ダウンロード＋S3アップロード＋履歴登録）"""
+    """現在表示中の工数集計データのエクスポートを受け付ける（ファイル生成はワーカーで実行）"""
     if request.method != 'POST':
         return redirect('reports:workload_aggregation')
-    
-    # フィルター条件を取得
-    filters = {}
-    for key in ['project_name', 'case_name', 'status', 'case_classification', 'section', 'mub_manager']:
-        value = request.POST.get(key) or request.GET.get(key)
-        if value:
-            filters[key] = value
-    
-    # データセットを取得
-    queryset = WorkloadAggregation.objects.select_related(
-        'case_name', 'section', 'mub_manager'
-    )
-    
-    # フィルター適用
-    if filters.get('project_name'):
-        queryset = queryset.filter(project_name__icontains=filters['project_name'])
-    if filters.get('case_name'):
-        queryset = queryset.filter(case_name_id=filters['case_name'])
-    if filters.get('status'):
-        queryset = queryset.filter(status=filters['status'])
-    if filters.get('case_classification'):
-        queryset = queryset.filter(case_classification=filters['case_classification'])
-    if filters.get('section'):
-        queryset = queryset.filter(section_id=filters['section'])
-    if filters.get('mub_manager'):
-        queryset = queryset.filter(mub_manager_id=filters['mub_manager'])
-    
-    queryset = queryset.order_by('-created_at')
-    
-    # エクスポート形式を取得
+
+    is_ajax = request.headers.get('x-requested-with') == 'XMLHttpRequest'
+    filters = extract_filters(request)
     export_format = request.POST.get('format', 'excel')
-    
-    print(f"=== EXPORT DEBUG ===")
-    print(f"Export format requested: {export_format}")
-    print(f"QuerySet count: {queryset.count()}")
-    print(f"==================")
-    
+
+    if export_format not in EXTENSION_MAP:
+        if is_ajax:
+            return JsonResponse({'success': False, 'error': f'サポートされていない形式です: {export_format}'}, status=400)
+        messages.error(request, f'サポートされていない形式です: {export_format}')
+        return redirect('reports:workload_aggregation')
+
+    total_records = build_export_queryset(filters).count()
+
     # データが0件の場合の処理
-    if queryset.count() == 0:
+    if total_records == 0:
+        if is_ajax:
+            return JsonResponse({'success': False, 'error': 'エクスポートするデータがありません。'}, status=400)
         messages.warning(request, 'エクスポートするデータがありません。フィルター条件を確認してください。')
         return redirect('reports:workload_aggregation')
-    
-    # Windows対応：一時ディレクトリとファイル名を修正
-    import tempfile
-    
-    timestamp = timezone.now().strftime('%Y%m%d_%H%M%S')
-    
-    # 正しいファイル拡張子を設定
-    extension_map = {
-        'excel': 'xlsx',
-        'csv': 'csv',
-        'pdf': 'pdf'
-    }
-    
-    file_extension = extension_map.get(export_format, 'xlsx')
-    file_name = f"workload_{timestamp}.{file_extension}"
-    
-    # Windows対応の一時ディレクトリ
-    temp_dir = tempfile.gettempdir()
-    local_path = os.path.join(temp_dir, file_name)
-    
-    print(f"Temp directory: {temp_dir}")
-    print(f"Local path: {local_path}")
-    
-    # 履歴モデル作成（S3アップロード用）
-    export_record = ReportExport.objects.create(
-        requested_by=request.user,
-        export_type=ReportExport.ExportTypeChoices.WORKLOAD_AGGREGATION,
-        export_format=export_format,
-        status=ReportExport.StatusChoices.PENDING,
-        file_name=file_name,
-        filter_conditions=filters,  # フィルター条件も保存
-        total_records=queryset.count()
-    )
-    
-    try:
-        # ファイル生成（S3アップロード用とダウンロード用の両方）
-        if export_format == 'excel':
-            print("Processing EXCEL export...")
-            # S3アップロード用ファイル生成
-            export_workload_excel(queryset, export_type='excel', save_to_file=local_path)
-            # ダウンロード用レスポンス生成
-            response = export_workload_excel(queryset, export_type='excel')
-        elif export_format == 'csv':
-            print("Processing CSV export...")
-            # S3アップロード用ファイル生成
-            export_workload_csv(queryset, save_to_file=local_path)
-            # ダウンロード用レスポンス生成
-            response = export_workload_csv(queryset)
-        elif export_format == 'pdf':
-            print("Processing PDF export...")
-            # S3アップロード用ファイル生成
-            export_workload_pdf(queryset, filters, save_to_file=local_path)
-            # ダウンロード用レスポンス生成
-            response = export_workload_pdf(queryset, filters)
-        elif export_format == 'professional': 
-            print("Processing PROFESSIONAL export...")
-            professional_type = request.POST.get('professional_type', 'executive_summary')
-            # S3アップロード用ファイル生成
-            export_workload_professional(queryset, filters, professional_type, save_to_file=local_path)
-            # ダウンロード用レスポンス生成
-            response = export_workload_professional(queryset, filters, professional_type)
-        else:
-            messages.error(request, f'サポートされていない形式です: {export_format}')
-            export_record.delete()  # 失敗時は履歴削除
-            return redirect('reports:workload_aggregation')
-        
-        # ファイルサイズを取得
-        if os.path.exists(local_path):
-            file_size = os.path.getsize(local_path)
-            export_record.file_size = file_size
-            export_record.save(update_fields=['file_size'])
-            print(f"File created successfully: {local_path} ({file_size} bytes)")
-        else:
-            print(f"WARNING: File not created: {local_path}")
-            raise Exception(f"ファイル生成に失敗しました: {local_path}")
-        
-        # S3アップロード＆履歴登録（バックグラウンドで実行）
-        print(f"Starting S3 upload for: {local_path}")
-        complete_export(export_record, local_path)
-        
-        print(f"Export completed successfully: {file_name}")
-        messages.success(request, f'エクスポートが完了しました。履歴からS3ダウンロードも可能です。')
-        
-        return response
-        
-    except Exception as e:
-        print(f"Export failed: {str(e)}")
-        import traceback
-        print(f"Traceback: {traceback.format_exc()}")
-        
-        # エラー時は履歴をFAILEDに更新
-        try:
-            if hasattr(export_record, 'error_message'):
-                export_record.error_message = str(e)
-                update_fields = ['status', 'error_message']
-            else:
-                update_fields = ['status']
-            
-            export_record.status = ReportExport.StatusChoices.FAILED
-            export_record.save(update_fields=update_fields)
-        except Exception as save_error:
-            print(f"Failed to save error status: {save_error}")
-        
-        messages.error(request, f'エクスポートに失敗しました: {str(e)}')
-        return redirect('reports:workload_aggregation')
+
+    options = {}
+    if export_format == 'professional':
+        options['professional_type'] = request.POST.get('professional_type', 'executive_summary')
+
+    job = enqueue_export(request.user, export_format, filters, options, total_records=total_records)
+    job = run_without_worker(job)
+
+    if is_ajax:
+        return JsonResponse({
+            'success': True,
+            'export_id': job.pk,
+            'status': job.status,
+            'status_url': reverse('reports:export_status', args=[job.pk]),
+        }, status=202)
+
+    messages.success(request, 'エクスポートを受け付けました。完了後にエクスポート履歴からダウンロードできます。')
+    return redirect('reports:report_export_list')
+
+
+@login_required
+def export_status(request, pk):
+    """エクスポートジョブの進捗（ポーリング用）"""
+    job = get_object_or_404(visible_exports(request.user), pk=pk)
+    return JsonResponse({
+        'success': True,
+        'export_id': job.pk,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'total_records': job.total_records,
+        'exported_records': job.exported_records,
+        'progress': job.progress_percent,
+        'error': job.error_message if job.status == ReportExport.StatusChoices.FAILED else '',
+        'download_url': reverse('reports:export_download', args=[job.pk]) if job.is_downloadable else None,
+    })
+
+
+@login_required
+def export_download(request, pk):
+    """エクスポートファイルのダウンロード（ローカル保存はファイルを返し、S3はURLへリダイレクト）"""
+    job = get_object_or_404(visible_exports(request.user), pk=pk)
+    if not job.is_downloadable:
+        messages.error(request, 'このエクスポートはダウンロードできません。')
+        return redirect('reports:report_export_list')
+
+    ReportExport.objects.filter(pk=job.pk).update(download_count=F('download_count') + 1)
+
+    if job.file_path and os.path.exists(job.file_path):
+        return FileResponse(open(job.file_path, 'rb'), as_attachment=True, filename=job.file_name)
+    if job.file_s3_url:
+        return HttpResponseRedirect(job.file_s3_url)
+
+    messages.error(request, 'エクスポートファイルが見つかりません。')
+    return redirect('reports:report_export_list')
 
 def export_workload_pdf(queryset, filters=None, save_to_file=None):
     """PDF形式でエクスポート（ファイル保存またはHttpResponse）"""
@@ -819,121 +685,65 @@ def export_workload_text_fallback(queryset, filters=None):
 @require_http_methods(["POST"])
 def export_report_with_history(request):
     """エクスポート履歴に登録しつつレポートをエクスポート（CSV例）"""
-    # フィルター条件取得
-    filters = {}
-    for key in ['project_name', 'case_name', 'status', 'case_classification', 'section', 'mub_manager']:
-        value = request.POST.get(key) or request.GET.get(key)
-        if value:
-            filters[key] = value
-
-    queryset = WorkloadAggregation.objects.select_related(
-        'case_name', 'section', 'mub_manager'
-    )
-    # フィルター適用
-    if filters.get('project_name'):
-        queryset = queryset.filter(project_name__icontains=filters['project_name'])
-    if filters.get('case_name'):
-        queryset = queryset.filter(case_name_id=filters['case_name'])
-    if filters.get('status'):
-        queryset = queryset.filter(status=filters['status'])
-    if filters.get('case_classification'):
-        queryset = queryset.filter(case_classification=filters['case_classification'])
-    if filters.get('section'):
-        queryset = queryset.filter(section_id=filters['section'])
-    if filters.get('mub_manager'):
-        queryset = queryset.filter(mub_manager_id=filters['mub_manager'])
-    
-    queryset = queryset.order_by('-created_at')
-
+    filters = extract_filters(request)
     export_format = request.POST.get('format', 'csv')  # 'csv', 'pdf', 'excel'
-    return export_and_upload(queryset, export_format, filters, request.user)
+    if export_format not in EXTENSION_MAP:
+        return JsonResponse({'success': False, 'error': f'サポートされていない形式です: {export_format}'}, status=400)
 
-def export_workload_excel(queryset, export_type='excel', save_to_file=None):
-    """Excel形式でエクスポート（ファイル保存またはHttpResponse）"""
-    wb = openpyxl.Workbook()
-    ws = wb.active
-    ws.title = "工数集計レポート"
-    
-    # ヘッダースタイル
-    header_font = Font(bold=True, color="FFFFFF")
-    header_fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    header_alignment = Alignment(horizontal="center", vertical="center")
-    
-    # ヘッダー行
-    headers = [
-        'プロジェクト名', 'チケット名', '部名', 'ステータス', 'チケット分類',
-        '見積日', '受注日', '終了日（予定）', '終了日実績', '検収日',
-        '使用可能金額（税別）', '請求金額（税別）', '外注費（税別）',
-        '見積工数（人日）', '使用工数（人日）', '新入社員使用工数（人日）',
-        '単価（万円/月）', '請求単価（万円/月）',
-        '請求先', 'MUB担当者', '備考', '作成日時'
+    job = enqueue_export(request.user, export_format, filters)
+    job = run_without_worker(job)
+    return JsonResponse({
+        'success': True,
+        'export_id': job.pk,
+        'status': job.status,
+        'status_url': reverse('reports:export_status', args=[job.pk]),
+    }, status=202)
+
+def _excel_row(row):
+    """Excel出力の1行（values_list の行から作成）"""
+    return [
+        project_display(row['project_name__project_no'], row['project_name__name']),
+        str(row['case_name__title']) if row['case_name__title'] else '',
+        str(row['section__name']) if row['section__name'] else '',
+        str(STATUS_LABELS.get(row['status'], row['status'])),
+        str(CASE_CLASSIFICATION_LABELS.get(row['case_classification'], row['case_classification'])),
+        row['estimate_date'].strftime('%Y-%m-%d') if row['estimate_date'] else '',
+        row['order_date'].strftime('%Y-%m-%d') if row['order_date'] else '',
+        row['planned_end_date'].strftime('%Y-%m-%d') if row['planned_end_date'] else '',
+        row['actual_end_date'].strftime('%Y-%m-%d') if row['actual_end_date'] else '',
+        row['inspection_date'].strftime('%Y-%m-%d') if row['inspection_date'] else '',
+        float(row['available_amount'] or 0),
+        float(row['billing_amount_excluding_tax'] or 0),
+        float(row['outsourcing_cost_excluding_tax'] or 0),
+        float(row['estimated_workdays'] or 0),
+        float(row['used_workdays'] or 0),
+        float(row['newbie_workdays'] or 0),
+        float(row['unit_cost_per_month'] or 0),
+        float(row['billing_unit_cost_per_month'] or 0),
+        row['billing_destination'] or '',
+        full_name(row['mub_manager__first_name'], row['mub_manager__last_name']) if row['mub_manager_id'] else '',
+        row['remarks'] or '',
+        row['created_at'].strftime('%Y-%m-%d %H:%M:%S'),
     ]
-    
-    # ヘッダー設定
-    for col_num, header in enumerate(headers, 1):
-        cell = ws.cell(row=1, column=col_num, value=header)
-        cell.font = header_font
-        cell.fill = header_fill
-        cell.alignment = header_alignment
-    
-    # データ行
-    for row_num, workload in enumerate(queryset, 2):
-        try:
-            data_row = [
-                str(workload.project_name) if workload.project_name else '',
-                str(workload.case_name.title) if workload.case_name else '',
-                str(workload.section.name) if workload.section else '',
-                str(workload.get_status_display()),
-                str(workload.get_case_classification_display()),
-                workload.estimate_date.strftime('%Y-%m-%d') if workload.estimate_date else '',
-                workload.order_date.strftime('%Y-%m-%d') if workload.order_date else '',
-                workload.planned_end_date.strftime('%Y-%m-%d') if workload.planned_end_date else '',
-                workload.actual_end_date.strftime('%Y-%m-%d') if workload.actual_end_date else '',
-                workload.inspection_date.strftime('%Y-%m-%d') if workload.inspection_date else '',
-                float(workload.available_amount or 0),
-                float(workload.billing_amount_excluding_tax or 0),
-                float(workload.outsourcing_cost_excluding_tax or 0),
-                float(workload.estimated_workdays or 0),
-                float(workload.used_workdays or 0),
-                float(workload.newbie_workdays or 0),
-                float(workload.unit_cost_per_month or 0),
-                float(workload.billing_unit_cost_per_month or 0),
-                workload.billing_destination or '',
-                workload.mub_manager.get_full_name() if workload.mub_manager else '',
-                workload.remarks or '',
-                workload.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            ]
-            
-            for col_num, value in enumerate(data_row, 1):
-                ws.cell(row=row_num, column=col_num, value=value)
-        except Exception as e:
-            print(f"Row {row_num} export error: {str(e)}")
-            continue
-    
-    # 列幅の自動調整
-    for column in ws.columns:
-        max_length = 0
-        column_letter = get_column_letter(column[0].column)
-        for cell in column:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = min(max_length + 2, 50)
-        ws.column_dimensions[column_letter].width = adjusted_width
-    
+
+
+def export_workload_excel(queryset, export_type='excel', save_to_file=None, progress=None):
+    """
+    Excel形式でエクスポート（ファイル保存またはHttpResponse）。progress には出力済み件数が通知される。
+    write-only モードで書き出すため、件数が多くてもシート全体をメモリに持たない。
+    """
+    rows = (_excel_row(row) for row in iter_value_rows(queryset))
+
     # ファイル保存版（S3アップロード用）
     if save_to_file:
-        wb.save(save_to_file)
+        write_excel(
+            save_to_file, '工数集計レポート', CSV_HEADERS, rows,
+            header_style=HEADER_STYLE_BLUE, progress=progress, progress_interval=PROGRESS_INTERVAL
+        )
         print(f"Excel file saved to: {save_to_file}")
         return save_to_file
     
     # HTTPレスポンス版（既存の動作）
-    output = io.BytesIO()
-    wb.save(output)
-    output.seek(0)
-    
     timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
     
     if export_type == 'pdf':
@@ -941,172 +751,22 @@ def export_workload_excel(queryset, export_type='excel', save_to_file=None):
     else:
         filename = f'workload_standard_{timestamp}.xlsx'
     
-    response = HttpResponse(
-        output.getvalue(),
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
+    return excel_response(filename, '工数集計レポート', CSV_HEADERS, rows, header_style=HEADER_STYLE_BLUE)
 
-def export_workload_csv(queryset, save_to_file=None):
-    """CSV形式でエクスポート（ファイル保存またはHttpResponse）"""
-    import csv
-    
-    output = io.StringIO()
-    writer = csv.writer(output)
-    
-    # ヘッダー行
-    writer.writerow([
-        'プロジェクト名', 'チケット名', '部名', 'ステータス', 'チケット分類',
-        '見積日', '受注日', '終了日（予定）', '終了日実績', '検収日',
-        '使用可能金額（税別）', '請求金額（税別）', '外注費（税別）',
-        '見積工数（人日）', '使用工数（人日）', '新入社員使用工数（人日）',
-        '単価（万円/月）', '請求単価（万円/月）',
-        '請求先', 'MUB担当者', '備考', '作成日時'
-    ])
-    
-    # データ行
-    for workload in queryset:
-        try:
-            writer.writerow([
-                str(workload.project_name) if workload.project_name else '',
-                str(workload.case_name.title) if workload.case_name else '',
-                str(workload.section.name) if workload.section else '',
-                str(workload.get_status_display()),
-                str(workload.get_case_classification_display()),
-                workload.estimate_date.strftime('%Y-%m-%d') if workload.estimate_date else '',
-                workload.order_date.strftime('%Y-%m-%d') if workload.order_date else '',
-                workload.planned_end_date.strftime('%Y-%m-%d') if workload.planned_end_date else '',
-                workload.actual_end_date.strftime('%Y-%m-%d') if workload.actual_end_date else '',
-                workload.inspection_date.strftime('%Y-%m-%d') if workload.inspection_date else '',
-                str(workload.available_amount or 0),
-                str(workload.billing_amount_excluding_tax or 0),
-                str(workload.outsourcing_cost_excluding_tax or 0),
-                str(workload.estimated_workdays or 0),
-                str(workload.used_workdays or 0),
-                str(workload.newbie_workdays or 0),
-                str(workload.unit_cost_per_month or 0),
-                str(workload.billing_unit_cost_per_month or 0),
-                str(workload.billing_destination) if workload.billing_destination else '',
-                str(workload.mub_manager.get_full_name()) if workload.mub_manager else '',
-                str(workload.remarks) if workload.remarks else '',
-                workload.created_at.strftime('%Y-%m-%d %H:%M:%S'),
-            ])
-        except Exception as e:
-            print(f"CSV export error: {str(e)}")
-            continue
-    
+def export_workload_csv(queryset, save_to_file=None, progress=None):
+    """
+    CSV形式でエクスポート（ファイル保存またはStreamingHttpResponse）。progress には出力済み件数が通知される。
+    行は values_list().iterator() で少しずつ読み込むため、件数に関係なくメモリ使用量は一定。
+    """
     # ファイル保存版（S3アップロード用）
     if save_to_file:
-        with open(save_to_file, 'w', encoding='utf-8-sig', newline='') as f:
-            f.write(output.getvalue())
+        write_csv_file(queryset, save_to_file, progress=progress, progress_interval=PROGRESS_INTERVAL)
         print(f"CSV file saved to: {save_to_file}")
         return save_to_file
-    
-    # HTTPレスポンス版（既存の動作）
-    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-    filename = f'workload_csv_{timestamp}.csv'
-    
-    response = HttpResponse(output.getvalue(), content_type='text/csv; charset=utf-8-sig')
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
-    
-    return response
 
-def complete_export(report_export, local_path):
-    """
-    S3アップロード＆履歴登録を行う関数
-    """
-    logger = logging.getLogger(__name__)
-    logger.info(f"[S3連携] complete_export開始: local_path={local_path}, file_name={report_export.file_name}")
-
-    try:
-        
-        # ファイル存在確認
-        if not os.path.exists(local_path):
-            raise FileNotFoundError(f"ローカルファイルが見つかりません: {local_path}")
-        
-        # ファイルサイズ取得
-        file_size = os.path.getsize(local_path)
-        logger.info(f"[S3連携] ファイルサイズ: {file_size} bytes")
-        
-        # S3アップロード
-        s3_key = f"exports/{report_export.file_name}"
-        logger.info(f"[S3連携] S3アップロード開始: s3_key={s3_key}")
-        
-        s3_url = upload_file_to_s3(local_path, s3_key)
-        logger.info(f"[S3連携] S3アップロード成功: s3_url={s3_url}")
+    # HTTPレスポンス版（少しずつ送出）
+    return streaming_csv_response(queryset)
 
-        # file_s3_urlフィールドが存在するかチェック
-        if hasattr(report_export, 'file_s3_url'):
-            report_export.file_s3_url = s3_url
-            report_export.file_size = file_size
-            update_fields = ['file_s3_url', 'file_size', 'status']
-        else:
-            logger.warning("[S3連携] file_s3_urlフィールドが存在しません。マイグレーション後に再試行してください。")
-            report_export.file_size = file_size
-            update_fields = ['file_size', 'status']
-        
-        report_export.status = ReportExport.StatusChoices.COMPLETED
-        report_export.save(update_fields=update_fields)
-        logger.info(f"[履歴登録] ReportExport更新完了: id={report_export.id}, status={report_export.status}")
-        
-        # ローカルファイルを削除（オプション）
-        try:
-            os.remove(local_path)
-            logger.info(f"[ファイル削除] ローカルファイルを削除: {local_path}")
-        except Exception as cleanup_error:
-            logger.warning(f"[ファイル削除] ローカルファイル削除に失敗: {cleanup_error}")
-
-    except Exception as e:
-        logger.error(f"[S3連携] S3アップロード失敗: {str(e)}")
-        import traceback
-        logger.error(f"[S3連携] エラー詳細: {traceback.format_exc()}")
-        
-        # エラー時は履歴をFAILEDに更新
-        try:
-            if hasattr(report_export, 'error_message'):
-                report_export.error_message = str(e)
-                update_fields = ['status', 'error_message']
-            else:
-                update_fields = ['status']
-            
-            report_export.status = ReportExport.StatusChoices.FAILED
-            report_export.save(update_fields=update_fields)
-            logger.error(f"[履歴登録] ReportExportステータスFAILEDに更新: id={report_export.id}")
-        except Exception as save_error:
-            logger.error(f"[履歴登録] エラー状態の保存に失敗: {save_error}")
-        
-        # エラーを再発生させる
-        raise e
-
-def upload_file_to_s3(local_path, s3_key):
-    """
-    ローカルファイルをS3にアップロードする関数
-    """
-    import boto3
-    from django.conf import settings
-    
-    try:
-        # S3クライアント作成
-        s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            region_name=settings.AWS_S3_REGION_NAME
-        )
-        
-        # S3にアップロード
-        bucket_name = settings.AWS_STORAGE_BUCKET_NAME
-        s3_client.upload_file(local_path, bucket_name, s3_key)
-        
-        # S3 URLを生成
-        s3_url = f"https://{bucket_name}.s3.{settings.AWS_S3_REGION_NAME}.amazonaws.com/{s3_key}"
-        
-        return s3_url
-        
-    except Exception as e:
-        raise Exception(f"S3アップロードエラー: {str(e)}")
 def export_workload_professional(queryset, filters=None, professional_type='executive_summary', save_to_file=None):
     """カッコイイレポート形式でエクスポート（PDF）"""
     try:
@@ -1531,11 +1191,6 @@ def bulk_update_work_hours(request):
         data = json.loads(request.body)
         filter_params = data.get('filter_params', {})
         
-        from .models import WorkloadAggregation
-        from apps.workloads.models import Workload
-        # === 【修正】正しいインポートパスに変更 ===
-        from apps.cost_master.models import OutsourcingCost  # apps.projects.models から apps.cost_master.models に変更
-        
         # フィルター条件を適用
         queryset = WorkloadAggregation.objects.all()
         
@@ -1560,168 +1215,14 @@ def bulk_update_work_hours(request):
                 Q(billing_destination__icontains=search_term)
             )
         
-        logger.info(f"対象レコード数: {queryset.count()}件")
-        
-        updated_count = 0
-        error_count = 0
-        
-        for aggregation_record in queryset:
-            try:
-                if aggregation_record.case_name:
-                    # === 【外注費の同期処理】 ===
-                    updated_outsourcing_cost = Decimal('0.0')
-                    
-                    # 年月フィールドを取得（WorkloadAggregationに年月フィールドがある場合）
-                    if hasattr(aggregation_record, 'year_month') and aggregation_record.year_month:
-                        target_year_month = aggregation_record.year_month
-                    else:
-                        # 年月フィールドがない場合は受注日から推定
-                        if aggregation_record.order_date:
-                            target_year_month = aggregation_record.order_date.strftime('%Y-%m')
-                        else:
-                            # デフォルトは現在年月
-                            target_year_month = datetime.now().strftime('%Y-%m')
-                    
-                    try:
-                        # === 【デバッグ】外注費テーブルの確認 ===
-                        logger.debug(f"外注費取得開始: チケットID={aggregation_record.case_name.id}, "
-                                   f"チケット名={aggregation_record.case_name.title}, "
-                                   f"年月={target_year_month}")
-                        
-                        # 該当チケット・年月の外注費を取得
-                        outsourcing_costs = OutsourcingCost.objects.filter(
-                            ticket=aggregation_record.case_name,
-                            year_month=target_year_month,
-                            is_active=True  # アクティブな外注費のみ
-                        )
-                        
-                        logger.debug(f"外注費レコード数: {outsourcing_costs.count()}件")
-                        
-                        # 外注費の合計を計算
-                        for cost_record in outsourcing_costs:
-                            cost_amount = Decimal(str(cost_record.total_cost or 0))
-                            updated_outsourcing_cost += cost_amount
-                            logger.debug(f"外注費レコード: ID={cost_record.id}, "
-                                       f"金額=¥{cost_amount:,}, "
-                                       f"業者={getattr(cost_record, 'vendor', 'N/A')}")
-                        
-                        logger.info(f"外注費同期: チケット={aggregation_record.case_name.title}, "
-                                   f"年月={target_year_month}, "
-                                   f"外注費=¥{updated_outsourcing_cost:,} "
-                                   f"(レコード数: {outsourcing_costs.count()}件)")
-                        
-                    except OutsourcingCost.DoesNotExist:
-                        logger.info(f"外注費データなし: チケット={aggregation_record.case_name.title}, 年月={target_year_month}")
-                        updated_outsourcing_cost = Decimal('0.0')
-                    except Exception as outsourcing_error:
-                        logger.warning(f"外注費取得エラー (ID: {aggregation_record.id}): {outsourcing_error}")
-                        # エラーの場合は既存の外注費を維持
-                        updated_outsourcing_cost = Decimal(str(aggregation_record.outsourcing_cost_excluding_tax or 0))
-                    
-                    # === 【工数計算処理（既存のロジック）】 ===
-                    workload_qs = Workload.objects.filter(
-                        ticket=aggregation_record.case_name
-                    )
-                    
-                    # 期間フィルターを適用（年月ベースで）
-                    if aggregation_record.order_date and aggregation_record.actual_end_date:
-                        start_date = aggregation_record.order_date
-                        end_date = aggregation_record.actual_end_date
-                        
-                        target_year_months = []
-                        current_date = start_date.replace(day=1)
-                        
-                        while current_date <= end_date:
-                            year_month = current_date.strftime('%Y-%m')
-                            target_year_months.append(year_month)
-                            
-                            if current_date.month == 12:
-                                current_date = current_date.replace(year=current_date.year + 1, month=1)
-                            else:
-                                current_date = current_date.replace(month=current_date.month + 1)
-                        
-                        if target_year_months:
-                            workload_qs = workload_qs.filter(year_month__in=target_year_months)
-                    
-                    # 工数を計算
-                    total_used_workdays = Decimal('0.0')
-                    total_newbie_workdays = Decimal('0.0')
-                    
-                    for workload in workload_qs:
-                        try:
-                            if aggregation_record.order_date and aggregation_record.actual_end_date:
-                                year, month = map(int, workload.year_month.split('-'))
-                                
-                                period_start = max(
-                                    aggregation_record.order_date,
-                                    datetime(year, month, 1).date()
-                                )
-                                
-                                last_day = calendar.monthrange(year, month)[1]
-                                period_end = min(
-                                    aggregation_record.actual_end_date,
-                                    datetime(year, month, last_day).date()
-                                )
-                                
-                                month_hours = 0
-                                for day in range(period_start.day, period_end.day + 1):
-                                    if day <= last_day:
-                                        day_hours = workload.get_day_value(day)
-                                        month_hours += day_hours
-                                
-                            else:
-                                month_hours = workload.total_hours
-                            
-                            # 型をDecimalに統一
-                            workdays = Decimal(str(month_hours)) / Decimal('8.0')
-                            
-                            if hasattr(workload.user, 'is_newbie') and workload.user.is_newbie:
-                                total_newbie_workdays += workdays
-                            else:
-                                total_used_workdays += workdays
-                                
-                        except Exception as calc_error:
-                            logger.warning(f"工数計算エラー (WorkloadID: {workload.id}): {calc_error}")
-                            continue
-                    
-                    # === 【集計レコードを更新（工数+外注費）】 ===
-                    # 更新前の値を記録（比較用）
-                    old_outsourcing_cost = Decimal(str(aggregation_record.outsourcing_cost_excluding_tax or 0))
-                    
-                    aggregation_record.used_workdays = total_used_workdays
-                    aggregation_record.newbie_workdays = total_newbie_workdays
-                    aggregation_record.outsourcing_cost_excluding_tax = updated_outsourcing_cost
-                    aggregation_record.updated_at = timezone.now()
-                    
-                    # === 【使用可能金額の自動計算・更新】 ===
-                    if hasattr(aggregation_record, 'available_amount'):
-                        try:
-                            calculated_available = aggregation_record.calculated_available_amount
-                            aggregation_record.available_amount = calculated_available
-                            logger.debug(f"使用可能金額を自動更新: {calculated_available}")
-                        except Exception as calc_error:
-                            logger.warning(f"使用可能金額計算エラー (ID: {aggregation_record.id}): {calc_error}")
-                    
-                    # 保存実行
-                    aggregation_record.save()
-                    
-                    # === 【更新結果をログ出力】 ===
-                    logger.info(f"更新完了: ID={aggregation_record.id}, "
-                              f"チケット={aggregation_record.case_name.title}, "
-                              f"使用工数={float(total_used_workdays):.1f}, "
-                              f"新入社員工数={float(total_newbie_workdays):.1f}, "
-                              f"外注費: ¥{float(old_outsourcing_cost):,.0f} → ¥{float(updated_outsourcing_cost):,.0f}")
-                    
-                    updated_count += 1
-                    
-                else:
-                    logger.warning(f"チケットが設定されていません: ID={aggregation_record.id}")
-                    error_count += 1
-                    
-            except Exception as e:
-                logger.error(f"工数更新エラー (ID: {aggregation_record.id}): {str(e)}")
-                error_count += 1
-                continue
+        # 対象レコードを一括で再計算（集計クエリ数は対象件数に依存しない）
+        started = time.perf_counter()
+        result = recalculate_aggregations(queryset)
+        updated_count = result['updated_count']
+        error_count = result['error_count']
+        RECALCULATION_DURATION.observe(time.perf_counter() - started, 'bulk_update_work_hours')
+        RECALCULATION_RECORDS.inc(updated_count, 'bulk_update_work_hours', 'updated')
+        RECALCULATION_RECORDS.inc(error_count, 'bulk_update_work_hours', 'error')
         
         logger.info(f"工数一括更新完了 - 更新: {updated_count}件, エラー: {error_count}件")
         
@@ -1753,10 +1254,6 @@ def sync_outsourcing_costs(request):
         data = json.loads(request.body)
         filter_params = data.get('filter_params', {})
         
-        from .models import WorkloadAggregation
-        # === 【修正】正しいインポートパスに変更 ===
-        from apps.cost_master.models import OutsourcingCost
-        
         # フィルター条件を適用
         queryset = WorkloadAggregation.objects.all()
         
@@ -1783,87 +1280,18 @@ def sync_outsourcing_costs(request):
         
         logger.info(f"外注費同期対象レコード数: {queryset.count()}件")
         
-        updated_count = 0
-        error_count = 0
-        
-        for aggregation_record in queryset:
-            try:
-                if aggregation_record.case_name:
-                    # 年月の決定ロジック
-                    if hasattr(aggregation_record, 'year_month') and aggregation_record.year_month:
-                        target_year_month = aggregation_record.year_month
-                    elif aggregation_record.order_date:
-                        target_year_month = aggregation_record.order_date.strftime('%Y-%m')
-                    else:
-                        target_year_month = datetime.now().strftime('%Y-%m')
-                    
-                    # 外注費の取得と合計計算
-                    try:
-                        # === 【デバッグログ追加】 ===
-                        logger.debug(f"外注費同期: チケット={aggregation_record.case_name.title}, "
-                                   f"チケットID={aggregation_record.case_name.id}, "
-                                   f"年月={target_year_month}")
-                        
-                        outsourcing_costs = OutsourcingCost.objects.filter(
-                            ticket=aggregation_record.case_name,
-                            year_month=target_year_month,
-                            is_active=True
-                        )
-                        
-                        logger.debug(f"マッチした外注費レコード数: {outsourcing_costs.count()}件")
-                        
-                        total_outsourcing_cost = Decimal('0.0')
-                        for cost_record in outsourcing_costs:
-                            amount = Decimal(str(cost_record.total_cost or 0))
-                            total_outsourcing_cost += amount
-                            logger.debug(f"外注費: ID={cost_record.id}, 金額=¥{amount:,}")
-                        
-                        # 既存の外注費と比較
-                        current_cost = Decimal(str(aggregation_record.outsourcing_cost_excluding_tax or 0))
-                        
-                        logger.info(f"外注費比較: 現在=¥{float(current_cost):,.0f}, "
-                                  f"新規=¥{float(total_outsourcing_cost):,.0f}")
-                        
-                        # 外注費が変更されている場合のみ更新
-                        if total_outsourcing_cost != current_cost:
-                            aggregation_record.outsourcing_cost_excluding_tax = total_outsourcing_cost
-                            
-                            # 使用可能金額の自動再計算
-                            if hasattr(aggregation_record, 'available_amount'):
-                                try:
-                                    calculated_available = aggregation_record.calculated_available_amount
-                                    aggregation_record.available_amount = calculated_available
-                                except Exception as calc_error:
-                                    logger.warning(f"使用可能金額計算エラー (ID: {aggregation_record.id}): {calc_error}")
-                            
-                            aggregation_record.updated_at = timezone.now()
-                            aggregation_record.save()
-                            
-                            logger.info(f"外注費同期完了: ID={aggregation_record.id}, "
-                                      f"チケット={aggregation_record.case_name.title}, "
-                                      f"年月={target_year_month}, "
-                                      f"旧外注費=¥{float(current_cost):,.0f}, "
-                                      f"新外注費=¥{float(total_outsourcing_cost):,.0f}")
-                            
-                            updated_count += 1
-                        else:
-                            logger.debug(f"外注費変更なし: ID={aggregation_record.id}, 外注費=¥{float(total_outsourcing_cost):,.0f}")
-                        
-                    except Exception as outsourcing_error:
-                        logger.error(f"外注費取得エラー (ID: {aggregation_record.id}): {outsourcing_error}")
-                        error_count += 1
-                        continue
-                        
-                else:
-                    logger.warning(f"チケットが設定されていません: ID={aggregation_record.id}")
-                    error_count += 1
-                    
-            except Exception as e:
-                logger.error(f"外注費同期エラー (ID: {aggregation_record.id}): {str(e)}")
-                error_count += 1
-                continue
+        # 外注費を (チケット, 年月) ごとに一括集計して同期（クエリ数は対象件数に依存しない）
+        started = time.perf_counter()
+        result = recalculate_outsourcing_costs(queryset)
+        processed_count = result['processed_count']
+        updated_count = result['updated_count']
+        error_count = result['error_count']
         
         logger.info(f"外注費同期完了 - 更新: {updated_count}件, エラー: {error_count}件")
+        RECALCULATION_DURATION.observe(time.perf_counter() - started, 'sync_outsourcing_costs')
+        RECALCULATION_RECORDS.inc(updated_count, 'sync_outsourcing_costs', 'updated')
+        RECALCULATION_RECORDS.inc(processed_count - updated_count - error_count, 'sync_outsourcing_costs', 'unchanged')
+        RECALCULATION_RECORDS.inc(error_count, 'sync_outsourcing_costs', 'error')
         
         return JsonResponse({
             'success': True,
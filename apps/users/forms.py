@@ -52,7 +52,7 @@ class CustomUserCreationForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['department'].queryset = Department.objects.filter(is_active=True)
-        self.fields['section'].queryset = Section.objects.filter(is_active=True)
+        self.fields['section'].queryset = Section.objects.filter(is_active=True).select_related('department')
         self.fields['department'].empty_label = "選択してください"
         self.fields['section'].empty_label = "選択してください"
         self.fields['employee_level'].empty_label = "選択してください"
@@ -148,7 +148,7 @@ class SuperUserEditForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['department'].queryset = Department.objects.filter(is_active=True)
-        self.fields['section'].queryset = Section.objects.filter(is_active=True)
+        self.fields['section'].queryset = Section.objects.filter(is_active=True).select_related('department')
         self.fields['department'].empty_label = "選択してください"
         self.fields['section'].empty_label = "選択してください"
         self.fields['employee_level'].empty_label = "選択してください"
@@ -175,7 +175,7 @@ class UserEditForm(forms.ModelForm):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.fields['department'].queryset = Department.objects.filter(is_active=True)
-        self.fields['section'].queryset = Section.objects.filter(is_active=True)
+        self.fields['section'].queryset = Section.objects.filter(is_active=True).select_related('department')
         self.fields['department'].empty_label = "選択してください"
         self.fields['section'].empty_label = "選択してください"
         self.fields['employee_level'].empty_label = "選択してください"
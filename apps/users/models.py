@@ -112,12 +112,16 @@ class Department(models.Model):
 
     @property
     def active_users_count(self):
-        """アクティブユーザー数"""
+        """アクティブユーザー数（active_users_total を annotate 済みならクエリを発行しない）"""
+        if hasattr(self, 'active_users_total'):
+            return self.active_users_total
         return self.users.filter(is_active=True).count()
 
     @property
     def sections_count(self):
-        """課の数"""
+        """課の数（sections_total を annotate 済みならクエリを発行しない）"""
+        if hasattr(self, 'sections_total'):
+            return self.sections_total
         return self.sections.filter(is_active=True).count()
 
 class Section(models.Model):
@@ -170,7 +174,9 @@ class Section(models.Model):
 
     @property
     def active_users_count(self):
-        """アクティブユーザー数"""
+        """アクティブユーザー数（active_users_total を annotate 済みならクエリを発行しない）"""
+        if hasattr(self, 'active_users_total'):
+            return self.active_users_total
         return self.users.filter(is_active=True).count()
 
 class UserProfile(models.Model):
@@ -15,9 +15,9 @@ from .models import CustomUser, Department, Section
 from .forms import CustomUserCreationForm, UserEditForm, ProfileEditForm, DepartmentForm, SectionForm, SuperUserEditForm
 import logging
 import json
-import pandas as pd
 from datetime import datetime
 from django.http import HttpResponse
+from apps.core.excel_export import excel_response
 from apps.core.decorators import (
     leader_or_superuser_required_403,
     LeaderOrSuperuserRequiredMixin
@@ -288,11 +288,20 @@ class DepartmentDetailView(LeaderOrSuperuserRequiredMixin, DetailView):
     template_name = 'users/department/department_detail.html'
     context_object_name = 'department'
 
+    def get_queryset(self):
+        return Department.objects.select_related('manager').annotate(
+            active_users_total=Count('users', filter=models.Q(users__is_active=True), distinct=True),
+            sections_total=Count('sections', filter=models.Q(sections__is_active=True), distinct=True),
+        )
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        department = self.get_object()
-        context['sections'] = department.sections.filter(is_active=True)
-        context['users'] = department.users.filter(is_active=True)
+        department = self.object
+        # 課一覧は無効な課も表示する。課長・人数は課ごとに問い合わせずまとめて取得
+        context['sections'] = department.sections.select_related('manager').annotate(
+            active_users_total=Count('users', filter=models.Q(users__is_active=True))
+        )
+        context['users'] = department.users.filter(is_active=True).select_related('section')
         return context
 
 class DepartmentCreateView(LeaderOrSuperuserRequiredMixin, CreateView):
@@ -341,6 +350,21 @@ class SectionDetailView(LeaderOrSuperuserRequiredMixin, DetailView):
     template_name = 'users/section/section_detail.html'
     context_object_name = 'section'
 
+    # 所属ユーザー一覧の表示件数
+    USER_DISPLAY_LIMIT = 10
+
+    def get_queryset(self):
+        return Section.objects.select_related('department', 'manager').annotate(
+            user_count=Count('users'),
+            active_users_total=Count('users', filter=models.Q(users__is_active=True)),
+        )
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['section_users'] = self.object.users.all()[:self.USER_DISPLAY_LIMIT]
+        context['remaining_user_count'] = max(self.object.user_count - self.USER_DISPLAY_LIMIT, 0)
+        return context
+
 class SectionCreateView(LeaderOrSuperuserRequiredMixin, CreateView):
     model = Section
     form_class = SectionForm
@@ -765,52 +789,34 @@ def user_password_display(request):
 def user_export(request):
     """ユーザー一覧をExcelファイルでエクスポート"""
     try:
-        users = CustomUser.objects.select_related('department').all().order_by('date_joined')
-        
-        data = []
-        for user in users:
-            data.append({
-                'ユーザー名': user.username,
-                'メールアドレス': user.email,
-                '姓': user.first_name,
-                '名': user.last_name,
-                'フルネーム': user.get_full_name(),
-                '所属部署': user.department.name if user.department else '未設定',
-                '社員レベル': user.get_employee_level_display() if user.employee_level else '未設定',
-                'リーダー権限': 'はい' if user.is_leader else 'いいえ',
-                'アクティブ': 'はい' if user.is_active else 'いいえ',
-                '最終ログイン': user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else '未ログイン',
-                '登録日': user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
-            })
-        
-        df = pd.DataFrame(data)
-        
-        response = HttpResponse(
-            content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+        users = CustomUser.objects.select_related('department').order_by('date_joined')
+        
+        headers = [
+            'ユーザー名', 'メールアドレス', '姓', '名', 'フルネーム', '所属部署',
+            '社員レベル', 'リーダー権限', 'アクティブ', '最終ログイン', '登録日',
+        ]
+        rows = (
+            [
+                user.username,
+                user.email,
+                user.first_name,
+                user.last_name,
+                user.get_full_name(),
+                user.department.name if user.department else '未設定',
+                user.get_employee_level_display() if user.employee_level else '未設定',
+                'はい' if user.is_leader else 'いいえ',
+                'はい' if user.is_active else 'いいえ',
+                user.last_login.strftime('%Y-%m-%d %H:%M:%S') if user.last_login else '未ログイン',
+                user.date_joined.strftime('%Y-%m-%d %H:%M:%S'),
+            ]
+            for user in users.iterator(chunk_size=2000)
         )
         
         timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
         filename = f'ユーザー一覧_{timestamp}.xlsx'
-        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response = excel_response(filename, 'ユーザー一覧', headers, rows)
         
-        with pd.ExcelWriter(response, engine='openpyxl') as writer:
-            df.to_excel(writer, sheet_name='ユーザー一覧', index=False)
-            
-            # 列幅調整
-            worksheet = writer.sheets['ユーザー一覧']
-            for column in worksheet.columns:
-                max_length = 0
-                column_letter = column[0].column_letter
-                for cell in column:
-                    try:
-                        if len(str(cell.value)) > max_length:
-                            max_length = len(str(cell.value))
-                    except:
-                        pass
-                adjusted_width = min(max_length + 2, 50)
-                worksheet.column_dimensions[column_letter].width = adjusted_width
-        
-        messages.success(request, f'ユーザー一覧をExcelファイルとしてエクスポートしました。（{len(data)}件）')
+        messages.success(request, f'ユーザー一覧をExcelファイルとしてエクスポートしました。（{users.count()}件）')
         return response
         
     except Exception as e:
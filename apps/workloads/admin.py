@@ -13,18 +13,16 @@ def get_admin_stats():
     """管理画面用の統計情報を取得"""
     from apps.users.models import CustomUser
     from apps.projects.models import Project, ProjectTicket
-    from apps.workloads.models import WorkRecord
+    from apps.workloads.models import WorkloadEntry
     from django.utils import timezone
     
-    current_month = timezone.now().replace(day=1)
+    current_month = timezone.localdate().replace(day=1)
     
     return {
         'user_count': CustomUser.objects.filter(is_active=True).count(),
         'project_count': Project.objects.filter(is_active=True).count(),
         'ticket_count': ProjectTicket.objects.exclude(status='closed').count(),
-        'workload_count': WorkRecord.objects.filter(
-            work_date__gte=current_month
-        ).count(),
+        'workload_count': WorkloadEntry.objects.in_range(current_month).count(),
     }
 
 # カスタムAdminSiteを作成（オプション）
@@ -45,6 +43,32 @@ def admin_index_context(request):
         return get_admin_stats()
     return {}
 
+class MonthTotalFilter(admin.SimpleListFilter):
+    """月合計時間の範囲で絞り込み（DB で計算した月合計を使用）"""
+    title = '合計時間'
+    parameter_name = 'month_hours'
+    
+    RANGES = {
+        'zero': ('0時間', 0, 0),
+        'under_40': ('40時間未満', 0.1, 39.9),
+        '40_80': ('40〜80時間', 40, 79.9),
+        '80_160': ('80〜160時間', 80, 159.9),
+        'over_160': ('160時間以上', 160, None),
+    }
+    
+    def lookups(self, request, model_admin):
+        return [(key, label) for key, (label, _, _) in self.RANGES.items()]
+    
+    def queryset(self, request, queryset):
+        if self.value() not in self.RANGES:
+            return queryset
+        _, low, high = self.RANGES[self.value()]
+        # month_hours は WorkloadAdmin.get_queryset で注釈済み
+        queryset = queryset.filter(month_hours__gte=low)
+        if high is not None:
+            queryset = queryset.filter(month_hours__lte=high)
+        return queryset
+
 @admin.register(Workload)
 class WorkloadAdmin(admin.ModelAdmin):
     """工数管理画面（カレンダー形式対応）"""
@@ -61,6 +85,7 @@ class WorkloadAdmin(admin.ModelAdmin):
     ]
     list_filter = [
         'year_month',
+        MonthTotalFilter,
         'user__department',  # userを通してdepartmentにアクセス
         'user__section',     # userを通してsectionにアクセス
         'project',
@@ -113,14 +138,18 @@ class WorkloadAdmin(admin.ModelAdmin):
     get_section.admin_order_field = 'user__section__name'
     
     def total_hours(self, obj):
-        """合計時間を表示"""
-        return f"{obj.total_hours:.1f}時間"
+        """合計時間を表示（一覧では DB で計算した月合計を使用）"""
+        hours = getattr(obj, 'month_hours', None)
+        return f"{hours if hours is not None else obj.total_hours:.1f}時間"
     total_hours.short_description = '合計時間'
+    total_hours.admin_order_field = 'month_hours'
     
     def total_days(self, obj):
         """合計人日を表示"""
-        return f"{obj.total_days:.1f}人日"
+        days = getattr(obj, 'month_days', None)
+        return f"{days if days is not None else obj.total_days:.1f}人日"
     total_days.short_description = '合計人日'
+    total_days.admin_order_field = 'month_hours'
     
     def get_queryset(self, request):
         """クエリセットを最適化"""
@@ -130,7 +159,7 @@ class WorkloadAdmin(admin.ModelAdmin):
             'user__section',
             'project',
             'ticket'
-        )
+        ).with_month_total()
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         """外部キーフィールドのクエリセットを最適化"""
@@ -149,11 +178,11 @@ class WorkloadAdmin(admin.ModelAdmin):
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
     
     # カスタムアクション
-    actions = ['export_workload_summary']
+    actions = ['export_workload_summary', 'rollover_to_next_month']
     
     def export_workload_summary(self, request, queryset):
         """選択された工数のサマリーを表示"""
-        total_hours = sum(w.total_hours for w in queryset)
+        total_hours = queryset.month_total_hours()
         total_days = total_hours / 8
         
         self.message_user(
@@ -163,6 +192,20 @@ class WorkloadAdmin(admin.ModelAdmin):
         )
     export_workload_summary.short_description = "選択された工数のサマリーを表示"
     
+    def rollover_to_next_month(self, request, queryset):
+        """選択された工数行を工数0の行として翌月へ複製（年月ごとに1ステートメント）"""
+        from . import rollover
+        
+        created = 0
+        for year_month in queryset.order_by().values_list('year_month', flat=True).distinct():
+            created += rollover.rollover_workloads(
+                queryset.filter(year_month=year_month),
+                rollover.next_year_month(year_month)
+            )
+        
+        self.message_user(request, f"{created}件の工数行を翌月へ複製しました（既存・無効な行は除外）。")
+    rollover_to_next_month.short_description = "選択された工数行を翌月へ複製"
+    
     # 日付フィールドの階層表示
     date_hierarchy = 'created_at'
     
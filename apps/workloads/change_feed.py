@@ -0,0 +1,230 @@
+"""
+工数カレンダーの変更通知（Server-Sent Events）
+
+セル更新（update_workload_ajax / bulk_update_workload_ajax）はコミット後に
+プロセス内の変更バス（ChangeBus）へ送られ、同じプロセスの SSE 接続へすぐに届く。
+同じセルへの連続した変更は送信前にまとめ（最後の値のみ）、範囲外の工数行は除外する。
+別のワーカープロセスでの変更は届かないため、工数行の更新日時を定期的に確認し、
+変更された行をまとめて送る（DB ポーリングによる補完）。
+
+イベント:
+    cells  {"year_month", "cells": [[工数ID, 日, 時間], ...], "totals": {工数ID: 合計時間}}
+    rows   グリッドの差分（apps.workloads.grid.build_grid の since 指定時と同じ形式）
+イベントIDは「バスの通番|最終更新日時」で、再接続時の Last-Event-ID から続きを送る。
+
+SSE 接続は最大 DEFAULT_STREAM_SECONDS 秒ワーカーを占有するため、既定では無効
+（WORKLOAD_CHANGE_FEED_ENABLED）。無効の間、画面は grid の差分同期を定期的に呼ぶ。
+"""
+import calendar
+import json
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import transaction
+
+from . import grid
+
+# SSE 接続1回あたりの最大秒数（ブラウザは retry 後に自動で再接続する）
+DEFAULT_STREAM_SECONDS = 30
+# 別プロセスでの変更を確認する間隔（秒、0 で確認しない）
+DEFAULT_POLL_SECONDS = 10
+# 連続した変更をまとめる待ち時間（秒）
+DEFAULT_COALESCE_SECONDS = 0.3
+# 変更がないときのコメント送信間隔（接続維持用、秒）
+KEEPALIVE_SECONDS = 15
+# 再接続までの待ち時間（ミリ秒）
+RETRY_MILLISECONDS = 3000
+
+
+def _setting(name, default):
+    return getattr(settings, name, default)
+
+
+def is_enabled():
+    """変更通知（SSE）を使うか（WORKLOAD_CHANGE_FEED_ENABLED、既定は無効）"""
+    return bool(_setting('WORKLOAD_CHANGE_FEED_ENABLED', False))
+
+
+class ChangeBus:
+    """
+    プロセス内の変更バス。
+
+    発行された変更に通番を付けて直近の一定件数だけ保持し、
+    待機中の SSE 接続を起こす。
+    """
+
+    def __init__(self, maxlen=1000):
+        self._events = deque(maxlen=maxlen)
+        self._seq = 0
+        self._condition = threading.Condition()
+
+    @property
+    def last_seq(self):
+        with self._condition:
+            return self._seq
+
+    def publish(self, year_month, changes):
+        """変更を発行して通番を返す。changes: [(工数ID, 日, 時間, 行の合計時間), ...]"""
+        with self._condition:
+            self._seq += 1
+            self._events.append((self._seq, year_month, list(changes)))
+            self._condition.notify_all()
+            return self._seq
+
+    def wait(self, seq, timeout):
+        """通番 seq より新しい変更が発行されるまで待つ（発行されたら True）"""
+        with self._condition:
+            return self._condition.wait_for(lambda: self._seq > seq, timeout=timeout)
+
+    def changes_after(self, seq, year_month):
+        """
+        通番 seq より後の、指定年月の変更を返す。
+        戻り値: (変更のリスト, 最新の通番, 取りこぼしの有無)
+        """
+        with self._condition:
+            oldest = self._events[0][0] if self._events else self._seq + 1
+            missed = seq + 1 < oldest
+            changes = [
+                change
+                for event_seq, event_year_month, event_changes in self._events
+                if event_seq > seq and event_year_month == year_month
+                for change in event_changes
+            ]
+            return changes, self._seq, missed
+
+
+bus = ChangeBus()
+
+
+def publish_cells(year_month, changes):
+    """コミット後に変更を発行（トランザクション外なら即時）"""
+    changes = list(changes)
+    if changes:
+        transaction.on_commit(lambda: bus.publish(year_month, changes))
+
+
+def coalesce(changes):
+    """同じセルへの変更を最後の値にまとめ、行ごとの最新の合計時間を返す"""
+    cells = {}
+    totals = {}
+    for workload_id, day, hours, total_hours in changes:
+        cells[(workload_id, day)] = hours
+        totals[workload_id] = total_hours
+    return cells, totals
+
+
+def format_event(event, data, event_id=None):
+    """SSE のイベント文字列"""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    lines.append(f'data: {json.dumps(data, ensure_ascii=False, separators=(",", ":"))}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def parse_event_id(value):
+    """Last-Event-ID（通番|最終更新日時）を (通番, 最終更新日時) に変換（不正値は None）"""
+    if not value or '|' not in value:
+        return None
+    seq, watermark = value.split('|', 1)
+    try:
+        seq = int(seq)
+    except ValueError:
+        return None
+    return seq, grid.parse_since(watermark)
+
+
+def event_stream(user, year_month, department_filter='', section_filter='', last_event_id=None,
+                 stream_seconds=None, poll_seconds=None, coalesce_seconds=None):
+    """表示範囲の変更を SSE 形式で順に返すジェネレーター"""
+    stream_seconds = _setting('WORKLOAD_FEED_STREAM_SECONDS', DEFAULT_STREAM_SECONDS) if stream_seconds is None else stream_seconds
+    poll_seconds = _setting('WORKLOAD_FEED_POLL_SECONDS', DEFAULT_POLL_SECONDS) if poll_seconds is None else poll_seconds
+    coalesce_seconds = _setting('WORKLOAD_FEED_COALESCE_SECONDS', DEFAULT_COALESCE_SECONDS) if coalesce_seconds is None else coalesce_seconds
+
+    year, month, year_month = grid.parse_year_month(year_month)
+    days_in_month = calendar.monthrange(year, month)[1]
+    workloads = grid.scoped_workloads(user, year_month, department_filter, section_filter)
+
+    # 範囲の状態（件数・ID合計・最終更新日時）。変わっていれば行の追加・更新・削除がある
+    known_state = None
+    resume = parse_event_id(last_event_id)
+    if resume:
+        seq, watermark = resume
+        # 別プロセス（再起動前を含む）の通番なら、バスは現在から読み、差分は DB で補う
+        if seq > bus.last_seq:
+            seq = bus.last_seq
+    else:
+        seq = bus.last_seq
+        state = grid.grid_state(workloads)
+        watermark = state['watermark']
+        known_state = state
+
+    def event_id():
+        return f"{seq}|{watermark.isoformat() if watermark else ''}"
+
+    yield f'retry: {RETRY_MILLISECONDS}\n\n'
+
+    started = time.monotonic()
+    deadline = started + stream_seconds
+    next_poll = started if resume else started + poll_seconds
+    last_sent = started
+
+    while True:
+        now = time.monotonic()
+        if now >= deadline:
+            break
+
+        wake_at = min(deadline, last_sent + KEEPALIVE_SECONDS)
+        if poll_seconds:
+            wake_at = min(wake_at, next_poll)
+        if bus.wait(seq, timeout=max(wake_at - now, 0)):
+            # 連続した入力をまとめてから送る
+            time.sleep(coalesce_seconds)
+            changes, seq, missed = bus.changes_after(seq, year_month)
+            if missed:
+                # バスの保持件数を超えた場合は DB から補う
+                next_poll = time.monotonic()
+            cells, totals = coalesce(changes)
+            if cells:
+                visible = set(workloads.filter(
+                    id__in={workload_id for workload_id, _ in cells}
+                ).values_list('id', flat=True))
+                payload = {
+                    'year_month': year_month,
+                    'cells': [
+                        [workload_id, day, hours]
+                        for (workload_id, day), hours in cells.items()
+                        if workload_id in visible
+                    ],
+                    'totals': {
+                        workload_id: total for workload_id, total in totals.items()
+                        if workload_id in visible
+                    },
+                }
+                if payload['cells']:
+                    last_sent = time.monotonic()
+                    yield format_event('cells', payload, event_id())
+
+        now = time.monotonic()
+        if poll_seconds and now >= next_poll:
+            next_poll = now + poll_seconds
+            state = grid.grid_state(workloads)
+            if state != known_state:
+                data = grid.build_grid(workloads, days_in_month, since=watermark)
+                known_state = state
+                watermark = state['watermark'] or watermark
+                data.update({
+                    'year_month': year_month,
+                    'row_count': state['row_count'],
+                    'watermark': watermark.isoformat() if watermark else None,
+                })
+                last_sent = time.monotonic()
+                yield format_event('rows', data, event_id())
+                continue
+
+        if time.monotonic() - last_sent >= KEEPALIVE_SECONDS:
+            last_sent = time.monotonic()
+            yield ': keepalive\n\n'
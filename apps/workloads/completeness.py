@@ -0,0 +1,157 @@
+"""
+タイムシートの入力状況（未入力日）レポート
+
+対象月の工数行を担当者ごとに日別合計した1回の集計クエリと、
+営業日（土日祝を除く）のマスクから、締め日までの営業日で工数が0の日を担当者ごとに求める。
+担当者数 × 日数の NumPy 配列で判定するため、担当者が数百人でも行単位のループは発生しない。
+"""
+import calendar
+from datetime import date
+
+import numpy as np
+from django.contrib.auth import get_user_model
+from django.db.models import FloatField, Sum
+from django.db.models.functions import Cast
+from django.utils import timezone
+
+from apps.core.calendar_service import get_month_calendar
+
+from .models import Workload
+
+User = get_user_model()
+
+DAY_FIELDS = [f'day_{day:02d}' for day in range(1, 32)]
+
+CSV_HEADERS = ['部署', '課', 'ユーザー名', '氏名', '営業日数', '入力済み日数', '未入力日数', '入力率（%）', '合計時間', '未入力日']
+
+
+def resolve_cutoff(year, month, cutoff=None):
+    """
+    締め日（この日までの営業日を判定する）を月内の日にちで返す。
+    省略時は、今月なら今日、過去の月なら月末、未来の月なら0（判定対象なし）。
+    """
+    days_in_month = calendar.monthrange(year, month)[1]
+    if cutoff is None:
+        cutoff = timezone.localdate()
+    if (cutoff.year, cutoff.month) < (year, month):
+        return 0
+    if (cutoff.year, cutoff.month) > (year, month):
+        return days_in_month
+    return min(cutoff.day, days_in_month)
+
+
+def scoped_users(department_id=None, section_id=None):
+    """対象の担当者（有効なユーザー、部署・課で絞り込み可）"""
+    users = User.objects.filter(is_active=True)
+    if department_id:
+        users = users.filter(department_id=department_id)
+    if section_id:
+        users = users.filter(section_id=section_id)
+    return users
+
+
+def user_day_hours(year_month, users, days_in_month):
+    """
+    担当者ごとの日別合計（0.1時間単位の整数行列、担当者 × 日）を1回の集計クエリで取得。
+    戻り値: (担当者IDの配列, 行列)
+    """
+    day_fields = DAY_FIELDS[:days_in_month]
+    rows = list(
+        Workload.objects.filter(year_month=year_month, user__in=users)
+        .order_by()
+        .values('user_id')
+        .annotate(**{f'sum_{field}': Sum(Cast(field, FloatField())) for field in day_fields})
+        .values_list('user_id', *[f'sum_{field}' for field in day_fields])
+    )
+    user_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    if rows:
+        hours = np.array([row[1:] for row in rows], dtype=np.float64)
+        tenths = np.rint(np.nan_to_num(hours) * 10).astype(np.int64)
+    else:
+        tenths = np.zeros((0, days_in_month), dtype=np.int64)
+    return user_ids, tenths
+
+
+def completeness_report(year_month, cutoff=None, department_id=None, section_id=None):
+    """
+    入力状況レポートを作成する。
+
+    戻り値:
+        year_month, cutoff_day, cutoff_date, business_days（締め日までの営業日数）,
+        rows（担当者ごと。未入力日数の多い順）, summary（人数・未入力者数・未入力日数の合計）
+    """
+    year, month = map(int, year_month.split('-'))
+    month_calendar = get_month_calendar(year, month)
+    days_in_month = month_calendar.days_in_month
+    cutoff_day = resolve_cutoff(year, month, cutoff)
+
+    users = scoped_users(department_id, section_id)
+    user_rows = list(users.values_list(
+        'id', 'username', 'first_name', 'last_name', 'department__name', 'section__name'
+    ))
+    workload_user_ids, tenths = user_day_hours(year_month, users, days_in_month)
+
+    # 担当者の並び（user_rows）に合わせた日別合計の行列（工数行のない担当者は0）
+    matrix = np.zeros((len(user_rows), days_in_month), dtype=np.int64)
+    if len(workload_user_ids):
+        position = {user_id: index for index, (user_id, *_) in enumerate(user_rows)}
+        indexes = np.array([position[user_id] for user_id in workload_user_ids], dtype=np.int64)
+        matrix[indexes] = tenths
+
+    # 締め日までの営業日のうち、合計が0の日
+    expected = np.zeros(days_in_month, dtype=bool)
+    expected[:cutoff_day] = month_calendar.business_days[:cutoff_day]
+    missing = (matrix == 0) & expected
+    missing_counts = missing.sum(axis=1)
+    business_days = int(expected.sum())
+    totals = matrix.sum(axis=1) / 10
+
+    rows = []
+    for index, (user_id, username, first_name, last_name, department_name, section_name) in enumerate(user_rows):
+        missing_count = int(missing_counts[index])
+        rows.append({
+            'user_id': user_id,
+            'username': username,
+            'name': f"{first_name or ''} {last_name or ''}".strip() or username,
+            'department': department_name or '',
+            'section': section_name or '',
+            'business_days': business_days,
+            'filled_days': business_days - missing_count,
+            'missing_count': missing_count,
+            'missing_days': [int(day) + 1 for day in np.flatnonzero(missing[index])],
+            'completion_rate': round((business_days - missing_count) / business_days * 100, 1) if business_days else 100.0,
+            'total_hours': float(totals[index]),
+        })
+    rows.sort(key=lambda row: (-row['missing_count'], row['department'], row['section'], row['username']))
+
+    incomplete = [row for row in rows if row['missing_count']]
+    return {
+        'year_month': year_month,
+        'cutoff_day': cutoff_day,
+        'cutoff_date': date(year, month, cutoff_day) if cutoff_day else None,
+        'business_days': business_days,
+        'rows': rows,
+        'summary': {
+            'user_count': len(rows),
+            'complete_count': len(rows) - len(incomplete),
+            'incomplete_count': len(incomplete),
+            'missing_total': int(missing_counts.sum()),
+        },
+    }
+
+
+def csv_rows(report):
+    """CSV のデータ行（CSV_HEADERS の順）"""
+    for row in report['rows']:
+        yield [
+            row['department'],
+            row['section'],
+            row['username'],
+            row['name'],
+            row['business_days'],
+            row['filled_days'],
+            row['missing_count'],
+            row['completion_rate'],
+            row['total_hours'],
+            ' '.join(str(day) for day in row['missing_days']),
+        ]
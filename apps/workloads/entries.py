@@ -0,0 +1,154 @@
+"""
+日付別工数（WorkloadEntry）の同期・参照
+
+工数行（day_01〜day_31）の書き込みと同じトランザクションで日付別工数を作り直し、
+日付範囲の集計を date 列の索引で行えるようにする。
+save() による書き込みはシグナル（signals.py）で同期し、削除は外部キーの連鎖削除で消える。
+update() / bulk_update / bulk_create はシグナルが送られないため、呼び出し側で sync_workloads / set_entry を呼ぶ。
+月に存在しない日（2月30日など）の値は日付にできないため対象外とする（入力時にも拒否している。models.days_in_month）。
+"""
+import logging
+from datetime import date
+from decimal import Decimal
+
+from django.db import transaction
+
+from .models import Workload, WorkloadEntry, days_in_month
+
+logger = logging.getLogger(__name__)
+
+DAY_FIELDS = [f'day_{day:02d}' for day in range(1, 32)]
+
+# 再作成時に一度に読み込む工数行の件数
+DEFAULT_BATCH_SIZE = 1000
+
+
+def _month_days(year_month):
+    """'YYYY-MM' の (年, 月, 日数)。形式が不正なら None"""
+    days = days_in_month(year_month)
+    if days is None:
+        return None
+    year, month = map(int, year_month.split('-'))
+    return year, month, days
+
+
+def iter_entry_values(workload_id, user_id, project_id, ticket_id, year_month, day_values):
+    """工数行の値から日付別工数を作成（0・未入力の日は作らない）"""
+    month_days = _month_days(year_month)
+    if month_days is None:
+        return
+    year, month, days_in_month = month_days
+    for day, value in enumerate(day_values[:days_in_month], 1):
+        if value:
+            yield WorkloadEntry(
+                workload_id=workload_id,
+                user_id=user_id,
+                project_id=project_id,
+                ticket_id=ticket_id,
+                date=date(year, month, day),
+                hours=Decimal(str(value)),
+            )
+
+
+def build_entries(workload):
+    """工数行1件分の日付別工数（未保存）"""
+    return list(iter_entry_values(
+        workload.pk, workload.user_id, workload.project_id, workload.ticket_id, workload.year_month,
+        [getattr(workload, field) for field in DAY_FIELDS]
+    ))
+
+
+def sync_workloads(workloads):
+    """工数行の日付別工数を作り直す（削除1回 + 一括作成）"""
+    workloads = [workload for workload in workloads if workload.pk]
+    if not workloads:
+        return 0
+    entries = []
+    for workload in workloads:
+        entries.extend(build_entries(workload))
+    with transaction.atomic():
+        WorkloadEntry.objects.filter(workload_id__in=[workload.pk for workload in workloads]).delete()
+        WorkloadEntry.objects.bulk_create(entries)
+    return len(entries)
+
+
+def sync_workload(workload):
+    """工数行1件の日付別工数を作り直す"""
+    return sync_workloads([workload])
+
+
+def entry_date(year_month, day):
+    """年月と日から日付を作成（月に存在しない日は None）"""
+    month_days = _month_days(year_month)
+    if month_days is None or not 1 <= day <= month_days[2]:
+        return None
+    return date(month_days[0], month_days[1], day)
+
+
+def set_entry(workload_id, user_id, project_id, ticket_id, year_month, day, hours):
+    """工数行の1日分だけを反映（0なら削除、それ以外は更新または作成）"""
+    target_date = entry_date(year_month, day)
+    if target_date is None:
+        return
+    entries = WorkloadEntry.objects.filter(workload_id=workload_id, date=target_date)
+    hours = Decimal(str(hours))
+    if not hours:
+        entries.delete()
+        return
+    if not entries.update(hours=hours):
+        WorkloadEntry.objects.create(
+            workload_id=workload_id,
+            user_id=user_id,
+            project_id=project_id,
+            ticket_id=ticket_id,
+            date=target_date,
+            hours=hours,
+        )
+
+
+def _iter_all_entries(batch_size):
+    fields = ['id', 'user_id', 'project_id', 'ticket_id', 'year_month'] + DAY_FIELDS
+    for row in Workload.objects.order_by().values_list(*fields).iterator(chunk_size=batch_size):
+        yield from iter_entry_values(*row[:5], list(row[5:]))
+
+
+def backfill_entries(batch_size=DEFAULT_BATCH_SIZE):
+    """全工数行から日付別工数を作り直す。戻り値は作成件数"""
+    created = 0
+    batch = []
+    with transaction.atomic():
+        WorkloadEntry.objects.all().delete()
+        for entry in _iter_all_entries(batch_size):
+            batch.append(entry)
+            if len(batch) >= batch_size:
+                WorkloadEntry.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        if batch:
+            WorkloadEntry.objects.bulk_create(batch)
+            created += len(batch)
+    logger.info(f"日付別工数を再作成しました: {created}件")
+    return created
+
+
+def verify_entries(batch_size=DEFAULT_BATCH_SIZE):
+    """
+    日付別工数と工数行の差異を返す。
+    戻り値: [((工数ID, 日付), 日付別工数の値, 工数行の値), ...]
+    """
+    expected = {
+        (entry.workload_id, entry.date): entry.hours
+        for entry in _iter_all_entries(batch_size)
+    }
+    actual = {
+        (workload_id, entry_date): hours
+        for workload_id, entry_date, hours in WorkloadEntry.objects.order_by().values_list(
+            'workload_id', 'date', 'hours'
+        ).iterator(chunk_size=batch_size)
+    }
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual)):
+        if expected.get(key, Decimal('0')) != actual.get(key, Decimal('0')):
+            mismatches.append((key, actual.get(key, Decimal('0')), expected.get(key, Decimal('0'))))
+    return mismatches
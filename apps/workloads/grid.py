@@ -0,0 +1,280 @@
+"""
+工数カレンダーのグリッドデータ（JSON 差分同期用）
+
+表示範囲（年月・部署・課・権限）の工数行を、日別工数の配列と
+担当者・プロジェクト・チケットの参照表に分けた小さな JSON で返す。
+範囲の状態（件数・最終更新日時・ID合計）から ETag を作り、
+since（前回の最終更新日時）以降に更新された行だけを返せるようにする。
+
+管理者向けのカレンダーは担当者単位のブロック（部署名・課名・ユーザー名順）に分けて表示し、
+続きのブロックはカーソル（最後の担当者の並びキー）で取得する。
+"""
+import base64
+import calendar
+import hashlib
+import json
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, Max, Q, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import MonthTotal, Workload
+
+User = get_user_model()
+
+DAY_FIELDS = [f'day_{day:02d}' for day in range(1, 32)]
+
+# 行配列の列（hours は日別工数の配列）
+ROW_COLUMNS = ['id', 'user_id', 'project_id', 'ticket_id', 'total_hours', 'hours']
+
+ROW_FIELDS = ['id', 'user_id', 'project_id', 'ticket_id']
+USER_FIELDS = [
+    'user__username', 'user__first_name', 'user__last_name',
+    'user__section__name', 'user__department__name',
+]
+PROJECT_FIELDS = ['project__name']
+TICKET_FIELDS = ['ticket__title', 'ticket__status', 'ticket__priority']
+
+# カレンダーと同じ並び順
+ROW_ORDERING = [
+    'user__department__name', 'user__section__name', 'user__username', 'project__name', 'ticket__title'
+]
+
+# 管理者向けカレンダーの1ブロックあたりの担当者数
+DEFAULT_BLOCK_SIZE = 30
+
+# ブロック分けの並びキー（部署・課が未設定の担当者は空文字として先頭に並べる）
+BLOCK_KEYS = {
+    'block_department': Coalesce(F('user__department__name'), Value('')),
+    'block_section': Coalesce(F('user__section__name'), Value('')),
+}
+BLOCK_ORDERING = ['block_department', 'block_section', 'user__username']
+
+
+def parse_year_month(value):
+    """'YYYY-MM' を (年, 月, 'YYYY-MM') に変換（不正値は現在月）"""
+    try:
+        year, month = map(int, value.split('-'))
+        calendar.monthrange(year, month)
+    except (AttributeError, ValueError, calendar.IllegalMonthError):
+        now = timezone.now()
+        year, month = now.year, now.month
+    return year, month, f"{year:04d}-{month:02d}"
+
+
+def calendar_scope(user, department_filter='', section_filter=''):
+    """
+    ユーザー権限に応じた表示範囲。
+    戻り値: (工数行の絞り込み条件, 表示対象ユーザーのクエリセット)
+    """
+    if user.is_leader or user.is_superuser:
+        # 管理者は全データを表示（部署・課で絞り込み可）
+        workload_filter = {}
+        if department_filter:
+            workload_filter['user__department_id'] = department_filter
+        if section_filter:
+            workload_filter['user__section_id'] = section_filter
+        return workload_filter, User.objects.filter(is_active=True).order_by('username')
+
+    if getattr(user, 'section', None):
+        # 一般ユーザーは自分の課のみ
+        return (
+            {'user__section': user.section},
+            User.objects.filter(is_active=True, section=user.section).order_by('username'),
+        )
+    if getattr(user, 'department', None):
+        # 課がなければ自分の部署のみ
+        return (
+            {'user__department': user.department},
+            User.objects.filter(is_active=True, department=user.department).order_by('username'),
+        )
+    # 自分のみ表示
+    return {'user': user}, User.objects.filter(id=user.id)
+
+
+def scoped_workloads(user, year_month, department_filter='', section_filter=''):
+    """表示範囲の工数行"""
+    workload_filter, _ = calendar_scope(user, department_filter, section_filter)
+    return Workload.objects.filter(year_month=year_month, **workload_filter)
+
+
+def grid_state(queryset):
+    """範囲の状態（件数・最終更新日時・ID合計）を1クエリで取得"""
+    return queryset.order_by().aggregate(
+        row_count=Count('id'),
+        watermark=Max('updated_at'),
+        id_sum=Sum('id'),
+    )
+
+
+def grid_etag(year_month, scope_key, state):
+    """範囲の状態から ETag を作成（行の追加・更新・削除で変わる）"""
+    watermark = state['watermark'].isoformat() if state['watermark'] else ''
+    payload = f"{year_month}|{scope_key}|{state['row_count']}|{state['id_sum'] or 0}|{watermark}"
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def parse_since(value):
+    """since パラメータ（ISO 8601）を aware な日時に変換（不正値は None）"""
+    if not value:
+        return None
+    try:
+        since = parse_datetime(value)
+    except ValueError:
+        return None
+    if since is None:
+        return None
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
+
+
+def _user_label(username, first_name, last_name):
+    return f"{first_name or ''} {last_name or ''}".strip() or username
+
+
+def build_grid(queryset, days_in_month, since=None):
+    """
+    グリッドの JSON データを作成する。
+    since 指定時は、その日時以降に更新された行と、範囲内の全行IDだけを返す
+    （行IDの一覧から削除された行をクライアント側で判定する）。
+    """
+    rows_queryset = queryset
+    if since is not None:
+        # 同時刻の書き込みを取りこぼさないよう境界を含める（重複は上書きで無害）
+        rows_queryset = rows_queryset.filter(updated_at__gte=since)
+
+    day_fields = DAY_FIELDS[:days_in_month]
+    fields = ROW_FIELDS + USER_FIELDS + PROJECT_FIELDS + TICKET_FIELDS + day_fields
+    offset = len(ROW_FIELDS) + len(USER_FIELDS) + len(PROJECT_FIELDS) + len(TICKET_FIELDS)
+
+    rows = []
+    users = {}
+    projects = {}
+    tickets = {}
+    for values in rows_queryset.order_by(*ROW_ORDERING).values_list(*fields):
+        workload_id, user_id, project_id, ticket_id = values[:4]
+        username, first_name, last_name, section_name, department_name = values[4:9]
+        project_name = values[9]
+        ticket_title, ticket_status, ticket_priority = values[10:13]
+
+        hours = [float(value or 0) for value in values[offset:]]
+        rows.append([workload_id, user_id, project_id, ticket_id, round(sum(hours), 1), hours])
+
+        if user_id not in users:
+            users[user_id] = {
+                'name': _user_label(username, first_name, last_name),
+                'section': section_name or '',
+                'department': department_name or '',
+            }
+        if project_id not in projects:
+            projects[project_id] = {'name': project_name}
+        if ticket_id is not None and ticket_id not in tickets:
+            tickets[ticket_id] = {
+                'title': ticket_title,
+                'project_id': project_id,
+                'status': ticket_status,
+                'priority': ticket_priority,
+            }
+
+    grid = {
+        'columns': ROW_COLUMNS,
+        'rows': rows,
+        'users': users,
+        'projects': projects,
+        'tickets': tickets,
+        'full': since is None,
+    }
+    if since is not None:
+        grid['row_ids'] = list(queryset.order_by('id').values_list('id', flat=True))
+    return grid
+
+
+def calendar_block_size():
+    """管理者向けカレンダーの1ブロックあたりの担当者数"""
+    return getattr(settings, 'WORKLOAD_CALENDAR_BLOCK_SIZE', DEFAULT_BLOCK_SIZE)
+
+
+def month_totals(queryset):
+    """
+    範囲全体の集計（行数・担当者数・合計時間）と ETag 用の状態を1クエリで取得
+    """
+    totals = queryset.order_by().aggregate(
+        row_count=Count('id'),
+        watermark=Max('updated_at'),
+        id_sum=Sum('id'),
+        user_count=Count('user', distinct=True),
+        total_hours=Sum(MonthTotal()),
+    )
+    totals['total_hours'] = round(float(totals['total_hours'] or 0), 1)
+    return totals
+
+
+def encode_cursor(keys):
+    """ブロックの並びキー（部署名, 課名, ユーザー名）をカーソル文字列に変換"""
+    payload = json.dumps(list(keys), ensure_ascii=False).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii')
+
+
+def decode_cursor(cursor):
+    """カーソル文字列を並びキーに変換（不正値は None）"""
+    if not cursor:
+        return None
+    try:
+        keys = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')).decode('utf-8'))
+    except (ValueError, UnicodeError):
+        return None
+    if not isinstance(keys, list) or len(keys) != 3 or not all(isinstance(key, str) for key in keys):
+        return None
+    return keys
+
+
+def order_rows(queryset):
+    """カレンダーの行の並び順（ブロックと同じ並びキー + プロジェクト名・チケット名）"""
+    return queryset.annotate(**BLOCK_KEYS).order_by(*BLOCK_ORDERING, 'project__name', 'ticket__title')
+
+
+def user_block(queryset, cursor=None, size=None):
+    """
+    カーソルの次の担当者ブロックを取得する（キーセットページング、1クエリ）。
+    戻り値: (担当者IDのリスト, 次のブロックのカーソル。最後のブロックなら None)
+    """
+    size = size or calendar_block_size()
+    users = queryset.annotate(**BLOCK_KEYS).values_list(
+        *BLOCK_ORDERING, 'user_id'
+    ).order_by(*BLOCK_ORDERING).distinct()
+
+    keys = decode_cursor(cursor)
+    if keys:
+        department, section, username = keys
+        users = users.filter(
+            Q(block_department__gt=department)
+            | Q(block_department=department, block_section__gt=section)
+            | Q(block_department=department, block_section=section, user__username__gt=username)
+        )
+
+    rows = list(users[:size + 1])
+    next_cursor = encode_cursor(rows[size - 1][:3]) if len(rows) > size else None
+    return [row[3] for row in rows[:size]], next_cursor
+
+
+def block_subtotal(queryset, days_in_month):
+    """ブロックの小計（行数・担当者数・日別合計・合計時間）を1クエリで取得"""
+    day_fields = DAY_FIELDS[:days_in_month]
+    totals = queryset.order_by().aggregate(
+        row_count=Count('id'),
+        user_count=Count('user', distinct=True),
+        **{field: Sum(field) for field in day_fields}
+    )
+    day_totals = [float(totals[field] or 0) for field in day_fields]
+    total_hours = round(sum(day_totals), 1)
+    return {
+        'row_count': totals['row_count'],
+        'user_count': totals['user_count'],
+        'day_totals': day_totals,
+        'total_hours': total_hours,
+        'total_days': total_hours / 8,
+    }
@@ -0,0 +1,280 @@
+"""
+工数台帳（WorkloadLedger）の更新・参照
+
+工数の入力・削除時に増減分だけを台帳へ反映し、
+チケット単位の使用工数・新入社員工数を全工数行を走査せずに取得する。
+save() / delete() による書き込みはシグナル（signals.py）で反映する。
+update() / bulk_update / bulk_create はシグナルが送られないため、呼び出し側で apply_deltas を呼ぶ。
+"""
+import calendar
+import logging
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, F, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from .models import MonthTotal, Workload, WorkloadEntry, WorkloadLedger
+
+logger = logging.getLogger(__name__)
+
+DAY_FIELDS = [f'day_{day:02d}' for day in range(1, 32)]
+
+# 新入社員として扱う社員レベル
+NEWBIE_EMPLOYEE_LEVEL = 'junior'
+
+
+def ledger_key(workload, employee_level=None):
+    """工数行に対応する台帳キー (project_id, ticket_id, year_month, employee_level)"""
+    if employee_level is None:
+        employee_level = workload.user.employee_level
+    return (workload.project_id, workload.ticket_id, workload.year_month, employee_level or '')
+
+
+def workload_hours(workload):
+    """
+    工数行の月合計（Decimal）。
+    月に存在しない日の列は入力時に拒否しており常に0のため、日付別工数の合計と一致する。
+    """
+    return sum((getattr(workload, field) or Decimal('0') for field in DAY_FIELDS), Decimal('0'))
+
+
+def apply_deltas(deltas):
+    """
+    台帳キーごとの増減分（時間）を反映する。
+    deltas: {(project_id, ticket_id, year_month, employee_level): Decimal}
+    """
+    now = timezone.now()
+    with transaction.atomic():
+        for key, delta in deltas.items():
+            delta = Decimal(str(delta))
+            if not delta:
+                continue
+            project_id, ticket_id, year_month, employee_level = key
+            lookup = {
+                'project_id': project_id,
+                'ticket_id': ticket_id,
+                'year_month': year_month,
+                'employee_level': employee_level,
+            }
+            updated = WorkloadLedger.objects.filter(**lookup).update(
+                total_hours=F('total_hours') + delta,
+                updated_at=now
+            )
+            if updated:
+                continue
+            if delta < 0:
+                # 減算先の台帳がない（プロジェクト・チケットの削除で台帳ごと削除された）場合は作らない
+                continue
+            try:
+                with transaction.atomic():
+                    WorkloadLedger.objects.create(total_hours=delta, **lookup)
+            except IntegrityError:
+                # 同時に作成された場合は加算で反映
+                WorkloadLedger.objects.filter(**lookup).update(
+                    total_hours=F('total_hours') + delta,
+                    updated_at=now
+                )
+
+
+def stored_workload(workload_id):
+    """保存済みの工数行の (台帳キー, 月合計)。存在しなければ None"""
+    row = Workload.objects.filter(pk=workload_id).values_list(
+        'project_id', 'ticket_id', 'year_month', 'user__employee_level', *DAY_FIELDS
+    ).first()
+    if row is None:
+        return None
+    project_id, ticket_id, year_month, employee_level = row[:4]
+    hours = sum((value or Decimal('0') for value in row[4:]), Decimal('0'))
+    return (project_id, ticket_id, year_month, employee_level or ''), hours
+
+
+def apply_delta(workload, delta_hours):
+    """工数行1件分の増減分を台帳に反映"""
+    apply_deltas({ledger_key(workload): delta_hours})
+
+
+def add_workload(workload):
+    """工数行の合計を台帳に加算（作成時）"""
+    apply_delta(workload, workload_hours(workload))
+
+
+def remove_workload(workload):
+    """工数行の合計を台帳から減算（削除時）"""
+    apply_delta(workload, -workload_hours(workload))
+
+
+def remove_user(user_id, employee_level):
+    """
+    ユーザーの全工数行の合計を台帳から減算（ユーザーの削除時）。
+    工数行の件数によらず1クエリで、台帳キーごとに相関サブクエリで合計を求めて減算する。
+    """
+    # チケットなしの行どうしも同じ台帳キーとして扱うため、チケットIDを0にそろえて比較する
+    user_workloads = Workload.objects.filter(
+        user_id=user_id,
+        project_id=OuterRef('project_id'),
+        year_month=OuterRef('year_month'),
+    ).annotate(
+        ticket_key=Coalesce('ticket_id', Value(0))
+    ).filter(
+        ticket_key=Coalesce(OuterRef('ticket_id'), Value(0))
+    ).order_by()
+    user_hours = user_workloads.values('user_id').annotate(hours=Sum(MonthTotal())).values('hours')
+    WorkloadLedger.objects.filter(
+        Exists(user_workloads),
+        employee_level=employee_level or '',
+    ).update(
+        total_hours=F('total_hours') - Subquery(user_hours, output_field=WorkloadLedger._meta.get_field('total_hours')),
+        updated_at=timezone.now()
+    )
+
+
+def move_user_level(user_id, old_level, new_level):
+    """
+    社員レベルの変更時に、ユーザーの工数を旧レベルの台帳キーから新レベルの台帳キーへ移す。
+    台帳は書き込み時の社員レベルで集計しているため、移さないと工数行からの集計とずれる。
+    """
+    old_level = old_level or ''
+    new_level = new_level or ''
+    if old_level == new_level:
+        return
+    rows = Workload.objects.filter(user_id=user_id).values(
+        'project_id', 'ticket_id', 'year_month'
+    ).annotate(**{field: Sum(field) for field in DAY_FIELDS}).order_by()
+
+    deltas = defaultdict(Decimal)
+    for row in rows:
+        hours = sum((Decimal(str(row[field] or 0)) for field in DAY_FIELDS), Decimal('0'))
+        if not hours:
+            continue
+        deltas[(row['project_id'], row['ticket_id'], row['year_month'], old_level)] -= hours
+        deltas[(row['project_id'], row['ticket_id'], row['year_month'], new_level)] += hours
+    apply_deltas(deltas)
+
+
+def _month_bounds(year_month):
+    """'YYYY-MM' の月初日・月末日"""
+    year, month = map(int, year_month.split('-'))
+    return date(year, month, 1), date(year, month, calendar.monthrange(year, month)[1])
+
+
+def _iter_year_months(start_date, end_date):
+    """開始日〜終了日に含まれる年月を順に返す"""
+    current = start_date.replace(day=1)
+    while current <= end_date:
+        yield current.strftime('%Y-%m')
+        if current.month == 12:
+            current = current.replace(year=current.year + 1, month=1)
+        else:
+            current = current.replace(month=current.month + 1)
+
+
+def get_ticket_hours(ticket_id, start_date=None, end_date=None):
+    """
+    チケットの一般工数・新入社員工数（時間）を取得する。
+
+    期間指定なしは台帳の合計のみ（1クエリ）。
+    期間指定ありは、月全体が期間内の月を台帳から、
+    月の途中で切れる開始月・終了月だけを日付別工数から日付範囲で集計する。
+    戻り値: (一般工数, 新入社員工数)
+    """
+    ledgers = WorkloadLedger.objects.filter(ticket_id=ticket_id)
+    partial_months = []
+
+    if start_date and end_date:
+        year_months = list(_iter_year_months(start_date, end_date))
+        full_months = []
+        for year_month in year_months:
+            month_start, month_end = _month_bounds(year_month)
+            if start_date <= month_start and month_end <= end_date:
+                full_months.append(year_month)
+            else:
+                partial_months.append(year_month)
+        ledgers = ledgers.filter(year_month__in=full_months)
+
+    regular = Decimal('0')
+    newbie = Decimal('0')
+    rows = ledgers.values('employee_level').annotate(total=Sum('total_hours')).order_by()
+    for row in rows:
+        if row['employee_level'] == NEWBIE_EMPLOYEE_LEVEL:
+            newbie += row['total'] or Decimal('0')
+        else:
+            regular += row['total'] or Decimal('0')
+
+    if partial_months:
+        # 月の途中で切れる部分は日付別工数の (ticket, date) 索引で範囲集計
+        ranges = Q()
+        for year_month in partial_months:
+            month_start, month_end = _month_bounds(year_month)
+            ranges |= Q(date__range=(max(start_date, month_start), min(end_date, month_end)))
+        level_sums = WorkloadEntry.objects.filter(ranges, ticket_id=ticket_id).sum_by('user__employee_level')
+        for employee_level, hours in level_sums.items():
+            if employee_level == NEWBIE_EMPLOYEE_LEVEL:
+                newbie += hours
+            else:
+                regular += hours
+
+    return regular, newbie
+
+
+def get_project_hours(project_id, year_month=None):
+    """プロジェクトの合計工数（時間）を台帳から取得"""
+    ledgers = WorkloadLedger.objects.filter(project_id=project_id)
+    if year_month:
+        ledgers = ledgers.filter(year_month=year_month)
+    return ledgers.aggregate(total=Sum('total_hours'))['total'] or Decimal('0')
+
+
+def compute_ledger_from_workloads():
+    """工数行から台帳の正しい値を集計する（キー → 合計時間）"""
+    rows = Workload.objects.values(
+        'project_id', 'ticket_id', 'year_month', 'user__employee_level'
+    ).annotate(**{field: Sum(field) for field in DAY_FIELDS}).order_by()
+
+    expected = defaultdict(Decimal)
+    for row in rows:
+        key = (row['project_id'], row['ticket_id'], row['year_month'], row['user__employee_level'] or '')
+        expected[key] += sum((Decimal(str(row[field] or 0)) for field in DAY_FIELDS), Decimal('0'))
+    return expected
+
+
+def verify_ledger():
+    """
+    台帳と工数行の差異を返す。
+    戻り値: [(キー, 台帳の値, 工数行からの集計値), ...]
+    """
+    expected = compute_ledger_from_workloads()
+    actual = defaultdict(Decimal)
+    for ledger in WorkloadLedger.objects.all():
+        key = (ledger.project_id, ledger.ticket_id, ledger.year_month, ledger.employee_level)
+        actual[key] += ledger.total_hours
+
+    mismatches = []
+    for key in sorted(set(expected) | set(actual), key=str):
+        if expected.get(key, Decimal('0')) != actual.get(key, Decimal('0')):
+            mismatches.append((key, actual.get(key, Decimal('0')), expected.get(key, Decimal('0'))))
+    return mismatches
+
+
+def rebuild_ledger(batch_size=1000):
+    """工数行から台帳を作り直す。戻り値は作成件数"""
+    expected = compute_ledger_from_workloads()
+    ledgers = [
+        WorkloadLedger(
+            project_id=project_id,
+            ticket_id=ticket_id,
+            year_month=year_month,
+            employee_level=employee_level,
+            total_hours=total,
+        )
+        for (project_id, ticket_id, year_month, employee_level), total in expected.items()
+        if total
+    ]
+    with transaction.atomic():
+        WorkloadLedger.objects.all().delete()
+        WorkloadLedger.objects.bulk_create(ledgers, batch_size=batch_size)
+    logger.info(f"工数台帳を再構築しました: {len(ledgers)}件")
+    return len(ledgers)
@@ -0,0 +1,43 @@
+"""
+日付別工数の再作成・検証コマンド
+使用方法:
+    python manage.py backfill_workload_entries           # 再作成して検証
+    python manage.py backfill_workload_entries --verify  # 検証のみ
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.workloads.entries import DEFAULT_BATCH_SIZE, backfill_entries, verify_entries
+
+
+class Command(BaseCommand):
+    help = '日付別工数（工数行の0でない日を1日1行で保持）を工数データから再作成・検証します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='再作成せず、工数データとの差異のみを確認します'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='一度に読み込み・作成する件数'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            created = backfill_entries(batch_size=options['batch_size'])
+            self.stdout.write(f'日付別工数を再作成しました: {created}件')
+
+        mismatches = verify_entries(batch_size=options['batch_size'])
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('日付別工数は工数データと一致しています'))
+            return
+
+        for (workload_id, entry_date), actual, expected in mismatches[:50]:
+            self.stdout.write(
+                f'  工数ID={workload_id}, 日付={entry_date}: 日付別工数={actual}, 工数データ={expected}'
+            )
+        raise CommandError(f'日付別工数と工数データの不一致: {len(mismatches)}件')
@@ -0,0 +1,88 @@
+"""
+一括工数更新（bulk_update_workload_ajax）のベンチマーク
+使用方法: python manage.py bench_bulk_update_workload --cells 1000
+
+計測用データはトランザクション内で作成し、終了時にロールバックする。
+"""
+import json
+import random
+
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from apps.core.benchmark import build_workload_dataset, measure, rollback_after
+from apps.workloads import ledger
+from apps.workloads.models import Workload
+from apps.workloads.views import bulk_update_workload_ajax
+
+
+def legacy_bulk_update(changes):
+    """従来の1セルずつ取得・保存する一括更新（比較用）"""
+    updated_count = 0
+    for change in changes:
+        workload = Workload.objects.get(id=change['workload_id'])
+        workload.set_day_value(change['day'], float(change['value']))
+        # 台帳・日付別工数は保存時のシグナルで更新される
+        workload.save()
+        updated_count += 1
+    return updated_count
+
+
+class Command(BaseCommand):
+    help = '一括工数更新のクエリ数・処理時間・セル毎秒を従来方式と比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--cells', type=int, default=1000, help='1回の貼り付けで更新するセル数')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        cells = options['cells']
+
+        with rollback_after():
+            dataset = build_workload_dataset(
+                users=5, tickets=max(cells // 90, 1), months=1, seed=options['seed']
+            )
+            workloads = list(Workload.objects.filter(project=dataset['project']).select_related('user'))
+            ledger.rebuild_ledger()
+
+            changes = []
+            while len(changes) < cells:
+                for workload in workloads:
+                    for day in range(1, 29):
+                        changes.append({
+                            'workload_id': workload.id,
+                            'day': day,
+                            'value': rng.choice([0, 1, 2.5, 4, 7.5, 8]),
+                        })
+            changes = changes[:cells]
+
+            _, legacy_ms, legacy_queries = measure(legacy_bulk_update, changes)
+
+            factory = RequestFactory()
+            request = factory.post(
+                '/workloads/ajax/bulk-update/',
+                data=json.dumps({'changes': changes}),
+                content_type='application/json'
+            )
+            request.user = dataset['users'][0]
+            response, batched_ms, batched_queries = measure(bulk_update_workload_ajax, request)
+            result = json.loads(response.content)
+
+            mismatches = ledger.verify_ledger()
+
+        self.stdout.write(f"更新セル数: {cells}件 / 工数行: {len({change['workload_id'] for change in changes})}行")
+        self.stdout.write(
+            f"従来方式: {legacy_ms:,.1f} ms / {legacy_queries} クエリ / "
+            f"{cells / (legacy_ms / 1000):,.0f} セル/秒"
+        )
+        self.stdout.write(
+            f"一括方式: {batched_ms:,.1f} ms / {batched_queries} クエリ / "
+            f"{cells / (batched_ms / 1000):,.0f} セル/秒"
+        )
+        if not result.get('success') or result.get('updated_count') != cells:
+            self.stdout.write(self.style.ERROR(f"一括更新に失敗しました: {result}"))
+        elif mismatches:
+            self.stdout.write(self.style.ERROR(f"工数台帳の不一致: {len(mismatches)}件"))
+        else:
+            self.stdout.write(self.style.SUCCESS('更新結果・工数台帳ともに一致しました'))
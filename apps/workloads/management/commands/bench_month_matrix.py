@@ -0,0 +1,87 @@
+"""
+工数の月ベクトル集計（Workload.objects.month_matrix）のマイクロベンチマーク
+使用方法: python manage.py bench_month_matrix --tickets 300 --users 50 --months 6
+
+計測用データはトランザクション内で作成し、終了時にロールバックする。
+"""
+from collections import defaultdict
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from apps.core.benchmark import build_workload_dataset, measure, rollback_after
+from apps.workloads.models import Workload
+
+
+def per_object_sums(queryset, start_date, end_date):
+    """従来のモデル単位の集計（比較用）"""
+    row_total = 0.0
+    user_sums = defaultdict(float)
+    ticket_sums = defaultdict(float)
+    for workload in queryset:
+        row_total += workload.total_hours
+        year, month = map(int, workload.year_month.split('-'))
+        clipped = 0.0
+        for day in range(1, 32):
+            try:
+                current = date(year, month, day)
+            except ValueError:
+                continue
+            if start_date <= current <= end_date:
+                clipped += workload.get_day_value(day)
+        user_sums[workload.user_id] += clipped
+        ticket_sums[workload.ticket_id] += clipped
+    return round(row_total, 1), user_sums, ticket_sums
+
+
+def matrix_sums(queryset, start_date, end_date):
+    """月ベクトルによる集計"""
+    matrix = queryset.month_matrix()
+    clipped = matrix.date_range_totals(start_date, end_date)
+    return round(matrix.total(), 1), matrix.user_sums(clipped), matrix.ticket_sums(clipped)
+
+
+class Command(BaseCommand):
+    help = '工数の合計・期間切り出し・ユーザー/チケット別集計をモデル単位と月ベクトルで比較します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50, help='ユーザー数')
+        parser.add_argument('--tickets', type=int, default=300, help='チケット数')
+        parser.add_argument('--months', type=int, default=6, help='月数')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+
+    def handle(self, *args, **options):
+        with rollback_after():
+            dataset = build_workload_dataset(
+                users=options['users'],
+                tickets=options['tickets'],
+                months=options['months'],
+                seed=options['seed'],
+            )
+            queryset = Workload.objects.filter(project=dataset['project'])
+            year_months = dataset['year_months']
+            start_date = date(int(year_months[0][:4]), int(year_months[0][5:]), 10)
+            end_date = date(int(year_months[-1][:4]), int(year_months[-1][5:]), 20)
+
+            expected, object_ms, object_queries = measure(per_object_sums, queryset, start_date, end_date)
+            actual, matrix_ms, matrix_queries = measure(matrix_sums, queryset, start_date, end_date)
+            row_count = queryset.count()
+
+        def rounded(sums):
+            return {key: round(value, 1) for key, value in sums.items()}
+
+        same = (
+            expected[0] == actual[0]
+            and rounded(expected[1]) == rounded(actual[1])
+            and rounded(expected[2]) == rounded(actual[2])
+        )
+
+        self.stdout.write(f"工数行数: {row_count}行")
+        self.stdout.write(f"モデル単位: {object_ms:,.1f} ms / {object_queries} クエリ")
+        self.stdout.write(f"月ベクトル: {matrix_ms:,.1f} ms / {matrix_queries} クエリ")
+        if matrix_ms > 0:
+            self.stdout.write(f"速度比: {object_ms / matrix_ms:,.1f} 倍")
+        if same:
+            self.stdout.write(self.style.SUCCESS('集計結果は一致しました'))
+        else:
+            self.stdout.write(self.style.ERROR('集計結果が一致しません'))
@@ -0,0 +1,145 @@
+"""
+タイムシート一括取り込みのベンチマーク
+使用方法: python manage.py bench_timesheet_import --rows 100000 [--format xlsx]
+
+計測用データはトランザクション内で作成し、終了時にロールバックする。
+"""
+import calendar
+import csv
+import os
+import random
+import tempfile
+from datetime import date
+
+from django.core.management.base import BaseCommand
+
+from apps.core.benchmark import build_workload_dataset, measure, measure_memory, rollback_after
+from apps.workloads import entries, ledger
+from apps.workloads.models import Workload
+from apps.workloads.timesheet_import import DEFAULT_BATCH_SIZE, TimesheetImporter
+
+HEADER = ['担当者', 'プロジェクト', 'チケット', '日付', '工数']
+
+
+def legacy_import(rows):
+    """従来の1行ずつ取得・保存する取り込み（比較用）"""
+    from apps.projects.models import Project, ProjectTicket
+    from apps.users.models import CustomUser
+
+    for username, project_name, ticket_title, work_date, hours in rows:
+        user = CustomUser.objects.get(username=username)
+        project = Project.objects.get(name=project_name)
+        ticket = ProjectTicket.objects.get(project=project, title=ticket_title)
+        year, month, day = map(int, work_date.split('-'))
+        workload, _ = Workload.objects.get_or_create(
+            user=user, project=project, ticket=ticket, year_month=f'{year:04d}-{month:02d}'
+        )
+        workload.set_day_value(day, float(hours))
+        # 台帳・日付別工数は保存時のシグナルで更新される
+        workload.save()
+
+
+def write_file(path, rows, file_format):
+    if file_format == 'xlsx':
+        from openpyxl import Workbook
+
+        workbook = Workbook(write_only=True)
+        sheet = workbook.create_sheet()
+        sheet.append(HEADER)
+        for row in rows:
+            sheet.append(row)
+        workbook.save(path)
+        return
+    with open(path, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file)
+        writer.writerow(HEADER)
+        writer.writerows(rows)
+
+
+class Command(BaseCommand):
+    help = 'タイムシート一括取り込みの処理時間・クエリ数・ピークメモリ・行毎秒を計測します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='取り込む行数')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], default='csv', help='ファイル形式')
+        parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_SIZE, help='一度に保存する行数')
+        parser.add_argument('--legacy-rows', type=int, default=1000, help='従来方式で取り込む行数（0で比較しない）')
+        parser.add_argument('--seed', type=int, default=0, help='乱数シード')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        row_count = options['rows']
+
+        with rollback_after():
+            dataset = build_workload_dataset(users=100, tickets=300, months=2, seed=options['seed'])
+            ledger.rebuild_ledger()
+            entries.backfill_entries()
+            workloads_before = Workload.objects.count()
+
+            # 担当者ごと・月ごとに数チケットへ平日の工数を記入したタイムシート
+            # （先頭2か月は既存の工数行の上書き、以降は新規行）
+            project_name = dataset['project'].name
+            rows = []
+            year, month = 2024, 1
+            while len(rows) < row_count:
+                days_in_month = calendar.monthrange(year, month)[1]
+                weekdays = [
+                    date(year, month, day) for day in range(1, days_in_month + 1)
+                    if date(year, month, day).weekday() < 5
+                ]
+                for user in dataset['users']:
+                    for ticket in rng.sample(dataset['tickets'], 4):
+                        for work_date in weekdays:
+                            rows.append([
+                                user.username,
+                                project_name,
+                                ticket.title,
+                                work_date.isoformat(),
+                                rng.choice(['0', '0.5', '1', '2', '3.5', '7.5', '8']),
+                            ])
+                year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+            rows = rows[:row_count]
+
+            legacy_rows = rows[:options['legacy_rows']]
+            if legacy_rows:
+                _, legacy_ms, legacy_queries = measure(legacy_import, legacy_rows)
+
+            handle, path = tempfile.mkstemp(suffix=f".{options['format']}")
+            os.close(handle)
+            try:
+                write_file(path, rows, options['format'])
+                file_mb = os.path.getsize(path) / 1024 / 1024
+                importer = TimesheetImporter(batch_size=options['batch_size'])
+                with open(path, 'rb') as file:
+                    result, import_ms, import_queries, peak_mb = measure_memory(importer.import_file, file, path)
+            finally:
+                os.remove(path)
+
+            ledger_mismatches = ledger.verify_ledger()
+            entry_mismatches = entries.verify_entries()
+            workloads_after = Workload.objects.count()
+
+        self.stdout.write(
+            f"取り込み行数: {row_count:,}行（{options['format']}, {file_mb:,.1f} MB） / "
+            f"工数行: {workloads_before:,} → {workloads_after:,}行"
+        )
+        if legacy_rows:
+            self.stdout.write(
+                f"従来方式: {len(legacy_rows):,}行 {legacy_ms:,.1f} ms / {legacy_queries:,} クエリ / "
+                f"{len(legacy_rows) / (legacy_ms / 1000):,.0f} 行/秒"
+            )
+        self.stdout.write(
+            f"一括方式: {row_count:,}行 {import_ms:,.1f} ms / {import_queries:,} クエリ / "
+            f"{row_count / (import_ms / 1000):,.0f} 行/秒 / ピーク {peak_mb:,.1f} MB"
+        )
+        self.stdout.write(
+            f"作成{result['created']:,}件・更新{result['updated']:,}件・エラー{result['error_count']:,}件"
+        )
+        if result['error_count'] or result['rows'] != row_count:
+            self.stdout.write(self.style.ERROR(f"取り込みに失敗した行があります: {result['errors'][:5]}"))
+        elif ledger_mismatches or entry_mismatches:
+            self.stdout.write(self.style.ERROR(
+                f"工数台帳の不一致: {len(ledger_mismatches)}件 / 日付別工数の不一致: {len(entry_mismatches)}件"
+            ))
+        else:
+            self.stdout.write(self.style.SUCCESS('工数台帳・日付別工数ともに一致しました'))
@@ -0,0 +1,52 @@
+"""
+タイムシート（CSV / Excel）の一括取り込みコマンド
+使用方法:
+    python manage.py import_timesheets timesheet.csv
+    python manage.py import_timesheets timesheet.xlsx --dry-run  # 検証のみ
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.workloads.timesheet_import import DEFAULT_BATCH_SIZE, TimesheetFormatError, TimesheetImporter
+
+
+class Command(BaseCommand):
+    help = 'タイムシート（担当者・プロジェクト・チケット・日付・工数）を工数データへ取り込みます'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV（.csv）または Excel（.xlsx）ファイルのパス')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='保存せず、行の検証のみを行います'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help='一度に保存する行数'
+        )
+
+    def handle(self, *args, **options):
+        importer = TimesheetImporter(batch_size=options['batch_size'], dry_run=options['dry_run'])
+        try:
+            with open(options['path'], 'rb') as file:
+                result = importer.import_file(file, options['path'])
+        except OSError as e:
+            raise CommandError(f'ファイルを開けません: {e}')
+        except TimesheetFormatError as e:
+            raise CommandError(str(e))
+
+        for error in result['errors'][:50]:
+            self.stdout.write(f"  {error['line']}行目: {error['message']}")
+
+        summary = (
+            f"{result['rows']}行 / 工数{result['cells']}件 / "
+            f"工数行 作成{result['created']}件・更新{result['updated']}件 / エラー{result['error_count']}件"
+        )
+        if result['dry_run']:
+            summary = f'検証のみ: {summary}'
+        if result['error_count']:
+            self.stdout.write(self.style.WARNING(summary))
+        else:
+            self.stdout.write(self.style.SUCCESS(summary))
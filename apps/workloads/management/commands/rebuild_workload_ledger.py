@@ -0,0 +1,38 @@
+"""
+工数台帳の再構築・検証コマンド
+使用方法:
+    python manage.py rebuild_workload_ledger           # 再構築して検証
+    python manage.py rebuild_workload_ledger --verify  # 検証のみ
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+
+from apps.workloads.ledger import rebuild_ledger, verify_ledger
+
+
+class Command(BaseCommand):
+    help = '工数台帳（チケット・年月・社員レベル別の工数合計）を工数データから再構築・検証します'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='再構築せず、工数データとの差異のみを確認します'
+        )
+
+    def handle(self, *args, **options):
+        if not options['verify']:
+            created = rebuild_ledger()
+            self.stdout.write(f'工数台帳を再構築しました: {created}件')
+
+        mismatches = verify_ledger()
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS('工数台帳は工数データと一致しています'))
+            return
+
+        for (project_id, ticket_id, year_month, employee_level), actual, expected in mismatches[:50]:
+            self.stdout.write(
+                f'  プロジェクトID={project_id}, チケットID={ticket_id}, 年月={year_month}, '
+                f'社員レベル={employee_level or "-"}: 台帳={actual}, 工数データ={expected}'
+            )
+        raise CommandError(f'工数台帳と工数データの不一致: {len(mismatches)}件')
@@ -0,0 +1,63 @@
+"""
+工数行の月次繰り越しコマンド
+使用方法:
+    python manage.py rollover_workloads                              # 前月 → 今月
+    python manage.py rollover_workloads --from 2024-03 --to 2024-04
+    python manage.py rollover_workloads --section 3 --dry-run        # 課を指定して件数のみ確認
+"""
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from apps.workloads import rollover
+from apps.workloads.grid import parse_year_month
+
+
+class Command(BaseCommand):
+    help = '工数行（担当者・プロジェクト・チケット）を工数0の行として翌月へ複製します'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='source_month', help='複製元の年月（YYYY-MM、省略時は前月）')
+        parser.add_argument('--to', dest='target_month', help='複製先の年月（YYYY-MM、省略時は複製元の翌月）')
+        parser.add_argument('--department', type=int, help='部署IDで絞り込み')
+        parser.add_argument('--section', type=int, help='課IDで絞り込み')
+        parser.add_argument('--user', help='ユーザー名で絞り込み')
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='複製せず、複製される行数のみを表示します'
+        )
+
+    def _year_month(self, value):
+        _, _, year_month = parse_year_month(value)
+        if year_month != value:
+            raise CommandError(f'年月はYYYY-MM形式で指定してください: {value}')
+        return year_month
+
+    def handle(self, *args, **options):
+        if options['source_month']:
+            source_month = self._year_month(options['source_month'])
+        else:
+            source_month = rollover.previous_year_month(timezone.localdate().strftime('%Y-%m'))
+        if options['target_month']:
+            target_month = self._year_month(options['target_month'])
+        else:
+            target_month = rollover.next_year_month(source_month)
+        if source_month == target_month:
+            raise CommandError('複製元と複製先が同じ年月です。')
+
+        workload_filter = {}
+        if options['department']:
+            workload_filter['user__department_id'] = options['department']
+        if options['section']:
+            workload_filter['user__section_id'] = options['section']
+        if options['user']:
+            workload_filter['user__username'] = options['user']
+
+        if options['dry_run']:
+            count = rollover.rollover_preview(source_month, target_month, workload_filter)
+            self.stdout.write(f'{source_month} → {target_month}: {count}件の工数行が複製されます（検証のみ）')
+            return
+
+        created = rollover.rollover_month(source_month, target_month, workload_filter)
+        self.stdout.write(self.style.SUCCESS(f'{source_month} → {target_month}: {created}件の工数行を作成しました'))
@@ -1,9 +1,67 @@
+import calendar
+
+from django.core.exceptions import ValidationError
 from django.db import models
 from django.contrib.auth import get_user_model
 from decimal import Decimal
 
 User = get_user_model()
 
+MONTH_TOTAL_FIELD = models.DecimalField(max_digits=5, decimal_places=1)
+
+
+def days_in_month(year_month):
+    """
+    'YYYY-MM' の月の日数。形式が不正なら None。
+    月に存在しない日（2月30日など）の列には工数を入力させない（台帳・日付別工数の集計がずれないように）。
+    """
+    try:
+        year, month = map(int, year_month.split('-'))
+        return calendar.monthrange(year, month)[1]
+    except (AttributeError, ValueError, calendar.IllegalMonthError):
+        return None
+
+
+class MonthTotal(models.Func):
+    """
+    工数行の月合計（day_01〜day_31 の和）を表す DB 式。
+    入れ子の加算式は SQLite の構文解析の上限を超えるため、括弧1組の平たい加算式にする。
+    prefix で関連先の工数行を指定できる（例: MonthTotal('workloads__')）。
+    """
+    arg_joiner = ' + '
+    template = '(%(expressions)s)'
+
+    def __init__(self, prefix='', **extra):
+        extra.setdefault('output_field', MONTH_TOTAL_FIELD)
+        super().__init__(*[models.F(f'{prefix}day_{day:02d}') for day in range(1, 32)], **extra)
+
+
+class WorkloadQuerySet(models.QuerySet):
+    """工数クエリセット"""
+
+    def with_month_total(self):
+        """月合計を month_hours（時間）・month_days（人日）として注釈（並べ替え・絞り込み可）"""
+        return self.annotate(
+            month_hours=MonthTotal(),
+            month_days=models.ExpressionWrapper(MonthTotal() / 8, output_field=models.DecimalField()),
+        )
+
+    def month_total_hours(self):
+        """対象行の月合計の総和（Decimal、1クエリ）"""
+        total = self.order_by().aggregate(total=models.Sum(MonthTotal()))['total']
+        return Decimal(str(total or 0))
+
+    def month_totals_by(self, *fields):
+        """指定した列ごとの月合計の総和（month_hours の多い順）"""
+        return self.order_by().values(*fields).annotate(
+            month_hours=models.Sum(MonthTotal())
+        ).order_by('-month_hours')
+
+    def month_matrix(self, key_fields=('id', 'user_id', 'ticket_id', 'year_month')):
+        """日別工数を NumPy の月ベクトル（行 × 31）として取得"""
+        from .month_matrix import MonthMatrix
+        return MonthMatrix.from_queryset(self, key_fields)
+
 class Workload(models.Model):
     """工数モデル（カレンダー形式）"""
     user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="担当者", related_name="workloads")
@@ -54,6 +112,8 @@ class Workload(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="作成日時")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
     
+    objects = WorkloadQuerySet.as_manager()
+    
     class Meta:
         db_table = "workloads"
         verbose_name = "工数"
@@ -69,6 +129,20 @@ class Workload(models.Model):
             return f"{self.user.username} - {self.ticket.title} - {self.year_month}"
         return f"{self.user.username} - {self.project.name} - {self.year_month}"
     
+    def clean(self):
+        """月に存在しない日の工数を拒否"""
+        super().clean()
+        days = days_in_month(self.year_month)
+        if days is None:
+            raise ValidationError({'year_month': '年月はYYYY-MM形式で入力してください。'})
+        errors = {
+            f'day_{day:02d}': f'{self.year_month}に{day}日はありません。'
+            for day in range(days + 1, 32)
+            if getattr(self, f'day_{day:02d}')
+        }
+        if errors:
+            raise ValidationError(errors)
+    
     def get_day_value(self, day):
         """指定された日の工数を取得"""
         try:
@@ -106,4 +180,99 @@ class Workload(models.Model):
     @property
     def total_days(self):
         """月の合計人日を計算（8時間 = 1人日）"""
-        return self.total_hours / 8
\ No newline at end of file
+        return self.total_hours / 8
+
+class WorkloadLedger(models.Model):
+    """工数台帳（プロジェクト・チケット・年月・社員レベル別の工数合計）
+
+    工数入力のたびに増減分を加算して維持する。
+    整合性は manage.py rebuild_workload_ledger で再構築・検証できる。
+    """
+    project = models.ForeignKey("projects.Project", on_delete=models.CASCADE, verbose_name="プロジェクト", related_name="workload_ledgers")
+    ticket = models.ForeignKey(
+        "projects.ProjectTicket",
+        on_delete=models.CASCADE,
+        verbose_name="チケット",
+        related_name="workload_ledgers",
+        null=True,
+        blank=True
+    )
+    year_month = models.CharField(max_length=7, verbose_name="年月", help_text="YYYY-MM形式")
+    employee_level = models.CharField(max_length=20, blank=True, default='', verbose_name="社員レベル")
+    total_hours = models.DecimalField(max_digits=10, decimal_places=1, default=0, verbose_name="合計工数（時間）")
+
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="更新日時")
+
+    class Meta:
+        db_table = "workload_ledgers"
+        verbose_name = "工数台帳"
+        verbose_name_plural = "工数台帳"
+        unique_together = ["project", "ticket", "year_month", "employee_level"]
+        indexes = [
+            models.Index(fields=["ticket", "year_month"]),
+        ]
+
+    def __str__(self):
+        return f"{self.ticket_id or self.project_id} - {self.year_month} - {self.employee_level}: {self.total_hours}h"
+
+class WorkloadEntryQuerySet(models.QuerySet):
+    """日付別工数クエリセット"""
+
+    def in_range(self, start_date=None, end_date=None):
+        """日付範囲で絞り込み（両端を含む。None は無制限）"""
+        queryset = self
+        if start_date:
+            queryset = queryset.filter(date__gte=start_date)
+        if end_date:
+            queryset = queryset.filter(date__lte=end_date)
+        return queryset
+
+    def total_hours(self):
+        """合計時間（Decimal）"""
+        return Decimal(str(self.aggregate(total=models.Sum('hours'))['total'] or 0))
+
+    def sum_by(self, *fields):
+        """指定した列ごとの合計時間 {キー: Decimal}（列が1つならキーは値そのもの）"""
+        rows = self.order_by().values_list(*fields).annotate(total=models.Sum('hours'))
+        result = {}
+        for row in rows:
+            key = row[0] if len(fields) == 1 else tuple(row[:-1])
+            result[key] = Decimal(str(row[-1] or 0))
+        return result
+
+class WorkloadEntry(models.Model):
+    """日付別工数（工数行の0でない日だけを1日1行で保持）
+
+    工数行（day_01〜day_31）の書き込みと同時に更新し、日付範囲の集計を索引で行う。
+    整合性は manage.py backfill_workload_entries で再作成・検証できる。
+    """
+    workload = models.ForeignKey(Workload, on_delete=models.CASCADE, verbose_name="工数", related_name="entries")
+    user = models.ForeignKey(User, on_delete=models.CASCADE, verbose_name="担当者", related_name="workload_entries")
+    project = models.ForeignKey("projects.Project", on_delete=models.CASCADE, verbose_name="プロジェクト", related_name="workload_entries")
+    ticket = models.ForeignKey(
+        "projects.ProjectTicket",
+        on_delete=models.CASCADE,
+        verbose_name="チケット",
+        related_name="workload_entries",
+        null=True,
+        blank=True
+    )
+    date = models.DateField(verbose_name="日付")
+    hours = models.DecimalField(max_digits=4, decimal_places=1, verbose_name="工数（時間）")
+
+    objects = WorkloadEntryQuerySet.as_manager()
+
+    class Meta:
+        db_table = "workload_entries"
+        verbose_name = "日付別工数"
+        verbose_name_plural = "日付別工数"
+        unique_together = ["workload", "date"]
+        indexes = [
+            models.Index(fields=["date"]),
+            models.Index(fields=["ticket", "date"]),
+            models.Index(fields=["user", "date"]),
+            models.Index(fields=["project", "date"]),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.ticket_id or self.project_id} - {self.date}: {self.hours}h"
@@ -0,0 +1,141 @@
+"""
+工数の月ベクトル（行 × 31日）アクセス
+
+Workload の day_01〜day_31 を values_list で読み込み、
+モデルを生成せずに NumPy 配列として集計する。
+工数は0.1時間単位の整数で保持するため、合計に丸め誤差は出ない。
+"""
+import calendar
+
+import numpy as np
+from django.db.models import FloatField
+from django.db.models.functions import Cast
+
+DAY_FIELDS = [f'day_{day:02d}' for day in range(1, 32)]
+DAY_NUMBERS = np.arange(1, 32)
+
+
+def _month_index(year_month):
+    """'YYYY-MM' を月の通し番号に変換（不正値は -1）"""
+    try:
+        year, month = map(int, year_month.split('-'))
+    except (AttributeError, ValueError):
+        return -1
+    if not 1 <= month <= 12:
+        return -1
+    return year * 12 + (month - 1)
+
+
+class MonthMatrix:
+    """工数行ごとの日別工数（行 × 31）とキー列"""
+
+    def __init__(self, keys, tenths):
+        # keys: {フィールド名: 値の配列}, tenths: 0.1時間単位の整数行列
+        self.keys = keys
+        self.tenths = tenths
+
+    @classmethod
+    def from_queryset(cls, queryset, key_fields=('id', 'user_id', 'ticket_id', 'year_month')):
+        """クエリセットから読み込む（1クエリ、モデル生成なし）"""
+        key_fields = list(key_fields)
+        # Decimal への変換を避けるため、日別工数は浮動小数として取得する
+        day_columns = [Cast(field, FloatField()) for field in DAY_FIELDS]
+        rows = list(queryset.order_by().values_list(*key_fields, *day_columns))
+        key_count = len(key_fields)
+
+        keys = {
+            field: np.array([row[i] for row in rows], dtype=object)
+            for i, field in enumerate(key_fields)
+        }
+        if rows:
+            hours = np.array([row[key_count:] for row in rows], dtype=np.float64)
+            tenths = np.rint(np.nan_to_num(hours) * 10).astype(np.int64)
+        else:
+            tenths = np.zeros((0, 31), dtype=np.int64)
+        return cls(keys, tenths)
+
+    def __len__(self):
+        return self.tenths.shape[0]
+
+    @property
+    def hours(self):
+        """日別工数（時間）の配列"""
+        return self.tenths / 10
+
+    def row_totals(self):
+        """行ごとの月合計（時間）"""
+        return self.tenths.sum(axis=1) / 10
+
+    def total(self):
+        """全行の合計（時間）"""
+        return float(self.tenths.sum()) / 10
+
+    def day_totals(self):
+        """日ごとの合計（時間、長さ31）"""
+        return self.tenths.sum(axis=0) / 10
+
+    def day_range_totals(self, first_day, last_day):
+        """行ごとの指定日範囲（両端含む）の合計（時間）"""
+        mask = (DAY_NUMBERS >= first_day) & (DAY_NUMBERS <= last_day)
+        return (self.tenths * mask).sum(axis=1) / 10
+
+    def date_range_totals(self, start_date=None, end_date=None):
+        """
+        行ごとの期間内（両端含む）の合計（時間）。
+        year_month 列を使って行ごとの月に合わせて日付を切り出す。
+        """
+        if len(self) == 0:
+            return np.zeros(0)
+        if 'year_month' not in self.keys:
+            raise ValueError('date_range_totals には year_month 列が必要です')
+
+        months = np.array([_month_index(value) for value in self.keys['year_month']], dtype=np.int64)
+        last_days = np.array(
+            [calendar.monthrange(m // 12, m % 12 + 1)[1] if m >= 0 else 0 for m in months],
+            dtype=np.int64
+        )
+        first = np.ones(len(self), dtype=np.int64)
+        last = last_days.copy()
+        valid = months >= 0
+
+        if start_date:
+            start_month = start_date.year * 12 + start_date.month - 1
+            valid &= months >= start_month
+            first = np.where(months == start_month, start_date.day, first)
+        if end_date:
+            end_month = end_date.year * 12 + end_date.month - 1
+            valid &= months <= end_month
+            last = np.where(months == end_month, np.minimum(end_date.day, last_days), last)
+
+        mask = (
+            (DAY_NUMBERS[None, :] >= first[:, None])
+            & (DAY_NUMBERS[None, :] <= last[:, None])
+            & valid[:, None]
+        )
+        return (self.tenths * mask).sum(axis=1) / 10
+
+    def group_sums(self, field, values=None):
+        """
+        キー列ごとの合計（時間）を辞書で返す。
+        values に行ごとの値（row_totals / date_range_totals の結果など）を渡すとそれを合計する。
+        """
+        if values is None:
+            values = self.row_totals()
+        if len(self) == 0:
+            return {}
+        codes = {}
+        inverse = np.fromiter(
+            (codes.setdefault(value, len(codes)) for value in self.keys[field]),
+            dtype=np.int64,
+            count=len(self)
+        )
+        sums = np.bincount(inverse, weights=np.asarray(values, dtype=np.float64), minlength=len(codes))
+        return {value: round(float(sums[code]), 1) for value, code in codes.items()}
+
+    def user_sums(self, values=None):
+        """ユーザーごとの合計（時間）"""
+        return self.group_sums('user_id', values)
+
+    def ticket_sums(self, values=None):
+        """チケットごとの合計（時間）"""
+        return self.group_sums('ticket_id', values)
@@ -0,0 +1,132 @@
+"""
+工数行の月次繰り越し
+
+ある月の工数行（担当者・プロジェクト・チケット）を別の月へ、工数0の行として
+1回の INSERT ... SELECT で複製する。
+複製先に同じ組み合わせの行がある場合、無効な担当者・プロジェクト・チケット、
+クローズ済みのチケットの行は複製しない。
+作成される行は工数0のため、工数台帳・日付別工数への反映は不要。
+"""
+import logging
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import (
+    CharField, DateTimeField, DecimalField, Exists, OuterRef, Q, Value,
+)
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from apps.core.kpi_snapshot import invalidate_kpi_snapshot
+
+from . import grid
+from .models import Workload
+
+logger = logging.getLogger(__name__)
+
+DAY_FIELDS = [f'day_{day:02d}' for day in range(1, 32)]
+
+
+def next_year_month(year_month):
+    """'YYYY-MM' の翌月"""
+    year, month, _ = grid.parse_year_month(year_month)
+    year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return f'{year:04d}-{month:02d}'
+
+
+def previous_year_month(year_month):
+    """'YYYY-MM' の前月"""
+    year, month, _ = grid.parse_year_month(year_month)
+    year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return f'{year:04d}-{month:02d}'
+
+
+def rollover_source(queryset, target_month):
+    """
+    複製元の工数行（複製先に同じ組み合わせがなく、担当者・プロジェクト・チケットが有効なもの）
+    """
+    # チケットなしの行どうしも同じ組み合わせとして扱うため、チケットIDを0にそろえて比較する
+    existing = Workload.objects.filter(
+        year_month=target_month,
+        user_id=OuterRef('user_id'),
+        project_id=OuterRef('project_id'),
+    ).annotate(
+        ticket_key=Coalesce('ticket_id', Value(0))
+    ).filter(
+        ticket_key=Coalesce(OuterRef('ticket_id'), Value(0))
+    )
+    return queryset.filter(
+        Q(ticket__isnull=True) | Q(ticket__is_active=True) & ~Q(ticket__status='closed'),
+        user__is_active=True,
+        project__is_active=True,
+    ).exclude(
+        year_month=target_month
+    ).filter(
+        ~Exists(existing)
+    )
+
+
+def _insert_select(source, target_month):
+    """複製元のクエリセットから INSERT ... SELECT を1回実行し、作成件数を返す"""
+    now = timezone.now()
+    zero = Value(0, output_field=DecimalField(max_digits=4, decimal_places=1))
+    # 複製先の列 → 値（None は複製元の列をそのまま使う）
+    values = {
+        'user': None,
+        'project': None,
+        'ticket': None,
+        'year_month': Value(target_month, output_field=CharField()),
+        **{field: zero for field in DAY_FIELDS},
+        'created_at': Value(now, output_field=DateTimeField()),
+        'updated_at': Value(now, output_field=DateTimeField()),
+    }
+    # 注釈名がモデルのフィールド名と重ならないよう接頭辞を付ける
+    annotations = {
+        f'rollover_{name}': expression for name, expression in values.items() if expression is not None
+    }
+    select_fields = [
+        f'{name}_id' if expression is None else f'rollover_{name}' for name, expression in values.items()
+    ]
+    sql, params = source.annotate(**annotations).order_by().values_list(*select_fields).query.sql_with_params()
+
+    quote_name = connection.ops.quote_name
+    columns = ', '.join(quote_name(Workload._meta.get_field(name).column) for name in values)
+    with connection.cursor() as cursor:
+        cursor.execute(f'INSERT INTO {quote_name(Workload._meta.db_table)} ({columns}) {sql}', params)
+        return cursor.rowcount
+
+
+def rollover_workloads(queryset, target_month):
+    """
+    工数行のクエリセットを、工数0の行として target_month へ複製する（1ステートメント）。
+    戻り値: 作成した行数
+    """
+    source = rollover_source(queryset, target_month)
+    try:
+        with transaction.atomic():
+            created = _insert_select(source, target_month)
+    except IntegrityError:
+        # 同時に同じ組み合わせが作成された場合は、既存行を除いてもう一度複製する
+        with transaction.atomic():
+            created = _insert_select(source, target_month)
+    if created:
+        transaction.on_commit(invalidate_kpi_snapshot)
+    logger.info(f'工数行を{target_month}へ複製しました: {created}件')
+    return created
+
+
+def rollover_month(source_month, target_month=None, workload_filter=None):
+    """
+    source_month の工数行を target_month（省略時は翌月）へ複製する。
+    workload_filter: 工数行の絞り込み条件（例: {'user__section_id': 3}）
+    戻り値: 作成した行数
+    """
+    target_month = target_month or next_year_month(source_month)
+    queryset = Workload.objects.filter(year_month=source_month, **(workload_filter or {}))
+    return rollover_workloads(queryset, target_month)
+
+
+def rollover_preview(source_month, target_month=None, workload_filter=None):
+    """複製される行数（保存しない）"""
+    target_month = target_month or next_year_month(source_month)
+    queryset = Workload.objects.filter(year_month=source_month, **(workload_filter or {}))
+    return rollover_source(queryset, target_month).count()
@@ -0,0 +1,140 @@
+"""
+工数・ユーザーの書き込み時の処理
+
+工数行の save() / delete()（管理画面・ユーザー削除時の連鎖削除を含む）の増減分を工数台帳（ledger）へ反映し、
+日付別工数（entries）を作り直す（削除時は外部キーの連鎖削除で消える）。
+工数台帳は社員レベル別に集計しているため、社員レベルが変わったユーザーの工数を新しいレベルの台帳キーへ移す。
+update() / bulk_update / bulk_create はシグナルが送られないため、呼び出し側で台帳・日付別工数を更新する。
+
+ユーザー・プロジェクト・チケットの削除では、連鎖削除される工数行を1件ずつ反映せず、
+ユーザーは削除前に全工数をまとめて台帳から減算し、プロジェクト・チケットは台帳ごと連鎖削除されるに任せる。
+削除中の親はスレッドごとの集合に記録する（親の pre_delete で追加し、post_delete で取り除く）。
+"""
+import threading
+from collections import defaultdict
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from apps.projects.models import Project, ProjectTicket
+
+from . import entries, ledger
+from .models import Workload
+
+User = get_user_model()
+
+# 削除中の親 {(種類, ID)}（親の pre_delete で追加し、post_delete で取り除く）
+_deleting = threading.local()
+
+
+def _deleting_parents():
+    if not hasattr(_deleting, 'parents'):
+        _deleting.parents = set()
+    return _deleting.parents
+
+
+def _parent_deleting(workload):
+    """工数行が削除中の親（ユーザー・プロジェクト・チケット）の連鎖削除によるものか"""
+    parents = _deleting_parents()
+    if not parents:
+        return False
+    return bool(parents & {
+        ('user', workload.user_id), ('project', workload.project_id), ('ticket', workload.ticket_id),
+    })
+
+
+# 台帳・日付別工数の値に関係する列（これらを含まない部分更新では更新しない）
+LEDGER_FIELDS = set(ledger.DAY_FIELDS) | {'user', 'project', 'ticket', 'year_month'}
+
+
+def _touches_ledger(update_fields):
+    return update_fields is None or bool(LEDGER_FIELDS & set(update_fields))
+
+
+@receiver(pre_save, sender=Workload)
+def remember_stored_workload(sender, instance, raw=False, update_fields=None, **kwargs):
+    """保存前の台帳キー・月合計を記録（新規作成は対象外）"""
+    instance._ledger_previous = None
+    if raw or instance._state.adding or not _touches_ledger(update_fields):
+        return
+    instance._ledger_previous = ledger.stored_workload(instance.pk)
+
+
+@receiver(post_save, sender=Workload)
+def update_ledger_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """旧キーから保存前の合計を減算し、新キーへ保存後の合計を加算"""
+    if raw or not _touches_ledger(update_fields):
+        return
+    deltas = defaultdict(Decimal)
+    previous = getattr(instance, '_ledger_previous', None)
+    if previous is not None:
+        previous_key, previous_hours = previous
+        deltas[previous_key] -= previous_hours
+    deltas[ledger.ledger_key(instance)] += ledger.workload_hours(instance)
+    ledger.apply_deltas(deltas)
+
+
+@receiver(post_save, sender=Workload)
+def sync_entries_on_save(sender, instance, raw=False, update_fields=None, **kwargs):
+    """保存した工数行の日付別工数を作り直す"""
+    if raw or not _touches_ledger(update_fields):
+        return
+    entries.sync_workload(instance)
+
+
+@receiver(post_delete, sender=Workload)
+def update_ledger_on_delete(sender, instance, **kwargs):
+    """削除した工数行の合計を台帳から減算（親の削除による連鎖削除は親の削除時にまとめて反映済み）"""
+    if _parent_deleting(instance):
+        return
+    ledger.remove_workload(instance)
+
+
+@receiver(pre_delete, sender=User)
+def remove_user_from_ledger(sender, instance, **kwargs):
+    """削除するユーザーの全工数を台帳からまとめて減算"""
+    ledger.remove_user(instance.pk, instance.employee_level)
+    _deleting_parents().add(('user', instance.pk))
+
+
+@receiver(pre_delete, sender=Project)
+def mark_project_deleting(sender, instance, **kwargs):
+    """プロジェクトの台帳は連鎖削除されるため、工数行ごとの減算を省く"""
+    _deleting_parents().add(('project', instance.pk))
+
+
+@receiver(pre_delete, sender=ProjectTicket)
+def mark_ticket_deleting(sender, instance, **kwargs):
+    """チケットの台帳は連鎖削除されるため、工数行ごとの減算を省く"""
+    _deleting_parents().add(('ticket', instance.pk))
+
+
+@receiver(post_delete, sender=User)
+@receiver(post_delete, sender=Project)
+@receiver(post_delete, sender=ProjectTicket)
+def unmark_deleting(sender, instance, **kwargs):
+    kind = {User: 'user', Project: 'project', ProjectTicket: 'ticket'}[sender]
+    _deleting_parents().discard((kind, instance.pk))
+
+
+@receiver(pre_save, sender=User)
+def remember_employee_level(sender, instance, update_fields=None, **kwargs):
+    """保存前の社員レベルを記録（新規作成・社員レベルを含まない部分更新は対象外）"""
+    instance._previous_employee_level = None
+    if not instance.pk or (update_fields is not None and 'employee_level' not in update_fields):
+        return
+    instance._previous_employee_level = (
+        User.objects.filter(pk=instance.pk).values_list('employee_level', flat=True).first()
+    )
+
+
+@receiver(post_save, sender=User)
+def move_ledger_employee_level(sender, instance, created, **kwargs):
+    """社員レベルが変わった場合、台帳の工数を新しいレベルへ移す"""
+    previous = getattr(instance, '_previous_employee_level', None)
+    if created or previous is None:
+        return
+    if (previous or '') != (instance.employee_level or ''):
+        ledger.move_user_level(instance.pk, previous, instance.employee_level)
@@ -1,5 +1,15 @@
-from django.test import TestCase
+import json
+from decimal import Decimal
+
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from apps.core.perf_data import seed_perf_data, seed_prefix
+from apps.core.query_budget import SMALL_VOLUME
+
+from . import entries, ledger, rollover
 from .models import Workload
+from .timesheet_import import TimesheetFormatError, TimesheetImporter, parse_date, parse_hours
 
 class WorkloadModelTest(TestCase):
     def setUp(self):
@@ -26,4 +36,201 @@ class WorkloadModelTest(TestCase):
 
     def test_workload_str(self):
         workload = Workload.objects.get(year_month='2023-10')
-        self.assertEqual(str(workload), f'Workload for {workload.year_month}')
\ No newline at end of file
+        self.assertEqual(str(workload), f'Workload for {workload.year_month}')
+
+
+class WorkloadDerivedDataTestMixin:
+    """工数台帳・日付別工数が工数行からの集計と一致することを確認する"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from apps.users.models import CustomUser
+
+        seed_perf_data(seed=0, **SMALL_VOLUME)
+        cls.leader = CustomUser.objects.filter(
+            username__startswith=seed_prefix(0), is_leader=True, is_superuser=False
+        ).order_by('id').first()
+
+    def setUp(self):
+        self.client = Client(SERVER_NAME='127.0.0.1')
+        self.client.force_login(self.leader)
+
+    def post_json(self, name, data):
+        response = self.client.post(reverse(name), data=json.dumps(data), content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def assertDerivedDataConsistent(self):
+        self.assertEqual(ledger.verify_ledger(), [])
+        self.assertEqual(entries.verify_entries(), [])
+
+
+class WorkloadLedgerConsistencyTests(WorkloadDerivedDataTestMixin, TestCase):
+    """保存・一括更新・削除・翌月への複製の後も台帳・日付別工数が工数行と一致すること"""
+
+    def workload(self, **filters):
+        return Workload.objects.filter(ticket__isnull=False, **filters).select_related('user').order_by('id').first()
+
+    def test_seeded_data(self):
+        self.assertDerivedDataConsistent()
+
+    def test_save(self):
+        workload = self.workload()
+        before = sum(ledger.get_ticket_hours(workload.ticket_id))
+        old_value = workload.day_05
+        workload.day_05 = Decimal('7.5')
+        workload.save()
+
+        self.assertEqual(sum(ledger.get_ticket_hours(workload.ticket_id)), before + Decimal('7.5') - old_value)
+        self.assertDerivedDataConsistent()
+
+    def test_save_with_key_change(self):
+        workload = self.workload()
+        workload.year_month = '2030-01'
+        workload.save()
+        self.assertDerivedDataConsistent()
+
+    def test_update_cell(self):
+        workload = self.workload()
+        result = self.post_json('workloads:update_workload_ajax', {
+            'workload_id': workload.pk, 'day': 3, 'value': '6.5',
+        })
+        self.assertTrue(result['success'], result)
+        workload.refresh_from_db()
+        self.assertEqual(workload.day_03, Decimal('6.5'))
+        self.assertDerivedDataConsistent()
+
+    def test_bulk_update(self):
+        first, second = Workload.objects.order_by('id')[:2]
+        result = self.post_json('workloads:bulk_update_workload_ajax', {'changes': [
+            {'workload_id': first.pk, 'day': 1, 'value': '8'},
+            {'workload_id': first.pk, 'day': 2, 'value': '0'},
+            {'workload_id': second.pk, 'day': 10, 'value': '3.5'},
+        ]})
+        self.assertTrue(result['success'], result)
+        self.assertEqual(result['updated_count'], 3)
+        self.assertDerivedDataConsistent()
+
+    def test_out_of_month_day_rejected(self):
+        workload = self.workload(year_month__endswith='-02')
+        result = self.post_json('workloads:update_workload_ajax', {
+            'workload_id': workload.pk, 'day': 30, 'value': '4',
+        })
+        self.assertFalse(result['success'])
+        result = self.post_json('workloads:bulk_update_workload_ajax', {'changes': [
+            {'workload_id': workload.pk, 'day': 31, 'value': '4'},
+        ]})
+        self.assertFalse(result['success'])
+        workload.refresh_from_db()
+        self.assertEqual((workload.day_30, workload.day_31), (Decimal('0'), Decimal('0')))
+        self.assertDerivedDataConsistent()
+
+    def test_delete(self):
+        workloads = Workload.objects.order_by('id')
+        workloads.first().delete()
+        result = self.post_json('workloads:delete_workload_ajax', {'workload_id': workloads.first().pk})
+        self.assertTrue(result['success'], result)
+        Workload.objects.filter(pk__in=workloads.values_list('pk', flat=True)[:5]).delete()
+        self.assertDerivedDataConsistent()
+
+    def test_cascading_delete(self):
+        workload = self.workload()
+        workload.user.delete()
+        self.assertDerivedDataConsistent()
+        workload.project.delete()
+        self.assertDerivedDataConsistent()
+
+    def test_rollover(self):
+        source_month = Workload.objects.order_by('-year_month').values_list('year_month', flat=True).first()
+        target_month = rollover.next_year_month(source_month)
+        expected = rollover.rollover_preview(source_month)
+        self.assertGreater(expected, 0)
+
+        self.assertEqual(rollover.rollover_month(source_month), expected)
+        self.assertEqual(rollover.rollover_month(source_month), 0)
+        copied = Workload.objects.filter(year_month=target_month)
+        self.assertEqual(copied.count(), expected)
+        self.assertEqual(copied.month_total_hours(), Decimal('0'))
+        self.assertDerivedDataConsistent()
+
+
+class TimesheetImportTests(WorkloadDerivedDataTestMixin, TestCase):
+    """タイムシート取り込みの検証と、取り込み後の台帳・日付別工数"""
+
+    HEADER = ['担当者', 'プロジェクト', 'チケット', '日付', '工数']
+
+    def setUp(self):
+        super().setUp()
+        self.workload = Workload.objects.filter(ticket__isnull=False).select_related(
+            'user', 'project', 'ticket'
+        ).order_by('id').first()
+
+    def row(self, work_date, hours, username=None, ticket=None):
+        return [
+            username or self.workload.user.username,
+            self.workload.project.project_no,
+            self.workload.ticket.ticket_no if ticket is None else ticket,
+            work_date,
+            hours,
+        ]
+
+    def test_parse_hours(self):
+        self.assertEqual(parse_hours(''), Decimal('0'))
+        self.assertEqual(parse_hours('7.25'), Decimal('7.2'))
+        self.assertEqual(parse_hours(8), Decimal('8.0'))
+        self.assertIsNone(parse_hours('24.1'))
+        self.assertIsNone(parse_hours('-1'))
+        self.assertIsNone(parse_hours('abc'))
+
+    def test_parse_date(self):
+        self.assertEqual(parse_date('2024-02-29').day, 29)
+        self.assertEqual(parse_date('2024/3/1').month, 3)
+        self.assertIsNone(parse_date('2023-02-29'))
+        self.assertIsNone(parse_date('2024-01'))
+        self.assertIsNone(parse_date(''))
+
+    def test_missing_columns(self):
+        with self.assertRaises(TimesheetFormatError):
+            TimesheetImporter().import_rows([['担当者', '日付', '工数']])
+        with self.assertRaises(TimesheetFormatError):
+            TimesheetImporter().import_rows([])
+
+    def test_invalid_rows_are_reported(self):
+        result = TimesheetImporter().import_rows([
+            self.HEADER,
+            self.row('2030-04-01', '8'),
+            self.row('2030-04-31', '8'),
+            self.row('2030-04-02', '25'),
+            self.row('2030-04-03', '8', username='no-such-user'),
+            self.row('2030-04-04', '8', ticket='no-such-ticket'),
+        ])
+        self.assertEqual(result['rows'], 5)
+        self.assertEqual(result['cells'], 1)
+        self.assertEqual(result['error_count'], 4)
+        self.assertEqual([error['line'] for error in result['errors']], [3, 4, 5, 6])
+        self.assertDerivedDataConsistent()
+
+    def test_import(self):
+        year_month = self.workload.year_month
+        result = TimesheetImporter(batch_size=2).import_rows([
+            self.HEADER,
+            self.row(f'{year_month}-01', '8'),
+            self.row(f'{year_month}-02', '4.5'),
+            self.row(f'{year_month}-02', '5'),
+            self.row('2030-05-01', '3'),
+        ])
+        self.assertEqual(result['error_count'], 0, result['errors'])
+        self.assertEqual(result['created'], 1)
+
+        self.workload.refresh_from_db()
+        self.assertEqual((self.workload.day_01, self.workload.day_02), (Decimal('8.0'), Decimal('5.0')))
+        created = Workload.objects.get(
+            user=self.workload.user, ticket=self.workload.ticket, year_month='2030-05'
+        )
+        self.assertEqual(created.day_01, Decimal('3.0'))
+        self.assertDerivedDataConsistent()
+
+    def test_dry_run(self):
+        result = TimesheetImporter(dry_run=True).import_rows([self.HEADER, self.row('2030-05-01', '3')])
+        self.assertEqual(result['cells'], 1)
+        self.assertFalse(Workload.objects.filter(year_month='2030-05').exists())
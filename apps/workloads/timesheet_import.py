@@ -0,0 +1,414 @@
+"""
+工数（タイムシート）の一括取り込み
+
+CSV または Excel（.xlsx）を1行ずつ読み込み（Excel は read-only モード）、
+担当者・プロジェクト・チケットを自然キーで解決して工数行（day_01〜day_31）へ反映する。
+
+    担当者     ユーザー名
+    プロジェクト プロジェクト番号（なければプロジェクト名。同名が複数ある場合はエラー）
+    チケット   チケット番号（なければプロジェクト内のチケット名。空欄はチケットなし）
+    日付       YYYY-MM-DD / YYYY/MM/DD（Excel の日付セルも可）
+    工数       0〜24（時間、小数1桁）
+
+自然キーの対応表は取り込み開始時に1クエリずつ作成する。
+行は一定件数ごとに、既存の工数行を1クエリで取得して更新分は bulk_update、
+新規分は bulk_create でまとめて保存し、工数台帳・日付別工数にも反映する。
+同じセル（担当者・プロジェクト・チケット・日付）が複数回現れた場合は後の行の値で上書きする。
+"""
+import csv
+import io
+import logging
+import os
+from collections import defaultdict
+from datetime import date, datetime
+from decimal import Decimal, InvalidOperation
+
+from django import forms
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from apps.core.kpi_snapshot import invalidate_kpi_snapshot
+
+from . import entries, ledger
+from .models import Workload
+
+logger = logging.getLogger(__name__)
+
+# 一度に保存する行数
+DEFAULT_BATCH_SIZE = 2000
+# 結果に保持するエラーの最大件数（件数自体はすべて数える）
+MAX_REPORTED_ERRORS = 1000
+
+MAX_HOURS = Decimal('24')
+
+# 列名（見出し）→ 項目名
+HEADER_ALIASES = {
+    'username': 'username',
+    'user': 'username',
+    '担当者': 'username',
+    'ユーザー名': 'username',
+    'project': 'project',
+    'project_no': 'project',
+    'プロジェクト': 'project',
+    'プロジェクト番号': 'project',
+    '案件': 'project',
+    'ticket': 'ticket',
+    'ticket_no': 'ticket',
+    'チケット': 'ticket',
+    'チケット番号': 'ticket',
+    'date': 'date',
+    '日付': 'date',
+    'hours': 'hours',
+    '工数': 'hours',
+    '工数（時間）': 'hours',
+}
+REQUIRED_COLUMNS = ('username', 'project', 'date', 'hours')
+
+SUPPORTED_EXTENSIONS = ('.csv', '.xlsx')
+
+
+class TimesheetFormatError(Exception):
+    """ファイル形式・見出しの誤り（取り込み全体を中止する）"""
+
+
+def _cell_text(value):
+    if value is None:
+        return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value).strip()
+
+
+def iter_csv_rows(file):
+    """CSV（UTF-8、BOM 可）を1行ずつ返す"""
+    text = io.TextIOWrapper(file, encoding='utf-8-sig', newline='')
+    try:
+        yield from csv.reader(text)
+    finally:
+        # 元のファイルオブジェクトを閉じないよう切り離す
+        text.detach()
+
+
+def iter_xlsx_rows(file):
+    """Excel の最初のシートを read-only モードで1行ずつ返す"""
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        yield from workbook.worksheets[0].iter_rows(values_only=True)
+    finally:
+        workbook.close()
+
+
+def iter_file_rows(file, filename):
+    """拡張子に応じて CSV / Excel の行を返す"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.csv':
+        return iter_csv_rows(file)
+    if extension == '.xlsx':
+        return iter_xlsx_rows(file)
+    raise TimesheetFormatError('CSV（.csv）または Excel（.xlsx）ファイルを指定してください。')
+
+
+def parse_date(value):
+    """日付セルの値を date に変換（不正値は None）"""
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    text = _cell_text(value)
+    for separator in ('-', '/'):
+        parts = text.split(separator)
+        if len(parts) == 3:
+            try:
+                return date(int(parts[0]), int(parts[1]), int(parts[2]))
+            except ValueError:
+                return None
+    return None
+
+
+def parse_hours(value):
+    """工数セルの値を小数1桁の Decimal に変換（空欄は0、不正値・範囲外は None）"""
+    text = _cell_text(value)
+    if not text:
+        return Decimal('0')
+    try:
+        hours = Decimal(text).quantize(Decimal('0.1'))
+    except (InvalidOperation, ValueError):
+        return None
+    if hours < 0 or hours > MAX_HOURS:
+        return None
+    return hours
+
+
+class TimesheetImportForm(forms.Form):
+    """タイムシート（CSV / Excel）取り込みフォーム"""
+    file = forms.FileField(
+        label="ファイル *",
+        help_text="CSV（UTF-8）または Excel（.xlsx）。列: 担当者, プロジェクト, チケット, 日付, 工数",
+        widget=forms.ClearableFileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx'})
+    )
+    dry_run = forms.BooleanField(
+        label="検証のみ（保存しない）",
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
+
+    def clean_file(self):
+        file = self.cleaned_data['file']
+        if not file.name.lower().endswith(SUPPORTED_EXTENSIONS):
+            raise forms.ValidationError('CSV（.csv）または Excel（.xlsx）ファイルを指定してください。')
+        return file
+
+
+class NaturalKeyResolver:
+    """自然キー → ID の対応表（各モデル1クエリで作成）"""
+
+    def __init__(self):
+        from apps.projects.models import Project, ProjectTicket
+        from apps.users.models import CustomUser
+
+        self.users = {}
+        self.employee_levels = {}
+        for user_id, username, employee_level in CustomUser.objects.values_list('id', 'username', 'employee_level'):
+            self.users[username] = user_id
+            self.employee_levels[user_id] = employee_level or ''
+
+        self.projects = {}
+        duplicated_names = set(
+            Project.objects.values('name').annotate(count=Count('id')).filter(count__gt=1).values_list('name', flat=True)
+        )
+        self.project_names = {}
+        for project_id, project_no, name in Project.objects.values_list('id', 'project_no', 'name'):
+            if project_no:
+                self.projects[project_no] = project_id
+            if name in duplicated_names:
+                self.project_names[name] = None
+            else:
+                self.project_names[name] = project_id
+
+        self.tickets = {}
+        self.ticket_titles = {}
+        for ticket_id, ticket_no, project_id, title in ProjectTicket.objects.values_list(
+            'id', 'ticket_no', 'project_id', 'title'
+        ):
+            if ticket_no:
+                self.tickets[ticket_no] = (ticket_id, project_id)
+            key = (project_id, title)
+            self.ticket_titles[key] = None if key in self.ticket_titles else ticket_id
+
+    def user(self, username):
+        return self.users.get(username)
+
+    def project(self, value):
+        """プロジェクト番号またはプロジェクト名から ID を返す（同名が複数なら None）"""
+        if value in self.projects:
+            return self.projects[value]
+        return self.project_names.get(value)
+
+    def ticket(self, value, project_id):
+        """
+        チケット番号またはプロジェクト内のチケット名から ID を返す。
+        戻り値: (チケットID, エラーメッセージ)
+        """
+        if value in self.tickets:
+            ticket_id, ticket_project_id = self.tickets[value]
+            if ticket_project_id != project_id:
+                return None, f'チケット「{value}」は指定されたプロジェクトのチケットではありません'
+            return ticket_id, None
+        key = (project_id, value)
+        if key not in self.ticket_titles:
+            return None, f'チケット「{value}」が見つかりません'
+        if self.ticket_titles[key] is None:
+            return None, f'チケット名「{value}」がプロジェクト内で重複しています（チケット番号を指定してください）'
+        return self.ticket_titles[key], None
+
+
+class TimesheetImporter:
+    """
+    タイムシートの取り込み。
+
+        importer = TimesheetImporter()
+        result = importer.import_file(file, 'timesheet.csv')
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, dry_run=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.resolver = None
+        self.result = {
+            'rows': 0,
+            'cells': 0,
+            'created': 0,
+            'updated': 0,
+            'error_count': 0,
+            'errors': [],
+            'dry_run': dry_run,
+        }
+
+    def add_error(self, line, message):
+        self.result['error_count'] += 1
+        if len(self.result['errors']) < MAX_REPORTED_ERRORS:
+            self.result['errors'].append({'line': line, 'message': message})
+
+    def _column_map(self, header):
+        columns = {}
+        for index, title in enumerate(header or ()):
+            field = HEADER_ALIASES.get(_cell_text(title).lower()) or HEADER_ALIASES.get(_cell_text(title))
+            if field and field not in columns:
+                columns[field] = index
+        missing = [field for field in REQUIRED_COLUMNS if field not in columns]
+        if missing:
+            raise TimesheetFormatError(f'必須の列がありません: {", ".join(missing)}')
+        return columns
+
+    def parse_row(self, line, values, columns):
+        """
+        1行を検証して (工数行のキー, 日, 工数) を返す（エラーなら None）。
+        工数行のキー: (user_id, project_id, ticket_id, year_month)
+        """
+        def cell(field):
+            index = columns.get(field)
+            if index is None or index >= len(values):
+                return None
+            return values[index]
+
+        username = _cell_text(cell('username'))
+        project_value = _cell_text(cell('project'))
+        ticket_value = _cell_text(cell('ticket'))
+
+        user_id = self.resolver.user(username)
+        if user_id is None:
+            self.add_error(line, f'担当者「{username}」が見つかりません')
+            return None
+        project_id = self.resolver.project(project_value)
+        if project_id is None:
+            self.add_error(line, f'プロジェクト「{project_value}」が見つからないか、同名のプロジェクトが複数あります')
+            return None
+        ticket_id = None
+        if ticket_value:
+            ticket_id, message = self.resolver.ticket(ticket_value, project_id)
+            if message:
+                self.add_error(line, message)
+                return None
+
+        work_date = parse_date(cell('date'))
+        if work_date is None:
+            self.add_error(line, f'日付「{_cell_text(cell("date"))}」が不正です')
+            return None
+        hours = parse_hours(cell('hours'))
+        if hours is None:
+            self.add_error(line, f'工数「{_cell_text(cell("hours"))}」は0〜24の数値で入力してください')
+            return None
+
+        return (user_id, project_id, ticket_id, work_date.strftime('%Y-%m')), work_date.day, hours
+
+    def flush(self, cells):
+        """
+        1バッチ分のセルを保存する。
+        cells: {(user_id, project_id, ticket_id, year_month): {日: 工数}}
+        """
+        if not cells:
+            return
+        self.result['cells'] += sum(len(days) for days in cells.values())
+        if self.dry_run:
+            return
+
+        # 一意制約（担当者・プロジェクト・チケット・年月）で既存行を1クエリで取得
+        existing = {}
+        candidates = Workload.objects.filter(
+            user_id__in={key[0] for key in cells},
+            project_id__in={key[1] for key in cells},
+            year_month__in={key[3] for key in cells},
+        )
+        for workload in candidates:
+            key = (workload.user_id, workload.project_id, workload.ticket_id, workload.year_month)
+            if key in cells:
+                existing[key] = workload
+
+        now = timezone.now()
+        to_update = []
+        to_create = []
+        touched_fields = set()
+        deltas = defaultdict(Decimal)
+        for key, days in cells.items():
+            user_id, project_id, ticket_id, year_month = key
+            workload = existing.get(key)
+            if workload is None:
+                workload = Workload(user_id=user_id, project_id=project_id, ticket_id=ticket_id, year_month=year_month)
+                to_create.append(workload)
+            else:
+                # bulk_update では auto_now が働かないため、差分同期用に更新日時を設定
+                workload.updated_at = now
+                to_update.append(workload)
+            ledger_key = (project_id, ticket_id, year_month, self.resolver.employee_levels[user_id])
+            for day, hours in days.items():
+                field = f'day_{day:02d}'
+                deltas[ledger_key] += hours - (getattr(workload, field) or Decimal('0'))
+                setattr(workload, field, hours)
+                touched_fields.add(field)
+
+        with transaction.atomic():
+            if to_update:
+                Workload.objects.bulk_update(to_update, sorted(touched_fields) + ['updated_at'], batch_size=500)
+            if to_create:
+                Workload.objects.bulk_create(to_create, batch_size=500)
+                # SQLite では bulk_create で主キーが設定されないため、一意キーで取得し直す
+                if to_create[0].pk is None:
+                    created_keys = {
+                        (workload.user_id, workload.project_id, workload.ticket_id, workload.year_month)
+                        for workload in to_create
+                    }
+                    to_create = [
+                        workload for workload in Workload.objects.filter(
+                            user_id__in={key[0] for key in created_keys},
+                            project_id__in={key[1] for key in created_keys},
+                            year_month__in={key[3] for key in created_keys},
+                        )
+                        if (workload.user_id, workload.project_id, workload.ticket_id, workload.year_month) in created_keys
+                    ]
+            ledger.apply_deltas(deltas)
+            entries.sync_workloads(to_update + to_create)
+            transaction.on_commit(invalidate_kpi_snapshot)
+
+        self.result['created'] += len(to_create)
+        self.result['updated'] += len(to_update)
+
+    def import_rows(self, rows):
+        """見出し行から始まる行を取り込み、結果を返す"""
+        rows = iter(rows)
+        try:
+            header = next(rows)
+        except StopIteration:
+            raise TimesheetFormatError('ファイルが空です。')
+        columns = self._column_map(header)
+        self.resolver = self.resolver or NaturalKeyResolver()
+
+        cells = defaultdict(dict)
+        pending = 0
+        for line, values in enumerate(rows, 2):
+            if not values or not any(_cell_text(value) for value in values):
+                continue
+            self.result['rows'] += 1
+            parsed = self.parse_row(line, values, columns)
+            if parsed is None:
+                continue
+            key, day, hours = parsed
+            cells[key][day] = hours
+            pending += 1
+            if pending >= self.batch_size:
+                self.flush(cells)
+                cells = defaultdict(dict)
+                pending = 0
+        self.flush(cells)
+
+        logger.info(
+            f"タイムシートを取り込みました: {self.result['rows']}行, "
+            f"作成{self.result['created']}件, 更新{self.result['updated']}件, エラー{self.result['error_count']}件"
+        )
+        return self.result
+
+    def import_file(self, file, filename):
+        """ファイル（バイナリ）を取り込み、結果を返す"""
+        return self.import_rows(iter_file_rows(file, filename))
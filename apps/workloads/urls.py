@@ -15,4 +15,12 @@ urlpatterns = [
     path('ajax/update/', views.update_workload_ajax, name='update_workload_ajax'),
     path('ajax/bulk-update/', views.bulk_update_workload_ajax, name='bulk_update_workload_ajax'),
     path('ajax/delete/', views.delete_workload_ajax, name='delete_workload_ajax'),
+    path('ajax/grid/', views.workload_grid_api, name='workload_grid_api'),
+    path('ajax/calendar-block/', views.workload_calendar_block, name='workload_calendar_block'),
+    path('ajax/changes/', views.workload_change_feed, name='workload_change_feed'),
+    path('ajax/rollover/', views.rollover_workload_ajax, name='rollover_workload_ajax'),
+    path('import/', views.timesheet_import, name='timesheet_import'),
+    path('completeness/', views.timesheet_completeness, name='timesheet_completeness'),
+    path('completeness/csv/', views.timesheet_completeness_csv, name='timesheet_completeness_csv'),
+    path('ajax/completeness/', views.timesheet_completeness_api, name='timesheet_completeness_api'),
 ]
\ No newline at end of file
@@ -1,26 +1,49 @@
 from django.shortcuts import render, get_object_or_404
+from django.template.loader import render_to_string
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView, ListView, CreateView, UpdateView, DeleteView, DetailView
-from django.http import JsonResponse
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth import get_user_model
 from django.utils import timezone
+from django.db import transaction
 from django.db.models import Q
 from django.urls import reverse_lazy
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_date
 from django.contrib import messages
+import csv
+import io
 import json
 import calendar
-import jpholiday
+import logging
+from collections import defaultdict
 from datetime import date
 from decimal import Decimal
 
-from .models import Workload
+from .models import Workload, days_in_month
+from . import change_feed, completeness, entries, grid, ledger, rollover
 from apps.projects.models import Project, ProjectTicket
 from apps.users.models import Department, Section
+from apps.core.calendar_service import get_month_calendar
+from apps.core.kpi_snapshot import invalidate_kpi_snapshot
+from apps.core.decorators import leader_or_superuser_required_403
+from apps.core.metrics import CELL_WRITES
+from .timesheet_import import MAX_REPORTED_ERRORS, TimesheetFormatError, TimesheetImporter, TimesheetImportForm
 
 User = get_user_model()
+logger = logging.getLogger(__name__)
+
+# 一括工数更新の bulk_update バッチサイズ
+BULK_UPDATE_BATCH_SIZE = 200
+
+def editable_workloads(user):
+    """編集できる工数行（本人の行、リーダー・管理者は全行）"""
+    if user.is_leader or user.is_superuser:
+        return Workload.objects.all()
+    return Workload.objects.filter(user=user)
 
 class WorkloadCalendarView(LoginRequiredMixin, TemplateView):
     """工数カレンダー表示"""
@@ -30,74 +53,36 @@ class WorkloadCalendarView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
         
         # 年月の取得（デフォルトは現在月）
-        year_month = self.request.GET.get('year_month', timezone.now().strftime('%Y-%m'))
+        year, month, year_month = grid.parse_year_month(
+            self.request.GET.get('year_month', timezone.now().strftime('%Y-%m'))
+        )
         department_filter = self.request.GET.get('department', '')
         section_filter = self.request.GET.get('section', '')
-        
-        try:
-            year, month = map(int, year_month.split('-'))
-        except:
-            year, month = timezone.now().year, timezone.now().month
-            year_month = f"{year:04d}-{month:02d}"
 
         # 該当月の日数を取得
         days_in_month = calendar.monthrange(year, month)[1]
         
-        # ユーザー権限に応じたクエリセット
+        # ユーザー権限に応じたクエリセット（管理者は全データ、一般ユーザーは自分の課・部署のみ）
         user = self.request.user
-        if user.is_leader or user.is_superuser:
-            # 管理者は全データを表示
-            workloads = Workload.objects.filter(year_month=year_month)
-            
-            # 部署フィルター
-            if department_filter:
-                workloads = workloads.filter(user__department_id=department_filter)
-            
-            # 課フィルター
-            if section_filter:
-                workloads = workloads.filter(user__section_id=section_filter)
-                
-            # 管理者は全ユーザーを表示
-            all_users = User.objects.filter(is_active=True).order_by('username')
-        else:
-            # 一般ユーザーは自分の課のみ
-            if hasattr(user, 'section') and user.section:
-                workloads = Workload.objects.filter(
-                    year_month=year_month,
-                    user__section=user.section
-                )
-                # 同じ課のユーザーのみ表示
-                all_users = User.objects.filter(
-                    is_active=True,
-                    section=user.section
-                ).order_by('username')
-            elif hasattr(user, 'department') and user.department:
-                workloads = Workload.objects.filter(
-                    year_month=year_month,
-                    user__department=user.department
-                )
-                # 同じ部署のユーザーのみ表示
-                all_users = User.objects.filter(
-                    is_active=True,
-                    department=user.department
-                ).order_by('username')
-            else:
-                workloads = Workload.objects.filter(
-                    year_month=year_month,
-                    user=user
-                )
-                # 自分のみ表示
-                all_users = User.objects.filter(id=user.id)
+        workload_filter, _ = grid.calendar_scope(user, department_filter, section_filter)
+        workloads = Workload.objects.filter(year_month=year_month, **workload_filter)
 
-        # selectで関連データを取得（ticketとprojectの両方）
-        workloads = workloads.select_related(
-            'user', 'project', 'ticket', 'user__section', 'user__department'
-        ).order_by(
-            'user__department__name', 'user__section__name', 'user__username', 'project__name', 'ticket__title'
-        )
+        # 範囲全体の集計（統計表示・差分同期の初期状態、1クエリ）
+        totals = grid.month_totals(workloads)
+        is_admin = user.is_leader or user.is_superuser
+
+        # 管理者は全社分になるため、担当者ブロック単位で最初のブロックだけ表示し、続きはスクロールで取得
+        block = None
+        next_cursor = None
+        if is_admin:
+            block_user_ids, next_cursor = grid.user_block(workloads)
+            workloads = workloads.filter(user_id__in=block_user_ids)
+            block = grid.block_subtotal(workloads, days_in_month)
 
-        # 統計計算
-        unique_users = workloads.values('user').distinct().count()
+        # selectで関連データを取得（ticketとprojectの両方）
+        workloads = grid.order_rows(workloads.select_related(
+            'user', 'project', 'ticket', 'user__section', 'user__section__department', 'user__department'
+        ))
 
         # 部署一覧（フィルター用）
         if user.is_leader or user.is_superuser:
@@ -119,39 +104,13 @@ class WorkloadCalendarView(LoginRequiredMixin, TemplateView):
             else:
                 sections = Section.objects.none()
 
-        # アクティブなプロジェクト一覧
-        projects = Project.objects.filter(is_active=True).order_by('name')
-        
-        # 全チケット一覧（プロジェクトごとに整理）
-        tickets = ProjectTicket.objects.select_related('project').filter(
-            project__is_active=True
-        ).order_by('project__name', 'title')
-
         # 月の最初の日（曜日計算用）
-        from datetime import date
         first_day = date(year, month, 1)
 
-        # 祝日と曜日情報を作成
-        _, last_day = calendar.monthrange(year, month)
-        
-        holidays = []
-        weekday_info = {}
-        
-        for day in range(1, last_day + 1):
-            target_date = date(year, month, day)
-            weekday = target_date.weekday()  # 0=月曜, 6=日曜
-            
-            # 祝日判定
-            if jpholiday.is_holiday(target_date):
-                holidays.append(day)
-            
-            # 曜日情報を保存
-            weekday_info[day] = {
-                'weekday': weekday,
-                'is_saturday': weekday == 5,
-                'is_sunday': weekday == 6,
-                'is_holiday': jpholiday.is_holiday(target_date)
-            }
+        # 祝日と曜日情報（年月ごとにキャッシュされたカレンダーから取得）
+        month_calendar = get_month_calendar(year, month)
+        holidays = month_calendar.holiday_days
+        weekday_info = month_calendar.weekday_info()
         
         context.update({
             'year_month': year_month,
@@ -162,13 +121,16 @@ class WorkloadCalendarView(LoginRequiredMixin, TemplateView):
             'workloads': workloads,
             'departments': departments,
             'sections': sections,
-            'projects': projects,
-            'tickets': tickets,  # チケット一覧を追加
-            'all_users': all_users,
             'selected_department': department_filter,
             'selected_section': section_filter,
-            'is_admin': user.is_leader or user.is_superuser,
-            'unique_users_count': unique_users,
+            'is_admin': is_admin,
+            'unique_users_count': totals['user_count'],
+            'month_totals': totals,
+            'grid_etag': grid.grid_etag(year_month, f"{user.pk}|{department_filter}|{section_filter}", totals),
+            'change_feed_enabled': change_feed.is_enabled(),
+            'block': block,
+            'block_index': 0,
+            'next_cursor': next_cursor,
             'year_month_first_day': first_day.weekday(),
             'holidays': holidays,
             'weekday_info': weekday_info,
@@ -203,7 +165,9 @@ class WorkloadCreateView(LoginRequiredMixin, CreateView):
 
     def form_valid(self, form):
         messages.success(self.request, '工数を作成しました。')
-        return super().form_valid(form)
+        with transaction.atomic():
+            # 台帳・日付別工数は保存時のシグナルで同じトランザクション内に更新される
+            return super().form_valid(form)
 
 class WorkloadDetailView(LoginRequiredMixin, DetailView):
     """工数詳細ビュー"""
@@ -220,7 +184,9 @@ class WorkloadUpdateView(LoginRequiredMixin, UpdateView):
 
     def form_valid(self, form):
         messages.success(self.request, '工数を更新しました。')
-        return super().form_valid(form)
+        with transaction.atomic():
+            # 台帳（旧キーから減算・新キーへ加算）・日付別工数は保存時のシグナルで同じトランザクション内に更新される
+            return super().form_valid(form)
 
 class WorkloadDeleteView(LoginRequiredMixin, DeleteView):
     """工数削除ビュー"""
@@ -228,8 +194,12 @@ class WorkloadDeleteView(LoginRequiredMixin, DeleteView):
     template_name = 'workloads/workload_delete.html'
     success_url = reverse_lazy('workloads:workload_calendar')
 
+    def get_queryset(self):
+        return Workload.objects.select_related('user', 'project')
+
     def delete(self, request, *args, **kwargs):
         messages.success(request, '工数を削除しました。')
+        # 台帳は削除時のシグナルで減算される
         return super().delete(request, *args, **kwargs)
 
 @login_required
@@ -280,12 +250,14 @@ def create_workload_ajax(request):
             })
         
         # 新規工数行を作成
-        workload = Workload.objects.create(
-            user=user,
-            project=project,
-            ticket=ticket,
-            year_month=year_month
-        )
+        # 台帳・日付別工数は保存時のシグナルで同じトランザクション内に更新される
+        with transaction.atomic():
+            workload = Workload.objects.create(
+                user=user,
+                project=project,
+                ticket=ticket,
+                year_month=year_month
+            )
         
         return JsonResponse({
             'success': True,
@@ -316,43 +288,71 @@ def update_workload_ajax(request):
                 'error': '必須パラメータが不足しています。'
             })
         
-        try:
-            workload = Workload.objects.get(id=workload_id)
-        except Workload.DoesNotExist:
-            return JsonResponse({
-                'success': False,
-                'error': '指定された工数データが見つかりません。'
-            })
-        
-        # 権限チェック（本人または管理者のみ）
-        if workload.user != request.user and not request.user.is_leader and not request.user.is_superuser:
-            return JsonResponse({
-                'success': False,
-                'error': '編集権限がありません。'
-            })
-        
         # 値の範囲チェック
         try:
-            value = float(value) if value else 0.0
+            day = int(day)
+            value = Decimal(str(value)) if value else Decimal('0')
+            if not 1 <= day <= 31:
+                raise ValueError
             if value < 0 or value > 24:
                 return JsonResponse({
                     'success': False,
                     'error': '工数は0-24の範囲で入力してください。'
                 })
-        except (ValueError, TypeError):
+        except (ValueError, TypeError, ArithmeticError):
             return JsonResponse({
                 'success': False,
                 'error': '無効な値です。'
             })
+        # DB の精度（小数1桁）にそろえる
+        value = value.quantize(Decimal('0.1'))
+        field = f'day_{day:02d}'
+        
+        # 権限チェック（本人または管理者のみ）は WHERE 句で行い、対象の1列だけを更新する
+        editable = editable_workloads(request.user).filter(pk=workload_id)
+        with transaction.atomic():
+            row = editable.select_for_update().values_list(
+                *ledger.DAY_FIELDS, 'user_id', 'user__employee_level', 'project_id', 'ticket_id', 'year_month'
+            ).first()
+            # 月に存在しない日（2月30日など）は日付別工数にできないため入力させない
+            if row is not None and day > (days_in_month(row[-1]) or 0):
+                return JsonResponse({
+                    'success': False,
+                    'error': f'{row[-1]}に{day}日はありません。'
+                })
+            updated = row is not None and editable.update(**{field: value, 'updated_at': timezone.now()})
+            if updated:
+                day_values = dict(zip(ledger.DAY_FIELDS, row[:31]))
+                user_id, employee_level, project_id, ticket_id, year_month = row[31:]
+                old_value = day_values[field] or Decimal('0')
+                day_values[field] = value
+
+                # 台帳には増減分のみ、日付別工数にはその日だけを反映
+                ledger.apply_deltas({(project_id, ticket_id, year_month, employee_level or ''): value - old_value})
+                entries.set_entry(workload_id, user_id, project_id, ticket_id, year_month, day, value)
+                # update() はシグナルを送らないため、ダッシュボードのKPIを明示的に破棄
+                transaction.on_commit(invalidate_kpi_snapshot)
+                total_hours = float(sum((hours or Decimal('0') for hours in day_values.values()), Decimal('0')))
+                # 同じ月を表示中の画面へ変更を通知（コミット後）
+                change_feed.publish_cells(year_month, [(int(workload_id), day, float(value), total_hours)])
+        
+        if not updated:
+            if Workload.objects.filter(pk=workload_id).exists():
+                return JsonResponse({
+                    'success': False,
+                    'error': '編集権限がありません。'
+                })
+            return JsonResponse({
+                'success': False,
+                'error': '指定された工数データが見つかりません。'
+            })
         
-        # 工数を更新
-        workload.set_day_value(day, value)
-        workload.save()
-        
+        CELL_WRITES.inc(1, 'update')
+        # 行の合計は更新時にロックした行の値から計算
         return JsonResponse({
             'success': True,
-            'total_hours': workload.total_hours,
-            'total_days': workload.total_days,
+            'total_hours': total_hours,
+            'total_days': total_hours / 8,
             'message': f'{day}日の工数を更新しました。'
         })
         
@@ -379,41 +379,114 @@ def bulk_update_workload_ajax(request):
         updated_count = 0
         errors = []
         
+        # 対象の工数行を1クエリでまとめて取得
+        workload_ids = set()
         for change in changes:
-            workload_id = change.get('workload_id')
-            day = change.get('day')
-            value = change.get('value', 0)
-            
             try:
-                workload = Workload.objects.get(id=workload_id)
-                
-                # 権限チェック
-                # if workload.user != request.user and not request.user.is_leader:
-                #     errors.append(f'工数ID {workload_id}: 編集権限がありません')
-                #     continue
-                
-                # 値の範囲チェック
-                value = float(value) if value else 0.0
-                if value < 0 or value > 24:
-                    errors.append(f'工数ID {workload_id}, {day}日: 値が範囲外です')
-                    continue
-                
-                # 工数を更新
-                workload.set_day_value(day, value)
-                workload.save()
-                updated_count += 1
-                
-            except Workload.DoesNotExist:
-                errors.append(f'工数ID {workload_id}: データが見つかりません')
-                continue
+                workload_ids.add(int(change.get('workload_id')))
             except (ValueError, TypeError):
-                errors.append(f'工数ID {workload_id}, {day}日: 無効な値です')
-                continue
-            except Exception as e:
-                errors.append(f'工数ID {workload_id}: {str(e)}')
                 continue
         
+        # 読み込みから保存までを1トランザクションで行い、対象の工数行は行ロックする
+        # （ロックせずに読んだ値で書き戻すと、同時に行われた1セル更新を古い値で上書きしてしまう）
+        with transaction.atomic():
+            workloads = Workload.objects.select_for_update().in_bulk(workload_ids)
+            employee_levels = dict(
+                User.objects.filter(
+                    id__in={workload.user_id for workload in workloads.values()}
+                ).values_list('id', 'employee_level')
+            )
+            
+            original_hours = {}
+            changed_fields = defaultdict(set)
+            changed_cells = set()
+            
+            for change in changes:
+                workload_id = change.get('workload_id')
+                day = change.get('day')
+                value = change.get('value', 0)
+                
+                try:
+                    if workload_id is None:
+                        raise Workload.DoesNotExist
+                    workload = workloads.get(int(workload_id))
+                    if workload is None:
+                        raise Workload.DoesNotExist
+                    
+                    # 権限チェック
+                    # if workload.user != request.user and not request.user.is_leader:
+                    #     errors.append(f'工数ID {workload_id}: 編集権限がありません')
+                    #     continue
+                    
+                    day = int(day)
+                    if not 1 <= day <= 31:
+                        raise ValueError
+                    if day > (days_in_month(workload.year_month) or 0):
+                        errors.append(f'工数ID {workload_id}, {day}日: {workload.year_month}に存在しない日付です')
+                        continue
+                    
+                    # 値の範囲チェック
+                    value = Decimal(str(value)) if value else Decimal('0')
+                    if value < 0 or value > 24:
+                        errors.append(f'工数ID {workload_id}, {day}日: 値が範囲外です')
+                        continue
+                    # DB の精度（小数1桁）にそろえる
+                    value = value.quantize(Decimal('0.1'))
+                    
+                    # 工数をメモリ上で更新（保存は最後にまとめて行う）。値が変わった列だけを記録する
+                    field = f'day_{day:02d}'
+                    if workload.pk not in original_hours:
+                        original_hours[workload.pk] = ledger.workload_hours(workload)
+                    if (getattr(workload, field) or Decimal('0')) != value:
+                        setattr(workload, field, value)
+                        changed_fields[workload.pk].add(field)
+                        changed_cells.add((workload.pk, day))
+                    updated_count += 1
+                    
+                except Workload.DoesNotExist:
+                    errors.append(f'工数ID {workload_id}: データが見つかりません')
+                    continue
+                except (ValueError, TypeError, ArithmeticError):
+                    errors.append(f'工数ID {workload_id}, {day}日: 無効な値です')
+                    continue
+                except Exception as e:
+                    errors.append(f'工数ID {workload_id}: {str(e)}')
+                    continue
+            
+            # 行ごとに変更された日付列だけを保存する（同じ列の組み合わせの行をまとめて bulk_update）
+            if changed_fields:
+                now = timezone.now()
+                deltas = defaultdict(Decimal)
+                groups = defaultdict(list)
+                for pk, fields in changed_fields.items():
+                    workload = workloads[pk]
+                    workload.updated_at = now
+                    key = ledger.ledger_key(workload, employee_levels.get(workload.user_id) or '')
+                    deltas[key] += ledger.workload_hours(workload) - original_hours[pk]
+                    groups[tuple(sorted(fields))].append(workload)
+                for fields, group in groups.items():
+                    Workload.objects.bulk_update(
+                        group,
+                        list(fields) + ['updated_at'],
+                        batch_size=BULK_UPDATE_BATCH_SIZE
+                    )
+                changed_workloads = [workloads[pk] for pk in changed_fields]
+                ledger.apply_deltas(deltas)
+                entries.sync_workloads(changed_workloads)
+                # bulk_update はシグナルを送らないため、ダッシュボードのKPIを明示的に破棄
+                transaction.on_commit(invalidate_kpi_snapshot)
+                # 同じ月を表示中の画面へ変更を通知（コミット後）
+                cells_by_month = defaultdict(list)
+                for workload_id, day in sorted(changed_cells):
+                    workload = workloads[workload_id]
+                    cells_by_month[workload.year_month].append(
+                        (workload_id, day, workload.get_day_value(day), workload.total_hours)
+                    )
+                for year_month, cells in cells_by_month.items():
+                    change_feed.publish_cells(year_month, cells)
+        
         if updated_count > 0:
+            CELL_WRITES.inc(updated_count, 'bulk_update')
             return JsonResponse({
                 'success': True,
                 'updated_count': updated_count,
@@ -448,7 +521,7 @@ def delete_workload_ajax(request):
             })
         
         try:
-            workload = Workload.objects.get(id=workload_id)
+            workload = Workload.objects.select_related('user', 'project', 'ticket').get(id=workload_id)
         except Workload.DoesNotExist:
             return JsonResponse({
                 'success': False,
@@ -464,6 +537,7 @@ def delete_workload_ajax(request):
         
         # 工数行を削除
         workload_info = f"{workload.user.get_full_name()} - {workload.ticket.title if workload.ticket else workload.project.name}"
+        # 台帳は削除時のシグナルで減算される
         workload.delete()
         
         return JsonResponse({
@@ -475,4 +549,262 @@ def delete_workload_ajax(request):
         return JsonResponse({
             'success': False,
             'error': f'サーバーエラー: {str(e)}'
-        })
\ No newline at end of file
+        })
+@login_required
+@require_http_methods(["GET"])
+def workload_grid_api(request):
+    """
+    工数カレンダーのグリッドデータ（JSON）
+
+    year_month・department・section はカレンダー画面と同じ。
+    ETag が If-None-Match と一致すれば 304 を返す。
+    since（前回レスポンスの watermark）指定時は、それ以降に更新された行と全行IDのみを返す。
+    """
+    year, month, year_month = grid.parse_year_month(
+        request.GET.get('year_month', timezone.now().strftime('%Y-%m'))
+    )
+    department_filter = request.GET.get('department', '')
+    section_filter = request.GET.get('section', '')
+    since = grid.parse_since(request.GET.get('since'))
+
+    workloads = grid.scoped_workloads(request.user, year_month, department_filter, section_filter)
+    state = grid.grid_state(workloads)
+    scope_key = f"{request.user.pk}|{department_filter}|{section_filter}"
+    etag = grid.grid_etag(year_month, scope_key, state)
+
+    not_modified = get_conditional_response(request, etag=f'"{etag}"')
+    if not_modified is not None:
+        return not_modified
+
+    days_in_month = calendar.monthrange(year, month)[1]
+    data = grid.build_grid(workloads, days_in_month, since=since)
+    data.update({
+        'success': True,
+        'year_month': year_month,
+        'days_in_month': days_in_month,
+        'row_count': state['row_count'],
+        'watermark': state['watermark'].isoformat() if state['watermark'] else None,
+    })
+
+    response = JsonResponse(data)
+    response['ETag'] = f'"{etag}"'
+    # 認証済みユーザーごとの内容のため、共有キャッシュには置かず毎回再検証させる
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+@login_required
+@require_http_methods(["GET"])
+def workload_calendar_block(request):
+    """
+    工数カレンダーの続きの担当者ブロック（管理者向けの分割表示用）
+
+    cursor は前のブロックのレスポンス（または画面）の next_cursor。
+    行のHTML・ブロック小計・次のカーソルを返す。
+    """
+    year, month, year_month = grid.parse_year_month(
+        request.GET.get('year_month', timezone.now().strftime('%Y-%m'))
+    )
+    department_filter = request.GET.get('department', '')
+    section_filter = request.GET.get('section', '')
+    cursor = request.GET.get('cursor', '')
+    if grid.decode_cursor(cursor) is None:
+        return JsonResponse({
+            'success': False,
+            'error': 'カーソルが不正です。'
+        }, status=400)
+    try:
+        block_index = int(request.GET.get('block', 1))
+    except (TypeError, ValueError):
+        block_index = 1
+
+    days_in_month = calendar.monthrange(year, month)[1]
+    workloads = grid.scoped_workloads(request.user, year_month, department_filter, section_filter)
+    block_user_ids, next_cursor = grid.user_block(workloads, cursor)
+    workloads = workloads.filter(user_id__in=block_user_ids)
+    block = grid.block_subtotal(workloads, days_in_month)
+    workloads = grid.order_rows(workloads.select_related(
+        'user', 'project', 'ticket', 'user__section', 'user__section__department', 'user__department'
+    ))
+
+    html = render_to_string('workloads/_workload_rows.html', {
+        'workloads': workloads,
+        'year': year,
+        'month': month,
+        'days_in_month': days_in_month,
+        'day_range': range(1, days_in_month + 1),
+        'weekday_info': get_month_calendar(year, month).weekday_info(),
+        'block': block,
+        'block_index': block_index,
+    }, request=request)
+
+    return JsonResponse({
+        'success': True,
+        'html': html,
+        'block': block_index,
+        'subtotal': block,
+        'next_cursor': next_cursor,
+    })
+
+@login_required
+@require_http_methods(["GET"])
+def workload_change_feed(request):
+    """
+    工数カレンダーの変更通知（Server-Sent Events）
+
+    year_month・department・section はカレンダー画面と同じ。
+    接続は一定時間で終了し、ブラウザの EventSource が Last-Event-ID 付きで再接続する。
+    WORKLOAD_CHANGE_FEED_ENABLED が無効なら 404（画面は差分同期の定期実行を使う）。
+    """
+    if not change_feed.is_enabled():
+        raise Http404('変更通知は無効です。')
+    response = StreamingHttpResponse(
+        change_feed.event_stream(
+            request.user,
+            request.GET.get('year_month', timezone.now().strftime('%Y-%m')),
+            request.GET.get('department', ''),
+            request.GET.get('section', ''),
+            last_event_id=request.headers.get('Last-Event-ID') or request.GET.get('last_event_id'),
+        ),
+        content_type='text/event-stream; charset=utf-8',
+    )
+    response['Cache-Control'] = 'no-cache'
+    # nginx などのリバースプロキシでバッファリングさせない
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+@login_required
+@require_http_methods(["POST"])
+def rollover_workload_ajax(request):
+    """
+    工数行の月次繰り越しAJAX
+
+    複製元の月の工数行（担当者・プロジェクト・チケット）を工数0の行として複製先の月へ作成する。
+    管理者は表示中の部署・課の全員分、一般ユーザーは自分の行のみ。
+    """
+    try:
+        data = json.loads(request.body)
+    except json.JSONDecodeError:
+        return JsonResponse({'success': False, 'error': '不正なリクエストです。'}, status=400)
+
+    _, _, target_month = grid.parse_year_month(data.get('target_month'))
+    if data.get('source_month'):
+        _, _, source_month = grid.parse_year_month(data['source_month'])
+    else:
+        source_month = rollover.previous_year_month(target_month)
+    if source_month == target_month:
+        return JsonResponse({'success': False, 'error': '複製元と複製先が同じ年月です。'}, status=400)
+
+    user = request.user
+    if user.is_leader or user.is_superuser:
+        workload_filter, _ = grid.calendar_scope(user, data.get('department', ''), data.get('section', ''))
+    else:
+        workload_filter = {'user': user}
+
+    created = rollover.rollover_month(source_month, target_month, workload_filter)
+    logger.info(
+        f"工数行の繰り越し: user={user.username}, {source_month} → {target_month}, created={created}"
+    )
+    return JsonResponse({
+        'success': True,
+        'created': created,
+        'source_month': source_month,
+        'target_month': target_month,
+        'message': f'{source_month}の工数行から{created}件の工数行を作成しました。',
+    })
+
+@login_required
+@leader_or_superuser_required_403
+def timesheet_import(request):
+    """タイムシート（CSV / Excel）の一括取り込み"""
+    result = None
+    if request.method == 'POST':
+        form = TimesheetImportForm(request.POST, request.FILES)
+        if form.is_valid():
+            upload = form.cleaned_data['file']
+            importer = TimesheetImporter(dry_run=form.cleaned_data['dry_run'])
+            try:
+                result = importer.import_file(upload, upload.name)
+            except TimesheetFormatError as e:
+                form.add_error('file', str(e))
+            else:
+                logger.info(
+                    f"タイムシート取り込み: user={request.user.username}, file={upload.name}, "
+                    f"rows={result['rows']}, errors={result['error_count']}, dry_run={result['dry_run']}"
+                )
+                if result['dry_run']:
+                    messages.info(request, f"{result['rows']}行を検証しました（保存していません）。")
+                else:
+                    messages.success(
+                        request,
+                        f"{result['cells']}件の工数を取り込みました"
+                        f"（工数行 作成{result['created']}件・更新{result['updated']}件）。"
+                    )
+                if result['error_count']:
+                    messages.warning(request, f"{result['error_count']}行はエラーのため取り込んでいません。")
+    else:
+        form = TimesheetImportForm()
+
+    return render(request, 'workloads/timesheet_import.html', {
+        'form': form,
+        'result': result,
+        'max_reported_errors': MAX_REPORTED_ERRORS,
+    })
+
+def _completeness_report(request):
+    """リクエストの条件（year_month・cutoff・department・section）で入力状況レポートを作成"""
+    _, _, year_month = grid.parse_year_month(request.GET.get('year_month'))
+    try:
+        cutoff = parse_date(request.GET.get('cutoff') or '')
+    except ValueError:
+        cutoff = None
+    return completeness.completeness_report(
+        year_month,
+        cutoff=cutoff,
+        department_id=request.GET.get('department') or None,
+        section_id=request.GET.get('section') or None,
+    )
+
+@login_required
+@leader_or_superuser_required_403
+def timesheet_completeness(request):
+    """タイムシート入力状況（締め日までの未入力日）"""
+    report = _completeness_report(request)
+    department_filter = request.GET.get('department', '')
+    sections = Section.objects.all()
+    if department_filter:
+        sections = sections.filter(department_id=department_filter)
+    return render(request, 'workloads/timesheet_completeness.html', {
+        'report': report,
+        'year_month': report['year_month'],
+        'departments': Department.objects.all(),
+        'sections': sections,
+        'selected_department': department_filter,
+        'selected_section': request.GET.get('section', ''),
+        'query_string': request.GET.urlencode(),
+    })
+
+@login_required
+@leader_or_superuser_required_403
+def timesheet_completeness_api(request):
+    """タイムシート入力状況（JSON）"""
+    report = _completeness_report(request)
+    cutoff_date = report['cutoff_date']
+    return JsonResponse({
+        'success': True,
+        **report,
+        'cutoff_date': cutoff_date.isoformat() if cutoff_date else None,
+    })
+
+@login_required
+@leader_or_superuser_required_403
+def timesheet_completeness_csv(request):
+    """タイムシート入力状況（CSV）"""
+    report = _completeness_report(request)
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(completeness.CSV_HEADERS)
+    writer.writerows(completeness.csv_rows(report))
+    # Excel で文字化けしないよう先頭に BOM を付ける（HTTP の charset は登録名の utf-8）
+    response = HttpResponse(('\ufeff' + buffer.getvalue()).encode('utf-8'), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="timesheet_completeness_{report["year_month"]}.csv"'
+    return response
@@ -45,6 +45,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'apps.core.middleware.MetricsMiddleware',  # リクエストの処理時間のメトリクス
+    'apps.core.middleware.RequestProfilingMiddleware',  # リクエストの計測（設定で有効化）
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -183,6 +185,13 @@ AWS_S3_REGION_NAME = 'ap-northeast-1'  # 東京リージョン例
 AWS_QUERYSTRING_AUTH = False
 AWS_S3_ADDRESSING_STYLE = "virtual"
 
+# エクスポートファイルの保存先（'s3' または 'local'。'local' は MEDIA_ROOT/exports に保存）
+REPORT_EXPORT_STORAGE = 's3'
+# 処理中のエクスポートジョブの進捗が途絶えてから、停止したワーカーのものとみなし再実行するまでの秒数
+REPORT_EXPORT_STALE_SECONDS = 3600
+# エクスポートを manage.py run_export_worker で実行するか（無効ならリクエストの中で実行する）
+REPORT_EXPORT_WORKER_ENABLED = os.environ.get('REPORT_EXPORT_WORKER_ENABLED', '') == '1'
+
 # セッションの有効期限設定
 SESSION_COOKIE_AGE = 60 * 60 * 8  # 8時間
 # ブラウザを閉じたときにセッションを削除
@@ -191,10 +200,54 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_SECURE = False  # 開発環境では False、本番環境では True に変更
 SESSION_COOKIE_HTTPONLY = True  # JavaScriptからのアクセスを防ぐ
 SESSION_COOKIE_SAMESITE = 'Lax'  # CSRF攻撃を防ぐ
-# セッションデータベースの定期クリーンアップ
-SESSION_SAVE_EVERY_REQUEST = True  # リクエストごとにセッションの有効期限を更新
+# セッションの保存先（DB / 'django.contrib.sessions.backends.cached_db' でキャッシュ併用 /
+# 'django.contrib.sessions.backends.signed_cookies' で署名付きCookie。Cookieの内容は暗号化されない）
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+# セッションはデータが変わったときだけ保存する。
+# 最後のアクティビティ時間（SessionTimeoutMiddleware）が区切りごとに変わるため、
+# 操作中のセッションは区切りごとに保存され、有効期限も延長される
+SESSION_SAVE_EVERY_REQUEST = False
+# 最後のアクティビティ時間を記録する単位（秒）。0 なら毎リクエスト記録する
+SESSION_ACTIVITY_GRANULARITY_SECONDS = 60
 # CSRFトークンの設定
 CSRF_COOKIE_SECURE = False  # 開発環境では False、本番環境では True に変更
 # JavaScriptからアクセスできるように（AJAXで必要）
 CSRF_COOKIE_HTTPONLY = False
-CSRF_COOKIE_SAMESITE = 'Lax'
\ No newline at end of file
+CSRF_COOKIE_SAMESITE = 'Lax'
+
+# リクエストの計測（RequestProfilingMiddleware。既定は無効）
+REQUEST_PROFILING_ENABLED = os.environ.get('REQUEST_PROFILING_ENABLED', '') == '1'
+# 計測するリクエストの割合（0〜1）
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', '0.1'))
+# 記録するしきい値（処理時間ミリ秒・クエリ数のどちらか以上）
+REQUEST_PROFILING_SLOW_MS = 500
+REQUEST_PROFILING_SLOW_QUERIES = 100
+# RequestProfile テーブルに残す件数
+REQUEST_PROFILING_BUFFER_SIZE = 500
+# 遅いリクエストのログ（JSON 1行、10MB × 5世代でローテーション）
+REQUEST_PROFILING_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'slow_requests.log')
+
+# メトリクス（MetricsMiddleware・/metrics）
+METRICS_ENABLED = True
+# gunicorn の複数ワーカーの値を合算するための共有ディレクトリ（空ならプロセス内のみ）。
+# 終了したワーカーの値も合算するため、サービスの起動時に空にすること
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+# 各プロセスが METRICS_DIR へ値を書き出す間隔（秒）
+METRICS_FLUSH_SECONDS = 5
+# /metrics にアクセスできるIPアドレス（スーパーユーザーはどこからでも可）
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+# 接続元IPアドレスの判定で信頼するリバースプロキシの段数（0 は REMOTE_ADDR で判定）。
+# X-Forwarded-For は右からこの段数目の値を使う（左側はクライアントが偽装できる）
+METRICS_TRUSTED_PROXY_COUNT = 0
+
+# 工数カレンダーの変更通知（Server-Sent Events。既定は無効で、画面は定期的な差分同期を使う）。
+# SSE 接続はワーカーを占有するため、有効にするときは gunicorn をスレッドワーカーで起動すること
+# （例: gunicorn --worker-class gthread --threads 8 kousu_management_app.wsgi:application）
+WORKLOAD_CHANGE_FEED_ENABLED = os.environ.get('WORKLOAD_CHANGE_FEED_ENABLED', '') == '1'
+
+# 検索（入力補完）の索引を作り直すまでの最大秒数（件数・更新日時に表れない変更の反映用）
+LOOKUP_INDEX_MAX_AGE_SECONDS = 300
+
+# テストランナー（マイグレーションファイルなしでテスト用データベースを作成する）
+# 実行例: python manage.py test apps.core.tests apps.workloads.tests.WorkloadLedgerConsistencyTests apps.workloads.tests.TimesheetImportTests
+TEST_RUNNER = 'apps.core.test_runner.AppTestRunner'
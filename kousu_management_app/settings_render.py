@@ -42,6 +42,8 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # WhiteNoiseを追加
+    'apps.core.middleware.MetricsMiddleware',  # リクエストの処理時間のメトリクス
+    'apps.core.middleware.RequestProfilingMiddleware',  # リクエストの計測（設定で有効化）
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -140,7 +142,15 @@ SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 SESSION_COOKIE_SECURE = True   # 本番環境では True
 SESSION_COOKIE_HTTPONLY = True
 SESSION_COOKIE_SAMESITE = 'Lax'
-SESSION_SAVE_EVERY_REQUEST = True
+# セッションの保存先（DB / 'django.contrib.sessions.backends.cached_db' でキャッシュ併用 /
+# 'django.contrib.sessions.backends.signed_cookies' で署名付きCookie。Cookieの内容は暗号化されない）
+SESSION_ENGINE = os.environ.get('SESSION_ENGINE', 'django.contrib.sessions.backends.db')
+# セッションはデータが変わったときだけ保存する。
+# 最後のアクティビティ時間（SessionTimeoutMiddleware）が区切りごとに変わるため、
+# 操作中のセッションは区切りごとに保存され、有効期限も延長される
+SESSION_SAVE_EVERY_REQUEST = False
+# 最後のアクティビティ時間を記録する単位（秒）。0 なら毎リクエスト記録する
+SESSION_ACTIVITY_GRANULARITY_SECONDS = 60
 
 # CSRF設定
 CSRF_COOKIE_SECURE = True     # 本番環境では True
@@ -162,6 +172,10 @@ AWS_S3_REGION_NAME = 'ap-northeast-1'
 AWS_QUERYSTRING_AUTH = False
 AWS_S3_ADDRESSING_STYLE = "virtual"
 
+# エクスポートを manage.py run_export_worker（Background Worker）で実行するか。
+# 無効ならリクエストの中で実行する（RENDER_README.md 参照）
+REPORT_EXPORT_WORKER_ENABLED = os.environ.get('REPORT_EXPORT_WORKER_ENABLED', '') == '1'
+
 # ログ設定
 LOGGING = {
     'version': 1,
@@ -186,4 +200,29 @@ LOGGING = {
             'level': 'INFO',
         },
     },
-}
\ No newline at end of file
+}
+
+# リクエストの計測（RequestProfilingMiddleware。既定は無効）
+REQUEST_PROFILING_ENABLED = os.environ.get('REQUEST_PROFILING_ENABLED', '') == '1'
+# 計測するリクエストの割合（0〜1）
+REQUEST_PROFILING_SAMPLE_RATE = float(os.environ.get('REQUEST_PROFILING_SAMPLE_RATE', '0.1'))
+# 記録するしきい値（処理時間ミリ秒・クエリ数のどちらか以上）
+REQUEST_PROFILING_SLOW_MS = 500
+REQUEST_PROFILING_SLOW_QUERIES = 100
+# RequestProfile テーブルに残す件数
+REQUEST_PROFILING_BUFFER_SIZE = 500
+# 遅いリクエストのログ（JSON 1行、10MB × 5世代でローテーション）
+REQUEST_PROFILING_LOG_FILE = os.path.join(BASE_DIR, 'logs', 'slow_requests.log')
+
+# メトリクス（MetricsMiddleware・/metrics）
+METRICS_ENABLED = True
+# gunicorn の複数ワーカーの値を合算するための共有ディレクトリ（空ならプロセス内のみ）。
+# 終了したワーカーの値も合算するため、サービスの起動時に空にすること
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+# 各プロセスが METRICS_DIR へ値を書き出す間隔（秒）
+METRICS_FLUSH_SECONDS = 5
+# /metrics にアクセスできるIPアドレス（スーパーユーザーはどこからでも可）
+METRICS_ALLOWED_IPS = ['127.0.0.1']
+# 接続元IPアドレスの判定で信頼するリバースプロキシの段数（Render のロードバランサー1段）。
+# X-Forwarded-For は右からこの段数目の値を使う（左側はクライアントが偽装できる）
+METRICS_TRUSTED_PROXY_COUNT = 1
@@ -0,0 +1,150 @@
+/**
+ * 入力補完のセレクト（apps/projects/widgets.py の LookupSelect）
+ *
+ * data-lookup-url を持つセレクトの前に検索欄を追加し、
+ * 入力に応じて検索APIから候補をページ単位で読み込んで選択肢を入れ替える。
+ * data-lookup-depends-on があれば、そのセレクトの値を project パラメータとして送る。
+ * data-lookup-scope があれば、scope パラメータとして送る。
+ */
+(function() {
+    const DEBOUNCE_MS = 250;
+
+    function setupLookupSelect(select) {
+        if (select.dataset.lookupReady) {
+            return;
+        }
+        select.dataset.lookupReady = 'true';
+
+        const input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control form-control-sm mb-1';
+        input.placeholder = '番号・名称で検索';
+        input.autocomplete = 'off';
+        select.parentNode.insertBefore(input, select);
+
+        let page = 1;
+        let loaded = false;
+        let timer = null;
+        let requestId = 0;
+        let previousValue = select.value;
+
+        function buildUrl(pageNumber) {
+            const url = new URL(select.dataset.lookupUrl, window.location.origin);
+            url.searchParams.set('q', input.value.trim());
+            url.searchParams.set('page', pageNumber);
+            if (select.dataset.lookupScope) {
+                url.searchParams.set('scope', select.dataset.lookupScope);
+            }
+            const dependsOn = select.dataset.lookupDependsOn;
+            if (dependsOn) {
+                const parent = document.getElementById(dependsOn);
+                if (parent && parent.value) {
+                    url.searchParams.set('project', parent.value);
+                }
+            }
+            return url;
+        }
+
+        function render(data, append) {
+            const selectedValue = select.value;
+            const moreOption = select.querySelector('option[data-lookup-more]');
+            if (moreOption) {
+                moreOption.remove();
+            }
+            if (!append) {
+                // 空欄と選択中の値以外を入れ替える
+                Array.from(select.options).forEach(option => {
+                    if (option.value !== '' && option.value !== selectedValue) {
+                        option.remove();
+                    }
+                });
+            }
+            data.results.forEach(item => {
+                if (String(item.id) === selectedValue) {
+                    return;
+                }
+                const option = document.createElement('option');
+                option.value = item.id;
+                option.textContent = item.label;
+                select.appendChild(option);
+            });
+            if (data.has_more) {
+                const option = document.createElement('option');
+                option.value = '';
+                option.dataset.lookupMore = 'true';
+                option.textContent = '… さらに読み込む';
+                select.appendChild(option);
+            }
+        }
+
+        function load(pageNumber) {
+            const current = ++requestId;
+            fetch(buildUrl(pageNumber), {
+                headers: { 'X-Requested-With': 'XMLHttpRequest' }
+            })
+                .then(response => {
+                    if (!response.ok) {
+                        throw new Error(`HTTP error! status: ${response.status}`);
+                    }
+                    return response.json();
+                })
+                .then(data => {
+                    // 後から出した検索の結果だけを反映する
+                    if (current !== requestId || !data.success) {
+                        return;
+                    }
+                    page = pageNumber;
+                    loaded = true;
+                    render(data, pageNumber > 1);
+                })
+                .catch(error => {
+                    console.error('候補の取得エラー:', error);
+                });
+        }
+
+        input.addEventListener('input', function() {
+            clearTimeout(timer);
+            timer = setTimeout(() => load(1), DEBOUNCE_MS);
+        });
+
+        // 検索欄を使わずに開いた場合も、最初のページを読み込む
+        select.addEventListener('focus', function() {
+            if (!loaded) {
+                load(1);
+            }
+        });
+
+        // 「さらに読み込む」を選んだ場合は選択を戻して次のページを読み込む
+        select.addEventListener('change', function(event) {
+            const option = select.options[select.selectedIndex];
+            if (option && option.dataset.lookupMore) {
+                event.stopImmediatePropagation();
+                select.value = previousValue;
+                load(page + 1);
+                return;
+            }
+            previousValue = select.value;
+        });
+
+        // 絞り込み元のセレクトが変わったら候補を読み込み直す
+        const dependsOn = select.dataset.lookupDependsOn;
+        const parent = dependsOn ? document.getElementById(dependsOn) : null;
+        if (parent) {
+            parent.addEventListener('change', function() {
+                loaded = false;
+                if (document.activeElement === select || input.value.trim()) {
+                    load(1);
+                }
+            });
+        }
+    }
+
+    function setupLookupSelects(root) {
+        (root || document).querySelectorAll('select[data-lookup-url]').forEach(setupLookupSelect);
+    }
+
+    window.setupLookupSelects = setupLookupSelects;
+    document.addEventListener('DOMContentLoaded', function() {
+        setupLookupSelects(document);
+    });
+})();